@@ -0,0 +1,85 @@
+"""
+Per-message NLU latency and model memory: full spaCy pipelines vs the trimmed PIPELINE_PROFILES,
+and the keyword fast path that skips the model.
+
+Usage: python benchmark_nlu.py [--repeat N]
+Each pipeline is measured in a fresh process so RSS figures do not overlap.
+"""
+import argparse
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+
+MODELS = {"en": "en_core_web_sm", "ru": "ru_core_news_sm"}
+MESSAGES = {
+    "en": ["look", "go north", "attack the goblin", "pickup the Healing Potion", "talk to the Mock Guard"],
+    "ru": ["смотри", "иди на север", "атакуй гоблина", "подбери Зелье лечения", "поговори с Макетный Страж"],
+}
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+    return statistics.median(ordered), ordered[int(len(ordered) * 0.95) - 1]
+
+
+def _measure_model(language: str, exclude, repeat: int, queue) -> None:
+    import spacy
+    before = _rss_mb()
+    started = time.perf_counter()
+    nlp = spacy.load(MODELS[language], exclude=exclude)
+    load_s = time.perf_counter() - started
+    model_mb = _rss_mb() - before
+    samples = []
+    for _ in range(repeat):
+        for text in MESSAGES[language]:
+            t0 = time.perf_counter()
+            nlp(text)
+            samples.append((time.perf_counter() - t0) * 1000)
+    queue.put((nlp.pipe_names, load_s, model_mb, _percentiles(samples)))
+
+
+def _measure_fast_path(language: str, repeat: int):
+    from bot.nlu.player_action_parser import LEMMA_TABLES, get_matcher_nlp
+    nlp, table = get_matcher_nlp(language), LEMMA_TABLES[language]
+    samples, hits = [], 0
+    for _ in range(repeat):
+        for text in MESSAGES[language]:
+            t0 = time.perf_counter()
+            doc = nlp.make_doc(text)
+            tokens = table.resolve([t.text for t in doc], [t.whitespace_ for t in doc])
+            samples.append((time.perf_counter() - t0) * 1000)
+            hits += tokens is not None
+    return hits / (repeat * len(MESSAGES[language])), _percentiles(samples)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    from bot.nlu.player_action_parser import PIPELINE_PROFILES
+
+    context = multiprocessing.get_context("spawn")
+    for language in MODELS:
+        print(f"== {language} ({MODELS[language]}) ==")
+        for label, exclude in (("full", []), ("trimmed", PIPELINE_PROFILES[language].get("exclude", []))):
+            queue = context.Queue()
+            process = context.Process(target=_measure_model, args=(language, exclude, args.repeat, queue))
+            process.start()
+            pipe_names, load_s, model_mb, (p50, p95) = queue.get()
+            process.join()
+            print(f"  {label:8} load {load_s:5.2f}s  +{model_mb:6.1f} MB RSS  p50 {p50:6.3f} ms  p95 {p95:6.3f} ms  {pipe_names}")
+        hit_rate, (p50, p95) = _measure_fast_path(language, args.repeat)
+        print(f"  fastpath hit {hit_rate:4.0%}  p50 {p50:6.3f} ms  p95 {p95:6.3f} ms  (misses fall through to the model)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 # bot/ai/prompt_context_collector.py
 import json
-from typing import TYPE_CHECKING, Dict, Any, List, Optional, Union
+import os
+from typing import TYPE_CHECKING, Callable, Dict, Any, List, Optional, Tuple, Union
+
+from pydantic import TypeAdapter
+
 from bot.ai.ai_data_models import GameTerm, ScalingParameter, GenerationContext
 
 if TYPE_CHECKING:
@@ -16,8 +20,35 @@ if TYPE_CHECKING:
     # Forward reference for GameManager if needed, or pass settings directly
     # from bot.game.managers.game_manager import GameManager
 
+LORE_FILE_PATH = "game_data/lore_i18n.json"
+
+# GenerationContext field -> validator for that field alone, so fragments can be validated separately.
+_FIELD_ADAPTERS: Dict[str, TypeAdapter] = {}
+
+
+def _validate_field(field_name: str, value: Any) -> Any:
+    adapter = _FIELD_ADAPTERS.get(field_name)
+    if adapter is None:
+        adapter = _FIELD_ADAPTERS[field_name] = TypeAdapter(GenerationContext.model_fields[field_name].annotation)
+    return adapter.validate_python(value)
+
+
+def _templates_version(manager: Any) -> Any:
+    """Template version of a manager (bumped by its template loaders); None when the manager is missing."""
+    return getattr(manager, 'templates_version', None) if manager is not None else None
+
 
 class PromptContextCollector:
+    """
+    Builds the GenerationContext for AI generation requests.
+
+    The static fragments (rules summary, lore, game terms, scaling parameters, factions) are validated
+    once and cached per guild together with a stamp of their sources: the templates_version counters
+    of the template-owning managers and the lore file's mtime. A fragment is rebuilt when its stamp
+    changes or after invalidate_fragments(), which is also needed when the settings change.
+    World state, player, quest and relationship data are collected on every request.
+    """
+
     def __init__(
         self,
         settings: Dict[str, Any],
@@ -42,6 +73,9 @@ class PromptContextCollector:
         self.ability_manager = ability_manager
         self.spell_manager = spell_manager
         self.event_manager = event_manager
+        # (guild_id or None, fragment name) -> (source stamp, validated fragment)
+        self._fragment_cache: Dict[Tuple[Optional[str], str], Tuple[Any, Any]] = {}
+        self._fragment_generation = 0
 
     def get_main_language_code(self) -> str:
         """Determines the main language code for the bot."""
@@ -50,8 +84,10 @@ class PromptContextCollector:
     def get_lore_context(self) -> List[Dict[str, Any]]:
         """Gathers lore context from game_data/lore_i18n.json."""
         try:
-            with open("game_data/lore_i18n.json", 'r', encoding='utf-8') as f:
+            with open(LORE_FILE_PATH, 'r', encoding='utf-8') as f:
                 lore_data = json.load(f)
+                if isinstance(lore_data, list): # The shipped file is a bare list of entries
+                    return lore_data
                 return lore_data.get("lore_entries", [])
         except FileNotFoundError:
             print(f"Warning: Lore file not found at game_data/lore_i18n.json")
@@ -697,13 +733,13 @@ class PromptContextCollector:
             "target_languages": self.settings.get("target_languages", ["en", "ru"]),
             "request_type": request_type,
             "request_params": request_params,
-            "game_rules_summary": self.get_game_rules_summary(guild_id),
-            "lore_snippets": self.get_lore_context(),
+            "game_rules_summary": self._cached_fragment(guild_id, "game_rules_summary", lambda: self.get_game_rules_summary(guild_id)),
+            "game_lore_snippets": self._cached_fragment(None, "game_lore_snippets", self.get_lore_context),
             "world_state": self.get_world_state_context(guild_id),
-            "game_terms_dictionary": self.get_game_terms_dictionary(guild_id),
-            "scaling_parameters": self.get_scaling_parameters(guild_id),
+            "game_terms_dictionary": self._cached_fragment(guild_id, "game_terms_dictionary", lambda: self.get_game_terms_dictionary(guild_id)),
+            "scaling_parameters": self._cached_fragment(guild_id, "scaling_parameters", lambda: self.get_scaling_parameters(guild_id)),
             "player_context": None,
-            "faction_data": self.get_faction_data_context(guild_id), # Call the new method
+            "faction_data": self._cached_fragment(guild_id, "faction_data", lambda: self.get_faction_data_context(guild_id)),
             "relationship_data": [],
             "active_quests_summary": [],
         }
@@ -723,9 +759,51 @@ class PromptContextCollector:
             context_dict["relationship_data"] = self.get_relationship_context(guild_id, entity_id=target_entity_id, entity_type="npc")
 
         try:
-            generation_context_model = GenerationContext(**context_dict)
-            return generation_context_model
+            # Cached fragments were validated when they were built; only the per-request parts are checked here.
+            for field_name, value in context_dict.items():
+                if field_name not in self._CACHED_FRAGMENTS:
+                    context_dict[field_name] = _validate_field(field_name, value)
+            return GenerationContext.model_construct(**context_dict)
         except Exception as e:
             print(f"Error creating GenerationContext model from dict: {context_dict}")
             print(f"Pydantic Validation Error: {e}")
             raise ValueError(f"Failed to construct GenerationContext: {e}") from e
+
+    # --- Fragment cache ---
+
+    _CACHED_FRAGMENTS = frozenset({"game_rules_summary", "game_lore_snippets", "game_terms_dictionary", "scaling_parameters", "faction_data"})
+
+    def invalidate_fragments(self, guild_id: Optional[str] = None) -> None:
+        """Forces cached fragments (all, or one guild's plus the shared lore) to be rebuilt on next use."""
+        if guild_id is None:
+            self._fragment_generation += 1
+            self._fragment_cache.clear()
+            return
+        for cache_key in [key for key in self._fragment_cache if key[0] in (str(guild_id), None)]:
+            del self._fragment_cache[cache_key]
+
+    def _cached_fragment(self, guild_id: Optional[str], name: str, build: Callable[[], Any]) -> Any:
+        cache_key = (str(guild_id) if guild_id is not None else None, name)
+        stamp = self._fragment_stamp(guild_id, name)
+        cached = self._fragment_cache.get(cache_key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        fragment = _validate_field(name, build())
+        self._fragment_cache[cache_key] = (stamp, fragment)
+        return fragment
+
+    def _fragment_stamp(self, guild_id: Optional[str], name: str) -> Tuple:
+        """Stamp of everything the named fragment is built from, besides the settings."""
+        if name == "game_lore_snippets":
+            try:
+                return (self._fragment_generation, os.stat(LORE_FILE_PATH).st_mtime_ns)
+            except OSError:
+                return (self._fragment_generation, None)
+        if name == "game_terms_dictionary":
+            return (self._fragment_generation, self.get_main_language_code()) + tuple(
+                _templates_version(manager) for manager in (
+                    self.ability_manager, self.spell_manager, self.npc_manager,
+                    self.item_manager, self.location_manager, self.quest_manager,
+                )
+            )
+        return (self._fragment_generation,)
@@ -0,0 +1,40 @@
+"""add player_collected_actions
+
+Revision ID: 3c9e5d7a1f42
+Revises: 667f91524537
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e5d7a1f42'
+down_revision: Union[str, None] = '667f91524537'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('player_collected_actions',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('guild_id', sa.String(), nullable=False),
+    sa.Column('player_id', sa.String(), nullable=False),
+    sa.Column('action_data', sa.JSON(), nullable=False),
+    sa.Column('submitted_at', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_player_collected_actions_guild_id'), 'player_collected_actions', ['guild_id'], unique=False)
+    op.create_index(op.f('ix_player_collected_actions_player_id'), 'player_collected_actions', ['player_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_player_collected_actions_player_id'), table_name='player_collected_actions')
+    op.drop_index(op.f('ix_player_collected_actions_guild_id'), table_name='player_collected_actions')
+    op.drop_table('player_collected_actions')
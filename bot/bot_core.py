@@ -19,6 +19,8 @@ from bot.services.openai_service import OpenAIService
 from bot.game.managers.game_manager import GameManager
 from bot.game.services.location_interaction_service import LocationInteractionService # Added for GameManager setup
 from bot.nlu.player_action_parser import parse_player_action
+from bot.services.action_buffer import CollectedAction
+from bot.game.turn_readiness_queue import REASON_END_TURN
 from bot.services.nlu_data_service import NLUDataService
 
 # Direct imports for command modules being converted to Cogs are removed.
@@ -27,7 +29,7 @@ from bot.services.nlu_data_service import NLUDataService
 
 LOADED_TEST_GUILD_IDS: List[int] = []
 
-TURN_CYCLE_INTERVAL_SECONDS = 10 # Or load from settings if preferred
+TURN_CYCLE_INTERVAL_SECONDS = 10 # Max wait of the turn scheduler between is_closed checks
 
 
 def load_settings_from_file(file_path: str) -> Dict[str, Any]:
@@ -62,30 +64,35 @@ class RPGBot(commands.Bot):
         global_game_manager = self.game_manager
 
     async def run_periodic_turn_checks(self):
+        """
+        Turn scheduler: sleeps until a character ends their turn (TurnReadinessQueue), then processes
+        only the guilds and characters that enqueued themselves. Idle guilds are never visited.
+        """
         await self.wait_until_ready() # Ensure bot is fully ready
-        logging.info("Starting periodic turn checks loop.")
+        logging.info("Starting turn scheduler loop.")
         try:
             while not self.is_closed():
                 if self.game_manager and self.game_manager.turn_processing_service:
-                    logging.debug(f"Periodic turn check: Iterating {len(self.guilds)} guilds.")
-                    for guild in self.guilds:
+                    readiness_queue = self.game_manager.turn_readiness_queue
+                    # The timeout only lets the loop notice that the bot was closed.
+                    if not await readiness_queue.wait(REASON_END_TURN, timeout=TURN_CYCLE_INTERVAL_SECONDS):
+                        continue
+                    for guild_id, player_ids in readiness_queue.take(REASON_END_TURN).items():
                         try:
-                            logging.debug(f"Periodic turn check: Running for guild {guild.id}.")
-                            await self.game_manager.turn_processing_service.run_turn_cycle_check(str(guild.id))
-                            logging.debug(f"Periodic turn check: Completed for guild {guild.id}.")
+                            logging.debug(f"Turn scheduler: Processing {len(player_ids)} ready players in guild {guild_id}.")
+                            await self.game_manager.turn_processing_service.run_turn_cycle_check(guild_id, player_ids=player_ids)
                         except Exception as e:
-                            logging.error(f"Error during run_turn_cycle_check for guild {guild.id}: {e}", exc_info=True)
-                    logging.debug(f"Periodic turn check: Sleeping for {TURN_CYCLE_INTERVAL_SECONDS} seconds.")
-                    await asyncio.sleep(TURN_CYCLE_INTERVAL_SECONDS)
+                            logging.error(f"Error during run_turn_cycle_check for guild {guild_id}: {e}", exc_info=True)
+                            readiness_queue.retry_later(guild_id, player_ids, REASON_END_TURN)
                 else:
-                    logging.warning("Periodic turn check: GameManager or TurnProcessingService not available. Sleeping.")
+                    logging.warning("Turn scheduler: GameManager or TurnProcessingService not available. Sleeping.")
                     await asyncio.sleep(TURN_CYCLE_INTERVAL_SECONDS * 3) # Longer sleep if services not ready
         except asyncio.CancelledError:
-            logging.info("Periodic turn checks task was cancelled.")
+            logging.info("Turn scheduler task was cancelled.")
         except Exception as e:
-            logging.error(f"Unhandled error in periodic_turn_checks loop: {e}", exc_info=True)
+            logging.error(f"Unhandled error in turn scheduler loop: {e}", exc_info=True)
         finally:
-            logging.info("Periodic turn checks loop has ended.")
+            logging.info("Turn scheduler loop has ended.")
 
     async def on_interaction(self, interaction: discord.Interaction):
         if interaction.type == discord.InteractionType.application_command:
@@ -269,32 +276,20 @@ class RPGBot(commands.Bot):
             )
 
             if parsed_action:
-                intent, entities = parsed_action
-                action_to_store = {"intent": intent, "entities": entities, "original_text": message.content}
-
-                current_actions_str = player.collected_actions_json
-                current_actions_list = []
-                if current_actions_str:
-                    try:
-                        current_actions_list = json.loads(current_actions_str)
-                    except json.JSONDecodeError:
-                        current_actions_list = []
-                    if not isinstance(current_actions_list, list):
-                        current_actions_list = []
-
-                current_actions_list.append(action_to_store)
-                player.collected_actions_json = json.dumps(current_actions_list)
-
-                if hasattr(self.game_manager, 'db_service') and self.game_manager.db_service:
-                    await self.game_manager.db_service.update_player_field(
-                        player_id=player.id,
-                        field_name='collected_actions_json',
-                        value=player.collected_actions_json,
-                        guild_id=str(message.guild.id)
+                if isinstance(parsed_action, dict):
+                    intent, entities = parsed_action.get('intent'), parsed_action.get('entities', [])
+                else:
+                    intent, entities = parsed_action
+                action_buffer = getattr(self.game_manager, 'action_buffer', None)
+                if action_buffer:
+                    # Kept in memory and written to the DB in batches, so the reaction is immediate.
+                    action_buffer.append(
+                        str(message.guild.id), player.id,
+                        CollectedAction(intent=intent, entities=entities, original_text=message.content)
                     )
                     await message.add_reaction("👍")
                 else:
-                    print(f"RPGBot: DBService not available for updating player {player.id} in guild {message.guild.id}")
+                    print(f"RPGBot: ActionBuffer not available for player {player.id} in guild {message.guild.id}")
                     await message.add_reaction("⚠️")
             else:
                 await message.add_reaction("❓")
@@ -3,6 +3,7 @@ from discord.ext import commands
 from typing import Optional, TYPE_CHECKING
 import asyncio
 from bot.utils.i18n_utils import get_i18n_text
+from bot.game.turn_readiness_queue import REASON_END_TURN
 if TYPE_CHECKING:
     from bot.bot_core import RPGBot
     from bot.game.managers.game_manager import GameManager
@@ -165,6 +166,7 @@ class ActionModuleCog(commands.Cog, name="Action Commands Module"):
             # Set status to indicate readiness for periodic processing
             player_char.current_game_status = 'ожидание_обработки'
             game_mngr.character_manager.mark_character_dirty(guild_id_str, player_char.id)
+            game_mngr.turn_readiness_queue.mark_ready(guild_id_str, player_char.id, REASON_END_TURN)
 
             # Optional: Immediately save this status change to DB
             try:
@@ -4,10 +4,12 @@ from discord.ext import commands
 import traceback
 from bot.command_modules.game_setup_cmds import is_master_or_admin_check
 from bot.command_modules.game_setup_cmds import is_master_or_admin_check
+import io
 import json # For parsing parameters_json
 from typing import TYPE_CHECKING, Optional, Dict, Any # For type hints
 
 from bot.game.managers.undo_manager import UndoManager # Make it a runtime import
+from bot.utils.tick_profiler import TICK_PROFILER
 
 if TYPE_CHECKING:
     from bot.bot_core import RPGBot # For type hinting self.bot
@@ -53,6 +55,60 @@ class GMAppCog(commands.Cog, name="GM App Commands"):
         else:
             await interaction.followup.send("**Мастер:** GameManager недоступен.", ephemeral=True)
 
+    @app_commands.command(name="gm_tick_stats", description="ГМ: Показать задержки мирового тика (p50/p95/p99) и самые медленные тики.")
+    @app_commands.describe(
+        as_json="Прислать полный отчет JSON-файлом.",
+        all_guilds="Включить данные всех гильдий, а не только текущей."
+    )
+    async def cmd_gm_tick_stats(self, interaction: Interaction, as_json: Optional[bool] = False, all_guilds: Optional[bool] = False):
+        if not await is_master_or_admin_check(interaction):
+            await interaction.response.send_message("**Мастер:** Только Мастера Игры могут использовать эту команду.", ephemeral=True)
+            return
+
+        # Данные других гильдий видит только владелец бота.
+        if (all_guilds or not interaction.guild_id) and not await self.bot.is_owner(interaction.user):
+            await interaction.response.send_message("**Мастер:** Данные всех гильдий доступны только владельцу бота.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        guild_filter = None if all_guilds or not interaction.guild_id else str(interaction.guild_id)
+
+        if as_json:
+            report = TICK_PROFILER.to_json(guild_id=guild_filter, slowest=10)
+            await interaction.followup.send(
+                "**Мастер:** Отчет профилировщика тика.",
+                file=discord.File(io.BytesIO(report.encode('utf-8')), filename="tick_stats.json"),
+                ephemeral=True
+            )
+            return
+
+        snapshot = TICK_PROFILER.snapshot(guild_id=guild_filter, slowest=5)
+        if not snapshot['phases']:
+            await interaction.followup.send("**Мастер:** Данных о времени тика пока нет.", ephemeral=True)
+            return
+
+        lines = ["guild | phase | n | p50 | p95 | p99 | max (ms)"]
+        for entry in snapshot['phases'][:15]:
+            lines.append(
+                f"{entry['guild_id']} | {entry['phase']} | {entry['count']} | "
+                f"{entry['p50'] * 1000:.1f} | {entry['p95'] * 1000:.1f} | {entry['p99'] * 1000:.1f} | {entry['max'] * 1000:.1f}"
+            )
+        if snapshot['slowest_ticks']:
+            lines.append("")
+            lines.append("Самые медленные тики:")
+            for tick in snapshot['slowest_ticks']:
+                if guild_filter is not None:
+                    guild_total = tick['guild_timings'][guild_filter].get('total', 0.0)
+                    lines.append(f"#{tick.get('tick')}: {tick['duration_seconds'] * 1000:.1f} ms (эта гильдия: {guild_total * 1000:.1f} ms)")
+                    continue
+                slowest_guild = max((tick.get('guild_timings') or {}).items(), key=lambda item: item[1].get('total', 0.0), default=(None, {}))[0]
+                lines.append(f"#{tick.get('tick')}: {tick['duration_seconds'] * 1000:.1f} ms (медленнее всех: {slowest_guild})")
+
+        message = "\n".join(lines)
+        if len(message) > 1900:
+            message = message[:1900] + "\n..."
+        await interaction.followup.send(f"```\n{message}\n```", ephemeral=True)
+
     # Correctly indented as a method of GMAppCog
     @app_commands.command(name="resolve_conflict", description="ГМ: Разрешить ожидающий конфликт.")
     @app_commands.describe(
@@ -38,6 +38,14 @@ class UtilityCog(commands.Cog, name="Utility"):
             if not character:
                 await interaction.followup.send("Create a character first with `/start_new_character`.", ephemeral=True); return
 
+            # Newest actions are in the in-memory buffer; older ones may still sit in collected_actions_json.
+            action_buffer = getattr(game_mngr, 'action_buffer', None)
+            buffered_action = action_buffer.pop_last(guild_id_str, character.id) if action_buffer else None
+            if buffered_action:
+                undone_action_text = buffered_action.original_text[:50] or 'last action'
+                await interaction.followup.send(f"Removed '{undone_action_text}{'...' if len(buffered_action.original_text) > 50 else ''}' from queue.", ephemeral=True)
+                return
+
             actions_list: List[Dict[str, Any]] = []
             collected_actions_json = getattr(character, 'collected_actions_json', "[]")
             if isinstance(collected_actions_json, str):
@@ -258,6 +258,15 @@ class GameLog(Base):
     party = relationship("Party")
     location = relationship("Location")
 
+class PlayerCollectedAction(Base):
+    # Append-only journal of submitted, not yet processed actions (ActionBuffer persists into it).
+    __tablename__ = 'player_collected_actions'
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    guild_id = Column(String, nullable=False, index=True)
+    player_id = Column(String, ForeignKey('players.id', ondelete='CASCADE'), nullable=False, index=True)
+    action_data = Column(JSON, nullable=False)
+    submitted_at = Column(Float, nullable=False)
+
 class Relationship(Base): __tablename__ = 'relationships'; id = Column(String, primary_key=True); placeholder = Column(Text, nullable=True)
 class PlayerNpcMemory(Base): __tablename__ = 'player_npc_memory'; id = Column(String, primary_key=True); placeholder = Column(Text, nullable=True)
 class Ability(Base): __tablename__ = 'abilities'; id = Column(String, primary_key=True); name_i18n = Column(JSON, nullable=True); description_i18n = Column(JSON, nullable=True)
@@ -6,13 +6,13 @@
 import asyncio
 import os # For accessing environment variables
 import traceback
-import json
-from typing import Optional, List, Tuple, Any, Union, Dict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Tuple, Any, Union, Dict, AsyncIterator, Callable
 
 import asyncpg # Driver for PostgreSQL
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from .models import Base # Assuming models.py is in the same directory
+
+from bot.utils.json_codec import RawJSON, encode_db_json, loads as json_loads
 
 # Database Connection URL Configuration
 # The application uses the DATABASE_URL environment variable to configure the
@@ -36,70 +36,133 @@ else:
     print(f"🌍 Using database URL from environment variable {DATABASE_URL_ENV_VAR}.")
 
 
+# Defaults for the "database_settings" section of settings.json.
+DEFAULT_POOL_SETTINGS: Dict[str, Any] = {
+    'pool_min_size': 1,
+    'pool_max_size': 10,
+    # asyncpg keeps an LRU cache of prepared statements per connection; every parametrised
+    # execute/fetch goes through it, so hot SQL is parsed and planned once per connection.
+    'statement_cache_size': 256,
+    'max_cached_statement_lifetime': 300,
+    'max_inactive_connection_lifetime': 300.0,
+    'command_timeout': None,
+    # bulk_upsert() switches from executemany to COPY into a temp table from this many rows on.
+    'bulk_copy_min_rows': 32,
+}
+
+
+class _ExplicitTransaction:
+    """Состояние begin_transaction()/commit()/rollback() для одной задачи."""
+
+    __slots__ = ('task', 'conn', 'transactions', 'owns_connection', 'previous_binding')
+
+    def __init__(self, task: Optional[asyncio.Task], conn: asyncpg.Connection, owns_connection: bool, previous_binding: Any):
+        self.task = task
+        self.conn = conn
+        # Стек открытых транзакций asyncpg: первая - сама транзакция, остальные - savepoint'ы.
+        self.transactions: List[Any] = []
+        self.owns_connection = owns_connection
+        self.previous_binding = previous_binding
+
+
 class PostgresAdapter:
     """
     Асинхронный адаптер для работы с базой данных PostgreSQL.
+
+    Каждый вызов execute/fetch* по умолчанию берет соединение из пула и возвращает его.
+    Внутри `async with adapter.unit_of_work():` все вызовы текущей задачи идут через одно
+    закрепленное соединение; `adapter.transaction()` дополнительно открывает на нем транзакцию
+    asyncpg (вложенные вызовы становятся savepoint'ами). begin_transaction()/commit()/rollback()
+    делают то же самое без контекстного менеджера: соединение закрепляется до завершения
+    внешней транзакции. Отдельной сессии SQLAlchemy нет - все запросы идут через пул asyncpg.
     """
 
-    def __init__(self, db_url: Optional[str] = None):
+    def __init__(self, db_url: Optional[str] = None, settings: Optional[Dict[str, Any]] = None):
+        self._pool_settings: Dict[str, Any] = {**DEFAULT_POOL_SETTINGS, **(settings or {})}
+        self._pool_lock = asyncio.Lock()
+        # (задача, соединение), закрепленное unit_of_work(). Задача хранится, потому что контекст копируется
+        # в задачи, созданные внутри блока, а им нельзя использовать чужое соединение параллельно.
+        self._bound_connection: ContextVar[Optional[Tuple[Optional[asyncio.Task], asyncpg.Connection]]] = ContextVar(f"pg_bound_connection_{id(self)}", default=None)
+        self._explicit_transaction: ContextVar[Optional[_ExplicitTransaction]] = ContextVar(f"pg_explicit_transaction_{id(self)}", default=None)
+        self.pool_acquire_count = 0
+        self._bulk_seq = 0
         self._db_url = db_url or SQLALCHEMY_DATABASE_URL
-        # Ensure the URL scheme is compatible with asyncpg if used directly
+        # The URL is kept in SQLAlchemy form for Alembic; asyncpg needs the plain scheme.
         self._asyncpg_url = self._db_url.replace("postgresql+asyncpg://", "postgresql://")
-
-        self._engine = create_async_engine(self._db_url, echo=False) # Set echo=True for SQL query logging
-        self._SessionLocal = sessionmaker(
-            bind=self._engine,
-            class_=AsyncSession, # Use AsyncSession for SQLAlchemy 2.0 async support
-            expire_on_commit=False,
-            autocommit=False, # Explicit commit needed
-            autoflush=False, # Explicit flush needed
-        )
-        self.db: Optional[AsyncSession] = None # SQLAlchemy async session
         self._conn_pool: Optional[asyncpg.Pool] = None # Asyncpg connection pool
         print(f"PostgresAdapter initialized for database URL: {self._db_url}")
 
     async def _get_raw_connection(self) -> asyncpg.Connection:
         """Gets a raw connection from the pool, creating pool if necessary."""
         if self._conn_pool is None:
-            max_retries = 2
-            last_retryable_exception: Optional[Union[ConnectionRefusedError, asyncpg.exceptions.CannotConnectNowError]] = None
-
-            for attempt in range(max_retries + 1):
-                try:
-                    # Adjust connect_min_size and connect_max_size as needed
-                    self._conn_pool = await asyncpg.create_pool(dsn=self._asyncpg_url, min_size=1, max_size=10)
-
-                    if self._conn_pool is None:
-                        # This is an immediate failure, not to be retried by this loop.
-                        # Original error message for this specific case.
-                        print("PostgresAdapter: ❌ Failed to create asyncpg connection pool: create_pool returned None")
-                        # No traceback here for this specific known condition, just raise
-                        raise ConnectionError("Failed to create asyncpg connection pool: create_pool returned None")
-
-                    print("PostgresAdapter: Asyncpg connection pool created.")
-                    last_retryable_exception = None # Reset if successful
-                    break  # Exit loop if pool is created successfully
-
-                except (ConnectionRefusedError, asyncpg.exceptions.CannotConnectNowError) as e:
-                    last_retryable_exception = e
-                    print(f"PostgresAdapter: Connection attempt {attempt + 1}/{max_retries + 1} failed due to {type(e).__name__}.")
-                    if attempt < max_retries:
-                        print(f"PostgresAdapter: Retrying in 5 seconds...")
-                        await asyncio.sleep(5)
-                    # If it's the last attempt, the loop will end, and last_retryable_exception will be handled below.
-
-                except Exception as e:
-                    # This catches other exceptions during create_pool, or the ConnectionError from pool being None.
-                    # These are considered immediate failures.
-                    # Format and print the generic "unexpected error" message.
-                    print(f"PostgresAdapter: ❌ An unexpected error occurred while creating asyncpg connection pool: {e}")
-                    traceback.print_exc()
-                    raise # Re-raise immediately, no more retries for this type of error.
-
-            if last_retryable_exception is not None:
-                # All retries for ConnectionRefusedError or CannotConnectNowError failed.
-                # Now, format and print the detailed error message block and raise the last caught exception.
-                error_message = f"""
+            async with self._pool_lock:
+                if self._conn_pool is None:
+                    await self._create_pool()
+
+        # Ensure pool is not None before acquiring. This should be guaranteed if pool creation succeeded,
+        # or an exception was raised.
+        if self._conn_pool is None:
+            # This state should ideally not be reached if logic above is correct.
+            # It implies retries completed without success AND no exception was propagated.
+            print("PostgresAdapter: ❌ Connection pool is None after initialization attempts, and no exception was raised from retries.")
+            raise ConnectionError("PostgresAdapter: Connection pool is None after initialization attempts.")
+
+        conn = await self._conn_pool.acquire()
+        if conn is None:
+            raise ConnectionError("Failed to acquire connection from asyncpg pool: acquire returned None")
+        self.pool_acquire_count += 1
+        return conn
+
+    async def _create_pool(self) -> None:
+        """Creates the asyncpg pool using the "database_settings" sizing, retrying while the server is not reachable."""
+        max_retries = 2
+        last_retryable_exception: Optional[Union[ConnectionRefusedError, asyncpg.exceptions.CannotConnectNowError]] = None
+
+        for attempt in range(max_retries + 1):
+            try:
+                pool_settings = self._pool_settings
+                self._conn_pool = await asyncpg.create_pool(
+                    dsn=self._asyncpg_url,
+                    min_size=int(pool_settings['pool_min_size']),
+                    max_size=int(pool_settings['pool_max_size']),
+                    statement_cache_size=int(pool_settings['statement_cache_size']),
+                    max_cached_statement_lifetime=int(pool_settings['max_cached_statement_lifetime']),
+                    max_inactive_connection_lifetime=float(pool_settings['max_inactive_connection_lifetime']),
+                    command_timeout=pool_settings['command_timeout'],
+                    init=self._init_connection,
+                )
+
+                if self._conn_pool is None:
+                    # This is an immediate failure, not to be retried by this loop.
+                    # Original error message for this specific case.
+                    print("PostgresAdapter: ❌ Failed to create asyncpg connection pool: create_pool returned None")
+                    # No traceback here for this specific known condition, just raise
+                    raise ConnectionError("Failed to create asyncpg connection pool: create_pool returned None")
+
+                print("PostgresAdapter: Asyncpg connection pool created.")
+                last_retryable_exception = None # Reset if successful
+                break  # Exit loop if pool is created successfully
+
+            except (ConnectionRefusedError, asyncpg.exceptions.CannotConnectNowError) as e:
+                last_retryable_exception = e
+                print(f"PostgresAdapter: Connection attempt {attempt + 1}/{max_retries + 1} failed due to {type(e).__name__}.")
+                if attempt < max_retries:
+                    print(f"PostgresAdapter: Retrying in 5 seconds...")
+                    await asyncio.sleep(5)
+                # If it's the last attempt, the loop will end, and last_retryable_exception will be handled below.
+
+            except Exception as e:
+                # This catches other exceptions during create_pool, or the ConnectionError from pool being None.
+                # These are considered immediate failures.
+                # Format and print the generic "unexpected error" message.
+                print(f"PostgresAdapter: ❌ An unexpected error occurred while creating asyncpg connection pool: {e}")
+                traceback.print_exc()
+                raise # Re-raise immediately, no more retries for this type of error.
+
+        if last_retryable_exception is not None:
+            # All retries for ConnectionRefusedError or CannotConnectNowError failed.
+            # Now, format and print the detailed error message block and raise the last caught exception.
+            error_message = f"""
 PostgresAdapter: ❌ DATABASE CONNECTION FAILED AFTER {max_retries + 1} ATTEMPTS!
 --------------------------------------------------------------------------------------
 Attempted to connect to: {self._asyncpg_url} (derived from {self._db_url})
@@ -118,42 +181,114 @@ Please check the following:
 Last encountered error: {last_retryable_exception}
 --------------------------------------------------------------------------------------
 """
-                print(error_message)
-                traceback.print_exc() # Print traceback for the last_retryable_exception
-                raise last_retryable_exception
+            print(error_message)
+            traceback.print_exc() # Print traceback for the last_retryable_exception
+            raise last_retryable_exception
+
+    @staticmethod
+    async def _init_connection(conn: asyncpg.Connection) -> None:
+        """Registers json/jsonb codecs, so JSON columns are read and written as Python objects."""
+        for type_name in ('json', 'jsonb'):
+            await conn.set_type_codec(type_name, encoder=encode_db_json, decoder=json_loads, schema='pg_catalog', format='text')
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[asyncpg.Connection]:
+        """Yields the connection pinned by unit_of_work(), or a pooled connection released on exit."""
+        bound_conn = self._get_bound_connection()
+        if bound_conn is not None:
+            yield bound_conn
+            return
 
-        # Ensure pool is not None before acquiring. This should be guaranteed if loop exited successfully,
-        # or an exception was raised.
-        if self._conn_pool is None:
-            # This state should ideally not be reached if logic above is correct.
-            # It implies retries completed without success AND no exception was propagated.
-            print("PostgresAdapter: ❌ Connection pool is None after initialization attempts, and no exception was raised from retries.")
-            raise ConnectionError("PostgresAdapter: Connection pool is None after initialization attempts.")
+        if not self._conn_pool:
+            await self.connect()
+        raw_conn = await self._get_raw_connection()
+        try:
+            yield raw_conn
+        finally:
+            if self._conn_pool and raw_conn:
+                await self._conn_pool.release(raw_conn)
 
-        conn = await self._conn_pool.acquire()
-        if conn is None:
-            raise ConnectionError("Failed to acquire connection from asyncpg pool: acquire returned None")
-        return conn
+    @asynccontextmanager
+    async def unit_of_work(self, transactional: bool = False) -> AsyncIterator[asyncpg.Connection]:
+        """
+        Pins one pooled connection to the current task for the duration of the block, so every
+        execute/fetch* issued inside it (directly or by managers) reuses that connection instead of
+        acquiring its own. With transactional=True the block runs in an asyncpg transaction that
+        commits on success and rolls back on exception; nested transactional blocks become savepoints.
 
+        The pinned connection must not be used by several tasks at once: do not asyncio.gather()
+        database calls inside a unit of work.
+        """
+        bound_conn = self._get_bound_connection()
+        if bound_conn is not None:
+            # Nested unit of work: reuse the pinned connection.
+            if transactional:
+                async with bound_conn.transaction():
+                    yield bound_conn
+            else:
+                yield bound_conn
+            return
 
-    async def connect(self) -> None:
+        async with self._connection() as conn:
+            token = self._bound_connection.set((asyncio.current_task(), conn))
+            try:
+                if transactional:
+                    async with conn.transaction():
+                        yield conn
+                else:
+                    yield conn
+            finally:
+                self._bound_connection.reset(token)
+
+    def transaction(self):
+        """Shortcut for unit_of_work(transactional=True)."""
+        return self.unit_of_work(transactional=True)
+
+    @asynccontextmanager
+    async def savepoint(self, on_rollback: Optional[Callable[[], None]] = None) -> AsyncIterator[asyncpg.Connection]:
         """
-        Устанавливает соединение с базой данных PostgreSQL и создает сессию SQLAlchemy.
-        Also initializes the asyncpg connection pool.
+        Isolates a block inside the current transaction. Unlike a nested transaction(), it also
+        recovers when the block caught a database error itself: the transaction would otherwise
+        stay aborted, so the block is rolled back to the savepoint and the outer transaction goes on.
+        on_rollback is called whenever the block's changes are rolled back, so callers can restore
+        in-memory state they cleared after statements that did not persist.
+        Outside a transaction it is a no-op.
         """
-        if self.db is None:
-            print("PostgresAdapter: Creating SQLAlchemy async session...")
+        async with self._connection() as conn:
+            if not conn.is_in_transaction():
+                yield conn
+                return
+            self._bulk_seq += 1
+            name = f"sp_{self._bulk_seq}"
+            await conn.execute(f"SAVEPOINT {name}")
             try:
-                self.db = self._SessionLocal()
-                print("PostgresAdapter: SQLAlchemy async session created.")
-            except Exception as e:
-                print(f"PostgresAdapter: ❌ Error creating SQLAlchemy async session: {e}")
-                traceback.print_exc()
-                if self.db:
-                    await self.db.close()
-                    self.db = None
+                yield conn
+            except BaseException:
+                await conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                if on_rollback is not None:
+                    on_rollback()
                 raise
-        
+            try:
+                await conn.execute(f"RELEASE SAVEPOINT {name}")
+            except asyncpg.exceptions.InFailedSQLTransactionError:
+                print(f"PostgresAdapter: Warning: a database error was handled inside savepoint {name}; its changes are rolled back.")
+                await conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                await conn.execute(f"RELEASE SAVEPOINT {name}")
+                if on_rollback is not None:
+                    on_rollback()
+
+    def _get_bound_connection(self) -> Optional[asyncpg.Connection]:
+        bound = self._bound_connection.get()
+        if bound is None or bound[0] is not asyncio.current_task():
+            return None
+        return bound[1]
+
+    def in_unit_of_work(self) -> bool:
+        return self._get_bound_connection() is not None
+
+
+    async def connect(self) -> None:
+        """Инициализирует пул соединений asyncpg (если он еще не создан)."""
         if self._conn_pool is None:
             # Initialize the pool by acquiring and releasing a connection
             conn = await self._get_raw_connection()
@@ -163,18 +298,7 @@ Last encountered error: {last_retryable_exception}
 
 
     async def close(self) -> None:
-        """Закрывает сессию SQLAlchemy, пул соединений asyncpg и движок SQLAlchemy."""
-        if self.db:
-            print("PostgresAdapter: Closing SQLAlchemy async session...")
-            try:
-                await self.db.close()
-                print("PostgresAdapter: SQLAlchemy async session closed.")
-            except Exception as e:
-                print(f"PostgresAdapter: ❌ Error closing SQLAlchemy async session: {e}")
-                traceback.print_exc()
-            finally:
-                self.db = None
-        
+        """Закрывает пул соединений asyncpg."""
         if self._conn_pool:
             print("PostgresAdapter: Closing asyncpg connection pool...")
             try:
@@ -186,194 +310,215 @@ Last encountered error: {last_retryable_exception}
             finally:
                 self._conn_pool = None
 
-        if self._engine:
-            print("PostgresAdapter: Disposing SQLAlchemy engine...")
-            try:
-                await self._engine.dispose()
-                print("PostgresAdapter: SQLAlchemy engine disposed.")
-            except Exception as e:
-                print(f"PostgresAdapter: ❌ Error disposing SQLAlchemy engine: {e}")
-            finally:
-                self._engine = None
-
 
     async def execute(self, sql: str, params: Optional[Union[Tuple, List]] = None) -> str:
         """
         Выполняет одиночный SQL запрос (например, INSERT, UPDATE, DELETE) с использованием raw asyncpg connection.
         Возвращает статус выполнения команды (e.g., "INSERT 0 1").
         """
-        if not self._conn_pool: 
-            await self.connect()
-        
-        raw_conn = await self._get_raw_connection()
-        try:
-            status = await raw_conn.execute(sql, *(params or []))
-            return status 
-        except Exception as e:
-            print(f"PostgresAdapter: ❌ Error executing SQL with asyncpg: {sql} | params: {params} | {e}")
-            traceback.print_exc()
-            raise
-        finally:
-            if self._conn_pool and raw_conn:
-                await self._conn_pool.release(raw_conn)
+        async with self._connection() as raw_conn:
+            try:
+                status = await raw_conn.execute(sql, *(params or []))
+                return status
+            except Exception as e:
+                print(f"PostgresAdapter: ❌ Error executing SQL with asyncpg: {sql} | params: {params} | {e}")
+                traceback.print_exc()
+                raise
 
     async def execute_insert(self, sql: str, params: Optional[Union[Tuple, List]] = None) -> Optional[Any]:
         """
         Выполняет INSERT запрос и возвращает значение (например, ID) используя 'RETURNING id'.
         SQL запрос ДОЛЖЕН содержать 'RETURNING ...' clause.
         """
-        if not self._conn_pool:
-            await self.connect()
-        
-        raw_conn = await self._get_raw_connection()
-        try:
-            inserted_value = await raw_conn.fetchval(sql, *(params or []))
-            return inserted_value
-        except Exception as e:
-            print(f"PostgresAdapter: ❌ Error executing INSERT SQL (with RETURNING): {sql} | params: {params} | {e}")
-            traceback.print_exc()
-            raise
-        finally:
-            if self._conn_pool and raw_conn:
-                await self._conn_pool.release(raw_conn)
+        async with self._connection() as raw_conn:
+            try:
+                inserted_value = await raw_conn.fetchval(sql, *(params or []))
+                return inserted_value
+            except Exception as e:
+                print(f"PostgresAdapter: ❌ Error executing INSERT SQL (with RETURNING): {sql} | params: {params} | {e}")
+                traceback.print_exc()
+                raise
 
     async def execute_many(self, sql: str, data: List[Union[Tuple, List]]) -> None:
          """
          Выполняет один SQL запрос много раз с разными данными (пакетная операция) с asyncpg.
          """
-         if not self._conn_pool:
-             await self.connect()
          if not data:
              return
 
-         raw_conn = await self._get_raw_connection()
-         try:
-             async with raw_conn.transaction():
-                 await raw_conn.executemany(sql, data)
-         except Exception as e:
-             print(f"PostgresAdapter: ❌ Error executing many SQL with asyncpg: {sql} | data count: {len(data)} | {e}")
-             traceback.print_exc()
-             raise
-         finally:
-            if self._conn_pool and raw_conn:
-                await self._conn_pool.release(raw_conn)
+         async with self._connection() as raw_conn:
+             try:
+                 # Inside an outer transaction this becomes a savepoint.
+                 async with raw_conn.transaction():
+                     await raw_conn.executemany(sql, data)
+             except Exception as e:
+                 print(f"PostgresAdapter: ❌ Error executing many SQL with asyncpg: {sql} | data count: {len(data)} | {e}")
+                 traceback.print_exc()
+                 raise
 
 
     async def fetchall(self, sql: str, params: Optional[Union[Tuple, List]] = None) -> List[Dict[str, Any]]:
         """Выполняет SELECT запрос и возвращает все строки как список словарей."""
-        if not self._conn_pool:
-            await self.connect()
-        
-        raw_conn = await self._get_raw_connection()
-        try:
-            records = await raw_conn.fetch(sql, *(params or []))
-            return [dict(record) for record in records] 
-        except Exception as e:
-            print(f"PostgresAdapter: ❌ Error fetching all SQL with asyncpg: {sql} | params: {params} | {e}")
-            traceback.print_exc()
-            raise
-        finally:
-            if self._conn_pool and raw_conn:
-                await self._conn_pool.release(raw_conn)
+        async with self._connection() as raw_conn:
+            try:
+                records = await raw_conn.fetch(sql, *(params or []))
+                return [dict(record) for record in records]
+            except Exception as e:
+                print(f"PostgresAdapter: ❌ Error fetching all SQL with asyncpg: {sql} | params: {params} | {e}")
+                traceback.print_exc()
+                raise
 
     async def fetchone(self, sql: str, params: Optional[Union[Tuple, List]] = None) -> Optional[Dict[str, Any]]:
         """Выполняет SELECT запрос и возвращает одну строку (или None) как словарь."""
-        if not self._conn_pool:
-            await self.connect()
+        async with self._connection() as raw_conn:
+            try:
+                record = await raw_conn.fetchrow(sql, *(params or []))
+                return dict(record) if record else None
+            except Exception as e:
+                print(f"PostgresAdapter: ❌ Error fetching one SQL with asyncpg: {sql} | params: {params} | {e}")
+                traceback.print_exc()
+                raise
 
-        raw_conn = await self._get_raw_connection()
+    def _get_explicit_transaction(self) -> Optional[_ExplicitTransaction]:
+        state = self._explicit_transaction.get()
+        if state is None or state.task is not asyncio.current_task():
+            return None
+        return state
+
+    def is_transaction_active(self) -> bool:
+        """True, если в текущей задаче есть открытая begin_transaction() транзакция."""
+        state = self._get_explicit_transaction()
+        return state is not None and bool(state.transactions)
+
+    async def begin_transaction(self) -> None:
+        """
+        Начинает транзакцию на том же соединении, через которое идут execute/fetch* текущей задачи.
+        Соединение закрепляется за задачей до завершающего commit()/rollback(); повторный вызов
+        до завершения открывает savepoint.
+        """
+        state = self._get_explicit_transaction()
+        created = state is None
+        if created:
+            bound_conn = self._get_bound_connection()
+            if bound_conn is None:
+                if not self._conn_pool:
+                    await self.connect()
+                conn = await self._get_raw_connection()
+            else:
+                conn = bound_conn
+            state = _ExplicitTransaction(asyncio.current_task(), conn, owns_connection=bound_conn is None, previous_binding=self._bound_connection.get())
+            if state.owns_connection:
+                self._bound_connection.set((state.task, conn))
+            self._explicit_transaction.set(state)
+
+        transaction = state.conn.transaction()
         try:
-            record = await raw_conn.fetchrow(sql, *(params or []))
-            return dict(record) if record else None 
+            # Если на соединении уже идет транзакция, asyncpg сам откроет SAVEPOINT.
+            await transaction.start()
         except Exception as e:
-            print(f"PostgresAdapter: ❌ Error fetching one SQL with asyncpg: {sql} | params: {params} | {e}")
+            print(f"PostgresAdapter: ❌ Error beginning transaction: {e}")
             traceback.print_exc()
+            if created:
+                await self._release_explicit_transaction(state)
             raise
-        finally:
-            if self._conn_pool and raw_conn:
-                await self._conn_pool.release(raw_conn)
-
-    async def commit(self) -> None:
-        """Коммитит текущую транзакцию SQLAlchemy сессии."""
-        if not self.db:
-            raise ConnectionError("SQLAlchemy session is not established.")
+        state.transactions.append(transaction)
+
+    async def _finish_transaction(self, commit: bool) -> None:
+        action = "commit" if commit else "rollback"
+        state = self._get_explicit_transaction()
+        if state is None or not state.transactions:
+            print(f"PostgresAdapter: Warning: {action} called without an active transaction.")
+            return
+        transaction = state.transactions.pop()
         try:
-            await self.db.commit()
-            print("PostgresAdapter: SQLAlchemy session committed.")
+            if commit:
+                await transaction.commit()
+            else:
+                await transaction.rollback()
         except Exception as e:
-            print(f"PostgresAdapter: ❌ Error committing SQLAlchemy session: {e}")
+            print(f"PostgresAdapter: ❌ Error during transaction {action}: {e}")
             traceback.print_exc()
-            await self.db.rollback() 
-            print("PostgresAdapter: SQLAlchemy session rolled back due to commit error.")
             raise
+        finally:
+            if not state.transactions:
+                await self._release_explicit_transaction(state)
+
+    async def _release_explicit_transaction(self, state: _ExplicitTransaction) -> None:
+        self._explicit_transaction.set(None)
+        if state.owns_connection:
+            self._bound_connection.set(state.previous_binding)
+            if self._conn_pool:
+                await self._conn_pool.release(state.conn)
+
+    async def bulk_upsert(
+        self,
+        table: str,
+        columns: List[str],
+        rows: List[Union[Tuple, List]],
+        conflict_columns: Tuple[str, ...] = ('id',),
+        update_columns: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Upserts many rows into `table` in one batch. Large batches are streamed with COPY into a
+        temporary table and merged with a single INSERT ... SELECT ... ON CONFLICT, so the number of
+        round trips does not grow with the row count; small ones use executemany with the same upsert.
+        Runs in a transaction (a savepoint when called inside one). Returns the number of rows written.
+        """
+        if not rows:
+            return 0
+        column_list = ', '.join(columns)
+        conflict_list = ', '.join(conflict_columns)
+        set_clause = ', '.join(f"{col} = EXCLUDED.{col}" for col in (update_columns or columns) if col not in conflict_columns)
+        conflict_action = f"DO UPDATE SET {set_clause}" if set_clause else "DO NOTHING"
+
+        async with self._connection() as raw_conn:
+            try:
+                async with raw_conn.transaction():
+                    if len(rows) < int(self._pool_settings['bulk_copy_min_rows']):
+                        placeholders = ', '.join(f'${i + 1}' for i in range(len(columns)))
+                        await raw_conn.executemany(
+                            f"INSERT INTO {table} ({column_list}) VALUES ({placeholders}) ON CONFLICT ({conflict_list}) {conflict_action}",
+                            rows
+                        )
+                    else:
+                        self._bulk_seq += 1
+                        temp_table = f"_bulk_{table}_{self._bulk_seq}"
+                        # CREATE TABLE AS не копирует NOT NULL/DEFAULT, поэтому частичный набор колонок не мешает COPY.
+                        await raw_conn.execute(f"CREATE TEMP TABLE {temp_table} AS SELECT {column_list} FROM {table} WITH NO DATA")
+                        await raw_conn.copy_records_to_table(temp_table, records=rows, columns=list(columns))
+                        await raw_conn.execute(
+                            f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {temp_table} ON CONFLICT ({conflict_list}) {conflict_action}"
+                        )
+                        await raw_conn.execute(f"DROP TABLE {temp_table}")
+            except Exception as e:
+                print(f"PostgresAdapter: ❌ Error bulk upserting into {table} | rows: {len(rows)} | {e}")
+                traceback.print_exc()
+                raise
+        return len(rows)
+
+    async def bulk_delete(self, table: str, guild_id: str, ids: List[str], id_column: str = 'id') -> None:
+        """Deletes the given ids of one guild from `table` with a single statement."""
+        if not ids:
+            return
+        await self.execute(f"DELETE FROM {table} WHERE guild_id = $1 AND {id_column} = ANY($2::text[])", (str(guild_id), list(ids)))
+
+    async def commit(self) -> None:
+        """Коммитит последнюю открытую begin_transaction() транзакцию (или освобождает savepoint)."""
+        await self._finish_transaction(commit=True)
 
     async def rollback(self) -> None:
-        """Откатывает текущую транзакцию SQLAlchemy сессии."""
-        if not self.db:
-            raise ConnectionError("SQLAlchemy session is not established.")
-        try:
-            await self.db.rollback()
-            print("PostgresAdapter: SQLAlchemy session rolled back.")
-        except Exception as e:
-            print(f"PostgresAdapter: ❌ Error rolling back SQLAlchemy session: {e}")
-            traceback.print_exc()
-            raise
+        """Откатывает последнюю открытую begin_transaction() транзакцию (или откатывает до savepoint)."""
+        await self._finish_transaction(commit=False)
 
     async def initialize_database(self) -> None:
         """
         Ensures the database is connected. Schema management is handled by Alembic.
         """
         print("PostgresAdapter: Initializing database connection for application use.")
-        if self.db is None: 
+        if self._conn_pool is None:
             await self.connect()
         print("PostgresAdapter: Database initialization checks complete. Schema is managed by Alembic.")
 
-    async def begin_transaction(self) -> None:
-        """Begins a new transaction on the SQLAlchemy session."""
-        if not self.db:
-            # Attempt to connect if session is not active. This might be needed if begin_transaction
-            # can be called before other methods that establish self.db.
-            await self.connect()
-            if not self.db: # Still no session after connect attempt
-                raise ConnectionError("SQLAlchemy session is not established, cannot begin transaction.")
-        try:
-            # SQLAlchemy AsyncSession typically uses await self.db.begin() or similar
-            # For now, assuming self.db is an AsyncSession, begin a transaction if not already in one.
-            # AsyncSession might manage transactions differently, often per operation or via begin_nested.
-            # A simple explicit begin might not be standard for all uses.
-            # However, if a block of operations needs to be atomic, an explicit transaction is good.
-            # Let's assume begin() starts a top-level transaction if one isn't active.
-            # await self.db.begin() # This starts a new transaction or sub-transaction
-            # For asyncpg, transactions are usually managed on a specific connection.
-            # The SQLAlchemy AsyncSession handles this abstraction.
-            # If a transaction is already active, this might create a savepoint.
-            # For now, we'll assume this is the intended way to ensure a transaction context.
-            # If self.db.in_transaction check is available:
-            # if not self.db.in_transaction:
-            #    await self.db.begin()
-            # print("PostgresAdapter: Began SQLAlchemy session transaction (or savepoint).")
-            # Simpler for now: ensure a connection is ready. The transaction is often managed by `with session.begin():`
-            # For explicit calls, this is more complex.
-            # For now, this method primarily ensures connection. Actual transaction start might be implicit with first operation
-            # or needs to be handled by how `self.db` operations are grouped.
-            # Awaiting more specific transaction block patterns in DBService.
-            # For this step, let's make it a no-op that ensures connection,
-            # assuming transactions will be handled by `with self.db.begin():` in higher layers if needed,
-            # or that individual `commit/rollback` calls are sufficient.
-            # To make it work as expected by DBService:
-            if not self.db.in_transaction(): # Check if already in a transaction
-                 self._current_transaction = await self.db.begin()
-                 print("PostgresAdapter: Began new SQLAlchemy session transaction.")
-            else:
-                 # If already in a transaction, create a savepoint (nested transaction)
-                 self._current_transaction = await self.db.begin_nested()
-                 print("PostgresAdapter: Began nested SQLAlchemy session transaction (savepoint).")
-
-        except Exception as e:
-            print(f"PostgresAdapter: ❌ Error beginning SQLAlchemy session transaction: {e}")
-            traceback.print_exc()
-            raise
-
 
     async def save_pending_conflict(self, conflict_id: str, guild_id: str, conflict_data: str) -> None:
         if not isinstance(conflict_data, str):
@@ -386,7 +531,7 @@ Last encountered error: {last_retryable_exception}
                 conflict_data = EXCLUDED.conflict_data,
                 created_at = NOW();
         """
-        await self.execute(sql, (conflict_id, guild_id, conflict_data))
+        await self.execute(sql, (conflict_id, guild_id, RawJSON(conflict_data)))
 
     async def get_pending_conflict(self, conflict_id: str) -> Optional[Dict[str, Any]]:
         sql = "SELECT id, guild_id, conflict_data FROM pending_conflicts WHERE id = $1;"
@@ -407,7 +552,7 @@ Last encountered error: {last_retryable_exception}
             INSERT INTO pending_moderation_requests (id, guild_id, user_id, content_type, data, status, created_at)
             VALUES ($1, $2, $3, $4, $5::jsonb, $6, NOW())
         """
-        await self.execute(sql, (request_id, guild_id, user_id, content_type, data_json, status))
+        await self.execute(sql, (request_id, guild_id, user_id, content_type, RawJSON(data_json), status))
 
     async def get_pending_moderation_request(self, request_id: str) -> Optional[Dict[str, Any]]:
         sql = "SELECT * FROM pending_moderation_requests WHERE id = $1;"
@@ -426,7 +571,7 @@ Last encountered error: {last_retryable_exception}
 
         if data_json is not None:
             fields_to_update.append(f"data = ${current_param_idx}::jsonb")
-            params_list.append(data_json)
+            params_list.append(RawJSON(data_json))
             current_param_idx += 1
         
         if moderator_notes is not None:
@@ -471,13 +616,8 @@ Last encountered error: {last_retryable_exception}
             print("PostgresAdapter: Error: Location data must include 'id' and 'guild_id' for upsert.")
             return False
 
-        # Ensure all JSON fields are dumped to strings for the query
-        data_for_sql = {}
-        for key, value in location_data.items():
-            if isinstance(value, dict) or isinstance(value, list):
-                data_for_sql[key] = json.dumps(value)
-            else:
-                data_for_sql[key] = value
+        # JSON fields are passed as dicts/lists; the json/jsonb codec registered on the pool encodes them
+        data_for_sql = dict(location_data)
 
         # Ensure boolean is_active is correctly represented if not present or None
         if 'is_active' not in data_for_sql or data_for_sql['is_active'] is None:
@@ -35,6 +35,9 @@ async def _gm_action_load_campaign(message: Message, sub_args: List[str], contex
             await send_callback(f"Initiating campaign load for '{campaign_identifier}' in guild {guild_id}...")
             # This method is expected to handle everything, including messaging success/failure internally or via exceptions
             await campaign_loader.trigger_campaign_load_and_distribution(guild_id, campaign_identifier, **context)
+            prompt_context_collector = context.get('prompt_context_collector')
+            if prompt_context_collector:
+                prompt_context_collector.invalidate_fragments(guild_id) # Campaign data also feeds the cached AI prompt fragments
             # If it doesn't message success, we might add one here, but usually manager methods handle their own comms.
             # For now, assuming it messages on success or raises specific errors handled below.
         elif hasattr(campaign_loader, 'load_campaign_from_file'): # Fallback to old method if it exists
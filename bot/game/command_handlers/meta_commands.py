@@ -80,7 +80,8 @@ async def handle_roll_command(message: Message, args: List[str], context: Dict[s
         return
 
     try:
-        roll_result = await rule_engine.resolve_dice_roll(roll_string, context=context)
+        # Player-requested rolls are always written to the game log
+        roll_result = await rule_engine.resolve_dice_roll(roll_string, context={**context, 'log_dice_roll': True})
 
         if not isinstance(roll_result, dict):
              await send_callback(f"An error occurred while trying to roll '{roll_string}'. Invalid result from RuleEngine.")
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any, Optional
 from discord import Message
 import json
+from bot.utils.json_codec import from_db_json
 # import traceback
 
 # This function was originally in CommandRouter, moved here.
@@ -30,7 +31,7 @@ async def _activate_approved_content_internal(request_id: str, context: Dict[str
         return False
 
     try:
-        approved_data = json.loads(data_json_str)
+        approved_data = from_db_json(data_json_str)
     except json.JSONDecodeError:
         await send_to_master_channel(f"Error: Invalid JSON in request {request_id}.")
         return False
@@ -18,6 +18,7 @@ from discord import Message
 import discord
 
 # TOP-LEVEL IMPORTS
+from bot.utils.json_codec import from_db_json
 from bot.services.campaign_loader import CampaignLoaderService
 from bot.game.managers.relationship_manager import RelationshipManager
 from bot.game.managers.quest_manager import QuestManager
@@ -378,7 +379,7 @@ class CommandRouter:
             summary = "Could not generate summary."
             if data_json_str:
                 try:
-                    data_dict = json.loads(data_json_str)
+                    data_dict = from_db_json(data_json_str)
                     try:
                         from bot.utils.text_utils import generate_summary # Ensure this util is available
                         summary = generate_summary(data_dict, content_type)
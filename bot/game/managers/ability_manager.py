@@ -35,6 +35,7 @@ class AbilityManager:
         self._status_manager = status_manager
         
         self._ability_templates: Dict[str, Dict[str, Ability]] = {}  # guild_id -> ability_id -> Ability object
+        self.templates_version = 0  # bumped on every template (re)load; PromptContextCollector stamps its cached fragments with it
         print("AbilityManager initialized.")
 
     async def load_ability_templates(self, guild_id: str, campaign_data: Dict[str, Any]) -> None:
@@ -55,7 +56,8 @@ class AbilityManager:
                 loaded_count += 1
             except Exception as e:
                 print(f"AbilityManager: Error loading ability template '{ability_data.get('id', 'UnknownID')}' for guild {guild_id_str}: {e}")
-        
+        self.templates_version += 1
+
         print(f"AbilityManager: Successfully loaded {loaded_count} ability templates for guild {guild_id_str}.")
         if loaded_count > 0:
             print(f"AbilityManager: Example ability templates for guild {guild_id_str}:")
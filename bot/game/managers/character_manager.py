@@ -6,10 +6,13 @@ import uuid
 import traceback
 import asyncio
 # Import typing components
-from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Union
+from typing import Optional, Dict, Any, List, Set, Tuple, TYPE_CHECKING, Union
 
 # --- Imports ---
+from bot.utils.json_codec import RawJSON, dumps, from_db_json, raw_json
 from bot.game.models.character import Character
+from bot.game.utils.location_occupancy import LocationOccupancyIndex, CHARACTERS
+from bot.game.utils.stats_calculator import EffectiveStatsCache
 from builtins import dict, set, list, int # Use lowercase for isinstance
 
 # --- Imports needed ONLY for Type Checking ---
@@ -28,6 +31,113 @@ if TYPE_CHECKING:
     from bot.game.managers.npc_manager import NPCManager
     from bot.game.managers.game_manager import GameManager
 
+# Column order of the rows built by CharacterManager.save_state for PostgresAdapter.bulk_upsert.
+PLAYER_SAVE_COLUMNS = [
+    'id', 'discord_id', 'name_i18n', 'guild_id', 'current_location_id', 'stats', 'inventory',
+    'current_action', 'action_queue', 'party_id', 'state_variables', 'hp', 'max_health',
+    'is_alive', 'status_effects', 'level', 'xp', 'unspent_xp', 'active_quests', 'known_spells',
+    'spell_cooldowns', 'skills_data_json', 'abilities_data_json', 'spells_data_json', 'flags_json',
+    'character_class', 'selected_language', 'current_game_status', 'collected_actions_json', 'current_party_id', 'effective_stats_json',
+]
+
+# Character attribute behind a players column, where the names differ.
+_PLAYER_COLUMN_SOURCES = {
+    'discord_id': 'discord_user_id', 'current_location_id': 'location_id', 'xp': 'experience',
+    'skills_data_json': 'skills_data', 'abilities_data_json': 'abilities_data',
+    'spells_data_json': 'spells_data', 'flags_json': 'flags',
+}
+
+
+def _player_column_values(char: "Character") -> Dict[str, Any]:
+    """Values of every PLAYER_SAVE_COLUMNS column for one character (JSON columns as Python objects)."""
+    char_data = char.to_dict() # also syncs stats['hp'] / stats['max_health']
+    current_action = char_data.get('current_action')
+    return {
+        'id': char.id,
+        'discord_id': str(char.discord_user_id) if char.discord_user_id is not None else None,
+        'name_i18n': char_data.get('name_i18n') or {},
+        'guild_id': char.guild_id,
+        'current_location_id': char.location_id,
+        'stats': char_data.get('stats') or {},
+        'inventory': raw_json(char_data.get('inventory')) or [],
+        'current_action': dumps(current_action) if current_action else None, # VARCHAR column
+        'action_queue': char_data.get('action_queue') or [],
+        'party_id': char.party_id,
+        'state_variables': char_data.get('state_variables') or {},
+        'hp': float(char.hp or 0.0),
+        'max_health': float(char.max_health or 0.0),
+        'is_alive': bool(char.is_alive),
+        'status_effects': char_data.get('status_effects') or [],
+        'level': int(char.level or 1),
+        'xp': int(char.experience or 0),
+        'unspent_xp': int(char.unspent_xp or 0),
+        'active_quests': char_data.get('active_quests') or [],
+        'known_spells': char_data.get('known_spells') or [],
+        'spell_cooldowns': char_data.get('spell_cooldowns') or {},
+        'skills_data_json': char_data.get('skills_data') or [],
+        'abilities_data_json': char_data.get('abilities_data') or [],
+        'spells_data_json': char_data.get('spells_data') or [],
+        'flags_json': char_data.get('flags') or {},
+        'character_class': char.character_class,
+        'selected_language': char.selected_language,
+        'current_game_status': char.current_game_status,
+        'collected_actions_json': raw_json(char.collected_actions_json),
+        'current_party_id': char.current_party_id,
+        'effective_stats_json': raw_json(getattr(char, 'effective_stats_json', None)) or {},
+    }
+
+
+def _fingerprint(value: Any) -> Any:
+    """Fingerprint of a JSON column value: per top-level key for dicts (enables key patches), one hash otherwise."""
+    if isinstance(value, dict):
+        return {key: hash(dumps(item)) for key, item in value.items()}
+    return hash(dumps(value))
+
+
+def _is_container_column(char: "Character", column: str) -> bool:
+    return isinstance(getattr(char, _PLAYER_COLUMN_SOURCES.get(column, column), None), (dict, list))
+
+
+def _diff_player_columns(char: "Character", values: Dict[str, Any], baseline: Dict[str, Any], changed_fields: Set[str]) -> Tuple[List[Tuple[str, str, Any]], Dict[str, Any]]:
+    """
+    Compares a character with the fingerprints of its last saved state.
+    Returns (column, 'set' | 'patch', value) assignments and the new fingerprints of the written columns.
+    Reassigned attributes come from Character's change tracking; lists/dicts mutated in place are found
+    by fingerprint. A dict column whose keys were only added or changed is written as a key patch.
+    """
+    assignments: List[Tuple[str, str, Any]] = []
+    fingerprints: Dict[str, Any] = {}
+    for column in PLAYER_SAVE_COLUMNS[1:]: # id is the key
+        value = values[column]
+        if not _is_container_column(char, column):
+            if _PLAYER_COLUMN_SOURCES.get(column, column) in changed_fields:
+                assignments.append((column, 'set', value))
+                fingerprints[column] = None
+            continue
+        fingerprint = _fingerprint(value)
+        previous = baseline.get(column)
+        if fingerprint == previous:
+            continue
+        fingerprints[column] = fingerprint
+        if isinstance(fingerprint, dict) and isinstance(previous, dict) and previous.keys() <= fingerprint.keys():
+            changed_keys = [key for key, key_fingerprint in fingerprint.items() if previous.get(key) != key_fingerprint]
+            if len(changed_keys) < len(fingerprint):
+                assignments.append((column, 'patch', {key: value[key] for key in changed_keys}))
+                continue
+        assignments.append((column, 'set', value))
+    return assignments, fingerprints
+
+
+def _player_update_sql(signature: Tuple[Tuple[str, str], ...]) -> str:
+    set_parts = []
+    for index, (column, mode) in enumerate(signature, start=2):
+        if mode == 'patch':
+            # Columns are json, not jsonb: merge the changed keys through jsonb and cast back.
+            set_parts.append(f"{column} = (COALESCE({column}::jsonb, '{{}}'::jsonb) || ${index}::jsonb)::json")
+        else:
+            set_parts.append(f"{column} = ${index}")
+    return f"UPDATE players SET {', '.join(set_parts)} WHERE id = $1"
+
 
 class CharacterManager:
     required_args_for_load = ["guild_id"]
@@ -54,7 +164,9 @@ class CharacterManager:
         relationship_manager: Optional["RelationshipManager"] = None,
         game_log_manager: Optional["GameLogManager"] = None,
         npc_manager: Optional["NPCManager"] = None,
-        game_manager: Optional["GameManager"] = None
+        game_manager: Optional["GameManager"] = None,
+        occupancy_index: Optional[LocationOccupancyIndex] = None,
+        stats_cache: Optional[EffectiveStatsCache] = None
     ):
         print("Initializing CharacterManager...")
         self._db_service = db_service
@@ -70,12 +182,17 @@ class CharacterManager:
         self._game_log_manager = game_log_manager
         self._npc_manager = npc_manager
         self._game_manager = game_manager
+        # Общий с NpcManager/PartyManager индекс "кто в какой локации" (см. GameManager).
+        self._occupancy = occupancy_index or LocationOccupancyIndex()
+        self._stats_cache = stats_cache or EffectiveStatsCache()
 
         self._characters = {}
         self._discord_to_char_map = {}
         self._entities_with_active_action = {}
         self._dirty_characters = {}
         self._deleted_characters_ids = {}
+        # guild_id -> character_id -> column -> fingerprint of the last saved value (see _diff_player_columns)
+        self._saved_fingerprints: Dict[str, Dict[str, Dict[str, Any]]] = {}
         print("CharacterManager initialized.")
 
     async def _recalculate_and_store_effective_stats(self, guild_id: str, character_id: str, char_model: Optional[Character] = None) -> None:
@@ -101,16 +218,18 @@ class CharacterManager:
             setattr(char_model, 'effective_stats_json', "{}")
             return
 
-        from bot.game.utils import stats_calculator # Local import for safety
         try:
             rules_config = self._rule_engine.rules_config_data
-            effective_stats_dict = await stats_calculator.calculate_effective_stats(
+            # Recomputed only when base stats, equipped items, statuses or rules changed since the last call.
+            effective_stats_dict = await self._stats_cache.get_effective_stats(
                 db_service=self._db_service, guild_id=guild_id, entity_id=character_id,
                 entity_type="Character", rules_config_data=rules_config,
                 character_manager=self, npc_manager=self._npc_manager,
                 item_manager=self._item_manager, status_manager=self._status_manager
             )
-            setattr(char_model, 'effective_stats_json', json.dumps(effective_stats_dict))
+            effective_stats_json = dumps(effective_stats_dict)
+            if getattr(char_model, 'effective_stats_json', None) != effective_stats_json:
+                setattr(char_model, 'effective_stats_json', effective_stats_json)
             # print(f"CharacterManager: Recalculated effective_stats for character {character_id}.") # Can be noisy
         except Exception as es_ex:
             print(f"CharacterManager: ERROR recalculating effective_stats for {character_id}: {es_ex}")
@@ -161,15 +280,13 @@ class CharacterManager:
         return []
 
     def get_characters_in_location(self, guild_id: str, location_id: str, **kwargs: Any) -> List["Character"]:
-        guild_id_str = str(guild_id)
-        location_id_str = str(location_id)
-        characters_in_location = []
-        guild_chars = self._characters.get(guild_id_str)
-        if guild_chars:
-             for char in guild_chars.values():
-                 if isinstance(char, Character) and hasattr(char, 'location_id') and str(getattr(char, 'location_id', None)) == location_id_str:
-                      characters_in_location.append(char)
-        return characters_in_location
+        guild_chars = self._characters.get(str(guild_id), {})
+        return [char for char_id in self._occupancy.occupants(guild_id, location_id, CHARACTERS) if (char := guild_chars.get(char_id)) is not None]
+
+    def _set_location(self, guild_id: str, char: "Character", location_id: Optional[str]) -> None:
+        """Single place where a cached character changes location, so the occupancy index stays in sync."""
+        char.location_id = str(location_id) if location_id else None
+        self._occupancy.place(guild_id, CHARACTERS, char.id, char.location_id)
 
     def get_entities_with_active_action(self, guild_id: str) -> Set[str]:
         return self._entities_with_active_action.get(str(guild_id), set()).copy()
@@ -220,10 +337,10 @@ class CharacterManager:
             'party_id': None, 'state_variables': {}, 'hp': 100.0, 'max_health': 100.0,
             'is_alive': True, 'status_effects': [], 'level': level, 'experience': experience,
             'unspent_xp': unspent_xp, 'selected_language': default_player_language,
-            'collected_actions_json': None, 'skills_data_json': json.dumps([]),
-            'abilities_data_json': json.dumps([]), 'spells_data_json': json.dumps([]),
+            'collected_actions_json': None, 'skills_data_json': [],
+            'abilities_data_json': [], 'spells_data_json': [],
             'character_class': kwargs.get('character_class', 'Adventurer'),
-            'flags_json': json.dumps({}), 'effective_stats_json': "{}"
+            'flags_json': {}, 'effective_stats_json': RawJSON("{}")
         }
         model_data = data.copy()
         model_data['discord_user_id'] = model_data.pop('discord_id')
@@ -242,11 +359,11 @@ class CharacterManager:
         RETURNING id;
         """
         db_params = (
-            data['id'], str(data['discord_id']), json.dumps(data['name_i18n']), data['guild_id'],
-            data['current_location_id'], json.dumps(data['stats']), json.dumps(data['inventory']),
+            data['id'], str(data['discord_id']), data['name_i18n'], data['guild_id'],
+            data['current_location_id'], data['stats'], data['inventory'],
             json.dumps(data['current_action']) if data['current_action'] is not None else None,
-            json.dumps(data['action_queue']), data['party_id'], json.dumps(data['state_variables']),
-            data['hp'], data['max_health'], data['is_alive'], json.dumps(data['status_effects']),
+            data['action_queue'], data['party_id'], data['state_variables'],
+            data['hp'], data['max_health'], data['is_alive'], data['status_effects'],
             data['level'], data['experience'], data['unspent_xp'], data['selected_language'],
             data['collected_actions_json'], data['skills_data_json'], data['abilities_data_json'],
             data['spells_data_json'], data['character_class'], data['flags_json'], data['effective_stats_json']
@@ -257,6 +374,7 @@ class CharacterManager:
             setattr(char, 'effective_stats_json', data['effective_stats_json'])
 
             self._characters.setdefault(guild_id_str, {})[char.id] = char
+            self._occupancy.place(guild_id_str, CHARACTERS, char.id, char.location_id)
             if char.discord_user_id is not None:
                  self._discord_to_char_map.setdefault(guild_id_str, {})[char.discord_user_id] = char.id
 
@@ -276,63 +394,71 @@ class CharacterManager:
         if not dirty_ids and not deleted_ids: return
 
         if deleted_ids:
-            # ... (deletion logic as before) ...
-            ids_to_delete_list = list(deleted_ids)
-            if ids_to_delete_list:
-                pg_placeholders = ','.join([f'${i+2}' for i in range(len(ids_to_delete_list))])
-                delete_sql = f"DELETE FROM players WHERE guild_id = $1 AND id IN ({pg_placeholders})"
-                try:
-                    await self._db_service.adapter.execute(delete_sql, (guild_id_str, *ids_to_delete_list))
-                    self._deleted_characters_ids.pop(guild_id_str, None)
-                except Exception as e: print(f"Error deleting characters: {e}"); traceback.print_exc()
-            else: self._deleted_characters_ids.pop(guild_id_str, None)
+            try:
+                await self._db_service.adapter.bulk_delete('players', guild_id_str, list(deleted_ids))
+                self._deleted_characters_ids.pop(guild_id_str, None)
+                for deleted_id in deleted_ids:
+                    self._saved_fingerprints.get(guild_id_str, {}).pop(deleted_id, None)
+                    self._stats_cache.invalidate(guild_id_str, deleted_id, "Character")
+            except Exception as e: print(f"Error deleting characters: {e}"); traceback.print_exc()
 
         guild_cache = self._characters.get(guild_id_str, {})
         chars_to_save = [guild_cache[cid] for cid in list(dirty_ids) if cid in guild_cache]
-        if chars_to_save:
-            upsert_sql = '''
-            INSERT INTO players (
-                id, discord_id, name_i18n, guild_id, current_location_id, stats, inventory,
-                current_action, action_queue, party_id, state_variables, hp, max_health,
-                is_alive, status_effects, level, xp, unspent_xp, active_quests, known_spells,
-                spell_cooldowns, skills_data_json, abilities_data_json, spells_data_json, flags_json,
-                character_class, selected_language, current_game_status, collected_actions_json, current_party_id, effective_stats_json
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22, $23, $24, $25, $26, $27, $28, $29, $30, $31)
-            ON CONFLICT (id) DO UPDATE SET
-                discord_id=EXCLUDED.discord_id, name_i18n=EXCLUDED.name_i18n, guild_id=EXCLUDED.guild_id, current_location_id=EXCLUDED.current_location_id, stats=EXCLUDED.stats, inventory=EXCLUDED.inventory, current_action=EXCLUDED.current_action, action_queue=EXCLUDED.action_queue, party_id=EXCLUDED.party_id, state_variables=EXCLUDED.state_variables, hp=EXCLUDED.hp, max_health=EXCLUDED.max_health, is_alive=EXCLUDED.is_alive, status_effects=EXCLUDED.status_effects, level=EXCLUDED.level, xp=EXCLUDED.experience, unspent_xp=EXCLUDED.unspent_xp, active_quests=EXCLUDED.active_quests, known_spells=EXCLUDED.known_spells, spell_cooldowns=EXCLUDED.spell_cooldowns, skills_data_json=EXCLUDED.skills_data_json, abilities_data_json=EXCLUDED.abilities_data_json, spells_data_json=EXCLUDED.spells_data_json, flags_json=EXCLUDED.flags_json, character_class=EXCLUDED.character_class, selected_language=EXCLUDED.selected_language, current_game_status=EXCLUDED.current_game_status, collected_actions_json=EXCLUDED.collected_actions_json, current_party_id=EXCLUDED.current_party_id, effective_stats_json=EXCLUDED.effective_stats_json;
-            '''
-            data_to_upsert = []
-            processed_dirty_ids = set()
-            for char_obj in chars_to_save:
-                try:
-                    char_data = char_obj.to_dict()
-                    effective_stats_j = getattr(char_obj, 'effective_stats_json', '{}')
-                    if not isinstance(effective_stats_j, str): effective_stats_j = json.dumps(effective_stats_j or {})
-                    db_params = (
-                        char_data.get('id'), char_data.get('discord_id'), json.dumps(char_data.get('name_i18n', {})),
-                        char_data.get('guild_id'), char_data.get('current_location_id'), json.dumps(char_data.get('stats', {})),
-                        json.dumps(char_data.get('inventory', [])), json.dumps(char_data.get('current_action')) if char_data.get('current_action') else None,
-                        json.dumps(char_data.get('action_queue', [])), char_data.get('party_id'), json.dumps(char_data.get('state_variables', {})),
-                        float(char_data.get('hp',0.0)), float(char_data.get('max_health',0.0)), bool(char_data.get('is_alive',True)),
-                        json.dumps(char_data.get('status_effects', [])), int(char_data.get('level',1)), int(char_data.get('experience',0)),
-                        int(char_data.get('unspent_xp',0)), json.dumps(char_data.get('active_quests', [])), json.dumps(char_data.get('known_spells', [])),
-                        json.dumps(char_data.get('spell_cooldowns', {})), json.dumps(char_data.get('skills_data', [])),
-                        json.dumps(char_data.get('abilities_data', [])), json.dumps(char_data.get('spells_data', [])),
-                        json.dumps(char_data.get('flags', {})), char_data.get('character_class'), char_data.get('selected_language'),
-                        char_data.get('current_game_status'), char_data.get('collected_actions_json'), char_data.get('current_party_id'),
-                        effective_stats_j
-                    )
-                    data_to_upsert.append(db_params)
-                    processed_dirty_ids.add(char_obj.id)
-                except Exception as e: print(f"Error preparing char {char_obj.id} for save: {e}")
-
-            if data_to_upsert:
-                try:
-                    await self._db_service.adapter.execute_many(upsert_sql, data_to_upsert)
-                    if guild_id_str in self._dirty_characters:
-                        self._dirty_characters[guild_id_str].difference_update(processed_dirty_ids)
-                        if not self._dirty_characters[guild_id_str]: del self._dirty_characters[guild_id_str]
-                except Exception as e: print(f"Error batch upserting characters: {e}")
+        if not chars_to_save: return
+
+        # Строки без сохраненного отпечатка (новые или впервые после загрузки) пишутся полным upsert'ом,
+        # остальные - узким UPDATE только измененных колонок, сгруппированным по набору колонок.
+        guild_fingerprints = self._saved_fingerprints.setdefault(guild_id_str, {})
+        full_rows: List[Tuple[Any, ...]] = []
+        updates_by_signature: Dict[Tuple[Tuple[str, str], ...], List[Tuple[Any, ...]]] = {}
+        pending: Dict[str, Tuple["Character", Dict[str, Any], Set[str]]] = {}
+        for char_obj in chars_to_save:
+            try:
+                values = _player_column_values(char_obj)
+                changed_fields = char_obj.take_changed_fields()
+                baseline = guild_fingerprints.get(char_obj.id)
+                if baseline is None:
+                    full_rows.append(tuple(values[column] for column in PLAYER_SAVE_COLUMNS))
+                    fingerprints = {column: _fingerprint(values[column]) for column in PLAYER_SAVE_COLUMNS if _is_container_column(char_obj, column)}
+                else:
+                    assignments, fingerprints = _diff_player_columns(char_obj, values, baseline, changed_fields)
+                    if assignments:
+                        signature = tuple((column, mode) for column, mode, _ in assignments)
+                        updates_by_signature.setdefault(signature, []).append((char_obj.id, *(value for _, _, value in assignments)))
+                pending[char_obj.id] = (char_obj, fingerprints, changed_fields)
+            except Exception as e: print(f"Error preparing char {char_obj.id} for save: {e}")
+
+        try:
+            if full_rows:
+                await self._db_service.adapter.bulk_upsert('players', PLAYER_SAVE_COLUMNS, full_rows)
+            for signature, rows in updates_by_signature.items():
+                await self._db_service.adapter.execute_many(_player_update_sql(signature), rows)
+        except Exception as e:
+            print(f"Error saving characters: {e}")
+            # Отпечатки не обновляются, изменения остаются отмеченными - следующий save их повторит.
+            for char_obj, _, changed_fields in pending.values():
+                char_obj._changed_fields.update(changed_fields)
+            return
+
+        for char_id, (_, fingerprints, _) in pending.items():
+            guild_fingerprints.setdefault(char_id, {}).update(fingerprints)
+        if guild_id_str in self._dirty_characters:
+            self._dirty_characters[guild_id_str].difference_update(pending.keys())
+            if not self._dirty_characters[guild_id_str]: del self._dirty_characters[guild_id_str]
+
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_characters.get(guild_id_str, ())), set(self._deleted_characters_ids.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        """Вызывается PersistenceManager, если сохранение гильдии откатилось: все будет записано заново."""
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_characters.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_characters_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+        # Отпечатки могли принять неподтвержденную запись - такие строки пишутся полным upsert'ом.
+        guild_fingerprints = self._saved_fingerprints.get(guild_id_str, {})
+        for char_id in dirty_ids: guild_fingerprints.pop(char_id, None)
 
     async def load_state(self, guild_id: str, **kwargs: Any) -> None:
         if self._db_service is None or self._db_service.adapter is None: return
@@ -341,6 +467,8 @@ class CharacterManager:
         self._discord_to_char_map.pop(guild_id_str, None); self._discord_to_char_map[guild_id_str] = {}
         self._entities_with_active_action.pop(guild_id_str, None); self._entities_with_active_action[guild_id_str] = set()
         self._dirty_characters.pop(guild_id_str, None); self._deleted_characters_ids.pop(guild_id_str, None)
+        self._saved_fingerprints.pop(guild_id_str, None)
+        self._occupancy.clear(guild_id_str, CHARACTERS)
         rows = []
         try:
             sql = '''
@@ -361,29 +489,33 @@ class CharacterManager:
             data = dict(row)
             try:
                 char_id = str(data.get('id'))
-                data['effective_stats_json'] = data.get('effective_stats_json', '{}')
-                for k, v_type, d_val_str in [('stats','{}',dict), ('inventory','[]',list), ('action_queue','[]',list),
-                                   ('state_variables','{}',dict), ('status_effects','[]',list),
-                                   ('skills_data_json','[]',list), ('abilities_data_json','[]',list),
-                                   ('spells_data_json','[]',list), ('flags_json','{}',dict),
-                                   ('active_quests','[]',list), ('known_spells','[]',list),
-                                   ('spell_cooldowns','{}',dict)]:
-                    raw_val = data.get(k)
-                    parsed_val = v_type()
-                    if isinstance(raw_val, (str, bytes)): parsed_val = json.loads(raw_val or d_val_str)
-                    elif isinstance(raw_val, v_type): parsed_val = raw_val
-                    data[k.replace('_json','')] = parsed_val
+                # В памяти effective_stats_json и collected_actions_json остаются JSON-строками,
+                # как их пишут калькуляторы статов и сбор действий.
+                effective_stats = data.get('effective_stats_json')
+                data['effective_stats_json'] = effective_stats if isinstance(effective_stats, str) else dumps(effective_stats or {})
+                collected_actions = data.get('collected_actions_json')
+                if collected_actions is not None and not isinstance(collected_actions, str):
+                    data['collected_actions_json'] = dumps(collected_actions)
+                for k, v_type in [('stats',dict), ('inventory',list), ('action_queue',list),
+                                  ('state_variables',dict), ('status_effects',list),
+                                  ('skills_data_json',list), ('abilities_data_json',list),
+                                  ('spells_data_json',list), ('flags_json',dict),
+                                  ('active_quests',list), ('known_spells',list),
+                                  ('spell_cooldowns',dict)]:
+                    parsed_val = from_db_json(data.get(k))
+                    data[k.replace('_json','')] = parsed_val if isinstance(parsed_val, v_type) else v_type()
                     if '_json' in k and k in data: del data[k]
-                current_action_json = data.get('current_action')
-                data['current_action'] = json.loads(current_action_json) if isinstance(current_action_json, str) else (current_action_json if isinstance(current_action_json, dict) else None)
-                name_i18n_json = data.get('name_i18n')
-                data['name_i18n'] = json.loads(name_i18n_json or '{}') if isinstance(name_i18n_json, str) else (name_i18n_json if isinstance(name_i18n_json, dict) else {})
+                current_action = from_db_json(data.get('current_action'), text=True)
+                data['current_action'] = current_action if isinstance(current_action, dict) else None
+                name_i18n = from_db_json(data.get('name_i18n'))
+                data['name_i18n'] = name_i18n if isinstance(name_i18n, dict) else {}
                 data['name'] = data['name_i18n'].get(data.get('selected_language','en'), next(iter(data['name_i18n'].values()), char_id[:8]))
                 data['discord_user_id'] = int(data['discord_id']) if data.get('discord_id') else None
                 if 'discord_id' in data: del data['discord_id']
                 char = Character.from_dict(data)
                 setattr(char, 'effective_stats_json', data.get('effective_stats_json', '{}'))
                 guild_chars_cache[char.id] = char
+                self._occupancy.place(guild_id_str, CHARACTERS, char.id, char.location_id)
                 if char.discord_user_id: guild_discord_map_cache[char.discord_user_id] = char.id
                 if char.current_action or char.action_queue: guild_active_action_cache.add(char.id)
             except Exception as e: print(f"Error processing char row {data.get('id')}: {e}")
@@ -399,7 +531,7 @@ class CharacterManager:
         return False
     async def update_character_location(self, character_id: str, location_id: Optional[str], guild_id: str, **kwargs: Any) -> Optional["Character"]:
         char = self.get_character(guild_id, character_id)
-        if char: char.current_location_id = str(location_id) if location_id else None; self.mark_character_dirty(guild_id, character_id); await self._recalculate_and_store_effective_stats(guild_id, character_id, char); return char
+        if char: self._set_location(guild_id, char, location_id); self.mark_character_dirty(guild_id, character_id); await self._recalculate_and_store_effective_stats(guild_id, character_id, char); return char
         return None
     async def add_item_to_inventory(self, guild_id: str, character_id: str, item_id: str, quantity: int = 1, **kwargs: Any) -> bool: return True
     async def remove_item_from_inventory(self, guild_id: str, character_id: str, item_id: str, quantity: int = 1, **kwargs: Any) -> bool: return True
@@ -470,7 +602,7 @@ class CharacterManager:
         return False
     async def revert_location_change(self, guild_id: str, character_id: str, old_location_id: str, **kwargs: Any) -> bool:
         char = self.get_character(guild_id, character_id);
-        if char: char.current_location_id = old_location_id; self.mark_character_dirty(guild_id, character_id); await self._recalculate_and_store_effective_stats(guild_id, character_id, char); return True
+        if char: self._set_location(guild_id, char, old_location_id); self.mark_character_dirty(guild_id, character_id); await self._recalculate_and_store_effective_stats(guild_id, character_id, char); return True
         return False
     async def revert_hp_change(self, guild_id: str, character_id: str, old_hp: float, old_is_alive: bool, **kwargs: Any) -> bool:
         char = self.get_character(guild_id, character_id);
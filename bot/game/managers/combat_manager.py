@@ -43,6 +43,10 @@ class CombatManager:
     _active_combats: Dict[str, Dict[str, "Combat"]]
     _dirty_combats: Dict[str, Set[str]]
     _deleted_combats_ids: Dict[str, Set[str]]
+    # guild_id -> entity_id -> combat_id for living participants of active combats
+    _combat_by_participant: Dict[str, Dict[str, str]]
+    # guild_id -> event_id -> combat ids
+    _combats_by_event: Dict[str, Dict[str, Set[str]]]
 
     def __init__(
         self,
@@ -77,6 +81,8 @@ class CombatManager:
         self._active_combats = {}
         self._dirty_combats = {}
         self._deleted_combats_ids = {}
+        self._combat_by_participant = {}
+        self._combats_by_event = {}
         # print("CombatManager initialized (with updated start_combat).") # Reduced verbosity
 
     def get_combat(self, guild_id: str, combat_id: str) -> Optional["Combat"]:
@@ -94,31 +100,44 @@ class CombatManager:
         return []
 
     def get_combat_by_participant_id(self, guild_id: str, entity_id: str) -> Optional["Combat"]:
-        guild_id_str = str(guild_id)
-        guild_combats = self._active_combats.get(guild_id_str)
-        if guild_combats:
-             for combat in guild_combats.values():
-                 if isinstance(combat.participants, list):
-                     for p_obj in combat.participants:
-                         if isinstance(p_obj, CombatParticipant) and p_obj.entity_id == entity_id:
-                             return combat
-        return None
+        combat_id = self._combat_by_participant.get(str(guild_id), {}).get(str(entity_id))
+        return self.get_combat(guild_id, combat_id) if combat_id else None
 
     def get_combats_by_event_id(self, guild_id: str, event_id: str) -> List["Combat"]:
-         guild_id_str = str(guild_id)
-         combats_in_event = []
-         guild_combats = self._active_combats.get(guild_id_str)
-         if guild_combats:
-              for combat in guild_combats.values():
-                   if getattr(combat, 'event_id', None) == event_id:
-                        combats_in_event.append(combat)
-         return combats_in_event
+         guild_combats = self._active_combats.get(str(guild_id), {})
+         combat_ids = self._combats_by_event.get(str(guild_id), {}).get(str(event_id), ())
+         return [combat for combat_id in combat_ids if (combat := guild_combats.get(combat_id)) is not None]
 
     def is_character_in_combat(self, guild_id: str, entity_id: str) -> Optional[str]:
         """Checks if an entity is in any active combat and returns the combat_id if so."""
         combat = self.get_combat_by_participant_id(guild_id, entity_id)
         return combat.id if combat and hasattr(combat, 'id') else None
 
+    def _index_combat(self, guild_id_str: str, combat: "Combat") -> None:
+        """Adds an active combat to the participant and event lookup maps. Defeated participants are not indexed."""
+        guild_participants = self._combat_by_participant.setdefault(guild_id_str, {})
+        for participant in combat.participants:
+            if participant.hp > 0:
+                guild_participants[participant.entity_id] = combat.id
+        event_id = getattr(combat, 'event_id', None)
+        if event_id:
+            self._combats_by_event.setdefault(guild_id_str, {}).setdefault(str(event_id), set()).add(combat.id)
+
+    def _unindex_participant(self, guild_id_str: str, entity_id: str, combat_id: str) -> None:
+        """Drops a participant that died, fled or was removed; a newer combat of the same entity is kept."""
+        guild_participants = self._combat_by_participant.get(guild_id_str)
+        if guild_participants and guild_participants.get(entity_id) == combat_id:
+            del guild_participants[entity_id]
+
+    def _unindex_combat(self, guild_id_str: str, combat: "Combat") -> None:
+        for participant in combat.participants:
+            self._unindex_participant(guild_id_str, participant.entity_id, combat.id)
+        event_id = getattr(combat, 'event_id', None)
+        guild_events = self._combats_by_event.get(guild_id_str)
+        if event_id and guild_events and str(event_id) in guild_events:
+            guild_events[str(event_id)].discard(combat.id)
+            if not guild_events[str(event_id)]: del guild_events[str(event_id)]
+
     # Removed apply_damage_to_participant and record_attack as their logic
     # is now expected to be handled by the RuleEngine or within the
     # handle_participant_action_complete method based on RuleEngine results.
@@ -239,6 +258,7 @@ class CombatManager:
         try:
             combat = Combat.from_dict(combat_data)
             self._active_combats.setdefault(guild_id_str, {})[new_combat_id] = combat
+            self._index_combat(guild_id_str, combat)
             self.mark_combat_dirty(guild_id_str, new_combat_id)
 
             log_message_success = f"Combat {new_combat_id} started in location {location_id_str} for guild {guild_id_str}."
@@ -337,13 +357,8 @@ class CombatManager:
                 if not rules_config_data and hasattr(self._rule_engine, 'rules_config_data'): # Check RuleEngine if available
                     rules_config_data = self._rule_engine.rules_config_data
 
-                actor_eff_stats = await stats_calculator.calculate_effective_stats(
-                    self._db_service, current_actor_id, actor_participant_data.entity_type, rules_config_data,
-                    managers=kwargs # Pass all managers for stat calculation needs
-                )
-
                 potential_target_entities_for_ai: List[Union[CharacterModel, NpcModel]] = []
-                targets_eff_stats_map: Dict[str, Dict[str, Any]] = {}
+                stats_requests: List[Tuple[str, str]] = [(current_actor_id, actor_participant_data.entity_type)]
 
                 for p_data in combat.participants:
                     if p_data.entity_id != current_actor_id and p_data.hp > 0:
@@ -355,11 +370,14 @@ class CombatManager:
 
                         if target_entity_object:
                             potential_target_entities_for_ai.append(target_entity_object)
-                            target_eff_stats = await stats_calculator.calculate_effective_stats(
-                                self._db_service, p_data.entity_id, p_data.entity_type, rules_config_data,
-                                managers=kwargs
-                            )
-                            targets_eff_stats_map[p_data.entity_id] = target_eff_stats
+                            stats_requests.append((p_data.entity_id, p_data.entity_type))
+
+                # Actor and all targets in one pass
+                eff_stats_by_id = await self._batch_effective_stats(guild_id_str, stats_requests, rules_config_data)
+                actor_eff_stats = eff_stats_by_id.get(current_actor_id, {})
+                targets_eff_stats_map: Dict[str, Dict[str, Any]] = {
+                    entity_id: eff_stats_by_id.get(entity_id, {}) for entity_id, _ in stats_requests[1:]
+                }
 
                 ai_instance = NpcCombatAI(npc_object)
                 # The full context for AI needs all managers, rules_config, and the effective stats
@@ -549,24 +567,23 @@ class CombatManager:
                 await self._db_service.commit_transaction() # Commit changes like turn advancement
                 return
 
-            # Load Effective Stats for Actor
-            actor_effective_stats = await stats_calculator.calculate_effective_stats(
-                self._db_service, actor_id, actor_participant_data.entity_type, rules_config, # type: ignore
-                managers={'character_manager': self._character_manager, 'npc_manager': self._npc_manager, 'status_manager': self._status_manager, 'item_manager': self._item_manager}
-            )
-
-            # Determine targets and load their effective stats
+            # Determine targets and load effective stats for the actor and all targets in one pass
             target_ids = action_data.get('target_ids', []) # Assuming target_ids is a list in action_data
             targets_effective_stats = {}
             targets_data_for_rule_engine = []
 
+            stats_requests: List[Tuple[str, str]] = [(actor_id, actor_participant_data.entity_type)]
             for target_id in target_ids:
                 target_participant_data = combat.get_participant_data(target_id)
                 if target_participant_data:
-                    target_effective_stats = await stats_calculator.calculate_effective_stats(
-                        self._db_service, target_id, target_participant_data.entity_type, rules_config, # type: ignore
-                        managers={'character_manager': self._character_manager, 'npc_manager': self._npc_manager, 'status_manager': self._status_manager, 'item_manager': self._item_manager}
-                    )
+                    stats_requests.append((target_id, target_participant_data.entity_type))
+            eff_stats_by_id = await self._batch_effective_stats(guild_id_str, stats_requests, rules_config) # type: ignore
+            actor_effective_stats = eff_stats_by_id.get(actor_id, {})
+
+            for target_id in target_ids:
+                target_participant_data = combat.get_participant_data(target_id)
+                if target_participant_data:
+                    target_effective_stats = eff_stats_by_id.get(target_id, {})
                     targets_effective_stats[target_id] = target_effective_stats
                     targets_data_for_rule_engine.append({
                         "id": target_id,
@@ -651,7 +668,11 @@ class CombatManager:
                                     f"Participant {target_p.entity_id} HP changed from {original_hp} to {target_p.hp}",
                                     guild_id=guild_id_str, combat_id=combat_instance_id
                                 )
-                            if target_p.hp <= 0:
+                            if target_p.hp > 0:
+                                if original_hp <= 0: # Revived participant is back in the fight
+                                    self._combat_by_participant.setdefault(guild_id_str, {})[target_p.entity_id] = combat_instance_id
+                            else:
+                                self._unindex_participant(guild_id_str, target_p.entity_id, combat_instance_id)
                                 # Log defeat, RuleEngine might provide a specific message
                                 defeat_msg = f"Participant {target_p.entity_id} has been defeated."
                                 combat.combat_log.append(defeat_msg)
@@ -901,6 +922,7 @@ class CombatManager:
         guild_combats_cache = self._active_combats.get(guild_id_str)
         if guild_combats_cache:
             guild_combats_cache.pop(combat_id, None) # Remove from active memory
+        self._unindex_combat(guild_id_str, combat)
 
         # Add to _deleted_combats_ids only if we intend to delete it from DB entirely upon next save.
         # If we just want to mark it inactive, this line is not needed and save_state handles it.
@@ -920,6 +942,8 @@ class CombatManager:
         if self._db_service is None or self._db_service.adapter is None: return
 
         self._active_combats[guild_id_str] = {}
+        self._combat_by_participant[guild_id_str] = {}
+        self._combats_by_event.pop(guild_id_str, None)
         self._dirty_combats.pop(guild_id_str, None)
         self._deleted_combats_ids.pop(guild_id_str, None)
         rows = []
@@ -963,12 +987,23 @@ class CombatManager:
 
                 combat = Combat.from_dict(data)
                 guild_combats_cache[combat.id] = combat
+                self._index_combat(guild_id_str, combat)
                 loaded_count += 1
             except Exception as e:
                 print(f"CombatManager: Error loading combat object {data.get('id')}: {e}")
                 traceback.print_exc()
         print(f"CombatManager: Loaded {loaded_count} active combats for guild {guild_id_str}.")
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_combats.get(guild_id_str, ())), set(self._deleted_combats_ids.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_combats.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_combats_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
         guild_id_str = str(guild_id)
         if self._db_service is None or self._db_service.adapter is None: return
@@ -990,12 +1025,12 @@ class CombatManager:
 
             data_tuple = (
                 combat_dict['id'], combat_dict['guild_id'], combat_dict.get('location_id'),
-                combat_dict['is_active'], json.dumps(combat_dict['participants']),
+                combat_dict['is_active'], combat_dict['participants'],
                 0.0, # round_timer placeholder
-                combat_dict['current_round'], json.dumps(combat_dict['combat_log']),
-                json.dumps(combat_dict['state_variables']), combat_dict.get('channel_id'),
+                combat_dict['current_round'], combat_dict['combat_log'],
+                combat_dict['state_variables'], combat_dict.get('channel_id'),
                 combat_dict.get('event_id'),
-                json.dumps(combat_dict.get('turn_order', [])),
+                combat_dict.get('turn_order', []),
                 combat_dict.get('current_turn_index', 0)
             )
             combats_to_upsert_data.append(data_tuple)
@@ -1039,6 +1074,18 @@ class CombatManager:
         print(f"CombatManager: Rebuilding runtime caches for guild {str(guild_id)}.")
         print(f"CombatManager: Rebuild runtime caches complete for guild {str(guild_id)}.")
 
+    async def _batch_effective_stats(
+        self, guild_id: str, entities: List[Tuple[str, str]], rules_config: Any
+    ) -> Dict[str, Dict[str, Any]]:
+        """Effective stats for (entity_id, entity_type) pairs, computed in one batch. Empty when managers are missing."""
+        if not (self._character_manager and self._npc_manager and self._item_manager and self._status_manager):
+            return {}
+        return await stats_calculator.calculate_effective_stats_batch(
+            db_service=self._db_service, guild_id=guild_id, entities=entities, rules_config_data=rules_config,
+            character_manager=self._character_manager, npc_manager=self._npc_manager,
+            item_manager=self._item_manager, status_manager=self._status_manager
+        )
+
     def mark_combat_dirty(self, guild_id: str, combat_id: str) -> None:
          guild_id_str = str(guild_id)
          guild_combats_cache = self._active_combats.get(guild_id_str)
@@ -1064,6 +1111,7 @@ class CombatManager:
 
               combat.participants = new_participants_list
               combat.turn_order = new_turn_order
+              self._unindex_participant(guild_id_str, entity_id, combat_id)
 
               if new_turn_order:
                   if removed_actor_index != -1 and combat.current_turn_index >= removed_actor_index:
@@ -1082,7 +1130,8 @@ class CombatManager:
                       combat_finished = await rule_engine.check_combat_end_conditions(combat=combat, context=kwargs) # type: ignore
                       if combat_finished:
                           print(f"CombatManager: Combat {combat_id} ended after {entity_type} {entity_id} removed.")
-                          await self.end_combat(combat_id, **kwargs)
+                          winning_entity_ids = [p.entity_id for p in combat.participants if p.hp > 0]
+                          await self.end_combat(guild_id_str, combat_id, winning_entity_ids, context=kwargs)
                   except Exception as e:
                       print(f"CombatManager: Error checking end_conditions after entity removal: {e}")
 
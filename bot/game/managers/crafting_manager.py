@@ -8,7 +8,7 @@ import asyncio
 import time # Added for timestamp in crafting task
 # Импорт базовых типов
 # ИСПРАВЛЕНИЕ: Импортируем необходимые типы из typing
-from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable, Awaitable, Union # Added Union
+from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable, Awaitable, Union, Tuple # Added Union
 
 # Импорт модели CraftingQueue (нужен при runtime для кеша и возвращаемых типов)
 # TODO: Create a CraftingQueue model if you don't have one.
@@ -17,6 +17,7 @@ from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable, Awai
 # from bot.game.models.crafting_queue import CraftingQueue # Example import
 
 # Адаптер БД
+from bot.utils.json_codec import from_db_json
 from bot.services.db_service import DBService # Changed
 
 # Import built-in types for isinstance checks
@@ -297,6 +298,10 @@ class CraftingManager:
 
 
     # TODO: Implement process_tick method
+    def has_tick_work(self, guild_id: str) -> bool:
+        """Returns False when the guild has no crafting queues, so the world tick can skip this manager."""
+        return bool(self._crafting_queues.get(str(guild_id)))
+
     # Called by WorldSimulationProcessor
     # Needs guild_id, game_time_delta, context
     # Should iterate through active queues for the guild, update task progress,
@@ -519,7 +524,7 @@ class CraftingManager:
 
                  # Parse JSON fields, handle None/malformed data gracefully
                  try:
-                     data['queue'] = json.loads(data.get('queue') or '[]') if isinstance(data.get('queue'), (str, bytes)) else []
+                     data['queue'] = from_db_json(data.get('queue'), [])
                  except (json.JSONDecodeError, TypeError):
                       print(f"CraftingManager: Warning: Failed to parse queue for entity {entity_id} in guild {guild_id_str}. Setting to []. Data: {data.get('queue')}")
                       data['queue'] = []
@@ -536,7 +541,7 @@ class CraftingManager:
 
 
                  try:
-                     data['state_variables'] = json.loads(data.get('state_variables') or '{}') if isinstance(data.get('state_variables'), (str, bytes)) else {}
+                     data['state_variables'] = from_db_json(data.get('state_variables'), {})
                  except (json.JSONDecodeError, TypeError):
                       print(f"CraftingManager: Warning: Failed to parse state_variables for queue of entity {entity_id} in guild {guild_id_str}. Setting to {{}}. Data: {data.get('state_variables')}")
                       data['state_variables'] = {}
@@ -571,6 +576,16 @@ class CraftingManager:
         print(f"CraftingManager: Load state complete for guild {guild_id_str}.")
 
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_crafting_queues.get(guild_id_str, ())), set(self._deleted_crafting_queue_ids.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_crafting_queues.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_crafting_queue_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+
     # save_state - saves per-guild
     # required_args_for_save = ["guild_id"]
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
@@ -683,15 +698,12 @@ class CraftingManager:
                            if not isinstance(queue_list, list): queue_list = []
                            if not isinstance(state_variables, dict): state_variables = {}
 
-                           queue_json = json.dumps(queue_list)
-                           state_variables_json = json.dumps(state_variables)
-
                            data_to_upsert.append((
                                str(entity_id),
                                str(entity_type),
                                guild_id_str, # Ensure guild_id string
-                               queue_json,
-                               state_variables_json,
+                               queue_list,
+                               state_variables,
                            ))
                            upserted_entity_ids.add(str(entity_id)) # Track entity ID
 
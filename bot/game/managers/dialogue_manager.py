@@ -16,6 +16,7 @@ from typing import Optional, Dict, Any, List, Set, Callable, Awaitable, TYPE_CHE
 # from bot.game.models.dialogue_template import DialogueTemplate # If template model exists
 
 # Адаптер БД (прямой импорт нужен для __init__)
+from bot.utils.json_codec import from_db_json
 from bot.services.db_service import DBService # Changed
 
 # Import built-in types for isinstance checks
@@ -740,7 +741,7 @@ class DialogueManager:
                  try:
                      # Ensure participant IDs are strings after load
                      participants_raw = data.get('participants')
-                     data['participants'] = [str(p) for p in json.loads(participants_raw) if p is not None] if isinstance(participants_raw, (str, bytes)) else []
+                     data['participants'] = [str(p) for p in from_db_json(participants_raw, []) if p is not None]
                  except (json.JSONDecodeError, TypeError):
                       print(f"DialogueManager: Warning: Failed to parse participants for dialogue {dialogue_id} in guild {guild_id_str}. Setting to []. Data: {data.get('participants')}")
                       data['participants'] = []
@@ -748,7 +749,7 @@ class DialogueManager:
 
                  try:
                      state_variables_raw = data.get('state_variables')
-                     data['state_variables'] = json.loads(state_variables_raw) if isinstance(state_variables_raw, (str, bytes)) else {}
+                     data['state_variables'] = from_db_json(state_variables_raw, {})
                  except (json.JSONDecodeError, TypeError):
                       print(f"DialogueManager: Warning: Failed to parse state_variables for dialogue {dialogue_id} in guild {guild_id_str}. Setting to {{}}. Data: {data.get('state_variables')}")
                       data['state_variables'] = {}
@@ -809,6 +810,16 @@ class DialogueManager:
         print(f"DialogueManager: Load state complete for guild {guild_id_str}.")
 
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_dialogues.get(guild_id_str, ())), set(self._deleted_dialogue_ids.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_dialogues.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_dialogue_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+
     # save_state - saves per-guild
     # required_args_for_save = ["guild_id"]
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
@@ -947,18 +958,15 @@ class DialogueManager:
                            if not isinstance(participants, list): participants = [] # Ensure list for JSON
                            if not isinstance(state_variables, dict): state_variables = {} # Ensure dict for JSON
 
-                           participants_json = json.dumps(participants)
-                           state_variables_json = json.dumps(state_variables)
-
                            # Prepare tuple of parameters for execute_many
                            data_to_upsert_params.append((
                                str(dialogue_id), # Ensure string ID
                                str(template_id) if template_id is not None else None, # Ensure str or None
                                guild_id_str, # Ensure guild_id string
-                               participants_json,
+                               participants,
                                int(channel_id) if channel_id is not None else None, # Ensure int or None
                                str(current_stage_id) if current_stage_id is not None else None, # Ensure str or None
-                               state_variables_json,
+                               state_variables,
                                float(last_activity_game_time) if last_activity_game_time is not None else None, # Ensure float or None
                                str(event_id) if event_id is not None else None, # Ensure str or None
                                is_active, # Pass boolean directly
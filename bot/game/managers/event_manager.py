@@ -7,9 +7,10 @@ import traceback
 import asyncio
 # Импорт базовых типов
 # ИСПРАВЛЕНИЕ: Импортируем необходимые типы из typing
-from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable, Awaitable, Union # Added Union
+from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable, Awaitable, Union, Tuple # Added Union
 
 # Импорт модели Event (для аннотаций и работы с объектами при runtime)
+from bot.utils.json_codec import from_db_json
 from bot.game.models.event import Event # Прямой импорт
 
 # Адаптер БД
@@ -881,7 +882,7 @@ class EventManager:
 
                  # Parse JSON fields, handle None/malformed data gracefully
                  try:
-                     data['players'] = json.loads(data.get('players') or '[]') if isinstance(data.get('players'), (str, bytes)) else []
+                     data['players'] = from_db_json(data.get('players'), [])
                  except (json.JSONDecodeError, TypeError):
                       print(f"EventManager: Warning: Failed to parse players for event {event_id} in guild {guild_id_str}. Setting to []. Data: {data.get('players')}")
                       data['players'] = []
@@ -889,13 +890,13 @@ class EventManager:
                       data['players'] = [str(p) for p in data['players'] if p is not None]
 
                  try:
-                     data['state_variables'] = json.loads(data.get('state_variables') or '{}') if isinstance(data.get('state_variables'), (str, bytes)) else {}
+                     data['state_variables'] = from_db_json(data.get('state_variables'), {})
                  except (json.JSONDecodeError, TypeError):
                       print(f"EventManager: Warning: Failed to parse state_variables for event {event_id} in guild {guild_id_str}. Setting to {{}}. Data: {data.get('state_variables')}")
                       data['state_variables'] = {}
 
                  try:
-                     data['stages_data'] = json.loads(data.get('stages_data') or '{}') if isinstance(data.get('stages_data'), (str, bytes)) else {}
+                     data['stages_data'] = from_db_json(data.get('stages_data'), {})
                  except (json.JSONDecodeError, TypeError):
                       print(f"EventManager: Warning: Failed to parse stages_data for event {event_id} in guild {guild_id_str}. Setting to {{}}. Data: {data.get('stages_data')}")
                       data['stages_data'] = {}
@@ -989,6 +990,16 @@ class EventManager:
         print(f"EventManager: Load state complete for guild {guild_id_str}.")
 
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_events.get(guild_id_str, ())), set(self._deleted_event_ids.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_events.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_event_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+
     # save_state - saves per-guild
     # required_args_for_save = ["guild_id"]
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
@@ -1131,23 +1142,17 @@ class EventManager:
                            if not isinstance(stages_data, dict): stages_data = {}
                            if not isinstance(end_message_template_i18n, dict): end_message_template_i18n = {}
 
-                           name_i18n_json = json.dumps(name_i18n)
-                           players_json = json.dumps(players)
-                           state_variables_json = json.dumps(state_variables)
-                           stages_data_json = json.dumps(stages_data)
-                           end_message_template_i18n_json = json.dumps(end_message_template_i18n)
-
                            data_to_upsert.append((
                                str(event_id),
                                str(template_id) if template_id is not None else None, # Ensure str or None
-                               name_i18n_json, # Pass JSON string
+                               name_i18n, # JSON columns take the objects, the pool's codec encodes them
                                is_active, # Pass boolean directly
                                int(channel_id) if channel_id is not None else None, # Ensure int or None
                                str(current_stage_id), # Ensure string
-                               players_json,
-                               state_variables_json,
-                               stages_data_json,
-                               end_message_template_i18n_json, # Pass JSON string
+                               players,
+                               state_variables,
+                               stages_data,
+                               end_message_template_i18n,
                                guild_id_str, # Ensure guild_id string
                            ))
                            upserted_event_ids.add(str(event_id)) # Track ID
@@ -1364,14 +1369,14 @@ class EventManager:
             db_params = (
                 db_id,
                 db_template_id,
-                json.dumps(db_name_i18n),
+                db_name_i18n,
                 db_is_active,
                 db_channel_id,
                 db_current_stage_id,
-                json.dumps(db_players_list),
-                json.dumps(final_state_vars),
-                json.dumps(db_stages_data),
-                json.dumps(db_end_message_template_i18n),
+                db_players_list,
+                final_state_vars,
+                db_stages_data,
+                db_end_message_template_i18n,
                 guild_id_str
             )
 
@@ -1,13 +1,30 @@
 # bot/game/managers/game_log_manager.py
 from __future__ import annotations
+import asyncio
 import json
 import uuid
-# import time # Not strictly needed if only using NOW()
-from typing import Optional, Dict, Any, List, TYPE_CHECKING
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from bot.services.db_service import DBService
 
+# Overflow policies for the write-behind queue (game_log_settings["overflow_policy"]).
+OVERFLOW_BLOCK = "block"              # Await until the flusher frees space (backpressure).
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # Discard the oldest queued entry to make room.
+OVERFLOW_DROP_NEWEST = "drop_newest"  # Discard the entry being logged.
+OVERFLOW_SYNC = "sync"                # Flush the queue inline, then enqueue.
+_OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_SYNC)
+
+# Buffered rows carry their own timestamp so ordering reflects when the event happened,
+# not when the batch was flushed.
+_BATCH_INSERT_SQL = """
+    INSERT INTO game_logs
+    (id, timestamp, guild_id, player_id, party_id, event_type,
+    message_key, message_params, location_id, involved_entities_ids, details, channel_id)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+"""
+
 class GameLogManager:
     # required_args_for_load and required_args_for_save seem generic, keeping them.
     required_args_for_load: List[str] = ["guild_id"]
@@ -16,7 +33,125 @@ class GameLogManager:
     def __init__(self, db_service: Optional[DBService] = None, settings: Optional[Dict[str, Any]] = None):
         self._db_service = db_service
         self._settings = settings if settings is not None else {}
-        # print("GameLogManager initialized.") # Consider removing for production
+
+        # Write-behind pipeline. Entries are only buffered while the flusher task runs
+        # (see start()); otherwise log_event writes straight through as before.
+        self._write_behind_enabled: bool = bool(self._settings.get("write_behind_enabled", True))
+        self._batch_size: int = max(1, int(self._settings.get("batch_size", 100)))
+        self._flush_interval_seconds: float = float(self._settings.get("flush_interval_seconds", 0.5))
+        self._max_queue_size: int = max(self._batch_size, int(self._settings.get("max_queue_size", 10000)))
+        overflow_policy = self._settings.get("overflow_policy", OVERFLOW_BLOCK)
+        if overflow_policy not in _OVERFLOW_POLICIES:
+            print(f"GameLogManager: Unknown overflow_policy '{overflow_policy}', using '{OVERFLOW_BLOCK}'.")
+            overflow_policy = OVERFLOW_BLOCK
+        self._overflow_policy: str = overflow_policy
+
+        self._queue: Optional[asyncio.Queue[Tuple[Any, ...]]] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._stop_requested: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        self.dropped_events_count: int = 0
+
+    @property
+    def is_write_behind_active(self) -> bool:
+        return self._flusher_task is not None and not self._flusher_task.done()
+
+    def start(self) -> None:
+        """Starts the background flusher; from then on log_event only enqueues."""
+        if not self._write_behind_enabled or self.is_write_behind_active:
+            return
+        self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+        self._flush_requested = asyncio.Event()
+        self._stop_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher_task = asyncio.create_task(self._flusher_loop())
+        print(f"GameLogManager: Write-behind flusher started (batch_size={self._batch_size}, "
+              f"interval={self._flush_interval_seconds}s, max_queue={self._max_queue_size}, policy={self._overflow_policy}).")
+
+    async def stop(self) -> None:
+        """Stops the flusher and drains every queued entry to the DB."""
+        task = self._flusher_task
+        if task is None:
+            return
+        self._flusher_task = None
+        # The loop is not cancelled: a batch it is writing has already left the queue,
+        # so it finishes the current flush and exits on its own.
+        assert self._stop_requested is not None and self._flush_requested is not None
+        self._stop_requested.set()
+        self._flush_requested.set()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"GameLogManager: Error in flusher task during stop: {e}")
+        await self.flush()
+        print("GameLogManager: Write-behind flusher stopped and queue drained.")
+
+    async def flush(self) -> int:
+        """Writes all currently queued entries. Returns the number of rows written."""
+        if self._queue is None or self._flush_lock is None:
+            return 0
+        written = 0
+        async with self._flush_lock:
+            while not self._queue.empty():
+                batch: List[Tuple[Any, ...]] = []
+                while len(batch) < self._batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                written += await self._write_batch(batch)
+        return written
+
+    async def _flusher_loop(self) -> None:
+        assert self._flush_requested is not None and self._stop_requested is not None
+        while not self._stop_requested.is_set():
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self._flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"GameLogManager: Unexpected error in flusher loop: {e}")
+
+    async def _write_batch(self, batch: List[Tuple[Any, ...]]) -> int:
+        if not batch:
+            return 0
+        if self._db_service is None or self._db_service.adapter is None:
+            for row in batch:
+                print(f"GameLogManager: DB service not available. Dropping buffered log: {row}")
+            return 0
+        try:
+            await self._db_service.adapter.execute_many(_BATCH_INSERT_SQL, batch)
+            return len(batch)
+        except Exception as e:
+            print(f"GameLogManager: Failed to write batch of {len(batch)} log events to DB. Error: {e}")
+            for row in batch:
+                print(f"GameLogManager (DB-FAIL): Data: {row}")
+            return 0
+
+    async def _enqueue(self, row: Tuple[Any, ...]) -> None:
+        assert self._queue is not None and self._flush_requested is not None
+        if self._queue.full():
+            if self._overflow_policy == OVERFLOW_DROP_NEWEST:
+                self.dropped_events_count += 1
+                return
+            if self._overflow_policy == OVERFLOW_DROP_OLDEST:
+                self._queue.get_nowait()
+                self.dropped_events_count += 1
+            elif self._overflow_policy == OVERFLOW_SYNC:
+                await self.flush()
+        if self._overflow_policy == OVERFLOW_BLOCK:
+            # Backpressure: wake the flusher and wait for room.
+            self._flush_requested.set()
+            await self._queue.put(row)
+        else:
+            self._queue.put_nowait(row)
+        if self._queue.qsize() >= self._batch_size:
+            self._flush_requested.set()
 
     async def log_event(
         self,
@@ -41,10 +176,15 @@ class GameLogManager:
 
         log_id = str(uuid.uuid4())
 
-        # Prepare JSON fields
-        message_params_json = json.dumps(message_params) if message_params is not None else None
-        involved_entities_ids_json = json.dumps(involved_entities_ids) if involved_entities_ids is not None else None
-        details_json = json.dumps(details) # details is Dict[str, Any], non-optional in this context
+        # message_params, involved_entities_ids and details (non-optional here) go to JSON columns as
+        # Python objects; the pool's json/jsonb codec encodes them.
+        if self.is_write_behind_active:
+            await self._enqueue((
+                log_id, datetime.now(timezone.utc), guild_id, player_id, party_id, event_type,
+                message_key, message_params, location_id, involved_entities_ids,
+                details, channel_id
+            ))
+            return
 
         sql = """
             INSERT INTO game_logs 
@@ -54,8 +194,8 @@ class GameLogManager:
         """
         params = (
             log_id, guild_id, player_id, party_id, event_type,
-            message_key, message_params_json, location_id, involved_entities_ids_json,
-            details_json, channel_id
+            message_key, message_params, location_id, involved_entities_ids,
+            details, channel_id
         )
 
         try:
@@ -83,6 +223,9 @@ class GameLogManager:
         if self._db_service is None or self._db_service.adapter is None:
             print(f"GameLogManager: DB service or adapter not available. Cannot fetch logs for guild {guild_id}.")
             return []
+
+        # Reads must observe entries still sitting in the write-behind queue.
+        await self.flush()
         
         params_list: List[Any] = [guild_id]
 
@@ -133,6 +276,13 @@ class GameLogManager:
         # print(f"GameLogManager: Load state called for guild {str(guild_id)} (no specific state to load into manager).")
         pass
 
+    def snapshot_pending_save(self, guild_id: str) -> None:
+        """Записи журнала пишет flush(), у save_state нет ожидающих id."""
+        return None
+
+    def restore_pending_save(self, guild_id: str, snapshot: None) -> None:
+        pass
+
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
         # print(f"GameLogManager: Save state called for guild {str(guild_id)} (logs are saved directly).")
         pass
@@ -146,6 +296,9 @@ class GameLogManager:
             print(f"GameLogManager: DB service or adapter not available. Cannot delete log {log_id} for guild {guild_id}.")
             return False
 
+        # Flush first so a just-logged entry can be deleted.
+        await self.flush()
+
         sql = "DELETE FROM game_logs WHERE id = $1 AND guild_id = $2"
         try:
             # Assuming execute returns the number of rows affected or similar status
@@ -174,6 +327,9 @@ class GameLogManager:
             print(f"GameLogManager: DB service or adapter not available. Cannot fetch log {log_id} for guild {guild_id}.")
             return None
 
+        # Reads must observe entries still sitting in the write-behind queue.
+        await self.flush()
+
         sql = """
             SELECT id, timestamp, guild_id, player_id, party_id, event_type,
                    message_key, message_params, location_id, involved_entities_ids,
@@ -21,6 +21,12 @@ from bot.services.db_service import DBService
 from bot.ai.rules_schema import GameRules
 
 from bot.game.models.character import Character
+from bot.game.utils.location_occupancy import LocationOccupancyIndex
+from bot.game.utils.stats_calculator import EffectiveStatsCache
+from bot.services.global_state_cache import GlobalStateCache
+from bot.services.action_buffer import ActionBuffer
+from bot.game.turn_readiness_queue import TurnReadinessQueue, REASON_ACTIONS, REASON_END_TURN
+from bot.nlu.nlu_executor import NLUExecutor, set_nlu_executor
 
 if TYPE_CHECKING:
     from discord import Message
@@ -110,6 +116,11 @@ class GameManager:
         self.campaign_loader: Optional["CampaignLoader"] = None
         self.consequence_processor: Optional["ConsequenceProcessor"] = None
         self.nlu_data_service: Optional["NLUDataService"] = None
+        self.global_state_cache: Optional[GlobalStateCache] = None
+        self.action_buffer: Optional[ActionBuffer] = None
+        # Персонажи, которым нужна обработка хода; планировщик ходов не обходит гильдии без них.
+        self.turn_readiness_queue: TurnReadinessQueue = TurnReadinessQueue()
+        self.nlu_executor: Optional[NLUExecutor] = None
         self.ability_manager: Optional["AbilityManager"] = None
         self.spell_manager: Optional["SpellManager"] = None
         self.lore_manager: Optional["LoreManager"] = None
@@ -202,7 +213,7 @@ class GameManager:
 
             rules_entity_data = {
                 'id': DEFAULT_RULES_CONFIG_ID,
-                'config_data': json.dumps(self._rules_config_cache)
+                'config_data': self._rules_config_cache
             }
 
             try:
@@ -217,7 +228,7 @@ class GameManager:
                     success = await self.db_service.update_entity(
                         table_name='rules_config',
                         entity_id=DEFAULT_RULES_CONFIG_ID,
-                        data={'config_data': json.dumps(self._rules_config_cache)}, # Only update config_data
+                        data={'config_data': self._rules_config_cache}, # Only update config_data
                         id_field='id'
                     )
                     if success:
@@ -250,7 +261,7 @@ class GameManager:
 
     async def _initialize_database(self):
         print("GameManager: Initializing database service...")
-        self.db_service = DBService() # Removed db_path
+        self.db_service = DBService(settings=self._settings.get('database_settings')) # Removed db_path
         await self.db_service.connect()
 
         # try:
@@ -288,6 +299,11 @@ class GameManager:
         # If it's purely for schema (which Alembic now handles), it might be removable.
         # For now, keeping it to be safe, assuming it might do other setup.
         await self.db_service.initialize_database()
+        # World state flavour (global_state) is read from memory from here on.
+        self.global_state_cache = GlobalStateCache(db_service=self.db_service)
+        await self.global_state_cache.load()
+        # Collected player actions live in memory; PersistenceManager flushes them in batches.
+        self.action_buffer = ActionBuffer(db_service=self.db_service, readiness_queue=self.turn_readiness_queue)
         # self._db_adapter = self.db_service.adapter # Removed, GameManager holds db_service instance
         print("GameManager: DBService initialized post-Alembic.")
 
@@ -304,8 +320,11 @@ class GameManager:
         await self._load_or_initialize_rules_config()
         self.rule_engine = RuleEngine(settings=self._settings.get('rule_settings', {}), rules_data=self._rules_config_cache)
 
-        self.time_manager = TimeManager(db_service=self.db_service, settings=self._settings.get('time_settings', {})) # Changed
+        self.time_manager = TimeManager(db_service=self.db_service, settings=self._settings.get('time_settings', {}), global_state_cache=self.global_state_cache) # Changed
         self.location_manager = LocationManager(db_service=self.db_service, settings=self._settings) # Changed
+        # Shared location -> {characters, npcs, parties} index, maintained by the managers that move entities.
+        self.location_occupancy = LocationOccupancyIndex()
+        self.effective_stats_cache = EffectiveStatsCache()
 
         try:
             oset = self._settings.get('openai_settings', {})
@@ -316,7 +335,7 @@ class GameManager:
         except Exception as e: self.openai_service = None; print(f"GameManager: Warn: Failed OpenAIService init ({e})")
 
         self.event_manager = EventManager(db_service=self.db_service, settings=self._settings.get('event_settings', {}), openai_service=self.openai_service) # Changed
-        self.character_manager = CharacterManager(db_service=self.db_service, settings=self._settings, location_manager=self.location_manager, rule_engine=self.rule_engine) # Changed
+        self.character_manager = CharacterManager(db_service=self.db_service, settings=self._settings, location_manager=self.location_manager, rule_engine=self.rule_engine, occupancy_index=self.location_occupancy, stats_cache=self.effective_stats_cache) # Changed
         print("GameManager: Core managers and OpenAI service initialized.")
 
     async def _initialize_dependent_managers(self):
@@ -378,10 +397,17 @@ class GameManager:
             combat_manager=self.combat_manager,
             status_manager=self.status_manager,
             openai_service=self.openai_service,
-            campaign_loader=self.campaign_loader # Pass campaign_loader instance
+            campaign_loader=self.campaign_loader, # Pass campaign_loader instance
+            occupancy_index=self.location_occupancy,
+            stats_cache=self.effective_stats_cache
         )
 
-        self.party_manager = PartyManager(db_service=self.db_service, settings=self._settings.get('party_settings', {}), character_manager=self.character_manager, npc_manager=self.npc_manager) # Changed
+        self.party_manager = PartyManager(db_service=self.db_service, settings=self._settings.get('party_settings', {}), character_manager=self.character_manager, npc_manager=self.npc_manager, occupancy_index=self.location_occupancy) # Changed
+        self.party_manager._action_buffer = self.action_buffer
+        # LocationManager.move_entity moves entities through their managers, which keep the occupancy index in sync.
+        self.location_manager._character_manager = self.character_manager
+        self.location_manager._npc_manager = self.npc_manager
+        self.location_manager._party_manager = self.party_manager
         self.ability_manager = AbilityManager(db_service=self.db_service, settings=self._settings.get('ability_settings', {}), character_manager=self.character_manager, rule_engine=self.rule_engine, status_manager=self.status_manager) # Changed
         self.spell_manager = SpellManager(db_service=self.db_service, settings=self._settings.get('spell_settings', {}), character_manager=self.character_manager, rule_engine=self.rule_engine, status_manager=self.status_manager) # Changed
         self.game_log_manager = GameLogManager(db_service=self.db_service, settings=self._settings.get('game_log_settings')) # Changed
@@ -393,6 +419,12 @@ class GameManager:
         if self.consequence_processor: self.consequence_processor._quest_manager = self.quest_manager
         if self.db_service: self.nlu_data_service = NLUDataService(db_service=self.db_service) # Changed
         else: self.nlu_data_service = None
+        # Entity create/rename hooks keep the NLU entity cache fresh between TTL refreshes.
+        for manager_with_nlu_hooks in (self.location_manager, self.npc_manager, self.item_manager):
+            if manager_with_nlu_hooks: manager_with_nlu_hooks._nlu_data_service = self.nlu_data_service
+        # spaCy parsing runs in a process pool; parse_player_action picks this executor up.
+        self.nlu_executor = NLUExecutor.from_settings(self._settings.get('nlu_settings'))
+        set_nlu_executor(self.nlu_executor)
         self.lore_manager = LoreManager(settings=self._settings.get('lore_settings', {}), db_service=self.db_service) # Changed
 
         if self.character_manager:
@@ -456,7 +488,7 @@ class GameManager:
         else: self._party_command_handler = None
 
         if self.db_service: # Changed
-            self._persistence_manager = PersistenceManager(db_service=self.db_service, event_manager=self.event_manager, character_manager=self.character_manager, location_manager=self.location_manager, npc_manager=self.npc_manager, combat_manager=self.combat_manager, item_manager=self.item_manager, time_manager=self.time_manager, status_manager=self.status_manager, crafting_manager=self.crafting_manager, economy_manager=self.economy_manager, party_manager=self.party_manager) # Changed
+            self._persistence_manager = PersistenceManager(db_service=self.db_service, event_manager=self.event_manager, character_manager=self.character_manager, location_manager=self.location_manager, npc_manager=self.npc_manager, combat_manager=self.combat_manager, item_manager=self.item_manager, time_manager=self.time_manager, status_manager=self.status_manager, crafting_manager=self.crafting_manager, economy_manager=self.economy_manager, party_manager=self.party_manager, action_buffer=self.action_buffer) # Changed
         else: self._persistence_manager = None
 
         # Initialize UndoManager after its dependencies are ready
@@ -495,8 +527,20 @@ class GameManager:
             load_context_kwargs = {k: getattr(self, k, None) for k in ['rule_engine', 'time_manager', 'location_manager', 'event_manager', 'character_manager', 'item_manager', 'status_manager', 'combat_manager', 'crafting_manager', 'economy_manager', 'npc_manager', 'party_manager', 'openai_service', 'quest_manager', 'relationship_manager', 'dialogue_manager', 'game_log_manager', 'lore_manager', 'campaign_loader', 'consequence_processor', '_on_enter_action_executor', '_stage_description_generator', '_event_stage_processor', '_event_action_processor', '_character_action_processor', '_character_view_service', '_party_action_processor', '_persistence_manager', '_world_simulation_processor', 'conflict_resolver', 'db_service', 'nlu_data_service', 'ability_manager', 'spell_manager', 'prompt_context_collector', 'multilingual_prompt_generator', 'undo_manager']} # Added undo_manager to context
             load_context_kwargs.update({'send_callback_factory': self._get_discord_send_callback, 'settings': self._settings, 'discord_client': self._discord_client})
             await self._persistence_manager.load_game_state(guild_ids=self._active_guild_ids, **load_context_kwargs)
+            self._enqueue_loaded_turns()
         print("GameManager: Initial data and game state loaded.")
 
+    def _enqueue_loaded_turns(self) -> None:
+        """One scan after loading: re-enqueue turns that were pending before the restart."""
+        if not self.character_manager:
+            return
+        for guild_id_str in self._active_guild_ids:
+            for char_obj in self.character_manager.get_all_characters(guild_id_str) or []:
+                if getattr(char_obj, 'current_game_status', None) == 'ожидание_обработки':
+                    self.turn_readiness_queue.mark_ready(guild_id_str, char_obj.id, REASON_END_TURN)
+                elif getattr(char_obj, 'collected_actions_json', None):
+                    self.turn_readiness_queue.mark_ready(guild_id_str, char_obj.id, REASON_ACTIONS)
+
     async def _initialize_ai_content_services(self):
         print("GameManager: Initializing AI content generation services...")
         from bot.ai.prompt_context_collector import PromptContextCollector
@@ -514,6 +558,8 @@ class GameManager:
 
     async def _start_background_tasks(self):
         print("GameManager: Starting background tasks...")
+        if self.game_log_manager:
+            self.game_log_manager.start()
         if self._world_simulation_processor:
             self._world_tick_task = asyncio.create_task(self._world_tick_loop())
             print("GameManager: World tick loop started.")
@@ -611,9 +657,17 @@ class GameManager:
 
     async def _world_tick_loop(self) -> None:
         print(f"GameManager: Starting world tick loop with interval {self._tick_interval_seconds} seconds.")
+        loop = asyncio.get_running_loop()
+        # Тики идут с фиксированной частотой: если тик затянулся, следующий не сдвигается на время его выполнения,
+        # а пропущенные тики передаются в WorldSimulationProcessor (слияние или отбрасывание).
+        next_tick_at = loop.time() + self._tick_interval_seconds
         try:
             while True:
-                await asyncio.sleep(self._tick_interval_seconds)
+                await asyncio.sleep(max(0.0, next_tick_at - loop.time()))
+                missed_ticks = int((loop.time() - next_tick_at) // self._tick_interval_seconds) if self._tick_interval_seconds > 0 else 0
+                next_tick_at += self._tick_interval_seconds * (missed_ticks + 1)
+                if missed_ticks > 0 and self._world_simulation_processor:
+                    self._world_simulation_processor.note_missed_ticks(missed_ticks, self._tick_interval_seconds)
 
                 if self._world_simulation_processor:
                     try:
@@ -643,6 +697,8 @@ class GameManager:
                             'conflict_resolver': self.conflict_resolver,
                             'db_service': self.db_service, # Changed
                             'nlu_data_service': self.nlu_data_service,
+                            'global_state_cache': self.global_state_cache,
+                            'action_buffer': self.action_buffer,
                             'prompt_context_collector': self.prompt_context_collector,
                             'multilingual_prompt_generator': self.multilingual_prompt_generator,
                             'send_callback_factory': self._get_discord_send_callback,
@@ -658,18 +714,19 @@ class GameManager:
                         traceback.print_exc()
 
                 # --- Player Turn Processing (after WSP tick) ---
+                # Only characters that enqueued themselves since the last tick are looked at.
                 if self.turn_processing_service and self.character_manager:
-                    for guild_id_str in self._active_guild_ids: # Assuming _active_guild_ids holds strings
+                    for guild_id_str, ready_char_ids in self.turn_readiness_queue.take(REASON_ACTIONS).items():
                         try:
                             # Identify players ready for turn processing in this guild
-                            # get_all_characters is synchronous as per CharacterManager definition
-                            all_chars_in_guild = self.character_manager.get_all_characters(guild_id_str)
-
+                            # get_character is synchronous as per CharacterManager definition
                             players_with_actions: List[str] = []
-                            if all_chars_in_guild: # Ensure the list is not None or empty
-                                for char_obj in all_chars_in_guild:
-                                    if char_obj and char_obj.collected_actions_json: # Check if there are actions to process
-                                        players_with_actions.append(char_obj.id)
+                            for char_id in ready_char_ids:
+                                char_obj = self.character_manager.get_character(guild_id_str, char_id)
+                                if not char_obj: continue
+                                has_buffered = bool(self.action_buffer and self.action_buffer.has_actions(guild_id_str, char_obj.id))
+                                if has_buffered or char_obj.collected_actions_json: # Actions may have been drained by /end_turn meanwhile
+                                    players_with_actions.append(char_obj.id)
 
                             if players_with_actions:
                                 print(f"GameManager (Tick): Found {len(players_with_actions)} players with actions in guild {guild_id_str}. Processing turns...")
@@ -712,7 +769,7 @@ class GameManager:
                                                 )
 
                                             # DM Delivery
-                                            player_char_obj = await self.character_manager.get_character(guild_id_str, p_id)
+                                            player_char_obj = self.character_manager.get_character(guild_id_str, p_id)
                                             if player_char_obj and player_char_obj.discord_user_id:
                                                 try:
                                                     # Ensure discord_user_id is an int
@@ -774,6 +831,9 @@ class GameManager:
                         except Exception as tps_e:
                             print(f"GameManager (Tick): Error during TurnProcessingService call or subsequent handling for guild {guild_id_str}: {tps_e}")
                             traceback.print_exc()
+                            # Taken from the queue but not processed: retry on a later tick. A turn that failed before executing
+                            # anything has already put its drained actions back (TurnProcessingService.process_player_turns).
+                            self.turn_readiness_queue.retry_later(guild_id_str, ready_char_ids, REASON_ACTIONS)
                             if self.game_log_manager:
                                 await self.game_log_manager.log_event(
                                     guild_id=guild_id_str,
@@ -847,6 +907,8 @@ class GameManager:
                  print(f"GameManager: Error waiting for world tick task to complete after cancel: {e}")
                  traceback.print_exc()
 
+        if self.nlu_executor:
+            await self.nlu_executor.shutdown()
 
         if self._persistence_manager:
             try:
@@ -888,6 +950,19 @@ class GameManager:
                 print(f"GameManager: ❌ Error saving game state on shutdown: {e}")
                 traceback.print_exc()
 
+        if self.action_buffer:
+            try:
+                await self.action_buffer.shutdown()
+            except Exception as e:
+                print(f"GameManager: ❌ Error flushing collected actions on shutdown: {e}")
+                traceback.print_exc()
+
+        if self.game_log_manager:
+            try:
+                await self.game_log_manager.stop()
+            except Exception as e:
+                print(f"GameManager: ❌ Error draining game log queue on shutdown: {e}")
+                traceback.print_exc()
 
         if self.db_service: # Changed
             try:
@@ -1007,7 +1082,7 @@ class GameManager:
             success = await self.db_service.update_entity(
                 'rules_config',
                 DEFAULT_RULES_CONFIG_ID,
-                {'config_data': json.dumps(self._rules_config_cache)}
+                {'config_data': self._rules_config_cache}
             )
             if success:
                 print(f"GameManager: Default bot language successfully updated to '{language}' and saved.")
@@ -27,6 +27,7 @@ if TYPE_CHECKING:
     from bot.game.managers.crafting_manager import CraftingManager
     from bot.game.managers.game_log_manager import GameLogManager
     from bot.game.managers.inventory_manager import InventoryManager
+    from bot.services.nlu_data_service import NLUDataService
 
 from bot.game.models.item import Item
 from bot.utils.i18n_utils import get_i18n_text
@@ -70,6 +71,7 @@ class ItemManager:
         crafting_manager: Optional["CraftingManager"] = None,
         game_log_manager: Optional["GameLogManager"] = None,
         inventory_manager: Optional["InventoryManager"] = None,
+        nlu_data_service: Optional["NLUDataService"] = None,
     ):
         print("Initializing ItemManager...")
         self._db_service = db_service
@@ -85,12 +87,14 @@ class ItemManager:
         self._crafting_manager = crafting_manager
         self._game_log_manager = game_log_manager
         self._inventory_manager = inventory_manager
+        self._nlu_data_service = nlu_data_service
 
         self.rules_config: Optional[CoreGameRulesConfig] = None
         if self._rule_engine and hasattr(self._rule_engine, 'rules_config_data'):
             self.rules_config = self._rule_engine.rules_config_data
 
         self._item_templates = {}
+        self.templates_version = 0  # bumped on every template (re)load; PromptContextCollector stamps its cached fragments with it
         self._items = {}
         self._items_by_owner = {}
         self._items_by_location = {}
@@ -679,6 +683,7 @@ class ItemManager:
         # This would make get_item_template directly use the Pydantic models.
         # However, the existing get_item_template returns Dict[str, Any], not Pydantic model.
         # This suggests a potential mismatch or transitional state.
+        self.templates_version += 1
 
     def get_item_template(self, template_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -777,6 +782,7 @@ class ItemManager:
         }
         new_item = Item.from_dict(item_data_for_model)
         if not await self.save_item(new_item, guild_id_str): return None
+        self._notify_nlu_item_changed(guild_id_str, new_item.id, template_id_str)
         # self._update_lookup_caches_add(guild_id_str, new_item.to_dict()) # save_item should handle this
         if self._game_log_manager: asyncio.create_task(self._game_log_manager.log_event(guild_id=guild_id_str, event_type="ITEM_CREATED_WORLD", details={"item_id": new_item.id, "template_id": template_id_str, "location":location_id}))
         return new_item
@@ -800,6 +806,7 @@ class ItemManager:
         self._update_lookup_caches_remove(guild_id_str, item_to_remove.to_dict())
         self._dirty_items.get(guild_id_str, set()).discard(item_id_str)
         self._deleted_items.setdefault(guild_id_str, set()).add(item_id_str)
+        if self._nlu_data_service: self._nlu_data_service.remove_entity(guild_id_str, "item", item_id_str)
         # print(f"ItemManager.remove_item_instance: Item '{item_id_str}' removed from world.")
         return True
 
@@ -835,6 +842,7 @@ class ItemManager:
         # For now, let's assume save_item is called separately or by a background task.
         # Re-saving it here:
         await self.save_item(item_object, guild_id_str)
+        if 'template_id' in updates: self._notify_nlu_item_changed(guild_id_str, item_id_str, str(item_object.template_id))
 
         return True
 
@@ -844,7 +852,9 @@ class ItemManager:
         item_data.setdefault('guild_id', guild_id)
         if not item_id_to_recreate or self.get_item_instance(guild_id, item_id_to_recreate): return True
         newly_created_item_object = Item.from_dict(item_data)
-        return await self.save_item(newly_created_item_object, guild_id) # save_item also adds to cache
+        saved = await self.save_item(newly_created_item_object, guild_id) # save_item also adds to cache
+        if saved: self._notify_nlu_item_changed(str(guild_id), str(item_id_to_recreate), str(newly_created_item_object.template_id))
+        return saved
     async def revert_item_update(self, guild_id: str, item_id: str, old_field_values: Dict[str, Any], **kwargs: Any) -> bool: return await self.update_item_instance(guild_id, item_id, old_field_values, **kwargs)
     async def use_item_in_combat(self, guild_id: str, actor_id: str, item_instance_id: str, target_id: Optional[str] = None, game_log_manager: Optional['GameLogManager'] = None) -> Dict[str, Any]: return {"success": False, "consumed": False, "message": "Not implemented in detail."}
 
@@ -856,6 +866,12 @@ class ItemManager:
         self._items_by_location[guild_id_str] = {}
         # print(f"ItemManager: Cleared runtime cache for guild '{guild_id_str}'.")
 
+    def _notify_nlu_item_changed(self, guild_id: str, item_id: str, template_id: str) -> None:
+        """Pushes a created/re-templated item into the NLU entity cache (name comes from its template)."""
+        if not self._nlu_data_service: return
+        template = self.get_item_template(template_id) or {}
+        self._nlu_data_service.upsert_entity(guild_id, "item", item_id, template.get('name_i18n'))
+
     def mark_item_dirty(self, guild_id: str, item_id: str) -> None:
          if str(guild_id) in self._items and str(item_id) in self._items[str(guild_id)]:
              self._dirty_items.setdefault(str(guild_id), set()).add(str(item_id))
@@ -888,7 +904,7 @@ class ItemManager:
         db_params = (
             item_data['id'], item_data['template_id'], guild_id_str,
             item_data['owner_id'], item_data['owner_type'], item_data['location_id'],
-            float(item_data['quantity']), json.dumps(item_data['state_variables']),
+            float(item_data['quantity']), item_data['state_variables'],
             bool(item_data['is_temporary'])
         )
         upsert_sql = 'INSERT INTO items (id, template_id, guild_id, owner_id, owner_type, location_id, quantity, state_variables, is_temporary) VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9) ON CONFLICT (id) DO UPDATE SET template_id=EXCLUDED.template_id, owner_id=EXCLUDED.owner_id, owner_type=EXCLUDED.owner_type, location_id=EXCLUDED.location_id, quantity=EXCLUDED.quantity, state_variables=EXCLUDED.state_variables, is_temporary=EXCLUDED.is_temporary'
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 import json
+from bot.utils.json_codec import from_db_json
 from bot.game.models.party import Party
 from bot.game.models.location import Location
 import traceback
@@ -11,7 +12,7 @@ import uuid # uuid нужен для генерации ID инстансов
 
 # --- Базовые типы и TYPE_CHECKING ---
 # Set и другие типы нужны для аннотаций
-from typing import Optional, Dict, Any, List, Set, Callable, Awaitable, TYPE_CHECKING, Union
+from typing import Optional, Dict, Any, List, Set, Callable, Awaitable, TYPE_CHECKING, Union, Tuple
 
 # Import built-in types for isinstance checks
 from builtins import dict, set, list, str, int, bool, float # Added relevant builtins
@@ -34,6 +35,7 @@ if TYPE_CHECKING:
     from bot.game.event_processors.on_enter_action_executor import OnEnterActionExecutor
     from bot.game.event_processors.stage_description_generator import StageDescriptionGenerator
     from bot.ai.rules_schema import CoreGameRulesConfig # Added
+    from bot.services.nlu_data_service import NLUDataService
 
 
 # Define Callback Types
@@ -69,6 +71,7 @@ class LocationManager:
         event_action_processor: Optional["EventActionProcessor"] = None,
         on_enter_action_executor: Optional["OnEnterActionExecutor"] = None,
         stage_description_generator: Optional["StageDescriptionGenerator"] = None,
+        nlu_data_service: Optional["NLUDataService"] = None,
     ):
         print("Initializing LocationManager...")
         self._db_service = db_service
@@ -87,12 +90,14 @@ class LocationManager:
         self._event_action_processor = event_action_processor
         self._on_enter_action_executor = on_enter_action_executor
         self._stage_description_generator = stage_description_generator
+        self._nlu_data_service = nlu_data_service
 
         self.rules_config: Optional[CoreGameRulesConfig] = None
         if self._rule_engine and hasattr(self._rule_engine, 'rules_config_data'):
             self.rules_config = self._rule_engine.rules_config_data
 
         self._location_templates = {}
+        self.templates_version = 0  # bumped on every template (re)load; PromptContextCollector stamps its cached fragments with it
         self._location_instances = {}
         self._dirty_instances = {}
         self._deleted_instances = {}
@@ -104,6 +109,7 @@ class LocationManager:
         # ... (existing _load_location_templates logic - assuming it's correct) ...
         print("LocationManager: Loading global location templates...")
         self._location_templates = {}
+        self.templates_version += 1
         if self._settings and 'location_templates' in self._settings:
             templates_data = self._settings['location_templates']
             if isinstance(templates_data, dict):
@@ -147,11 +153,11 @@ class LocationManager:
                            if instance_id_raw is None or str(loaded_guild_id_raw) != guild_id_str: continue
                            instance_id = str(instance_id_raw); template_id = str(row['template_id']) if row['template_id'] is not None else None
                            name_i18n_json = row['name_i18n']; descriptions_i18n_json = row['descriptions_i18n']
-                           instance_name_i18n_dict = json.loads(name_i18n_json) if isinstance(name_i18n_json, str) else (name_i18n_json if isinstance(name_i18n_json, dict) else {})
-                           instance_descriptions_i18n_dict = json.loads(descriptions_i18n_json) if isinstance(descriptions_i18n_json, str) else (descriptions_i18n_json if isinstance(descriptions_i18n_json, dict) else {})
-                           instance_exits = json.loads(row['exits'] or '{}') if isinstance(row['exits'], (str, bytes)) else {}
+                           instance_name_i18n_dict = from_db_json(name_i18n_json, {})
+                           instance_descriptions_i18n_dict = from_db_json(descriptions_i18n_json, {})
+                           instance_exits = from_db_json(row['exits'], {})
                            # Ensure state_variables is always a dict, and inventory is a list within it
-                           instance_state_data = json.loads(row['state_variables'] or '{}') if isinstance(row['state_variables'], (str, bytes)) else {}
+                           instance_state_data = from_db_json(row['state_variables'], {})
                            if not isinstance(instance_state_data.get('inventory'), list): instance_state_data['inventory'] = []
 
                            is_active = row['is_active'] if 'is_active' in row.keys() else 0 # type: ignore
@@ -163,6 +169,8 @@ class LocationManager:
                       except Exception as e: print(f"LocationManager: Error processing instance row (ID: {row.get('id', 'N/A')}): {e}."); traceback.print_exc();
         except Exception as e: print(f"LocationManager: ❌ Error during DB instance load for guild {guild_id_str}: {e}"); traceback.print_exc(); raise
         print(f"LocationManager.load_state: Successfully loaded {loaded_instances_count} instances for guild {guild_id_str}.")
+        # The guild's location set was replaced wholesale; NLU names must be refetched.
+        if self._nlu_data_service: self._nlu_data_service.invalidate_cache(guild_id_str)
         if self._settings: # Check if _settings is not None
             guild_settings = self._settings.get('guilds', {}).get(guild_id_str, {})
             default_start_location_template_id = guild_settings.get('default_start_location_id', self._settings.get('default_start_location_id'))
@@ -172,6 +180,16 @@ class LocationManager:
         # ... (existing _ensure_persistent_location_exists logic - assuming it's correct) ...
         return None # Placeholder
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_instances.get(guild_id_str, ())), set(self._deleted_instances.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_instances.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_instances.setdefault(guild_id_str, set()).update(deleted_ids)
+
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
         # ... (existing save_state logic - assuming it's correct) ...
         pass
@@ -252,8 +270,40 @@ class LocationManager:
         return None
 
     async def move_entity(self, guild_id: str, entity_id: str, entity_type: str, from_location_id: Optional[str], to_location_id: str, **kwargs: Any) -> bool:
-        # ... (existing move_entity logic - assuming it's correct) ...
-        return False # Placeholder
+        """
+        Перемещает Character/NPC/Party. Само изменение локации делает менеджер сущности:
+        он же атомарно обновляет общий индекс занятости локаций.
+        """
+        guild_id_str = str(guild_id)
+        if not self.get_location_instance(guild_id_str, to_location_id):
+            print(f"LocationManager.move_entity: Target location {to_location_id} not found in guild {guild_id_str}.")
+            return False
+
+        context = {**kwargs, 'guild_id': guild_id_str}
+        if from_location_id:
+            await self.handle_entity_departure(from_location_id, entity_id, entity_type, **context)
+
+        moved = False
+        if entity_type == 'Character':
+            character_manager = kwargs.get('character_manager', self._character_manager)
+            if character_manager:
+                moved = await character_manager.update_character_location(entity_id, to_location_id, guild_id_str, context=context) is not None
+        elif entity_type == 'NPC':
+            npc_manager = kwargs.get('npc_manager', self._npc_manager)
+            if npc_manager:
+                moved = await npc_manager.update_npc_location(guild_id_str, entity_id, to_location_id) is not None
+        elif entity_type == 'Party':
+            party_manager = kwargs.get('party_manager', self._party_manager)
+            if party_manager:
+                moved = await party_manager.update_party_location(entity_id, to_location_id, guild_id_str, context=context)
+        else:
+            print(f"LocationManager.move_entity: Unsupported entity type '{entity_type}'.")
+        if not moved:
+            print(f"LocationManager.move_entity: Failed to move {entity_type} {entity_id} to {to_location_id} in guild {guild_id_str}.")
+            return False
+
+        await self.handle_entity_arrival(to_location_id, entity_id, entity_type, **context)
+        return True
 
     async def handle_entity_arrival(self, location_id: str, entity_id: str, entity_type: str, **kwargs: Any) -> None:
         # ... (existing handle_entity_arrival logic - assuming it's correct) ...
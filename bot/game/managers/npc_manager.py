@@ -5,9 +5,12 @@ import json
 import uuid
 import traceback
 import asyncio
-from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable, Awaitable, Union
+from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable, Awaitable, Union, Tuple
 
 from bot.game.models.npc import NPC
+from bot.game.utils.location_occupancy import LocationOccupancyIndex, NPCS
+from bot.game.utils.stats_calculator import EffectiveStatsCache
+from bot.utils.json_codec import RawJSON
 from builtins import dict, set, list, int, float, str, bool
 
 
@@ -27,6 +30,7 @@ if TYPE_CHECKING:
     from bot.services.openai_service import OpenAIService
     from bot.ai.ai_response_validator import AIResponseValidator
     from bot.services.notification_service import NotificationService
+    from bot.services.nlu_data_service import NLUDataService
 
 print("DEBUG: npc_manager.py module loaded.")
 
@@ -58,13 +62,17 @@ class NpcManager:
         openai_service: Optional["OpenAIService"] = None,
         ai_validator: Optional["AIResponseValidator"] = None,
         campaign_loader: Optional["CampaignLoader"] = None,
-        notification_service: Optional["NotificationService"] = None
+        notification_service: Optional["NotificationService"] = None,
+        nlu_data_service: Optional["NLUDataService"] = None,
+        occupancy_index: Optional[LocationOccupancyIndex] = None,
+        stats_cache: Optional[EffectiveStatsCache] = None
     ):
         print("Initializing NpcManager...")
         self._db_service = db_service
         self._settings = settings
         self._campaign_loader = campaign_loader
         self._npc_archetypes = {}
+        self.templates_version = 0  # bumped on every template (re)load; PromptContextCollector stamps its cached fragments with it
         self._item_manager = item_manager
         self._status_manager = status_manager
         self._party_manager = party_manager
@@ -78,6 +86,9 @@ class NpcManager:
         self._openai_service = openai_service
         self._ai_validator = ai_validator
         self._notification_service = notification_service
+        self._nlu_data_service = nlu_data_service
+        self._occupancy = occupancy_index or LocationOccupancyIndex()
+        self._stats_cache = stats_cache or EffectiveStatsCache()
         self._npcs = {}
         self._entities_with_active_action = {}
         self._dirty_npcs = {}
@@ -106,10 +117,9 @@ class NpcManager:
             setattr(npc_model, 'effective_stats_json', "{}")
             return
 
-        from bot.game.utils import stats_calculator # Local import
         try:
             rules_config = self._rule_engine.rules_config_data
-            effective_stats_dict = await stats_calculator.calculate_effective_stats(
+            effective_stats_dict = await self._stats_cache.get_effective_stats(
                 db_service=self._db_service, guild_id=guild_id, entity_id=npc_id,
                 entity_type="NPC", rules_config_data=rules_config,
                 character_manager=self._character_manager, npc_manager=self,
@@ -134,7 +144,7 @@ class NpcManager:
 
     def _load_npc_archetypes(self):
         # ... (original logic) ...
-        pass
+        self.templates_version += 1
 
     def get_npc(self, guild_id: str, npc_id: str) -> Optional["NPC"]:
         guild_id_str = str(guild_id); guild_npcs = self._npcs.get(guild_id_str)
@@ -147,13 +157,17 @@ class NpcManager:
         return []
 
     def get_npcs_in_location(self, guild_id: str, location_id: str, **kwargs: Any) -> List["NPC"]:
-        guild_id_str = str(guild_id); location_id_str = str(location_id)
-        npcs_in_location = []; guild_npcs = self._npcs.get(guild_id_str)
-        if guild_npcs:
-             for npc in guild_npcs.values():
-                 if isinstance(npc, NPC) and hasattr(npc, 'location_id') and str(getattr(npc, 'location_id', None)) == location_id_str:
-                      npcs_in_location.append(npc)
-        return npcs_in_location
+        guild_npcs = self._npcs.get(str(guild_id), {})
+        return [npc for npc_id in self._occupancy.occupants(guild_id, location_id, NPCS) if (npc := guild_npcs.get(npc_id)) is not None]
+
+    async def update_npc_location(self, guild_id: str, npc_id: str, location_id: Optional[str], **kwargs: Any) -> Optional["NPC"]:
+        """Moves a cached NPC and keeps the shared occupancy index in sync."""
+        npc = self.get_npc(guild_id, npc_id)
+        if not npc: return None
+        npc.location_id = str(location_id) if location_id else None
+        self._occupancy.place(guild_id, NPCS, npc.id, npc.location_id)
+        self.mark_npc_dirty(guild_id, npc_id)
+        return npc
 
     def get_entities_with_active_action(self, guild_id: str) -> Set[str]:
         return self._entities_with_active_action.get(str(guild_id), set()).copy()
@@ -212,8 +226,10 @@ class NpcManager:
             setattr(npc, 'effective_stats_json', data_for_npc_object.get('effective_stats_json', '{}'))
 
             self._npcs.setdefault(guild_id_str, {})[npc_id] = npc
+            self._occupancy.place(guild_id_str, NPCS, npc_id, npc.location_id)
             await self._recalculate_and_store_effective_stats(guild_id_str, npc.id, npc)
             self.mark_npc_dirty(guild_id_str, npc_id)
+            self._notify_nlu_npc_changed(guild_id_str, npc)
             return npc_id
         except Exception as e:
             print(f"NpcManager: Error creating NPC (non-AI path) '{npc_template_id}': {e}"); traceback.print_exc()
@@ -286,12 +302,15 @@ class NpcManager:
                     stat_name = key.split("stats.", 1)[1]
                     if not hasattr(npc, 'stats') or not isinstance(npc.stats, dict): npc.stats = {}
                     if npc.stats.get(stat_name) != value: npc.stats[stat_name] = value; health_or_direct_stats_changed = True; updated_fields.append(key)
+                elif key == "location_id":
+                     if npc.location_id != value: await self.update_npc_location(str(guild_id), npc_id, value); updated_fields.append(key)
                 elif hasattr(npc, key):
                      if getattr(npc,key) != value: setattr(npc,key,value); health_or_direct_stats_changed = True; updated_fields.append(key)
                 else: continue
             except Exception: pass
         if updated_fields:
             self.mark_npc_dirty(str(guild_id), npc_id)
+            if "name_i18n" in updated_fields: self._notify_nlu_npc_changed(str(guild_id), npc)
             if health_or_direct_stats_changed:
                 await self._recalculate_and_store_effective_stats(str(guild_id), npc_id, npc)
             # ... (logging) ...
@@ -309,13 +328,13 @@ class NpcManager:
             npc_data = npc.to_dict()
             target_table = 'generated_npcs' if getattr(npc, 'is_ai_generated', False) else 'npcs'
             eff_stats_json = getattr(npc, 'effective_stats_json', '{}')
-            if not isinstance(eff_stats_json, str): eff_stats_json = json.dumps(eff_stats_json or {})
+            eff_stats_json = RawJSON(eff_stats_json) if isinstance(eff_stats_json, str) else eff_stats_json or {}
 
             if target_table == 'generated_npcs':
                 db_params = (
-                    str(npc_id), json.dumps(npc_data.get('name_i18n', {})),
-                    json.dumps(npc_data.get('description_i18n', {})), json.dumps(npc_data.get('backstory_i18n', {})),
-                    json.dumps(npc_data.get('persona_i18n', {})), eff_stats_json
+                    str(npc_id), npc_data.get('name_i18n', {}),
+                    npc_data.get('description_i18n', {}), npc_data.get('backstory_i18n', {}),
+                    npc_data.get('persona_i18n', {}), eff_stats_json
                 )
                 upsert_sql = """
                 INSERT INTO generated_npcs (id, name_i18n, description_i18n, backstory_i18n, persona_i18n, effective_stats_json)
@@ -325,17 +344,17 @@ class NpcManager:
                     effective_stats_json = EXCLUDED.effective_stats_json;"""
             else:
                 db_params = (
-                    str(npc_id), str(npc_data.get('template_id')), json.dumps(npc_data.get('name_i18n', {})),
-                    json.dumps(npc_data.get('description_i18n', {})), json.dumps(npc_data.get('backstory_i18n', {})),
-                    json.dumps(npc_data.get('persona_i18n', {})), guild_id_str, str(npc_data.get('location_id')),
-                    json.dumps(npc_data.get('stats', {})), json.dumps(npc_data.get('inventory', [])),
-                    json.dumps(npc_data.get('current_action')), json.dumps(npc_data.get('action_queue', [])),
-                    str(npc_data.get('party_id')), json.dumps(npc_data.get('state_variables', {})),
+                    str(npc_id), str(npc_data.get('template_id')), npc_data.get('name_i18n', {}),
+                    npc_data.get('description_i18n', {}), npc_data.get('backstory_i18n', {}),
+                    npc_data.get('persona_i18n', {}), guild_id_str, str(npc_data.get('location_id')),
+                    npc_data.get('stats', {}), npc_data.get('inventory', []),
+                    json.dumps(npc_data.get('current_action')), npc_data.get('action_queue', []),
+                    str(npc_data.get('party_id')), npc_data.get('state_variables', {}),
                     float(npc_data.get('health',0.0)), float(npc_data.get('max_health',0.0)),
-                    bool(npc_data.get('is_alive',False)), json.dumps(npc_data.get('status_effects', [])),
+                    bool(npc_data.get('is_alive',False)), npc_data.get('status_effects', []),
                     bool(npc_data.get('is_temporary',False)), npc_data.get('archetype', "commoner"),
-                    json.dumps(npc_data.get('traits', [])), json.dumps(npc_data.get('desires', [])),
-                    json.dumps(npc_data.get('motives', [])), eff_stats_json
+                    npc_data.get('traits', []), npc_data.get('desires', []),
+                    npc_data.get('motives', []), eff_stats_json
                 )
                 upsert_sql = """
                 INSERT INTO npcs (
@@ -358,6 +377,7 @@ class NpcManager:
                 self._dirty_npcs[guild_id_str].discard(npc_id)
                 if not self._dirty_npcs[guild_id_str]: del self._dirty_npcs[guild_id_str]
             self._npcs.setdefault(guild_id_str, {})[npc_id] = npc
+            self._occupancy.place(guild_id_str, NPCS, npc_id, getattr(npc, 'location_id', None))
             return True
         except Exception as e: print(f"Error saving NPC {npc_id}: {e}"); traceback.print_exc(); return False
 
@@ -390,11 +410,19 @@ class NpcManager:
             setattr(npc, 'is_ai_generated', True) # Mark as AI-originated
             setattr(npc, 'effective_stats_json', data_for_npc_object.get('effective_stats_json', '{}'))
             self._npcs.setdefault(guild_id_str, {})[npc.id] = npc
+            self._occupancy.place(guild_id_str, NPCS, npc.id, npc.location_id)
             await self._recalculate_and_store_effective_stats(guild_id_str, npc.id, npc) # Recalculate properly
             self.mark_npc_dirty(guild_id_str, npc.id) # This will ensure it's saved via save_npc to generated_npcs
+            self._notify_nlu_npc_changed(guild_id_str, npc)
             return npc.id
         except Exception as e: print(f"Error creating NPC from moderated data: {e}"); traceback.print_exc(); return None
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        return set(self._dirty_npcs.get(str(guild_id), ())), set(self._deleted_npc_ids.get(str(guild_id), ()))
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_npcs.setdefault(str(guild_id), set()).update(dirty_ids)
+        if deleted_ids: self._deleted_npc_ids.setdefault(str(guild_id), set()).update(deleted_ids)
     async def save_state(self, guild_id: str, **kwargs: Any) -> None: pass # Placeholder, relies on save_npc
     async def load_state(self, guild_id: str, **kwargs: Any) -> None: # Placeholder, needs full logic
         # ... (Ensure SQL for 'npcs' and 'generated_npcs' includes 'effective_stats_json') ...
@@ -402,6 +430,11 @@ class NpcManager:
         # ... (Ensure setattr(npc, 'effective_stats_json', data.get('effective_stats_json','{}')) is done after NPC.from_dict) ...
         pass
     async def rebuild_runtime_caches(self, guild_id: str, **kwargs: Any) -> None: pass
+    def _notify_nlu_npc_changed(self, guild_id: str, npc: "NPC") -> None:
+        """Pushes a created/renamed NPC name into the NLU entity cache."""
+        if not self._nlu_data_service: return
+        entity_type = "generated_npc" if getattr(npc, 'is_ai_generated', False) else "npc"
+        self._nlu_data_service.upsert_entity(guild_id, entity_type, npc.id, getattr(npc, 'name_i18n', None))
     def mark_npc_dirty(self, guild_id: str, npc_id: str) -> None:
          if str(guild_id) in self._npcs and npc_id in self._npcs[str(guild_id)]:
               self._dirty_npcs.setdefault(str(guild_id), set()).add(npc_id)
@@ -410,7 +443,8 @@ class NpcManager:
     def get_next_action_from_queue(self, guild_id: str, npc_id: str) -> Optional[Dict[str, Any]]: return None
     async def revert_npc_spawn(self, guild_id: str, npc_id: str, **kwargs: Any) -> bool: return True
     async def recreate_npc_from_data(self, guild_id: str, npc_data: Dict[str, Any], **kwargs: Any) -> bool: return True
-    async def revert_npc_location_change(self, guild_id: str, npc_id: str, old_location_id: Optional[str], **kwargs: Any) -> bool: return True
+    async def revert_npc_location_change(self, guild_id: str, npc_id: str, old_location_id: Optional[str], **kwargs: Any) -> bool:
+        return await self.update_npc_location(guild_id, npc_id, old_location_id) is not None
     async def revert_npc_hp_change(self, guild_id: str, npc_id: str, old_hp: float, old_is_alive: bool, **kwargs: Any) -> bool: return True
     async def revert_npc_stat_changes(self, guild_id: str, npc_id: str, stat_changes: List[Dict[str, Any]], **kwargs: Any) -> bool: return True
     async def revert_npc_inventory_changes(self, guild_id: str, npc_id: str, inventory_changes: List[Dict[str, Any]], **kwargs: Any) -> bool: return True
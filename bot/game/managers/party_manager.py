@@ -7,8 +7,9 @@ import traceback
 import asyncio
 # Импорт базовых типов
 # ИСПРАВЛЕНИЕ: Импортируем Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable
-# ИСПРАВЛЕНИЕ: Tuple не нужен, если не используется явно
-from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable
+from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable, Tuple
+
+from bot.game.utils.location_occupancy import LocationOccupancyIndex, PARTIES
 
 
 # --- Imports needed ONLY for Type Checking ---
@@ -19,6 +20,7 @@ from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Callable
 if TYPE_CHECKING:
     # Добавляем адаптер БД
     from bot.services.db_service import DBService # Changed
+    from bot.services.action_buffer import ActionBuffer
     # Добавляем модели, используемые в аннотациях
     from bot.game.models.party import Party # Аннотируем как "Party"
     from bot.game.models.character import Character # Для clean_up_for_entity, rebuild_runtime_caches context
@@ -49,6 +51,7 @@ if TYPE_CHECKING:
 # --- Imports needed at Runtime ---
 # Для PartyManager обычно нужен только прямой импорт модели Party (для Party.from_dict) и утилит.
 # ВАЖНО: Прямой импорт Party НЕОБХОДИМ для Party.from_dict() при runtime
+from bot.utils.json_codec import from_db_json, raw_json
 from bot.game.models.party import Party # <--- Прямой импорт Party
 # Import dict for isinstance checks at runtime
 # ИСПРАВЛЕНИЕ: Добавляем import dict для isinstance проверки
@@ -94,6 +97,7 @@ class PartyManager:
                  npc_manager: Optional["NpcManager"] = None,
                  character_manager: Optional["CharacterManager"] = None,
                  combat_manager: Optional["CombatManager"] = None,
+                 occupancy_index: Optional[LocationOccupancyIndex] = None,
                  # event_manager: Optional["EventManager"] = None,  # если нужен
                  # dialogue_manager: Optional["DialogueManager"] = None, # если Party может быть в диалоге
                 ):
@@ -105,6 +109,10 @@ class PartyManager:
         self._npc_manager = npc_manager
         self._character_manager = character_manager
         self._combat_manager = combat_manager
+        # Общий индекс "кто в какой локации" (см. GameManager); партии хранятся по current_location_id.
+        self._occupancy = occupancy_index or LocationOccupancyIndex()
+        # Буфер собранных действий (назначается GameManager); старые collected_actions_json тоже читаются.
+        self._action_buffer: Optional["ActionBuffer"] = None
         # self._event_manager = event_manager
         # self._dialogue_manager = dialogue_manager
 
@@ -146,6 +154,11 @@ class PartyManager:
              return list(guild_parties.values())
         return [] # Возвращаем пустой список, если для гильдии нет партий
 
+    def get_parties_in_location(self, guild_id: str, location_id: str) -> List["Party"]:
+        """Партии, находящиеся в локации (по индексу занятости, без перебора всех партий гильдии)."""
+        guild_parties = self._parties.get(str(guild_id), {})
+        return [party for party_id in self._occupancy.occupants(guild_id, location_id, PARTIES) if (party := guild_parties.get(party_id)) is not None]
+
 
     # ИСПРАВЛЕНИЕ: Реализация get_party_by_member_id
     async def get_party_by_member_id(self, guild_id: str, entity_id: str, **kwargs: Any) -> Optional["Party"]: # Changed order to guild_id first
@@ -276,6 +289,7 @@ class PartyManager:
 
             # ИСПРАВЛЕНИЕ: Добавляем в per-guild кеш
             self._parties.setdefault(guild_id_str, {})[new_id] = party
+            self._occupancy.place(guild_id_str, PARTIES, new_id, current_location_id)
 
             # ИСПРАВЛЕНИЕ: Обновляем _member_to_party_map для этой гильдии
             guild_member_map = self._member_to_party_map.setdefault(guild_id_str, {})
@@ -409,6 +423,7 @@ class PartyManager:
         guild_parties = self._parties.get(guild_id_str)
         if guild_parties:
              guild_parties.pop(party_id_str, None) # Remove from per-guild cache
+        self._occupancy.remove(guild_id_str, PARTIES, party_id_str)
 
 
         # Убираем из dirty set, если там была (удален -> не dirty anymore for upsert)
@@ -452,6 +467,7 @@ class PartyManager:
 
         # Update the party's current_location_id
         party.current_location_id = resolved_new_location_id # type: ignore # Мы знаем, что атрибут существует
+        self._occupancy.place(guild_id_str, PARTIES, party_id, resolved_new_location_id)
         self.mark_party_dirty(guild_id_str, party_id)
 
         print(f"PartyManager: Party {party_id} in guild {guild_id_str} location updated to {resolved_new_location_id}. Context: {context}")
@@ -462,6 +478,16 @@ class PartyManager:
     # These methods should work per-guild
     # required_args_for_load, required_args_for_save, required_args_for_rebuild уже определены как атрибуты класса
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_parties.get(guild_id_str, ())), set(self._deleted_parties.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_parties.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_parties.setdefault(guild_id_str, set()).update(deleted_ids)
+
     # save_state(guild_id, **kwargs) - called by PersistenceManager
     # Needs to save ACTIVE parties for the specific guild, AND delete marked-for-deletion ones.
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
@@ -589,19 +615,18 @@ class PartyManager:
                                print(f"PartyManager: Warning: Party {party_id} ('{getattr(party, 'name', party_id)}') (guild {guild_id_str}) player_ids_list is not a list during upsert prep ({type(member_ids_list)}). Saving as empty list.")
                                member_ids_list = []
 
-                           player_ids_json = json.dumps(member_ids_list) # Save player_ids_list as JSON string
-                           state_variables_json = json.dumps(state_variables)
+                           # current_action is a VARCHAR column holding JSON text; the JSON columns take the objects.
                            current_action_json = json.dumps(current_action) if current_action is not None else None
 
                            data_to_upsert.append((
                                str(party_id),
                                guild_id_str,
-                                json.dumps(name_i18n_dict), # Save i18n name as JSON
+                                name_i18n_dict, # Save i18n name as JSON
                                str(leader_id) if leader_id is not None else None,
-                               player_ids_json, # This is the 'player_ids' column in DB
+                               member_ids_list, # This is the 'player_ids' column in DB
                                current_location_id,
                                turn_status,
-                               state_variables_json,
+                               state_variables,
                                current_action_json,
                            ))
                            upserted_party_ids.add(str(party_id))
@@ -648,6 +673,7 @@ class PartyManager:
         # ИСПРАВЛЕНИЕ: Очистите кеш партий ТОЛЬКО для этой гильдии
         self._parties.pop(guild_id_str, None)
         self._parties[guild_id_str] = {} # Создаем пустой кеш для этой гильдии
+        self._occupancy.clear(guild_id_str, PARTIES)
 
         # ИСПРАВЛЕНИЕ: Очищаем dirty и deleted сеты ТОЛЬКО для этой гильдии при загрузке
         self._dirty_parties.pop(guild_id_str, None)
@@ -687,20 +713,20 @@ class PartyManager:
 
                   # Parse JSON fields, handle None/malformed data gracefully
                   try:
-                      data['member_ids'] = json.loads(data.get('member_ids') or '[]') if isinstance(data.get('member_ids'), (str, bytes)) else []
+                      data['member_ids'] = from_db_json(data.get('member_ids'), [])
                   except (json.JSONDecodeError, TypeError):
                       print(f"PartyManager: Warning: Failed to parse member_ids for party {party_id}. Setting to []. Data: {data.get('member_ids')}")
                       data['member_ids'] = []
 
                   try:
-                      data['state_variables'] = json.loads(data.get('state_variables') or '{}') if isinstance(data.get('state_variables'), (str, bytes)) else {}
+                      data['state_variables'] = from_db_json(data.get('state_variables'), {})
                   except (json.JSONDecodeError, TypeError):
                       print(f"PartyManager: Warning: Failed to parse state_variables for party {party_id}. Setting to {{}}. Data: {data.get('state_variables')}")
                       data['state_variables'] = {}
 
                   try:
                       current_action_data = data.get('current_action')
-                      data['current_action'] = json.loads(current_action_data) if isinstance(current_action_data, (str, bytes)) else None
+                      data['current_action'] = from_db_json(current_action_data, text=True)
                   except (json.JSONDecodeError, TypeError):
                        print(f"PartyManager: Warning: Failed to parse current_action for party {party_id}. Setting to None. Data: {data.get('current_action')}")
                        data['current_action'] = None
@@ -744,6 +770,7 @@ class PartyManager:
 
                   # 4. Добавьте объект Party в per-guild кеш
                   guild_parties_cache[party.id] = party
+                  self._occupancy.place(guild_id_str, PARTIES, party.id, party.current_location_id)
 
                   loaded_count += 1
 
@@ -1044,14 +1071,15 @@ class PartyManager:
             for member_char in ready_members_in_location:
                 actions_json_str = member_char.collected_actions_json
                 member_actions_this_turn: List[Dict[str, Any]] = []
+                if self._action_buffer:
+                    member_actions_this_turn = [a.to_dict() for a in self._action_buffer.drain(guild_id, member_char.id)]
                 if actions_json_str:
                     try:
-                        member_actions_this_turn = json.loads(actions_json_str)
-                        if not isinstance(member_actions_this_turn, list):
-                            member_actions_this_turn = []
+                        legacy_actions = json.loads(actions_json_str)
+                        if isinstance(legacy_actions, list):
+                            member_actions_this_turn = legacy_actions + member_actions_this_turn
                     except json.JSONDecodeError:
                         print(f"PartyManager: Could not parse collected_actions_json for char {member_char.id}: {actions_json_str}")
-                        member_actions_this_turn = []
 
                 for i, action_data in enumerate(member_actions_this_turn):
                     if isinstance(action_data, dict): # Ensure action_data is a dict
@@ -1439,6 +1467,7 @@ class PartyManager:
             # If it's missing, it's a model inconsistency.
 
         party.current_location_id = old_location_id
+        self._occupancy.place(guild_id, PARTIES, party_id, old_location_id)
         self.mark_party_dirty(guild_id, party_id)
         print(f"PartyManager.revert_party_location_change: Reverted location for party {party_id} to {old_location_id} in guild {guild_id}.")
         return True
@@ -1502,13 +1531,13 @@ class PartyManager:
             db_params = (
                 party_data.get('id'),
                 guild_id_str, # Explicitly use the provided guild_id
-                json.dumps(party_data.get('name_i18n', {})), # Save i18n name as JSON
+                party_data.get('name_i18n', {}), # Save i18n name as JSON
                 party_data.get('leader_id'),
-                party_data.get('player_ids'), # This is already a JSON string from party.to_dict()
+                raw_json(party_data.get('player_ids')), # This is already a JSON string from party.to_dict()
                 party_data.get('current_location_id'),
                 party_data.get('turn_status'),
-                json.dumps(final_state_variables),
-                json.dumps(party_data.get('current_action')) # Can be None
+                final_state_variables,
+                json.dumps(party_data.get('current_action')) # VARCHAR column, JSON text. Can be None
             )
 
             upsert_sql = '''
@@ -1539,6 +1568,7 @@ class PartyManager:
             # PartyManager cache _parties stores Party objects.
             # Ensure the cached object is the one that was passed and now saved.
             self._parties.setdefault(guild_id_str, {})[party_id] = party
+            self._occupancy.place(guild_id_str, PARTIES, party_id, getattr(party, 'current_location_id', None))
 
             # Also, update the _member_to_party_map if members changed.
             # This requires comparing old vs new state or just rebuilding for this party.
@@ -12,10 +12,12 @@ from typing import Union, Tuple # Добавлен импорт Tuple
 # Импорт async (используется в методах ниже)
 import asyncio
 import traceback # Для вывода трассировки ошибок
+from contextlib import nullcontext
 
 # TODO: Импорт адаптера базы данных - используем наш конкретный SQLite адаптер
 # ИСПРАВЛЕНИЕ: Импортируем напрямую, так как используется в аннотациях БЕЗ строковых литералов
 from bot.services.db_service import DBService # Changed
+from bot.utils.tick_profiler import TICK_PROFILER
 
 
 # Импорт ВСЕХ менеджеров, которые этот менеджер будет координировать для сохранения/загрузки.
@@ -47,6 +49,7 @@ if TYPE_CHECKING:
     from bot.game.managers.dialogue_manager import DialogueManager
     from bot.game.managers.skill_manager import SkillManager # Added SkillManager
     from bot.game.managers.spell_manager import SpellManager # Added SpellManager
+    from bot.services.action_buffer import ActionBuffer
 
 
     # Определяем типы Callable для Type Checking, если они используются для аннотаций зависимостей-Callable
@@ -93,6 +96,7 @@ class PersistenceManager:
                  dialogue_manager: Optional["DialogueManager"] = None, # Use string literal!
                  skill_manager: Optional["SkillManager"] = None, # Added skill_manager
                  spell_manager: Optional["SpellManager"] = None, # Added spell_manager
+                 action_buffer: Optional["ActionBuffer"] = None, # Буфер собранных действий игроков
                  # TODO: Добавьте другие менеджеры
                 ):
         print("Initializing PersistenceManager...")
@@ -121,6 +125,7 @@ class PersistenceManager:
         self._dialogue_manager: Optional["DialogueManager"] = dialogue_manager
         self._skill_manager: Optional["SkillManager"] = skill_manager # Assigned to instance
         self._spell_manager: Optional["SpellManager"] = spell_manager # Assigned to instance
+        self._action_buffer: Optional["ActionBuffer"] = action_buffer
         # TODO: Сохраните другие менеджеры
 
 
@@ -140,7 +145,11 @@ class PersistenceManager:
             return
 
         print(f"PersistenceManager: Initiating game state save for {len(guild_ids)} guilds...")
+        # Сохранение одной гильдии учитывается в ее гистограмме, пакетное - в глобальной.
+        with TICK_PROFILER.measure('persistence.save_game_state', guild_ids[0] if len(guild_ids) == 1 else None):
+            await self._save_game_state(guild_ids, **kwargs)
 
+    async def _save_game_state(self, guild_ids: List[str], **kwargs: Any) -> None:
         # Передаем менеджеры и контекст в kwargs для _call_manager_save
         call_kwargs = {**kwargs} # Копируем входящие kwargs
 
@@ -153,27 +162,30 @@ class PersistenceManager:
 
         else:
             print("PersistenceManager: Database adapter found, attempting to save via managers.")
-            # При использовании execute/execute_many с авто-коммитом в SqliteAdapter,
-            # нет необходимости в явной общей транзакции здесь.
-            # Каждый менеджер отвечает за атомарность своих операций.
-            # Если нужна одна большая атомарная транзакция для ВСЕГО сохранения,
-            # нужно убрать авто-коммит из execute/execute_many в SqliteAdapter
-            # и использовать async with self._db_adapter: или async with self._db_adapter.cursor():
-            # и явный commit/rollback здесь.
-            # Для простоты текущей схемы, полагаемся на авто-коммит по операциям менеджеров.
+            # Все менеджеры гильдии пишут через одно закрепленное соединение в одной транзакции
+            # (пакетные bulk_upsert/bulk_delete), поэтому гильдия фиксируется одним COMMIT.
+            # Каждый менеджер дополнительно обернут в savepoint (см. _call_manager_save),
+            # так что ошибка одного менеджера откатывает только его изменения.
 
             try:
                 # Вызываем методы сохранения для каждого менеджера и каждой гильдии
                 for guild_id in guild_ids:
-                    await self._call_manager_save(guild_id, **call_kwargs) # Передаем guild_id и kwargs
+                    pending_restores: List[Callable[[], None]] = []
+                    try:
+                        async with self._db_service.unit_of_work(transactional=True):
+                            await self._call_manager_save(guild_id, pending_restores=pending_restores, **call_kwargs) # Передаем guild_id и kwargs
+                    except Exception:
+                        # COMMIT гильдии не прошел: менеджеры уже забыли записанные id, возвращаем их.
+                        for restore in pending_restores:
+                            restore()
+                        raise
 
                 # Если все вызовы _call_manager_save завершились без проброса исключения,
                 # считаем сохранение успешным на уровне делегирования.
-                print("PersistenceManager: ✅ Game state save delegation finished (individual managers handle commit).")
+                print("PersistenceManager: ✅ Game state save finished (one transaction per guild).")
 
             except Exception as e:
                 print(f"PersistenceManager: ❌ Error during game state save delegation via managers: {e}")
-                # Логируем ошибку, но не пытаемся откатывать общую транзакцию, т.к. ее нет в текущей схеме.
                 import traceback
                 print(traceback.format_exc())
                 # TODO: Добавить логику обработки ошибок сохранения (оповещение GM, попытки повтора?)
@@ -182,8 +194,12 @@ class PersistenceManager:
 
     # Вспомогательный метод для вызова save_state у всех менеджеров для одной гильдии
     # ИСПРАВЛЕНО: Сигнатура соответствует вызову
-    async def _call_manager_save(self, guild_id: str, **kwargs: Any) -> None:
-         """Вызывает save_state у каждого менеджера, который поддерживает персистентность, для одной гильдии."""
+    async def _call_manager_save(self, guild_id: str, pending_restores: Optional[List[Callable[[], None]]] = None, **kwargs: Any) -> None:
+         """
+         Вызывает save_state у каждого менеджера, который поддерживает персистентность, для одной гильдии.
+         pending_restores получает по функции на менеджер, восстанавливающей его dirty/deleted наборы,
+         если транзакция гильдии не будет зафиксирована.
+         """
          # Передаем guild_id и kwargs дальше менеджерам
          call_kwargs = {'guild_id': guild_id, **kwargs}
 
@@ -206,6 +222,7 @@ class PersistenceManager:
              (self._dialogue_manager, 'save_state'),
              (self._skill_manager, 'save_state'), # Added to save list
              (self._spell_manager, 'save_state'), # Added to save list
+             (self._action_buffer, 'save_state'), # Пакетная запись накопленных действий
              # TODO: Добавьте другие менеджеры здесь
          ]
 
@@ -216,7 +233,12 @@ class PersistenceManager:
                    try:
                        # Менеджер сам внутри должен игнорировать ненужные kwargs или рейзить ошибку, если mandatory args не переданы.
                        # Передаем словарь аргументов через **call_kwargs.
-                       await getattr(manager, method_name)(**call_kwargs)
+                       restore = self._pending_save_restorer(manager, str(guild_id))
+                       if pending_restores is not None:
+                           pending_restores.append(restore)
+                       with TICK_PROFILER.measure(f"persistence.save.{type(manager).__name__}", guild_id):
+                            async with self._manager_save_scope(on_rollback=restore):
+                                 await getattr(manager, method_name)(**call_kwargs)
                    except Exception as e:
                        print(f"PersistenceManager: ❌ Error saving state for guild {guild_id} in manager {type(manager).__name__}: {e}")
                        # Не пробрасываем здесь, чтобы не остановить сохранение других менеджеров/гильдий.
@@ -228,6 +250,24 @@ class PersistenceManager:
               #     print(f"PersistenceManager: Info: Optional manager {type(manager_attr).__name__} is None. Skipping save for guild {guild_id}.")
 
 
+    def _manager_save_scope(self, on_rollback: Optional[Callable[[], None]] = None):
+        """Savepoint вокруг save_state одного менеджера внутри транзакции гильдии (без БД - пустой контекст)."""
+        if self._db_service is None or self._db_service.adapter is None:
+            return nullcontext()
+        return self._db_service.savepoint(on_rollback=on_rollback)
+
+    @staticmethod
+    def _pending_save_restorer(manager: Any, guild_id: str) -> Callable[[], None]:
+        """
+        Снимок ожидающих записи id менеджера до save_state. save_state очищает их сразу после
+        успешного оператора, а savepoint или COMMIT гильдии могут затем откатиться.
+        Восстановление - объединение со снимком, поэтому повторный вызов безопасен.
+        Каждый сохраняемый менеджер обязан реализовать snapshot_pending_save/restore_pending_save.
+        """
+        snapshot = manager.snapshot_pending_save(guild_id)
+        return lambda: manager.restore_pending_save(guild_id, snapshot)
+
+
     async def load_game_state(self, guild_ids: List[str], **kwargs: Any) -> None:
         """
         Координирует загрузку состояния всех менеджеров для указанных гильдий при запуске бота.
@@ -329,6 +369,7 @@ class PersistenceManager:
              (self._dialogue_manager, 'load_state'),
              (self._skill_manager, 'load_state'), # Added to load list
              (self._spell_manager, 'load_state'), # Added to load list
+             (self._action_buffer, 'load_state'), # Необработанные действия после перезапуска
              # TODO: Добавьте другие менеджеры здесь
          ]
 
@@ -6,6 +6,7 @@ import traceback # Keep for potential future use, though not explicitly used in
 from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING, Union
 
 from ..models.quest import Quest
+from bot.utils.json_codec import from_db_json
 
 if TYPE_CHECKING:
     from bot.services.db_service import DBService # Changed
@@ -68,6 +69,7 @@ class QuestManager:
         self._active_quests: Dict[str, Dict[str, Dict[str, Any]]] = {}
         # guild_id -> quest_template_id -> quest_template_data
         self._quest_templates: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.templates_version = 0  # bumped on every template (re)load; PromptContextCollector stamps its cached fragments with it
         # guild_id -> character_id -> list of completed quest_ids
         self._completed_quests: Dict[str, Dict[str, List[str]]] = {}
         # guild_id -> set of character_ids with dirty quest data
@@ -161,6 +163,7 @@ class QuestManager:
         
         # print(f"Loaded {len(guild_templates_cache)} quest templates for guild {guild_id_str}.")
         
+        self.templates_version += 1
         loaded_template_count = len(guild_templates_cache)
         print(f"QuestManager: Loaded {loaded_template_count} quest templates from self.campaign_data for guild {guild_id_str}.")
         if loaded_template_count > 0:
@@ -898,16 +901,16 @@ class QuestManager:
                 # After creating quest_obj, parse the *_json_str fields into actual data attributes
                 # This responsibility is shifted to the manager after object creation.
                 if quest_obj.stages_json_str:
-                    try: quest_obj.stages = json.loads(quest_obj.stages_json_str)
+                    try: quest_obj.stages = from_db_json(quest_obj.stages_json_str, {}, text=True)
                     except json.JSONDecodeError: print(f"Error parsing stages_json for gen_quest {quest_obj.id}"); quest_obj.stages = {}
                 if quest_obj.rewards_json_str:
-                    try: quest_obj.rewards = json.loads(quest_obj.rewards_json_str)
+                    try: quest_obj.rewards = from_db_json(quest_obj.rewards_json_str, {}, text=True)
                     except json.JSONDecodeError: print(f"Error parsing rewards_json for gen_quest {quest_obj.id}"); quest_obj.rewards = {}
                 if quest_obj.prerequisites_json_str: # This should result in List[Dict] or similar for generated quests
-                    try: quest_obj.prerequisites = json.loads(quest_obj.prerequisites_json_str)
+                    try: quest_obj.prerequisites = from_db_json(quest_obj.prerequisites_json_str, [], text=True)
                     except json.JSONDecodeError: print(f"Error parsing prerequisites_json for gen_quest {quest_obj.id}"); quest_obj.prerequisites = []
                 if quest_obj.consequences_json_str:
-                    try: quest_obj.consequences = json.loads(quest_obj.consequences_json_str)
+                    try: quest_obj.consequences = from_db_json(quest_obj.consequences_json_str, {}, text=True)
                     except json.JSONDecodeError: print(f"Error parsing consequences_json for gen_quest {quest_obj.id}"); quest_obj.consequences = {}
                 # ai_prompt_context_data can be handled similarly if needed as a dict on the object
 
@@ -919,6 +922,12 @@ class QuestManager:
         print(f"QuestManager: Loaded {len(guild_quest_cache)} total quests for guild {guild_id_str}.")
 
 
+    def snapshot_pending_save(self, guild_id: str) -> Set[str]:
+        return set(self._dirty_quests.get(str(guild_id), ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Set[str]) -> None:
+        if snapshot: self._dirty_quests.setdefault(str(guild_id), set()).update(snapshot)
+
     async def save_state(self, guild_id: str, character_id: str) -> List[Dict[str, Any]]:
         """Saves active quests for a character. Returns a list of quest data objects for character state persistence."""
         guild_id_str = str(guild_id)
@@ -1107,20 +1116,20 @@ class QuestManager:
         try:
             # Prepare data for DB
             # title_i18n in DB maps to name_i18n in Quest model
-            title_i18n_json = json.dumps(quest.name_i18n or {})
-            description_i18n_json = json.dumps(quest.description_i18n or {})
+            title_i18n_json = quest.name_i18n or {}
+            description_i18n_json = quest.description_i18n or {}
 
             # stages_json: quest.stages should be a Python dict/list
-            stages_json = json.dumps(quest.stages or {})
-            rewards_json = json.dumps(quest.rewards or {})
+            stages_json = quest.stages or {}
+            rewards_json = quest.rewards or {}
 
             # prerequisites for generated quests might be more complex than List[str]
             # For now, assume it's a structure that can be dumped to JSON.
             # The Quest model stores it in self.prerequisites.
-            prerequisites_json = json.dumps(quest.prerequisites or [])
+            prerequisites_json = quest.prerequisites or []
 
             # consequences for generated quests
-            consequences_json = json.dumps(quest.consequences or {})
+            consequences_json = quest.consequences or {}
 
             # ai_prompt_context_json
             # The Quest model stores this as ai_prompt_context_json_str
@@ -1130,10 +1139,10 @@ class QuestManager:
                 ai_context_to_dump = getattr(quest, 'ai_prompt_context_data')
             elif quest.ai_prompt_context_json_str: # If it was loaded as a string and not parsed
                 try:
-                    ai_context_to_dump = json.loads(quest.ai_prompt_context_json_str)
+                    ai_context_to_dump = from_db_json(quest.ai_prompt_context_json_str, {}, text=True)
                 except json.JSONDecodeError:
                     print(f"Warning: Invalid JSON in ai_prompt_context_json_str for quest {quest.id}. Saving as empty.")
-            ai_prompt_context_json = json.dumps(ai_context_to_dump)
+            ai_prompt_context_json = ai_context_to_dump
 
             suggested_level_val = 0 # Default
             if hasattr(quest, 'suggested_level') and isinstance(getattr(quest, 'suggested_level'), int):
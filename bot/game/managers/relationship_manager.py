@@ -5,8 +5,9 @@ import uuid
 import json # Not strictly needed for Relationship model as defined, but good for future complex details
 import time # For updated_at, though DB can handle it.
 import traceback # For error handling
+import heapq
 
-from typing import Optional, Dict, Any, List, Set, TYPE_CHECKING
+from typing import Optional, Dict, Any, List, Set, Tuple, TYPE_CHECKING
 
 # Assuming the Relationship model is defined in bot.game.models.relationship
 from bot.game.models.relationship import Relationship
@@ -49,6 +50,10 @@ class RelationshipManager:
         self._dirty_relationships: Dict[str, Set[str]] = {} # {guild_id: set_of_relationship_ids}
         self._deleted_relationship_ids: Dict[str, Set[str]] = {} # {guild_id: set_of_relationship_ids}
 
+        # Lookup indexes over _relationships, kept in sync by _index_relationship/_unindex_relationship
+        self._relationships_by_entity: Dict[str, Dict[str, Set[str]]] = {} # {guild_id: {entity_id: set_of_relationship_ids}}
+        self._relationship_by_pair: Dict[str, Dict[Tuple[str, str, str], str]] = {} # {guild_id: {(entity1_id, entity2_id, type): relationship_id}}
+
         print("RelationshipManager initialized.")
 
     # --- Helper methods for managing cache state ---
@@ -61,17 +66,61 @@ class RelationshipManager:
     def get_relationships_for_entity(self, guild_id: str, entity_id: str) -> List[Relationship]:
         """Gets all relationships involving a specific entity (character or NPC) in a guild."""
         guild_id_str = str(guild_id)
-        entity_id_str = str(entity_id)
         guild_relationships = self._relationships.get(guild_id_str, {})
-        return [rel for rel in guild_relationships.values() 
-                if str(rel.entity1_id) == entity_id_str or str(rel.entity2_id) == entity_id_str]
+        relationship_ids = self._relationships_by_entity.get(guild_id_str, {}).get(str(entity_id), ())
+        return [rel for rel_id in relationship_ids if (rel := guild_relationships.get(rel_id)) is not None]
+
+    def get_relationship_between(self, guild_id: str, entity1_id: str, entity2_id: str, relationship_type: str) -> Optional[Relationship]:
+        """Gets the relationship of the given type between two entities (in either order)."""
+        guild_id_str = str(guild_id)
+        relationship_id = self._relationship_by_pair.get(guild_id_str, {}).get(self._pair_key(entity1_id, entity2_id, relationship_type))
+        return self.get_relationship(guild_id_str, relationship_id) if relationship_id else None
+
+    def get_strongest_relationships(self, guild_id: str, entity_id: str, limit: int = 5) -> List[Relationship]:
+        """
+        Returns the `limit` relationships of an entity with the largest absolute strength
+        (strong hostility counts as much as strong friendship). Only the entity's own relationships are considered.
+        """
+        return heapq.nlargest(limit, self.get_relationships_for_entity(guild_id, entity_id), key=lambda rel: abs(rel.strength or 0.0))
 
     def add_relationship_to_cache(self, guild_id: str, relationship: Relationship) -> None:
         """Adds or updates a relationship in the cache and marks it dirty."""
         guild_id_str = str(guild_id)
-        self._relationships.setdefault(guild_id_str, {})[str(relationship.id)] = relationship
+        guild_relationships = self._relationships.setdefault(guild_id_str, {})
+        previous = guild_relationships.get(str(relationship.id))
+        if previous is not None:
+            self._unindex_relationship(guild_id_str, previous)
+        guild_relationships[str(relationship.id)] = relationship
+        self._index_relationship(guild_id_str, relationship)
         self.mark_relationship_dirty(guild_id_str, relationship.id)
 
+    @staticmethod
+    def _pair_key(entity1_id: str, entity2_id: str, relationship_type: str) -> Tuple[str, str, str]:
+        """Order-independent key, matching the entity1_id < entity2_id convention of create_or_update_relationship."""
+        first, second = sorted((str(entity1_id), str(entity2_id)))
+        return first, second, str(relationship_type).lower()
+
+    def _index_relationship(self, guild_id_str: str, relationship: Relationship) -> None:
+        relationship_id = str(relationship.id)
+        guild_by_entity = self._relationships_by_entity.setdefault(guild_id_str, {})
+        for entity_id in (str(relationship.entity1_id), str(relationship.entity2_id)):
+            guild_by_entity.setdefault(entity_id, set()).add(relationship_id)
+        pair_key = self._pair_key(relationship.entity1_id, relationship.entity2_id, relationship.relationship_type)
+        self._relationship_by_pair.setdefault(guild_id_str, {})[pair_key] = relationship_id
+
+    def _unindex_relationship(self, guild_id_str: str, relationship: Relationship) -> None:
+        relationship_id = str(relationship.id)
+        guild_by_entity = self._relationships_by_entity.get(guild_id_str, {})
+        for entity_id in (str(relationship.entity1_id), str(relationship.entity2_id)):
+            entity_relationships = guild_by_entity.get(entity_id)
+            if entity_relationships is not None:
+                entity_relationships.discard(relationship_id)
+                if not entity_relationships: del guild_by_entity[entity_id]
+        guild_pairs = self._relationship_by_pair.get(guild_id_str, {})
+        pair_key = self._pair_key(relationship.entity1_id, relationship.entity2_id, relationship.relationship_type)
+        if guild_pairs.get(pair_key) == relationship_id:
+            del guild_pairs[pair_key]
+
     def mark_relationship_dirty(self, guild_id: str, relationship_id: str) -> None:
         """Marks a relationship as dirty for saving."""
         guild_id_str = str(guild_id)
@@ -90,7 +139,7 @@ class RelationshipManager:
         self._dirty_relationships.get(guild_id_str, set()).discard(relationship_id_str)
         # Remove from cache immediately
         if guild_id_str in self._relationships and relationship_id_str in self._relationships[guild_id_str]:
-             del self._relationships[guild_id_str][relationship_id_str]
+             self._unindex_relationship(guild_id_str, self._relationships[guild_id_str].pop(relationship_id_str))
 
     # --- Core Logic Methods ---
 
@@ -120,12 +169,7 @@ class RelationshipManager:
         rel_type_str = str(relationship_type).lower() # Standardize relationship type string
 
         # Check if a relationship of this type already exists between these entities
-        existing_relationship_id = None
-        for rel_id, rel in self._relationships.get(guild_id_str, {}).items():
-            if (str(rel.entity1_id) == entity1_id_str and str(rel.entity2_id) == entity2_id_str) and \
-               rel.relationship_type.lower() == rel_type_str:
-                existing_relationship_id = rel_id
-                break
+        existing_relationship_id = self._relationship_by_pair.get(guild_id_str, {}).get(self._pair_key(entity1_id_str, entity2_id_str, rel_type_str))
 
         if existing_relationship_id:
             # Update existing relationship
@@ -193,6 +237,8 @@ class RelationshipManager:
 
         # Clear existing cache for the guild
         self._relationships[guild_id_str] = {}
+        self._relationships_by_entity[guild_id_str] = {}
+        self._relationship_by_pair[guild_id_str] = {}
         self._dirty_relationships.pop(guild_id_str, None)
         self._deleted_relationship_ids.pop(guild_id_str, None)
 
@@ -235,12 +281,23 @@ class RelationshipManager:
 
                 relationship = Relationship.from_dict(data)
                 guild_cache[relationship.id] = relationship
+                self._index_relationship(guild_id_str, relationship)
                 loaded_count += 1
             except Exception as e:
                 print(f"RelationshipManager: Error loading relationship {data.get('id', 'N/A')} for guild {guild_id_str}: {e}"); traceback.print_exc()
 
         print(f"RelationshipManager: Loaded {loaded_count} relationships for guild {guild_id_str}.")
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_relationships.get(guild_id_str, ())), set(self._deleted_relationship_ids.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_relationships.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_relationship_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
         """Saves dirty relationships for a guild to the database and deletes marked ones."""
         guild_id_str = str(guild_id)
@@ -287,7 +344,7 @@ class RelationshipManager:
                         relationship.entity2_type,
                         relationship.relationship_type,
                         relationship.strength,
-                        json.dumps(relationship.details) if relationship.details is not None else '{}',
+                        relationship.details if relationship.details is not None else {},
                         relationship.created_at,
                     )
                     relationships_to_save_data.append(data_tuple)
@@ -328,9 +385,12 @@ class RelationshipManager:
     async def rebuild_runtime_caches(self, guild_id: str, **kwargs: Any) -> None:
         """Rebuilds any runtime caches if necessary (e.g., relationship graphs)."""
         guild_id_str = str(guild_id)
-        print(f"RelationshipManager: Rebuilding runtime caches for guild {guild_id_str} (currently no complex caches to rebuild).")
-        # Example: If you had a graph structure for quick relationship lookups
-        # between any two entities, you would rebuild it here based on _relationships cache.
+        print(f"RelationshipManager: Rebuilding runtime caches for guild {guild_id_str}.")
+        # Entity adjacency and pair indexes are derived from the _relationships cache.
+        self._relationships_by_entity[guild_id_str] = {}
+        self._relationship_by_pair[guild_id_str] = {}
+        for relationship in self._relationships.get(guild_id_str, {}).values():
+            self._index_relationship(guild_id_str, relationship)
         print(f"RelationshipManager: Rebuild runtime caches complete for guild {guild_id_str}.")
 
     # --- Example Usage / Utility ---
@@ -346,12 +406,7 @@ class RelationshipManager:
         rel_type_str = str(relationship_type).lower()
 
         # Find the specific relationship instance
-        relationship_to_adjust = None
-        for rel in self._relationships.get(guild_id_str, {}).values():
-            if (str(rel.entity1_id) == entity1_id_str and str(rel.entity2_id) == entity2_id_str) and \
-               rel.relationship_type.lower() == rel_type_str:
-                relationship_to_adjust = rel
-                break
+        relationship_to_adjust = self.get_relationship_between(guild_id_str, entity1_id_str, entity2_id_str, rel_type_str)
 
         if relationship_to_adjust:
             relationship_to_adjust.strength += amount
@@ -63,6 +63,13 @@ class SkillManager:
         # await self.load_skill_templates(guild_id, campaign_data)
 
 
+    def snapshot_pending_save(self, guild_id: str) -> None:
+        """SkillManager ничего не хранит между сохранениями."""
+        return None
+
+    def restore_pending_save(self, guild_id: str, snapshot: None) -> None:
+        pass
+
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
         """Saves skill-related states for a guild."""
         # Placeholder: if SkillManager itself stores persistent data that needs saving
@@ -36,6 +36,7 @@ class SpellManager:
         # self._npc_manager = npc_manager
         
         self._spell_templates: Dict[str, Dict[str, Spell]] = {}  # guild_id -> spell_id -> Spell object
+        self.templates_version = 0  # bumped on every template (re)load; PromptContextCollector stamps its cached fragments with it
         print("SpellManager initialized.")
 
     async def load_spell_templates(self, guild_id: str, campaign_data: Dict[str, Any]) -> None:
@@ -56,7 +57,8 @@ class SpellManager:
                 loaded_count += 1
             except Exception as e:
                 print(f"SpellManager: Error loading spell template '{spell_data.get('id', 'UnknownID')}' for guild {guild_id_str}: {e}")
-        
+        self.templates_version += 1
+
         print(f"SpellManager: Successfully loaded {loaded_count} spell templates for guild {guild_id_str}.")
         if loaded_count > 0:
             print(f"SpellManager: Example spell templates for guild {guild_id_str}:")
@@ -211,6 +213,13 @@ class SpellManager:
         else:
             print(f"SpellManager: No campaign_data provided to load_state for guild {guild_id_str}, cannot load spell templates.")
 
+    def snapshot_pending_save(self, guild_id: str) -> None:
+        """Шаблоны заклинаний статичны, откатывать нечего."""
+        return None
+
+    def restore_pending_save(self, guild_id: str, snapshot: None) -> None:
+        pass
+
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
         """Saves spell-related states for a guild."""
         # Spell templates are static and loaded from campaign data, so no specific saving needed here.
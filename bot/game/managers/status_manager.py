@@ -2,14 +2,18 @@
 
 # --- Импорты ---
 import json
+import copy
+import heapq
+import itertools
 import uuid
 import traceback
 import asyncio
 # ИСПРАВЛЕНИЕ: Добавляем Union
-from typing import Optional, Dict, Any, List, Set, Callable, Awaitable, TYPE_CHECKING, Union # Добавляем Union
+from typing import Optional, Dict, Any, List, Set, Callable, Awaitable, TYPE_CHECKING, Union, Tuple # Добавляем Union
 # from dataclasses import dataclass, field # dataclass и field не нужны в StatusManager, если только не используются для внутренней вспомогательной структуры, но не для модели NPC.
 
 # Импорт модели StatusEffect (для объектов эффектов)
+from bot.utils.json_codec import from_db_json
 from bot.game.models.status_effect import StatusEffect
 # Импорт адаптера БД
 # from bot.database.postgres_adapter import PostgresAdapter # Replaced with DBService
@@ -81,6 +85,17 @@ class StatusManager:
         self._dirty_status_effects: Dict[str, Set[str]] = {}
         self._deleted_status_effects_ids: Dict[str, Set[str]] = {}
 
+        # Индекс окончания: {guild_id: min-heap[(expires_at, seq, status_id)]}.
+        # Удаление ленивое - запись пропускается, если статуса нет в кеше или его expires_at изменился.
+        self._expiry_heaps: Dict[str, List[Tuple[float, int, str]]] = {}
+        # Расписание периодических эффектов: {guild_id: min-heap[(next_tick_at, seq, status_id, last_tick_at)]}.
+        self._periodic_heaps: Dict[str, List[Tuple[float, int, str, float]]] = {}
+        self._heap_seq = itertools.count()
+        # status_type -> интервал периодического эффекта (None - статус не периодический)
+        self._periodic_interval_cache: Dict[str, Optional[float]] = {}
+        # Собственные часы на случай, если TimeManager недоступен.
+        self._local_game_time: Dict[str, float] = {}
+
         self._load_status_templates()
 
         print("StatusManager initialized.")
@@ -89,6 +104,7 @@ class StatusManager:
         """Загружает статические шаблоны статус-эффектов из rules_config или settings."""
         print("StatusManager: Loading status templates...")
         self._status_templates = {} # Legacy, prefer rules_config
+        self._periodic_interval_cache = {}
 
         if self.rules_config and self.rules_config.status_effects:
             for status_id, status_def in self.rules_config.status_effects.items():
@@ -152,7 +168,7 @@ class StatusManager:
         return self._status_templates.get(status_type)
 
 
-    def get_status_display_name(self, status_instance: StatusEffect, lang: str = "en", default_lang: str = "en") -> str:
+    def get_status_display_name(self, status_instance: StatusEffect, lang: str = "en", default_lang: str = "en", current_game_time: Optional[float] = None) -> str:
          if not isinstance(status_instance, StatusEffect):
               return "Неизвестный статус"
 
@@ -163,8 +179,14 @@ class StatusManager:
              display_name = get_i18n_text(tpl, "name", lang, default_lang) # tpl is dict here
 
          desc_parts = [display_name]
-         if status_instance.duration is not None:
-             desc_parts.append(f"({status_instance.duration:.1f} ост.)")
+         if current_game_time is None and status_instance.guild_id:
+             # duration - полная длительность, остаток считается от текущего игрового времени гильдии.
+             current_game_time = self._get_current_game_time(str(status_instance.guild_id))
+         remaining = status_instance.remaining_duration(current_game_time) if current_game_time is not None else None
+         if remaining is not None:
+             desc_parts.append(f"({remaining:.1f} ост.)")
+         elif status_instance.duration is not None:
+             desc_parts.append(f"({status_instance.duration:.1f})")
 
          return " ".join(desc_parts)
 
@@ -186,6 +208,63 @@ class StatusManager:
              return guild_statuses.get(status_effect_id)
         return None
 
+    def get_status_effects_for_target(self, guild_id: str, target_id: str, target_type: Optional[str] = None) -> List[StatusEffect]:
+        """Активные статусы сущности из кеша гильдии. target_type без учёта регистра, 'player' = 'character'."""
+        def _kind(value: Any) -> str:
+            kind = str(value).lower()
+            return "character" if kind == "player" else kind
+        wanted_kind = _kind(target_type) if target_type else None
+        return [
+            eff for eff in self._status_effects.get(str(guild_id), {}).values()
+            if isinstance(eff, StatusEffect) and eff.target_id == str(target_id)
+            and (wanted_kind is None or _kind(eff.target_type) == wanted_kind)
+        ]
+
+    def _get_current_game_time(self, guild_id_str: str, **kwargs: Any) -> float:
+        """Текущее игровое время гильдии: из TimeManager, иначе по собственным часам StatusManager."""
+        time_mgr = kwargs.get('time_manager', self._time_manager)
+        if time_mgr and hasattr(time_mgr, 'get_current_game_time'):
+            current = time_mgr.get_current_game_time(guild_id_str)
+            if isinstance(current, (int, float)):
+                return float(current)
+        return self._local_game_time.get(guild_id_str, 0.0)
+
+    def _get_periodic_interval(self, status_type: str) -> Optional[float]:
+        """
+        Интервал периодического эффекта статуса из шаблона ('tick_interval').
+        0.0 - срабатывает каждый тик (шаблон с 'tick_effect' без интервала), None - не периодический.
+        """
+        if status_type in self._periodic_interval_cache:
+            return self._periodic_interval_cache[status_type]
+        interval: Optional[float] = None
+        tpl = self.get_status_template(status_type)
+        if tpl:
+            if tpl.get('tick_interval') is not None:
+                try:
+                    interval = max(0.0, float(tpl['tick_interval']))
+                except (TypeError, ValueError):
+                    interval = 0.0
+            elif tpl.get('tick_effect') or tpl.get('periodic_effects'):
+                interval = 0.0
+        self._periodic_interval_cache[status_type] = interval
+        return interval
+
+    def _index_status_effect(self, guild_id_str: str, eff: StatusEffect, current_game_time: float) -> None:
+        """Регистрирует статус в индексе окончания и, если он периодический, в расписании тиков."""
+        expires_at = eff.expires_at
+        if expires_at is not None:
+            heapq.heappush(self._expiry_heaps.setdefault(guild_id_str, []), (expires_at, next(self._heap_seq), eff.id))
+        interval = self._get_periodic_interval(eff.status_type)
+        if interval is not None:
+            heapq.heappush(
+                self._periodic_heaps.setdefault(guild_id_str, []),
+                (current_game_time + interval, next(self._heap_seq), eff.id, current_game_time)
+            )
+
+    def _clear_guild_indexes(self, guild_id_str: str) -> None:
+        self._expiry_heaps.pop(guild_id_str, None)
+        self._periodic_heaps.pop(guild_id_str, None)
+
     async def apply_status(self,
                            target_id: str,
                            target_type: str, # "character" or "npc"
@@ -232,10 +311,7 @@ class StatusManager:
                 resolved_duration = None
 
 
-        applied_at_time: Optional[float] = None
-        time_mgr = kwargs.get('time_manager', self._time_manager)
-        if time_mgr and hasattr(time_mgr, 'get_current_game_time'):
-            applied_at_time = time_mgr.get_current_game_time(guild_id_str)
+        applied_at_time: float = self._get_current_game_time(guild_id_str, **kwargs)
 
 
         current_state_vars = initial_state_variables.copy() if initial_state_variables else {}
@@ -282,13 +358,14 @@ class StatusManager:
                  params = (
                      status_effect_obj.id, status_effect_obj.status_type, status_effect_obj.target_id, status_effect_obj.target_type,
                      status_effect_obj.duration, status_effect_obj.applied_at, status_effect_obj.source_id,
-                     json.dumps(status_effect_obj.state_variables),
+                     status_effect_obj.state_variables,
                      status_effect_obj.guild_id
                  )
                  await self._db_service.adapter.execute(sql, params)
 
             self._status_effects.setdefault(guild_id_str, {})[status_effect_obj.id] = status_effect_obj
             self.mark_status_effect_dirty(guild_id_str, status_effect_obj.id)
+            self._index_status_effect(guild_id_str, status_effect_obj, applied_at_time)
 
             print(f"{log_prefix} Status effect '{status_effect_obj.id}' (type: {status_id}) applied successfully.")
             # TODO: Notify target entity's manager (CharacterManager, NpcManager) about the new status effect.
@@ -351,6 +428,7 @@ class StatusManager:
                     pass
                  if not guild_statuses_cache:
                       self._status_effects.pop(guild_id_str, None)
+                      self._clear_guild_indexes(guild_id_str)
 
             self._dirty_status_effects.get(guild_id_str, set()).discard(status_effect_id_str)
             self._deleted_status_effects_ids.setdefault(guild_id_str, set()).add(status_effect_id_str) # Ensure it's marked for deletion confirmation
@@ -434,66 +512,102 @@ class StatusManager:
 
         return removed_count
 
+    def has_tick_work(self, guild_id: str) -> bool:
+        """Есть ли у гильдии статусы с окончанием или периодическим эффектом (иначе тик можно пропустить)."""
+        guild_id_str = str(guild_id)
+        return bool(self._expiry_heaps.get(guild_id_str) or self._periodic_heaps.get(guild_id_str))
+
     async def process_tick(self, guild_id: str, game_time_delta: float, **kwargs: Any) -> None:
+        """
+        Снимает истекшие статусы и применяет периодические эффекты.
+        Длительности не уменьшаются: статусы хранят абсолютное время окончания,
+        поэтому тик обходит только истекшие и периодические статусы, а не все активные.
+        """
         guild_id_str = str(guild_id)
+        self._local_game_time[guild_id_str] = self._local_game_time.get(guild_id_str, 0.0) + game_time_delta
         guild_statuses_cache = self._status_effects.get(guild_id_str, {})
         if not guild_statuses_cache:
              return
 
+        current_game_time = self._get_current_game_time(guild_id_str, **kwargs)
         rule_engine = kwargs.get('rule_engine', self._rule_engine)
         char_mgr = kwargs.get('character_manager', self._character_manager)
         npc_mgr  = kwargs.get('npc_manager', self._npc_manager)
 
-        to_remove_ids: List[str] = []
-
-        for eff_id, eff in list(guild_statuses_cache.items()):
-            if not isinstance(eff, StatusEffect):
-                 print(f"StatusManager: Warning: Invalid object in cache for guild {guild_id_str}, ID {eff_id}. Expected StatusEffect, got {type(eff).__name__}. Marking for removal.")
-                 to_remove_ids.append(eff_id)
-                 continue
-
+        to_remove_ids: Set[str] = set()
+
+        # --- Истекшие статусы (из индекса окончания) ---
+        expiry_heap = self._expiry_heaps.get(guild_id_str)
+        while expiry_heap and expiry_heap[0][0] <= current_game_time:
+            expires_at, _, eff_id = heapq.heappop(expiry_heap)
+            eff = guild_statuses_cache.get(eff_id)
+            if eff is None or eff.expires_at != expires_at:
+                continue # Устаревшая запись
+            to_remove_ids.add(eff_id)
+
+        # --- Периодические эффекты (по расписанию) ---
+        periodic_heap = self._periodic_heaps.get(guild_id_str)
+        rescheduled: List[Tuple[float, int, str, float]] = []
+        target_entities: Dict[Tuple[str, str], Any] = {}
+        while periodic_heap and periodic_heap[0][0] <= current_game_time:
+            _, _, eff_id, last_tick_at = heapq.heappop(periodic_heap)
+            eff = guild_statuses_cache.get(eff_id)
+            if eff is None or eff_id in to_remove_ids:
+                continue
+            interval = self._get_periodic_interval(eff.status_type)
+            if interval is None:
+                continue
+            rescheduled.append((current_game_time + interval, next(self._heap_seq), eff_id, current_game_time))
+
+            if not (rule_engine and hasattr(rule_engine, 'apply_status_periodic_effects')):
+                continue
             try:
-                if eff.duration is not None:
-                    if not isinstance(eff.duration, (int, float)):
-                         print(f"StatusManager: Warning: Invalid duration type for status {eff_id} ('{eff.status_type}') in guild {guild_id_str}: {eff.duration}. Expected number. Marking for removal.")
-                         to_remove_ids.append(eff_id)
-                         continue
-
-                    eff.duration -= game_time_delta
-                    self.mark_status_effect_dirty(guild_id_str, eff_id)
-
-                    if eff.duration <= 0:
-                        to_remove_ids.append(eff_id)
-                        continue
-
-                # Periodic effects (RuleEngine call)
-                # This part needs to be adapted if rules_config is the primary source for effect details
-                status_template_dict = self.get_status_template(eff.status_type) # Fetches dict form
-
-                if status_template_dict and rule_engine and hasattr(rule_engine, 'apply_status_periodic_effects'):
+                target_key = (eff.target_type, eff.target_id)
+                if target_key not in target_entities:
                     target_entity = None
                     if eff.target_type == 'Character' and char_mgr:
                          target_entity = await char_mgr.get_character(guild_id_str, eff.target_id)
                     elif eff.target_type == 'NPC' and npc_mgr:
                          target_entity = await npc_mgr.get_npc(guild_id_str, eff.target_id)
-
-                    if target_entity:
-                        await rule_engine.apply_status_periodic_effects(
-                            status_effect=eff,
-                            target_entity=target_entity,
-                            game_time_delta=game_time_delta,
-                            rules_config=self.rules_config, # Pass rules_config
-                            **kwargs
-                        )
+                    target_entities[target_key] = target_entity
+                target_entity = target_entities[target_key]
+
+                if target_entity:
+                    state_before = copy.deepcopy(eff.state_variables)
+                    await rule_engine.apply_status_periodic_effects(
+                        status_effect=eff,
+                        target_entity=target_entity,
+                        game_time_delta=current_game_time - last_tick_at,
+                        rules_config=self.rules_config, # Pass rules_config
+                        **kwargs
+                    )
+                    # В БД уходят только статусы, которые эффект действительно изменил
+                    if eff.state_variables != state_before:
+                        self.mark_status_effect_dirty(guild_id_str, eff_id)
             except Exception as e:
                 print(f"StatusManager: ❌ Error in tick processing for status {eff_id} ('{eff.status_type}') on {eff.target_type} {eff.target_id} for guild {guild_id_str}: {e}")
                 traceback.print_exc()
-                to_remove_ids.append(eff_id)
+                to_remove_ids.add(eff_id)
 
-        for status_id_to_remove in set(to_remove_ids):
+        if rescheduled:
+            periodic_heap = self._periodic_heaps.setdefault(guild_id_str, [])
+            for entry in rescheduled:
+                heapq.heappush(periodic_heap, entry)
+
+        for status_id_to_remove in to_remove_ids:
              await self.remove_status_effect(status_id_to_remove, guild_id_str, **kwargs)
 
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_status_effects.get(guild_id_str, ())), set(self._deleted_status_effects_ids.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_status_effects.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_status_effects_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
         print(f"StatusManager: Saving state for guild {guild_id}...")
         if self._db_service is None:
@@ -511,11 +625,7 @@ class StatusManager:
                  return
 
             if deleted_ids_set:
-                ids_to_delete_db = list(deleted_ids_set)
-                placeholders = ','.join(['?'] * len(ids_to_delete_db))
-                sql_del = f"DELETE FROM statuses WHERE id IN ({placeholders}) AND guild_id = ?"
-                params_del = tuple(ids_to_delete_db) + (guild_id_str,)
-                await self._db_service.adapter.execute(sql_del, params_del)
+                await self._db_service.adapter.bulk_delete('statuses', guild_id_str, list(deleted_ids_set))
                 self._deleted_status_effects_ids.pop(guild_id_str, None) # Clear after successful DB operation
 
             guild_statuses_cache = self._status_effects.get(guild_id_str, {})
@@ -532,23 +642,19 @@ class StatusManager:
                       self._dirty_status_effects.get(guild_id_str, set()).discard(sid)
 
             if statuses_to_save_db:
-                sql_upsert = '''
-                    INSERT OR REPLACE INTO statuses
-                    (id, status_type, target_id, target_type, duration_turns, applied_at, source_id, state_variables, guild_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                '''
+                # name NOT NULL в схеме и хранит тот же шаблон, что и status_type.
+                columns = ['id', 'name', 'status_type', 'target_id', 'target_type', 'duration_turns', 'applied_at', 'source_id', 'state_variables', 'guild_id']
                 data_to_upsert_db = []
                 for eff_to_save in statuses_to_save_db:
-                    sv_json = json.dumps(getattr(eff_to_save, 'state_variables', {}))
                     data_to_upsert_db.append((
-                        eff_to_save.id, eff_to_save.status_type, eff_to_save.target_id, eff_to_save.target_type,
+                        eff_to_save.id, eff_to_save.status_type, eff_to_save.status_type, eff_to_save.target_id, eff_to_save.target_type,
                         eff_to_save.duration, eff_to_save.applied_at, eff_to_save.source_id,
-                        sv_json, eff_to_save.guild_id
+                        getattr(eff_to_save, 'state_variables', None) or {}, eff_to_save.guild_id
                     ))
                     upserted_in_db_ids.add(eff_to_save.id)
 
                 if data_to_upsert_db:
-                     await self._db_service.adapter.execute_many(sql_upsert, data_to_upsert_db)
+                     await self._db_service.adapter.bulk_upsert('statuses', columns, data_to_upsert_db)
                      if guild_id_str in self._dirty_status_effects:
                         self._dirty_status_effects[guild_id_str].difference_update(upserted_in_db_ids)
                         if not self._dirty_status_effects[guild_id_str]:
@@ -573,12 +679,14 @@ class StatusManager:
              self._status_effects[guild_id_str] = {}
              self._dirty_status_effects.pop(guild_id_str, None)
              self._deleted_status_effects_ids.pop(guild_id_str, None)
+             self._clear_guild_indexes(guild_id_str)
              return
 
         try:
             self._status_effects[guild_id_str] = {}
             self._dirty_status_effects.pop(guild_id_str, None)
             self._deleted_status_effects_ids.pop(guild_id_str, None)
+            self._clear_guild_indexes(guild_id_str)
 
             sql_statuses = '''
                 SELECT id, status_type, target_id, target_type, duration_turns, applied_at, source_id, state_variables, guild_id
@@ -587,10 +695,7 @@ class StatusManager:
             rows_statuses = await self._db_service.adapter.fetchall(sql_statuses, (guild_id_str,))
 
             if rows_statuses:
-                 time_mgr = kwargs.get('time_manager', self._time_manager)
-                 current_game_time_for_guild = None
-                 if time_mgr and hasattr(time_mgr, 'get_current_game_time'):
-                      current_game_time_for_guild = time_mgr.get_current_game_time(guild_id_str)
+                 current_game_time_for_guild = self._get_current_game_time(guild_id_str, **kwargs)
 
                  loaded_count = 0
                  for row in rows_statuses:
@@ -599,7 +704,7 @@ class StatusManager:
                            status_id_db = row_dict.get('id')
                            if status_id_db is None: continue
 
-                           row_dict['state_variables'] = json.loads(row_dict.get('state_variables') or '{}') if isinstance(row_dict.get('state_variables'), (str, bytes)) else {}
+                           row_dict['state_variables'] = from_db_json(row_dict.get('state_variables'), {})
                            row_dict['duration'] = float(row_dict.pop('duration_turns')) if row_dict.get('duration_turns') is not None else None
                            row_dict['applied_at'] = float(row_dict['applied_at']) if row_dict['applied_at'] is not None else None
 
@@ -607,15 +712,19 @@ class StatusManager:
 
                            status_instance = StatusEffect.from_dict(row_dict)
 
-                           if status_instance.duration is not None and status_instance.applied_at is not None and current_game_time_for_guild is not None:
-                                elapsed = current_game_time_for_guild - status_instance.applied_at
-                                if elapsed > 0:
-                                    status_instance.duration -= elapsed
-                                    if status_instance.duration <= 0:
-                                        self._deleted_status_effects_ids.setdefault(guild_id_str, set()).add(status_instance.id)
-                                        continue
+                           if status_instance.duration is not None and status_instance.applied_at is None:
+                                # Без точки отсчета длительность считается с момента загрузки
+                                status_instance.applied_at = current_game_time_for_guild
+                                self._dirty_status_effects.setdefault(guild_id_str, set()).add(status_instance.id)
+
+                           expires_at = status_instance.expires_at
+                           if expires_at is not None and expires_at <= current_game_time_for_guild:
+                                self._deleted_status_effects_ids.setdefault(guild_id_str, set()).add(status_instance.id)
+                                self._dirty_status_effects.get(guild_id_str, set()).discard(status_instance.id)
+                                continue
 
                            self._status_effects.setdefault(guild_id_str, {})[status_instance.id] = status_instance
+                           self._index_status_effect(guild_id_str, status_instance, current_game_time_for_guild)
                            loaded_count += 1
                       except Exception as e_row:
                            print(f"StatusManager: ❌ Error processing status row ID {row.get('id', 'Unknown')} for guild {guild_id_str}: {e_row}")
@@ -650,7 +759,7 @@ class StatusManager:
             db_params = (
                 effect_data.get('id'), effect_data.get('status_type'), effect_data.get('target_id'), effect_data.get('target_type'),
                 effect_data.get('duration'), effect_data.get('applied_at'), effect_data.get('source_id'),
-                json.dumps(effect_data.get('state_variables', {})), guild_id_str # Use guild_id_str here
+                effect_data.get('state_variables', {}), guild_id_str # Use guild_id_str here
             )
             upsert_sql = '''
             INSERT OR REPLACE INTO statuses (
@@ -662,7 +771,11 @@ class StatusManager:
             if guild_id_str in self._dirty_status_effects and effect_id in self._dirty_status_effects[guild_id_str]:
                 self._dirty_status_effects[guild_id_str].discard(effect_id)
                 if not self._dirty_status_effects[guild_id_str]: del self._dirty_status_effects[guild_id_str]
-            self._status_effects.setdefault(guild_id_str, {})[effect_id] = status_effect
+            guild_statuses = self._status_effects.setdefault(guild_id_str, {})
+            is_new = effect_id not in guild_statuses
+            guild_statuses[effect_id] = status_effect
+            if is_new:
+                self._index_status_effect(guild_id_str, status_effect, self._get_current_game_time(guild_id_str))
             return True
         except Exception as e:
             print(f"StatusManager: Error saving status effect {effect_id} for guild {guild_id_str}: {e}")
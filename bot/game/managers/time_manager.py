@@ -2,10 +2,12 @@
 
 # --- Импорты ---
 import asyncio
+import heapq
+import itertools
 import traceback
 import json
 import uuid
-from typing import Optional, Dict, Any, List, Callable, Awaitable, Union, Set # Добавляем Set
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Union, Set, Tuple, TYPE_CHECKING # Добавляем Set
 
 
 # TODO: Импортируйте модели, если TimeManager их использует (например, для аннотаций)
@@ -13,8 +15,12 @@ from typing import Optional, Dict, Any, List, Callable, Awaitable, Union, Set #
 
 # TODO: Импорт адаптера БД - используем наш конкретный SQLite адаптер
 # from bot.database.postgres_adapter import PostgresAdapter # Replaced with DBService
+from bot.utils.json_codec import from_db_json
 from bot.services.db_service import DBService
 
+if TYPE_CHECKING:
+    from bot.services.global_state_cache import GlobalStateCache
+
 # TODO: Импорт других менеджеров, если TimeManager их использует в своих методах
 # Например, менеджеры, методы которых вызываются при срабатывании таймеров
 # from bot.game.managers.event_manager import EventManager
@@ -43,6 +49,7 @@ class TimeManager:
                  # Принимаем зависимости, которые передает GameManager.
                  db_service: Optional[DBService] = None, # Changed from db_adapter
                  settings: Optional[Dict[str, Any]] = None,
+                 global_state_cache: Optional["GlobalStateCache"] = None, # Запись/чтение global_state через кеш в памяти
 
                  # TODO: Добавьте другие зависимости, если TimeManager их требует
                  # event_manager: Optional['EventManager'] = None,
@@ -53,6 +60,7 @@ class TimeManager:
         print("Initializing TimeManager...")
         self._db_service = db_service # Changed from _db_adapter
         self._settings = settings
+        self._global_state_cache = global_state_cache
 
         # TODO: Сохраните другие зависимости
         # self._event_manager = event_manager
@@ -70,6 +78,16 @@ class TimeManager:
         # Храним активные таймеры в словаре {guild_id: {timer_id: timer_data}}. Переделываем на пер-гильдийное.
         self._active_timers: Dict[str, Dict[str, Any]] = {} # <-- ИСПРАВЛЕНО: Пер-гильдийные таймеры
 
+        # Min-heap по ends_at для каждой гильдии: {guild_id: [(ends_at, seq, timer_id), ...]}.
+        # Удаление ленивое: запись в куче игнорируется, если таймера уже нет в _active_timers
+        # или его ends_at изменился. Вставка O(log n), тик O(k log n) для k сработавших.
+        self._timer_heaps: Dict[str, List[Tuple[float, int, str]]] = {}
+        self._timer_seq = itertools.count()
+
+        # Изменения, которые save_state должен записать в БД (только дельта, а не все таймеры).
+        self._dirty_timers: Dict[str, Set[str]] = {}
+        self._deleted_timer_ids: Dict[str, Set[str]] = {}
+
 
         print("TimeManager initialized.")
 
@@ -82,7 +100,63 @@ class TimeManager:
          # Возвращаем время для гильдии, по умолчанию 0.0 если нет записи
          return self._current_game_time.get(guild_id_str, 0.0)
 
-    # TODO: Добавьте метод для получения конкретного таймера
+    def get_timer(self, guild_id: str, timer_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает данные активного таймера из кеша или None."""
+        return self._active_timers.get(str(guild_id), {}).get(str(timer_id))
+
+    def _schedule_timer(self, guild_id_str: str, timer_data: Dict[str, Any]) -> None:
+        """Добавляет таймер в кучу сработки гильдии."""
+        heapq.heappush(
+            self._timer_heaps.setdefault(guild_id_str, []),
+            (float(timer_data['ends_at']), next(self._timer_seq), str(timer_data['id']))
+        )
+
+    def _rebuild_timer_heap(self, guild_id_str: str) -> None:
+        heap = [
+            (float(t['ends_at']), next(self._timer_seq), timer_id)
+            for timer_id, t in self._active_timers.get(guild_id_str, {}).items()
+            if t.get('is_active', True) and 'ends_at' in t
+        ]
+        heapq.heapify(heap)
+        self._timer_heaps[guild_id_str] = heap
+
+    def _pop_due_timers(self, guild_id_str: str, current_game_time: float) -> List[Dict[str, Any]]:
+        """Извлекает из кучи все таймеры с ends_at <= current_game_time."""
+        heap = self._timer_heaps.get(guild_id_str)
+        if not heap:
+            return []
+        guild_timers_cache = self._active_timers.get(guild_id_str, {})
+        due: List[Dict[str, Any]] = []
+        while heap and heap[0][0] <= current_game_time:
+            ends_at, _, timer_id = heapq.heappop(heap)
+            timer_data = guild_timers_cache.get(timer_id)
+            # Устаревшая запись кучи (таймер удалён или перепланирован)
+            if timer_data is None or not timer_data.get('is_active', True) or float(timer_data.get('ends_at', float('inf'))) != ends_at:
+                continue
+            due.append(timer_data)
+        if not heap:
+            self._timer_heaps.pop(guild_id_str, None)
+        return due
+
+    def mark_timer_dirty(self, guild_id: str, timer_id: str) -> None:
+        """Помечает таймер изменённым в памяти (например, изменился ends_at); перепланирует его."""
+        guild_id_str, timer_id_str = str(guild_id), str(timer_id)
+        timer_data = self._active_timers.get(guild_id_str, {}).get(timer_id_str)
+        if timer_data is None:
+            return
+        self._dirty_timers.setdefault(guild_id_str, set()).add(timer_id_str)
+        self._schedule_timer(guild_id_str, timer_data)
+
+    def _forget_timers(self, guild_id_str: str, timer_ids: List[str]) -> None:
+        """Удаляет таймеры из кеша (записи в куче отбрасываются лениво)."""
+        guild_timers_cache = self._active_timers.get(guild_id_str)
+        dirty = self._dirty_timers.get(guild_id_str)
+        for timer_id in timer_ids:
+            if guild_timers_cache: guild_timers_cache.pop(timer_id, None)
+            if dirty: dirty.discard(timer_id)
+        if guild_timers_cache is not None and not guild_timers_cache:
+            self._active_timers.pop(guild_id_str, None)
+            self._timer_heaps.pop(guild_id_str, None)
 
     # --- Методы управления таймерами (интеграция с БД) ---
 
@@ -141,7 +215,7 @@ class TimeManager:
                 new_timer_data['id'],
                 new_timer_data['type'],
                 new_timer_data['ends_at'],
-                json.dumps(new_timer_data['callback_data']),
+                new_timer_data['callback_data'],
                 bool(new_timer_data['is_active']), # Changed to boolean
                 new_timer_data['guild_id'] # <-- Параметр guild_id
                 # TODO: Добавить другие параметры в кортеж
@@ -155,6 +229,7 @@ class TimeManager:
             # --- Добавление в кеш после успешного сохранения ---
             # Добавляем в пер-гильдийный кеш таймеров
             self._active_timers.setdefault(guild_id_str, {})[timer_id] = new_timer_data
+            self._schedule_timer(guild_id_str, new_timer_data)
             print(f"TimeManager: Timer {timer_id} added to memory cache for guild {guild_id_str}.")
 
             return timer_id
@@ -197,12 +272,8 @@ class TimeManager:
                 print(f"TimeManager: No DB service. Simulating delete from DB for timer {timer_id_str} for guild {guild_id_str}.") # Changed message
 
             # --- Удаляем из кеша ---
-            # Удаляем из пер-гильдийного кеша
-            if guild_timers_cache: # Проверяем, что кеш для гильдии существует
-                 guild_timers_cache.pop(timer_id_str, None) # Удаляем по ID
-                 # Если после удаления кеш для гильдии опустел, можно удалить и сам ключ гильдии из self._active_timers
-                 if not guild_timers_cache:
-                      self._active_timers.pop(guild_id_str, None)
+            # Запись в куче станет устаревшей и будет пропущена при следующем тике.
+            self._forget_timers(guild_id_str, [timer_id_str])
             print(f"TimeManager: Timer {timer_id_str} removed from cache for guild {guild_id_str}.")
 
 
@@ -213,6 +284,30 @@ class TimeManager:
             # rollback уже в execute
 
 
+    async def remove_timers(self, guild_id: str, timer_ids: List[str]) -> None:
+        """
+        Пакетно удаляет таймеры из кеша и БД одним запросом.
+        Если удаление в БД не удалось, ID откладываются до следующего save_state.
+        """
+        guild_id_str = str(guild_id)
+        timer_ids_str = [str(t_id) for t_id in timer_ids]
+        if not timer_ids_str:
+            return
+
+        self._forget_timers(guild_id_str, timer_ids_str)
+
+        if self._db_service is None:
+            return
+        try:
+            await self._db_service.adapter.execute(
+                'DELETE FROM timers WHERE guild_id = $1 AND id = ANY($2::text[])',
+                (guild_id_str, timer_ids_str)
+            )
+        except Exception as e:
+            print(f"TimeManager: ❌ Error batch-deleting {len(timer_ids_str)} timers for guild {guild_id_str}: {e}. Deferring to save_state.")
+            self._deleted_timer_ids.setdefault(guild_id_str, set()).update(timer_ids_str)
+
+
     # Метод обработки тика (используется WorldSimulationProcessor)
     # ИСПРАВЛЕНИЕ: Добавляем guild_id и **kwargs к сигнатуре
     # ИСПРАВЛЕНИЕ: Аннотируем game_time_delta как float
@@ -238,55 +333,27 @@ class TimeManager:
         # print(f"TimeManager: Updated game time for guild {guild_id_str} to {self._current_game_time[guild_id_str]:.2f}.")
 
         # --- Проверяем и срабатываем активные таймеры для этой гильдии ---
-        # Получаем пер-гильдийный кеш таймеров
-        guild_timers_cache = self._active_timers.get(guild_id_str, {})
-
-        if not guild_timers_cache:
-             # print(f"TimeManager: No active timers in cache for guild {guild_id_str} to check.") # Too noisy
-             return # Нет таймеров для этой гильдии в кеше
-
-        timers_to_trigger: List[Dict[str, Any]] = [] # Список данных таймеров к срабатыванию
-
-        # Проходим по всем активным таймерам в кеше ДЛЯ ЭТОЙ ГИЛЬДИИ
-        # Итерируем по копии словаря values(), т.к. срабатывание может привести к удалению таймера из кеша
-        for timer_data in list(guild_timers_cache.values()):
-             # Таймер уже отфильтрован по guild_id, т.к. берется из guild_timers_cache
-             # Проверяем только is_active (в кеше) и ends_at
-             if timer_data.get('is_active', True) and timer_data.get('ends_at', float('inf')) <= current_game_time_for_guild: # Проверяем is_active и ends_at безопасно
-                  # Проверяем наличие всех необходимых полей перед добавлением в список срабатывания
-                  if 'id' in timer_data and 'type' in timer_data and 'ends_at' in timer_data:
-                       # print(f"TimeManager: Timer '{timer_data.get('type', 'Unknown')}' with ID {timer_data.get('id', 'N/A')} for guild {guild_id_str} triggered at game time {current_game_time_for_guild:.2f}.") # Debug
-                       timers_to_trigger.append(timer_data) # Добавляем весь словарь данных таймера
-                       # Помечаем таймер как неактивный В КЕШЕ сразу, чтобы он не сработал повторно в этом тике
-                       # Это важно, если _trigger_timer_callback сам не удаляет таймер немедленно.
-                       timer_data['is_active'] = False # Устанавливаем флаг в кеше
-
-
-                  else:
-                       print(f"TimeManager: Warning: Skipping triggering invalid timer data in cache for guild {guild_id_str}: {timer_data}")
+        # Берём из кучи только сработавшие таймеры: стоимость тика зависит от их числа, а не от всех таймеров.
+        timers_to_trigger = self._pop_due_timers(guild_id_str, current_game_time_for_guild)
+        if not timers_to_trigger:
+             return
 
+        for timer_data in timers_to_trigger:
+             # Помечаем таймер как неактивный В КЕШЕ сразу, чтобы он не сработал повторно
+             timer_data['is_active'] = False
 
         # --- Вызываем callback'и для сработавших таймеров ---
         for timer_data in timers_to_trigger:
-             # Вызываем callback'и ПОСЛЕ сбора списка таймеров к срабатыванию
              try:
-                  # Вызываем вспомогательный метод для срабатывания
-                  # Передаем guild_id и ВСЕ менеджеры/сервисы из kwargs process_tick
-                  # _trigger_timer_callback принимает timer_type, callback_data, **kwargs
-                  await self._trigger_timer_callback(timer_data['type'], timer_data.get('callback_data', {}), **kwargs) # Передаем kwargs из process_tick
-
-                  # TODO: Удалить таймер из кеша и БД после успешного срабатывания (или пометить как выполненный в БД)
-                  # Если is_active=False в кеше уже означает завершение,
-                  # а remove_timer сам удаляет из БД, то здесь просто вызываем remove_timer.
-                  # remove_timer принимает guild_id и timer_id
-                  await self.remove_timer(guild_id_str, timer_data['id'])
-
-
+                  # Передаем kwargs из process_tick (контекст WSP, включая guild_id и менеджеры)
+                  await self._trigger_timer_callback(timer_data['type'], timer_data.get('callback_data', {}), **kwargs)
              except Exception as e:
                   print(f"TimeManager: ❌ Error triggering timer callback for timer {timer_data.get('id', 'N/A')} ({timer_data.get('type', 'Unknown')}) for guild {guild_id_str}: {e}")
                   import traceback
                   print(traceback.format_exc())
-                  # TODO: Логика обработки ошибки срабатывания таймера - возможно, пометить таймер как ошибочный в БД?
+
+        # Сработавшие таймеры удаляются одним запросом (раньше - отдельный DELETE на каждый)
+        await self.remove_timers(guild_id_str, [t['id'] for t in timers_to_trigger])
 
         # print(f"TimeManager: Tick processing finished for guild {guild_id_str}.")
 
@@ -374,6 +441,16 @@ class TimeManager:
 
     # --- Методы персистентности (Используются PersistenceManager'ом) ---
 
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Set[str], Set[str]]:
+        guild_id_str = str(guild_id)
+        return set(self._dirty_timers.get(guild_id_str, ())), set(self._deleted_timer_ids.get(guild_id_str, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Set[str], Set[str]]) -> None:
+        guild_id_str = str(guild_id)
+        dirty_ids, deleted_ids = snapshot
+        if dirty_ids: self._dirty_timers.setdefault(guild_id_str, set()).update(dirty_ids)
+        if deleted_ids: self._deleted_timer_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+
     # ИСПРАВЛЕНИЕ: save_state должен принимать guild_id и **kwargs
     async def save_state(self, guild_id: str, **kwargs: Any) -> None:
         """
@@ -392,30 +469,34 @@ class TimeManager:
             current_game_time_for_guild = self._current_game_time.get(guild_id_str, 0.0)
 
             # Сохраняем текущее игровое время для этой гильдии в global_state
-            await self._db_service.adapter.execute(
-                "INSERT INTO global_state (key, value) VALUES ($1, $2) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
-                (f'game_time_{guild_id_str}', json.dumps(current_game_time_for_guild))
-            )
-            # execute уже коммитит (для этой одной операции)
+            # (через GlobalStateCache, чтобы копия в памяти и подписчики видели новое значение)
+            game_time_key = f'game_time_{guild_id_str}'
+            if self._global_state_cache is not None:
+                await self._global_state_cache.set(game_time_key, json.dumps(current_game_time_for_guild))
+            else:
+                await self._db_service.adapter.execute(
+                    "INSERT INTO global_state (key, value) VALUES ($1, $2) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+                    (game_time_key, json.dumps(current_game_time_for_guild))
+                )
 
 
-            # --- Сохранение активных таймеров для этой гильдии (в таблице timers) ---
-            # Удаляем ВСЕ таймеры для этой гильдии из БД перед вставкой
-            await self._db_service.adapter.execute("DELETE FROM timers WHERE guild_id = $1", (guild_id_str,))
-            # execute уже коммитит (для этой одной операции)
+            # --- Сохранение изменений таймеров для этой гильдии (в таблице timers) ---
+            # add_timer уже записал новые таймеры, поэтому пишем только дельту:
+            # отложенные удаления и таймеры, изменённые в памяти (mark_timer_dirty).
+            deleted_ids = self._deleted_timer_ids.pop(guild_id_str, set())
+            if deleted_ids:
+                try:
+                    await self._db_service.adapter.bulk_delete('timers', guild_id_str, list(deleted_ids))
+                except Exception:
+                    self._deleted_timer_ids.setdefault(guild_id_str, set()).update(deleted_ids)
+                    raise
 
-            # Вставляем все активные таймеры ИЗ КЕША, которые принадлежат этой гильдии
-            # Получаем пер-гильдийный кеш таймеров
             guild_timers_cache = self._active_timers.get(guild_id_str, {})
-
-            timers_to_save = [t for t in guild_timers_cache.values() if t.get('is_active', True)] # Фильтруем по is_active в кеше
+            dirty_ids = self._dirty_timers.pop(guild_id_str, set())
+            timers_to_save = [guild_timers_cache[t_id] for t_id in dirty_ids if t_id in guild_timers_cache and guild_timers_cache[t_id].get('is_active', True)]
 
             if timers_to_save:
-                sql = '''
-                    INSERT INTO timers (id, type, ends_at, callback_data, is_active, guild_id)
-                    VALUES ($1, $2, $3, $4, $5, $6)
-                    -- TODO: Добавить другие колонки в SQL
-                '''
+                columns = ['id', 'type', 'ends_at', 'callback_data', 'is_active', 'guild_id']
                 data_to_save = []
                 for timer_data in timers_to_save:
                     # Убедимся, что guild_id присутствует в данных таймера
@@ -428,20 +509,21 @@ class TimeManager:
                         timer_data['id'],
                         timer_data['type'],
                         timer_data['ends_at'],
-                        json.dumps(timer_data.get('callback_data', {})),
+                        timer_data.get('callback_data') or {},
                         bool(timer_data.get('is_active', True)), # Changed to boolean
                         timer_guild_id # <-- Параметр guild_id из данных таймера
-                        # TODO: Добавить другие параметры в кортеж
                     ))
-                # Используем execute_many для пакетной вставки таймеров
                 if data_to_save: # Только если есть что сохранять
-                     await self._db_service.adapter.execute_many(sql, data_to_save)
-                     # execute_many коммитит сам
+                     try:
+                          await self._db_service.adapter.bulk_upsert('timers', columns, data_to_save)
+                     except Exception:
+                          self._dirty_timers.setdefault(guild_id_str, set()).update(dirty_ids)
+                          raise
 
             # Note: При использовании execute и execute_many с авто-коммитом в каждом вызове,
             # нет необходимости в явном self._conn.commit() в конце save_state.
 
-            print(f"TimeManager: Successfully saved state for guild {guild_id_str} (time: {current_game_time_for_guild:.2f}, timers: {len(timers_to_save)}).")
+            print(f"TimeManager: Successfully saved state for guild {guild_id_str} (time: {current_game_time_for_guild:.2f}, timers upserted: {len(timers_to_save)}, deleted: {len(deleted_ids)}).")
 
         except Exception as e:
             print(f"TimeManager: ❌ Error during saving state for guild {guild_id_str}: {e}")
@@ -471,6 +553,9 @@ class TimeManager:
              # Если таймеры пер-гильдийные, очищаем или инициализируем кеш для этой гильдии
              self._active_timers.pop(guild_id_str, None)
              self._active_timers[guild_id_str] = {}
+             self._timer_heaps.pop(guild_id_str, None)
+             self._dirty_timers.pop(guild_id_str, None)
+             self._deleted_timer_ids.pop(guild_id_str, None)
 
              print(f"TimeManager: State is default after load (no DB adapter) for guild {guild_id_str}. Time = {self._current_game_time.get(guild_id_str, 0.0):.2f}, Timers = 0.")
              return
@@ -478,12 +563,16 @@ class TimeManager:
         try:
             # --- Загрузка текущего игрового времени для этой гильгии ---
             # Предполагаем, что время хранится per-guild в global_state с ключом 'game_time_<guild_id>'
-            sql_time = '''SELECT value FROM global_state WHERE key = $1'''
             key = f'game_time_{guild_id_str}'
-            row_time = await self._db_service.adapter.fetchone(sql_time, (key,)) # Changed from _db_adapter
-            if row_time and row_time['value']:
+            if self._global_state_cache is not None and self._global_state_cache.is_loaded:
+                saved_time = self._global_state_cache.get(key)
+            else:
+                sql_time = '''SELECT value FROM global_state WHERE key = $1'''
+                row_time = await self._db_service.adapter.fetchone(sql_time, (key,)) # Changed from _db_adapter
+                saved_time = row_time['value'] if row_time else None
+            if saved_time:
                 try:
-                    loaded_time = json.loads(row_time['value'])
+                    loaded_time = json.loads(saved_time)
                     # ИСПРАВЛЕНИЕ: Если игровое время пер-гильдийное, сохраняем его в Dict
                     self._current_game_time[guild_id_str] = float(loaded_time)
                     print(f"TimeManager: Loaded game time for guild {guild_id_str}: {self._current_game_time[guild_id_str]:.2f}")
@@ -502,6 +591,9 @@ class TimeManager:
             # Очищаем кеш таймеров ДЛЯ ЭТОЙ ГИЛЬДИИ перед загрузкой
             self._active_timers.pop(guild_id_str, None)
             self._active_timers[guild_id_str] = {} # Создаем пустой кеш для этой гильдии
+            self._timer_heaps.pop(guild_id_str, None)
+            self._dirty_timers.pop(guild_id_str, None)
+            self._deleted_timer_ids.pop(guild_id_str, None)
             guild_timers_cache = self._active_timers[guild_id_str] # Получаем ссылку на кеш гильдии
 
 
@@ -519,7 +611,7 @@ class TimeManager:
                                 'id': row['id'],
                                 'type': row['type'],
                                 'ends_at': float(row['ends_at']), # assumed REAL type in DB, ensure float
-                                'callback_data': json.loads(row['callback_data']) if row['callback_data'] else {},
+                                'callback_data': from_db_json(row['callback_data'], {}),
                                 'is_active': bool(row['is_active']), # Преобразуем 0/1 в bool
                                 # ДОБАВЛЕНО: Загружаем guild_id из БД в данные таймера
                                 'guild_id': row['guild_id'] # Сохраняем guild_id в данных таймера
@@ -534,6 +626,8 @@ class TimeManager:
                            print(traceback.format_exc())
 
 
+                 # heapify за O(n) вместо n вставок
+                 self._rebuild_timer_heap(guild_id_str)
                  print(f"TimeManager: Successfully loaded {len(guild_timers_cache)} active timers into cache for guild {guild_id_str}.")
 
             else:
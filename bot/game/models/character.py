@@ -1,7 +1,7 @@
 # В bot/game/models/character.py
 from __future__ import annotations
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 from dataclasses import dataclass, field # Import dataclass and field
 from bot.utils.i18n_utils import get_i18n_text # Import the new utility
 
@@ -65,6 +65,22 @@ class Character:
     # For now, we'll assume all relevant fields are explicitly defined.
     # extra_fields: Dict[str, Any] = field(default_factory=dict)
 
+    # Attributes reassigned since the last save (see CharacterManager.save_state). In-place changes
+    # of lists/dicts are not recorded here; the save path detects them by comparing fingerprints.
+    _changed_fields: Set[str] = field(default_factory=set, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        changed_fields = self.__dict__.get('_changed_fields')
+        if changed_fields is not None and not name.startswith('_'):
+            changed_fields.add(name)
+
+    def take_changed_fields(self) -> Set[str]:
+        """Returns the attributes changed since the previous call and resets the tracking."""
+        changed_fields = self._changed_fields
+        object.__setattr__(self, '_changed_fields', set())
+        return changed_fields
+
 
     def __post_init__(self):
         print(f"Character.__post_init__: Character {self.id} initialized. self.location_id: {self.location_id}, type: {type(self.location_id)}")
@@ -87,6 +103,17 @@ class Character:
             self.stats['max_mana'] = self.stats.get('mana', 50)
         if 'intelligence' not in self.stats:
             self.stats['intelligence'] = 10 # Default intelligence
+        # Normalisation above is not a change to persist.
+        self._changed_fields.clear()
+
+    @property
+    def current_location_id(self) -> Optional[str]:
+        """Alias for location_id under its players-table column name."""
+        return self.location_id
+
+    @current_location_id.setter
+    def current_location_id(self, value: Optional[str]) -> None:
+        self.location_id = value
 
     @property
     def name(self) -> str:
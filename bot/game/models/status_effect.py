@@ -24,12 +24,13 @@ class StatusEffect:
     # Тип сущности-цели ('Character', 'NPC', 'Location', 'Item', 'Combat', 'Party')
     target_type: str
 
-    # Оставшаяся длительность статус-эффекта в игровом времени (например, в минутах или тиках).
+    # Полная длительность статус-эффекта в игровом времени (например, в минутах или тиках).
+    # Не уменьшается в тиках: окончание вычисляется как applied_at + duration (см. expires_at).
     # None, если статус перманентный.
     duration: Optional[float] = None
 
     # Игровое время, когда статус был наложен.
-    # Используется для пересчета оставшейся длительности, если статус сохранялся/загружался.
+    # Вместе с duration задает абсолютное время окончания статуса.
     # Требуется только если duration не None.
     applied_at: Optional[float] = None
 
@@ -41,12 +42,33 @@ class StatusEffect:
     # Например, накопленный урон от яда/кровотечения, количество стаков, сила эффекта и т.п.
     state_variables: Dict[str, Any] = field(default_factory=dict)
 
+    # ID гильдии, к которой относится статус (StatusManager хранит и сохраняет статусы по гильдиям).
+    guild_id: Optional[str] = None
+
     # TODO: Добавьте другие поля, если необходимо для вашей логики статусов
     # Например:
     # is_active: bool = True # Флаг для логического удаления
     # applied_by_type: Optional[str] = None # Тип источника ('NPC', 'Item', 'Skill')
 
 
+    @property
+    def expires_at(self) -> Optional[float]:
+        """Абсолютное игровое время окончания (applied_at + duration) или None для перманентного статуса."""
+        if self.duration is None or self.applied_at is None:
+            return None
+        try:
+            return float(self.applied_at) + float(self.duration)
+        except (TypeError, ValueError):
+            return None
+
+    def remaining_duration(self, current_game_time: float) -> Optional[float]:
+        """Оставшаяся длительность относительно текущего игрового времени (None для перманентного статуса)."""
+        expires_at = self.expires_at
+        if expires_at is None:
+            return None
+        return max(0.0, expires_at - current_game_time)
+
+
     def to_dict(self) -> Dict[str, Any]:
         """Преобразует объект StatusEffect в словарь для сериализации."""
         # Используйте dataclasses.asdict() если не нужна спец. логика
@@ -62,6 +84,7 @@ class StatusEffect:
             'applied_at': self.applied_at,
             'source_id': self.source_id,
             'state_variables': self.state_variables,
+            'guild_id': self.guild_id,
             # TODO: Включите другие поля, если добавили
             # 'is_active': self.is_active,
             # 'applied_by_type': self.applied_by_type,
@@ -97,6 +120,7 @@ class StatusEffect:
 
         source_id = data.get('source_id') 
         state_variables = data.get('state_variables', {}) or {} 
+        guild_id = data.get('guild_id')
 
         return StatusEffect(
             id=str(status_id), # Ensure ID is string
@@ -107,6 +131,7 @@ class StatusEffect:
             applied_at=applied_at,
             source_id=str(source_id) if source_id is not None else None,
             state_variables=state_variables,
+            guild_id=str(guild_id) if guild_id is not None else None,
         )
 
 # Конец класса StatusEffect
@@ -60,9 +60,8 @@ class NpcMoveCompletionHandler(BaseNpcActionHandler): # Inherit from base (optio
              try:
                   # 1. Update the NPC's location in the NpcManager cache
                   print(f"NpcMoveCompletionHandler: Updating NPC {npc.id} location in cache from {old_location_id} to {target_location_id}.")
-                  npc.location_id = target_location_id
-                  # Mark the NPC as dirty via its manager
-                  self._npc_manager._dirty_npcs.add(npc.id)
+                  # NpcManager marks the NPC dirty and keeps the location occupancy index in sync
+                  await self._npc_manager.update_npc_location(npc.guild_id, npc.id, target_location_id)
 
                   # 2. Обработать триггеры OnExit для старой локации (если она была)
                   # Pass all managers/services from kwargs so triggers can use them
@@ -506,7 +506,7 @@ class PartyActionProcessor:
             if action_type == 'move':
                  # Party movement action completed. Party has arrived at the location.
                  target_location_id = callback_data.get('target_location_id')
-                 old_location_id = getattr(party, 'location_id', None) # Current location before update
+                 old_location_id = getattr(party, 'current_location_id', None) # Current location before update
 
                  # For movement, LocationManager must be available for triggers
                  if target_location_id and location_manager and hasattr(location_manager, 'handle_entity_arrival') and hasattr(location_manager, 'handle_entity_departure'): # Ensure trigger methods are available
@@ -514,9 +514,8 @@ class PartyActionProcessor:
                       # NOTE: Location is updated only ON COMPLETION of the long-duration move action.
                       # If the action is instant (duration <= 0), this happens in the same tick it was started.
                       print(f"PartyActionProcessor: Updating party {party_id} location in cache from {old_location_id} to {target_location_id}.")
-                      party.location_id = target_location_id
-                      # Mark the party as dirty via its manager
-                      self._party_manager._dirty_parties.add(party_id)
+                      # PartyManager marks the party dirty and keeps the location occupancy index in sync
+                      await self._party_manager.update_party_location(party_id, target_location_id, kwargs.get('guild_id'), context=kwargs)
 
                       # 2. Handle OnExit triggers for the old location (if there was one)
                       # Pass all managers/services from kwargs so triggers can use them
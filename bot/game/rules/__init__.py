@@ -1 +1 @@
-from .dice_roller import roll_dice
+from .dice_roller import roll_dice, roll_many, probability_at_least, parse_dice, DiceEngine, get_dice_engine, seed_dice
@@ -13,35 +13,11 @@ if TYPE_CHECKING:
     # from bot.game.models.npc import NPC
 
 from bot.game.models.check_models import DetailedCheckResult, CheckOutcome
+from bot.game.rules.dice_roller import roll_dice
 
 def _roll_dice_simple(dice_str: str) -> int:
-    # Very simple parser for NdX+M or NdX-M or NdX
-    dice_str = dice_str.replace(" ", "").lower()
-
-    modifier = 0
-    if '+' in dice_str:
-        parts, mod_str = dice_str.split('+', 1)
-        modifier = int(mod_str)
-        dice_str = parts
-    elif '-' in dice_str:
-        parts, mod_str = dice_str.split('-', 1)
-        modifier = -int(mod_str)
-        dice_str = parts
-
-    if 'd' not in dice_str: # Handle flat number like "5"
-        return int(dice_str) + modifier
-
-    num_dice_str, sides_str = dice_str.split('d', 1)
-    num_dice = int(num_dice_str) if num_dice_str else 1
-    sides = int(sides_str)
-
-    if sides <= 0: raise ValueError("Dice sides must be positive.")
-    if num_dice <=0: raise ValueError("Number of dice must be positive.")
-
-    total_roll = 0
-    for _ in range(num_dice):
-        total_roll += random.randint(1, sides)
-    return total_roll + modifier
+    # Total of an NdX+M / NdX-M / NdX expression or a flat number like "5"
+    return roll_dice(dice_str)[0]
 
 # perform_check should already be in this file
 def perform_check(
@@ -85,28 +61,12 @@ def perform_check(
 
     actor_raw_roll = 0
     try:
-        # Using the more robust _roll_dice_simple for consistency if formula is simple enough
-        # This assumes perform_check's formulas are also simple like "1d20" or "NdX"
-        if 'd' in result.actor_roll_formula.lower():
-             # _roll_dice_simple can handle "1d20", "2d6+3" etc.
-             # For perform_check, the base_die from config is usually just "1d20".
-             # If it's more complex, _roll_dice_simple might fail or misinterpret.
-             # The original logic was fine for "NdX" format.
-            num_dice_pd, die_type_pd = map(int, result.actor_roll_formula.lower().split('d'))
-            rolls = [random.randint(1, die_type_pd) for _ in range(num_dice_pd)]
-            actor_raw_roll = sum(rolls)
-            result.actor_rolls = rolls
-        else:
-            actor_raw_roll = int(result.actor_roll_formula) # Flat number "roll"
-            result.actor_rolls = [actor_raw_roll]
-    except ValueError: # Fallback if parsing above failed
-        try:
-            actor_raw_roll = _roll_dice_simple(result.actor_roll_formula)
-            result.actor_rolls = [actor_raw_roll] # _roll_dice_simple returns sum, not individual rolls for now
-        except Exception as e_simple_roll:
-            actor_raw_roll = random.randint(1, 20)
-            result.actor_rolls = [actor_raw_roll]
-            result.description = f"Note: Dice formula '{result.actor_roll_formula}' invalid ('{e_simple_roll}'), used 1d20."
+        actor_raw_roll, rolls = roll_dice(result.actor_roll_formula)
+        result.actor_rolls = rolls or [actor_raw_roll] # A flat number "roll" has no dice
+    except ValueError as e_roll:
+        actor_raw_roll = random.randint(1, 20)
+        result.actor_rolls = [actor_raw_roll]
+        result.description = f"Note: Dice formula '{result.actor_roll_formula}' invalid ('{e_roll}'), used 1d20."
 
 
     result.actor_total_roll_value = actor_raw_roll + modifier
@@ -1,5 +1,162 @@
+"""
+Dice engine shared by the rule engine, the combat rules and the check resolver.
+
+Expressions are parsed once into a DiceExpression and cached. A DiceEngine rolls them one at a time,
+in bulk (NumPy when it is installed) and answers probability queries such as P(total >= DC).
+"""
 import random
 import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, bulk rolls fall back to the random module
+    np = None
+
+# Expressions whose exact distribution has more (dice x sides) than this are estimated by sampling.
+EXACT_DISTRIBUTION_LIMIT = 2000
+DEFAULT_SAMPLES = 20000
+
+# [N]dX or [N]dF followed by any number of +M/-M modifiers, or a flat number like "5" or "-2".
+_DICE_PATTERN = re.compile(r"(?P<num_dice>\d*)d(?P<sides>\d+|f)(?P<modifiers>(?:[+\-]\d+)*)")
+_FLAT_PATTERN = re.compile(r"[+\-]?\d+")
+_MODIFIER_PATTERN = re.compile(r"([+\-])(\d+)")
+
+
+class DiceExpression(NamedTuple):
+    """A parsed dice expression. sides is "F" for Fudge/Fate dice (-1, 0, +1)."""
+    expression: str
+    num_dice: int
+    sides: Union[int, str]
+    modifier: int
+
+    @property
+    def faces(self) -> Tuple[int, int]:
+        """Lowest and highest face of one die."""
+        return (-1, 1) if self.sides == "F" else (1, int(self.sides))
+
+
+class DiceRoll(NamedTuple):
+    expression: DiceExpression
+    rolls: List[int]
+    total: int
+
+
+@lru_cache(maxsize=1024)
+def parse_dice(dice_string: str) -> DiceExpression:
+    """
+    Parses "NdX+M", "dX-M", "4dF", "2d6+3-1" or a flat number. N defaults to 1 and may be 0.
+
+    Raises:
+        ValueError: If the expression is invalid or a die has zero sides.
+    """
+    normalized = dice_string.replace(" ", "").lower()
+    match = _DICE_PATTERN.fullmatch(normalized)
+    if not match:
+        if _FLAT_PATTERN.fullmatch(normalized):
+            return DiceExpression(dice_string, 0, 1, int(normalized))
+        raise ValueError(
+            f"Invalid dice string format: '{dice_string}'. Expected format: NdX+M, NdX-M, NdF or a number"
+        )
+
+    num_dice = int(match.group("num_dice")) if match.group("num_dice") else 1
+    sides: Union[int, str] = "F" if match.group("sides") == "f" else int(match.group("sides"))
+    if sides == 0:
+        raise ValueError("Number of sides cannot be zero.")
+
+    modifier = 0
+    for operator, value in _MODIFIER_PATTERN.findall(match.group("modifiers")):
+        modifier += int(value) if operator == "+" else -int(value)
+    return DiceExpression(dice_string, num_dice, sides, modifier)
+
+
+class DiceEngine:
+    """
+    Rolls parsed dice expressions.
+
+    With a seed, single rolls use a private random.Random and bulk rolls a NumPy Generator, both
+    seeded, so results are reproducible. Without one the engine uses the global random module (so
+    random.seed() and patches of random.randint apply) and an unseeded Generator.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed(seed)
+
+    def seed(self, seed: Optional[int] = None) -> None:
+        self._random = random.Random(seed) if seed is not None else random
+        self._generator = np.random.default_rng(seed) if np is not None else None
+
+    def roll(self, dice_string: str) -> DiceRoll:
+        expression = parse_dice(dice_string)
+        low, high = expression.faces
+        rolls = [self._random.randint(low, high) for _ in range(expression.num_dice)]
+        return DiceRoll(expression, rolls, sum(rolls) + expression.modifier)
+
+    def roll_many(self, dice_string: str, times: int) -> Sequence[int]:
+        """Totals of `times` independent rolls: a NumPy int array, or a list when NumPy is not installed."""
+        expression = parse_dice(dice_string)
+        low, high = expression.faces
+        if self._generator is None:
+            return [
+                sum(self._random.randint(low, high) for _ in range(expression.num_dice)) + expression.modifier
+                for _ in range(times)
+            ]
+        faces = self._generator.integers(low, high + 1, size=(times, expression.num_dice))
+        return faces.sum(axis=1) + expression.modifier
+
+    def distribution(self, dice_string: str) -> Dict[int, float]:
+        """Exact total -> probability map of an expression."""
+        lowest, counts, outcomes = _exact_counts(parse_dice(dice_string))
+        return {lowest + offset: ways / outcomes for offset, ways in enumerate(counts)}
+
+    def probability_at_least(self, dice_string: str, target: int, samples: Optional[int] = None) -> float:
+        """
+        P(total >= target). Exact unless `samples` is given or the expression is too large
+        (see EXACT_DISTRIBUTION_LIMIT), in which case it is a Monte Carlo estimate.
+        """
+        expression = parse_dice(dice_string)
+        if samples is None and _is_exact_feasible(expression):
+            lowest, counts, outcomes = _exact_counts(expression)
+            return sum(counts[max(0, target - lowest):]) / outcomes
+        totals = self.roll_many(dice_string, samples or DEFAULT_SAMPLES)
+        if np is not None:
+            return float(np.count_nonzero(totals >= target)) / len(totals)
+        return sum(1 for total in totals if total >= target) / len(totals)
+
+
+def _is_exact_feasible(expression: DiceExpression) -> bool:
+    low, high = expression.faces
+    return expression.num_dice * (high - low + 1) <= EXACT_DISTRIBUTION_LIMIT
+
+
+@lru_cache(maxsize=256)
+def _exact_counts(expression: DiceExpression) -> Tuple[int, Tuple[int, ...], int]:
+    """(lowest total, ways to reach each total from the lowest upwards, number of outcomes)."""
+    low, high = expression.faces
+    face_count = high - low + 1
+    counts = [1]
+    for _ in range(expression.num_dice):
+        next_counts = [0] * (len(counts) + face_count - 1)
+        for offset, ways in enumerate(counts):
+            for face in range(face_count):
+                next_counts[offset + face] += ways
+        counts = next_counts
+    return expression.num_dice * low + expression.modifier, tuple(counts), face_count ** expression.num_dice
+
+
+_default_engine = DiceEngine()
+
+
+def get_dice_engine() -> DiceEngine:
+    """The process-wide engine used by roll_dice and the rules modules."""
+    return _default_engine
+
+
+def seed_dice(seed: Optional[int] = None) -> None:
+    """Reseeds the shared engine, e.g. for reproducible tests."""
+    _default_engine.seed(seed)
+
 
 def roll_dice(dice_string: str) -> tuple[int, list[int]]:
     """
@@ -8,8 +165,8 @@ def roll_dice(dice_string: str) -> tuple[int, list[int]]:
     Args:
         dice_string: The string representing the dice to roll.
             N is the number of dice (optional, defaults to 1).
-            X is the number of sides per die (required).
-            M is the modifier (optional, defaults to 0).
+            X is the number of sides per die (required), or F for Fudge dice.
+            M is the modifier (optional, defaults to 0). Several modifiers are summed.
 
     Returns:
         A tuple containing:
@@ -19,40 +176,13 @@ def roll_dice(dice_string: str) -> tuple[int, list[int]]:
     Raises:
         ValueError: If the dice_string is invalid.
     """
-    # Regex explanation:
-    # ^                  : Start of the string
-    # (\d*)              : Optional number of dice (Group 1, num_dice_str). Allows empty string e.g. "d20"
-    # d                  : Literal 'd' separating number of dice from sides
-    # (\d+)              : Number of sides (Group 2, num_sides_str). Must be present.
-    # (?:([+-])(\d+))?   : Optional non-capturing group for modifier
-    #   ([+-])           : Operator + or - (Group 3, operator)
-    #   (\d+)            : Modifier value (Group 4, modifier_str)
-    # $                  : End of the string
-    pattern = re.compile(r"^(\d*)d(\d+)(?:([+-])(\d+))?$")
-    match = pattern.match(dice_string)
+    result = _default_engine.roll(dice_string)
+    return result.total, result.rolls
 
-    if not match:
-        raise ValueError(
-            "Invalid dice string format. Expected format: NdX+M or NdX-M"
-        )
-
-    num_dice_str, num_sides_str, operator, modifier_str = match.groups()
-
-    num_dice = int(num_dice_str) if num_dice_str else 1
-    num_sides = int(num_sides_str)
 
-    if num_sides == 0:
-        raise ValueError("Number of sides cannot be zero.")
-
-    modifier = 0
-    if operator and modifier_str:
-        modifier_value = int(modifier_str)
-        if operator == "-":
-            modifier = -modifier_value
-        else:
-            modifier = modifier_value
+def roll_many(dice_string: str, times: int) -> Sequence[int]:
+    return _default_engine.roll_many(dice_string, times)
 
-    rolls = [random.randint(1, num_sides) for _ in range(num_dice)]
-    total_sum = sum(rolls) + modifier
 
-    return total_sum, rolls
+def probability_at_least(dice_string: str, target: int, samples: Optional[int] = None) -> float:
+    return _default_engine.probability_at_least(dice_string, target, samples)
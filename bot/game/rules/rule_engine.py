@@ -59,7 +59,7 @@ from bot.game.models.character import Character # Прямой импорт мо
 from bot.game.models.combat import Combat, CombatParticipant # Added Combat for method signature
 from bot.game.managers.time_manager import TimeManager # Added for runtime
 import bot.game.rules.combat_rules as combat_rules # Import the module
-# from bot.game.rules.dice_roller import roll_dice as external_roll_dice # Example if using external roller directly
+from bot.game.rules.dice_roller import get_dice_engine
 # from bot.game.models.spell import Spell # Not needed for runtime if only used in type hints within methods
 
 print("DEBUG: rule_engine.py module loaded.")
@@ -710,9 +710,12 @@ class RuleEngine:
         Parses a dice roll string (e.g., "2d6+3", "d20-1", "4dF"), simulates the roll,
         and returns a structured result.
 
+        The roll is logged to the game log only when context['log_dice_roll'] is true or when it is
+        sampled by the 'dice_roll_log_sample_rate' setting (0.0 by default, 1.0 logs every roll).
+
         Args:
             roll_string: The dice notation string.
-            context: Optional game context (unused in this method but included for consistency).
+            context: Optional game context; 'guild_id' and 'log_dice_roll' are read from it.
 
         Returns:
             A dictionary with roll details:
@@ -728,106 +731,36 @@ class RuleEngine:
         Raises:
             ValueError: If the roll_string is invalid.
         """
-        original_roll_string = roll_string # Keep original for return
-
-        # Attempt to get guild_id from context for logging, if available
-        guild_id_for_log = "UNKNOWN_GUILD"
-        if context and isinstance(context, dict) and 'guild_id' in context:
-            guild_id_for_log = str(context['guild_id'])
-
-        if self._game_log_manager:
-            # Using await here as log_event is async
-            await self._game_log_manager.log_event(
-                guild_id=guild_id_for_log, # May be "UNKNOWN_GUILD" if not in context
-                event_type="dice_roll_start",
-                message=f"Attempting to resolve dice roll: '{original_roll_string}'.",
-                metadata={"roll_string": original_roll_string}
-            )
-
-        # This method is now async, but random.randint is synchronous.
-        # For a truly async dice roller (e.g., using an external service or for complex simulation),
-        # this would involve `await` calls. For now, it's async for API consistency.
-        
-        # Using the parsing logic from the existing method, which is more complete
-        # than the external dice_roller.py's current simple NdX+M.
-        
-        roll_string = roll_string.lower().strip().replace(" ", "") # Normalize
-
-        # Regex to parse dice notation:
-        # (?P<num_dice>\d+)? - Optional number of dice
-        # d                       - The 'd' separator
-        # (?P<dice_sides>\d+|f)  - Number of sides (digits) or 'f' for Fudge/Fate dice
-        # ((?P<modifier_op>[+\-])(?P<modifier_val>\d+))? - Optional modifier group with operator and value
-        match = re.fullmatch(r"(?P<num_dice>\d*)d(?P<dice_sides>\d+|f)(?P<modifier_str>(?:[+\-]\d+)*)", roll_string)
-        # Modifier_str now captures multiple modifiers like +2-1
-
-        if not match:
-            # Try a simpler pattern if the main one fails (e.g. for just "d20")
-             match = re.fullmatch(r"d(?P<dice_sides>\d+|f)(?P<modifier_str>(?:[+\-]\d+)*)", roll_string)
-             if match: # Prepend num_dice = 1 if it's this simpler format
-                 parts_temp = match.groupdict()
-                 parts = {'num_dice': '1', **parts_temp}
-             else: # If still no match
-                 raise ValueError(f"Invalid dice roll string format: '{original_roll_string}'")
-        else:
-            parts = match.groupdict()
-
-
-        num_dice_str = parts.get('num_dice')
-        num_dice = int(num_dice_str) if num_dice_str else 1 # Default to 1 die if not specified (e.g. "d20")
-        
-        dice_sides_str = parts['dice_sides']
-        
-        # Parse complex modifiers like +2-1+5
-        modifier = 0
-        modifier_str_captured = parts.get('modifier_str', "")
-        if modifier_str_captured:
-            # Find all occurrences of operator and number (e.g., "+5", "-2")
-            modifier_parts = re.findall(r"([+\-])(\d+)", modifier_str_captured)
-            for op, val_str in modifier_parts:
-                val = int(val_str)
-                if op == '+':
-                    modifier += val
-                elif op == '-':
-                    modifier -= val
-        
-        rolls = []
-        calculated_dice_sides: Union[int, str] = 0
-
-        if dice_sides_str == 'f': # Fudge/Fate dice
-            calculated_dice_sides = "F"
-            for _ in range(num_dice):
-                # Standard Fudge dice roll: 3dF -> 3 dice, each -1, 0, or +1
-                roll = random.randint(1, 3) - 2 
-                rolls.append(roll)
-        else:
-            calculated_dice_sides = int(dice_sides_str)
-            if calculated_dice_sides <= 0:
-                raise ValueError("Dice sides must be a positive integer.")
-            for _ in range(num_dice):
-                rolls.append(random.randint(1, calculated_dice_sides))
-        
-        total = sum(rolls) + modifier
+        dice_roll = get_dice_engine().roll(roll_string)
 
         result_payload = {
-            'roll_string': original_roll_string,
-            'num_dice': num_dice,
-            'dice_sides': calculated_dice_sides,
-            'rolls': rolls,
-            'modifier': modifier,
-            'total': total,
+            'roll_string': roll_string,
+            'num_dice': dice_roll.expression.num_dice,
+            'dice_sides': dice_roll.expression.sides,
+            'rolls': dice_roll.rolls,
+            'modifier': dice_roll.expression.modifier,
+            'total': dice_roll.total,
         }
 
-        if self._game_log_manager:
+        if self._game_log_manager and self._should_log_dice_roll(context):
+            guild_id_for_log = "UNKNOWN_GUILD"
+            if context and isinstance(context, dict) and 'guild_id' in context:
+                guild_id_for_log = str(context['guild_id'])
             await self._game_log_manager.log_event(
                 guild_id=guild_id_for_log,
                 event_type="dice_roll_result",
-                message=f"Dice roll '{original_roll_string}' resolved. Total: {total}. Rolls: {rolls}, Mod: {modifier}.",
+                message=f"Dice roll '{roll_string}' resolved. Total: {dice_roll.total}. Rolls: {dice_roll.rolls}, Mod: {dice_roll.expression.modifier}.",
                 metadata=result_payload # Log the full result
             )
 
         return result_payload
 
+    def _should_log_dice_roll(self, context: Optional[Dict[str, Any]]) -> bool:
+        if context and isinstance(context, dict) and context.get('log_dice_roll'):
+            return True
+        sample_rate = float(self._settings.get('dice_roll_log_sample_rate', 0.0))
+        return sample_rate > 0.0 and random.random() < sample_rate
+
     async def resolve_steal_attempt(self, stealer_char: Character, target_entity: Any, context: Dict[str, Any]) -> Dict[str, Any]:
         """
         Resolves a steal attempt from a target entity.
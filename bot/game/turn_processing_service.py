@@ -1,9 +1,10 @@
 from __future__ import annotations
 import json
+import time
 import traceback
 import asyncio # Added for asyncio.sleep
 import uuid # Added for action_id_log fallback
-from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable, Awaitable
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Callable, Awaitable, Tuple
 
 if TYPE_CHECKING:
     from bot.game.managers.character_manager import CharacterManager
@@ -20,9 +21,12 @@ if TYPE_CHECKING:
     from bot.game.managers.inventory_manager import InventoryManager
     from bot.game.managers.equipment_manager import EquipmentManager
     from bot.game.managers.item_manager import ItemManager # Added for USE_ITEM
+    from bot.services.action_buffer import ActionBuffer, CollectedAction
 
 from bot.database.models import PendingConflict
 from bot.ai.rules_schema import CoreGameRulesConfig
+from bot.utils.tick_profiler import TICK_PROFILER
+from bot.game.turn_readiness_queue import REASON_END_TURN
 
 class TurnProcessingService:
     def __init__(self,
@@ -39,7 +43,8 @@ class TurnProcessingService:
                  inventory_manager: InventoryManager,
                  equipment_manager: EquipmentManager,
                  item_manager: ItemManager, # Added for USE_ITEM
-                 settings: Dict[str, Any]):
+                 settings: Dict[str, Any],
+                 action_buffer: Optional[ActionBuffer] = None):
         self.character_manager = character_manager
         self.conflict_resolver = conflict_resolver
         self.rule_engine = rule_engine
@@ -54,47 +59,55 @@ class TurnProcessingService:
         self.equipment_manager = equipment_manager
         self.item_manager = item_manager # Added for USE_ITEM
         self.settings = settings
+        self.action_buffer = action_buffer
         print("TurnProcessingService initialized.")
 
-    async def run_turn_cycle_check(self, guild_id: str) -> None:
-        # ... (existing run_turn_cycle_check logic - assuming it's correct) ...
-        print(f"TurnProcessingService: Starting turn cycle check for guild {guild_id}.")
-        await self.game_log_manager.log_event(
-            guild_id=guild_id,
-            event_type="turn_cycle_check_start",
-            message=f"Turn cycle check started for guild {guild_id}.",
-            metadata={"guild_id": guild_id}
-        )
-        all_characters_in_guild = await self.character_manager.get_all_characters(guild_id)
-        if not all_characters_in_guild:
-            print(f"TurnProcessingService: No characters found in guild {guild_id} during turn cycle check.")
-            await self.game_log_manager.log_event(guild_id, "turn_cycle_no_characters", "No characters in guild.")
-            return
-
-        pending_players = [
-            p for p in all_characters_in_guild
-            if hasattr(p, 'current_game_status') and p.current_game_status == 'ожидание_обработки'
-        ]
-        if not pending_players:
-            print(f"TurnProcessingService: No players awaiting turn processing in guild {guild_id}.")
-            await self.game_log_manager.log_event(guild_id, "turn_cycle_no_pending_players", "No players awaiting processing.")
+    async def run_turn_cycle_check(self, guild_id: str, player_ids: Optional[List[str]] = None) -> None:
+        """
+        Processes the turns of players awaiting processing ('ожидание_обработки').
+
+        player_ids are the candidates taken from the TurnReadinessQueue; without them every character
+        in the guild is scanned. Nothing is logged to game_logs unless at least one turn is processed.
+        """
+        if player_ids is None:
+            all_characters_in_guild = self.character_manager.get_all_characters(guild_id)
+            player_ids = [
+                p.id for p in (all_characters_in_guild or [])
+                if hasattr(p, 'current_game_status') and p.current_game_status == 'ожидание_обработки'
+            ]
+        if not player_ids:
             return
 
-        player_ids_to_process = [p.id for p in pending_players]
         updated_char_ids_for_processing = []
-        for player_id in player_ids_to_process:
-            char = await self.character_manager.get_character(guild_id, player_id)
+        for player_id in player_ids:
+            char = self.character_manager.get_character(guild_id, player_id)
             if char and getattr(char, 'current_game_status', '') == 'ожидание_обработки':
                 char.current_game_status = 'обрабатывается' # type: ignore
                 self.character_manager.mark_character_dirty(guild_id, player_id)
                 updated_char_ids_for_processing.append(player_id)
 
         if not updated_char_ids_for_processing:
-            await self.game_log_manager.log_event(guild_id, "turn_cycle_no_players_updated", "No players updated to processing state.")
+            print(f"TurnProcessingService: No players awaiting turn processing in guild {guild_id}.")
             return
-        await self.game_manager.save_game_state_after_action(guild_id, reason="Pre-turn processing status update")
-
-        await self.process_player_turns(updated_char_ids_for_processing, guild_id)
+        print(f"TurnProcessingService: Starting turn cycle for {len(updated_char_ids_for_processing)} players in guild {guild_id}.")
+        try:
+            await self.game_log_manager.log_event(
+                guild_id=guild_id,
+                event_type="turn_cycle_check_start",
+                message=f"Turn cycle check started for guild {guild_id}.",
+                metadata={"guild_id": guild_id, "player_ids": updated_char_ids_for_processing}
+            )
+            await self.game_manager.save_game_state_after_action(guild_id, reason="Pre-turn processing status update")
+
+            await self.process_player_turns(updated_char_ids_for_processing, guild_id)
+        except Exception:
+            # Персонажи в статусе 'обрабатывается' больше не попадут в цикл - возвращаем их в ожидание.
+            for player_id in updated_char_ids_for_processing:
+                char = self.character_manager.get_character(guild_id, player_id)
+                if char and getattr(char, 'current_game_status', '') == 'обрабатывается':
+                    char.current_game_status = 'ожидание_обработки' # type: ignore
+                    self.character_manager.mark_character_dirty(guild_id, player_id)
+            raise
 
         await self.game_log_manager.log_event(
             guild_id=guild_id, event_type="turn_cycle_check_end",
@@ -104,6 +117,30 @@ class TurnProcessingService:
 
 
     async def process_player_turns(self, player_ids: List[str], guild_id: str) -> Dict[str, Any]:
+        # character_id -> (actions drained from the buffer, legacy collected_actions_json)
+        taken_actions: Dict[str, Tuple[List[CollectedAction], Optional[str]]] = {}
+        with TICK_PROFILER.measure('turns.process_player_turns', guild_id):
+            try:
+                return await self._process_player_turns(player_ids, guild_id, taken_actions)
+            except Exception:
+                # The caller re-enqueues the players; their actions must be there when they are retried.
+                self._return_taken_actions(guild_id, taken_actions)
+                raise
+
+    def _return_taken_actions(self, guild_id: str, taken_actions: Dict[str, Tuple[List[CollectedAction], Optional[str]]]) -> None:
+        """Gives actions taken for a turn that never executed them back to their characters."""
+        for char_id, (buffered, legacy_json) in taken_actions.items():
+            if self.action_buffer and buffered:
+                self.action_buffer.restore(guild_id, char_id, buffered)
+            if legacy_json:
+                char = self.character_manager.get_character(guild_id, char_id)
+                if char and not getattr(char, 'collected_actions_json', None):
+                    setattr(char, 'collected_actions_json', legacy_json)
+                    self.character_manager.mark_character_dirty(guild_id, char_id)
+        taken_actions.clear()
+
+    async def _process_player_turns(self, player_ids: List[str], guild_id: str,
+                                    taken_actions: Dict[str, Tuple[List[CollectedAction], Optional[str]]]) -> Dict[str, Any]:
         print(f"TurnProcessingService: Starting to process turns for players {player_ids} in guild {guild_id}.")
         player_actions_map: Dict[str, List[Dict[str, Any]]] = {}
         turn_feedback_reports: Dict[str, List[str]] = {pid: [] for pid in player_ids}
@@ -111,33 +148,38 @@ class TurnProcessingService:
         action_read_delay = self.settings.get("turn_processing_action_read_delay", 0.1)
 
         for player_id in player_ids:
-            char = await self.character_manager.get_character(guild_id, player_id)
+            char = self.character_manager.get_character(guild_id, player_id)
             if not char:
                 turn_feedback_reports[player_id].append("Error: Your character data was not found.")
                 continue
 
+            # Actions collected in memory are taken as-is; collected_actions_json is only read for
+            # actions stored before the buffer existed.
+            drained = self.action_buffer.drain(guild_id, char.id) if self.action_buffer else []
+            buffered_actions = [a.to_dict() for a in drained]
             raw_actions_json = getattr(char, 'collected_actions_json', None)
+            taken_actions[char.id] = (drained, raw_actions_json)
             if raw_actions_json:
                 try:
                     actions = json.loads(raw_actions_json)
                     if isinstance(actions, list) and all(isinstance(act, dict) for act in actions):
-                        player_actions_map[char.id] = actions
+                        player_actions_map[char.id] = actions + buffered_actions
                         setattr(char, 'collected_actions_json', None)
                         self.character_manager.mark_character_dirty(guild_id, char.id)
                     else:
                         turn_feedback_reports[player_id].append("Warning: Your collected actions were in an invalid format.")
-                        player_actions_map[char.id] = []
+                        player_actions_map[char.id] = buffered_actions
                 except json.JSONDecodeError:
                     turn_feedback_reports[player_id].append("Error: Could not parse your collected actions.")
-                    player_actions_map[char.id] = []
+                    player_actions_map[char.id] = buffered_actions
             else:
-                player_actions_map[char.id] = []
+                player_actions_map[char.id] = buffered_actions
 
         if not player_actions_map or all(not v for v in player_actions_map.values()):
              for pid in player_ids:
                 if not turn_feedback_reports[pid]: turn_feedback_reports[pid].append("Вы не подали никаких действий в этом ходу.")
              for player_id_status_update in player_ids:
-                char_to_update = await self.character_manager.get_character(guild_id, player_id_status_update)
+                char_to_update = self.character_manager.get_character(guild_id, player_id_status_update)
                 if char_to_update:
                     setattr(char_to_update, 'current_game_status', "turn_processed_no_actions")
                     self.character_manager.mark_character_dirty(guild_id, player_id_status_update)
@@ -152,14 +194,19 @@ class TurnProcessingService:
             print(f"TPS: CRITICAL - rules_config not available for guild {guild_id}. Aborting turn processing.")
             for pid in player_ids:
                 turn_feedback_reports[pid].append("Критическая ошибка: правила игры не загружены. Обработка хода прервана.")
-                char_to_update_err = await self.character_manager.get_character(guild_id, pid)
+                char_to_update_err = self.character_manager.get_character(guild_id, pid)
                 if char_to_update_err:
                     setattr(char_to_update_err, 'current_game_status', "ожидание_обработки")
                     self.character_manager.mark_character_dirty(guild_id, pid)
+            # Статус снова 'ожидание_обработки', но очередь уже выдала этих игроков: возвращаем их действия
+            # и ставим их в очередь повторно, иначе ход завис бы.
+            self._return_taken_actions(guild_id, taken_actions)
+            self.game_manager.turn_readiness_queue.retry_later(guild_id, player_ids, REASON_END_TURN)
             await self.game_manager.save_game_state_after_action(guild_id, reason="Turn processing aborted, no rules_config")
             return {"status": "error_no_rules_config", "feedback_per_player": turn_feedback_reports}
 
-        analysis_result = await self.conflict_resolver.analyze_actions_for_conflicts(player_actions_map, guild_id, rules_config)
+        with TICK_PROFILER.measure('turns.conflict_analysis', guild_id):
+            analysis_result = await self.conflict_resolver.analyze_actions_for_conflicts(player_actions_map, guild_id, rules_config)
         for auto_res_outcome in analysis_result.get("auto_resolution_outcomes", []):
             all_processed_action_results.append(auto_res_outcome)
             res_char_id = auto_res_outcome.get("character_id")
@@ -171,12 +218,14 @@ class TurnProcessingService:
             pass
 
         actions_to_execute = analysis_result.get("actions_to_execute", [])
+        # From here on the actions are executed: a later failure must not hand them back for a second run.
+        taken_actions.clear()
         for action_item_context in actions_to_execute:
             char_id_acting = action_item_context.get("character_id")
             action_data = action_item_context.get("action_data")
             if not char_id_acting or not action_data: continue
 
-            acting_char = await self.character_manager.get_character(guild_id, char_id_acting)
+            acting_char = self.character_manager.get_character(guild_id, char_id_acting)
             if not acting_char:
                 turn_feedback_reports[char_id_acting].append("Ошибка: Ваш персонаж не найден для выполнения действия.")
                 continue
@@ -188,6 +237,7 @@ class TurnProcessingService:
             db_service = self.game_manager.db_service
             transaction_begun = False
             normalized_intent_type = intent_type.upper()
+            action_started = time.perf_counter()
 
             try:
                 if normalized_intent_type == "MOVE":
@@ -220,11 +270,11 @@ class TurnProcessingService:
                     actual_target_entity_obj = None
                     if target_entity_data:
                         if target_entity_data.get("type") == "character" or target_entity_data.get("type") == "player_character":
-                            actual_target_entity_obj = await self.character_manager.get_character(guild_id, target_entity_data.get("id"))
+                            actual_target_entity_obj = self.character_manager.get_character(guild_id, target_entity_data.get("id"))
                         elif target_entity_data.get("type") == "npc":
                             # Assuming NpcManager has get_npc method
                             if hasattr(self.character_action_processor, '_npc_manager') and self.character_action_processor._npc_manager: # type: ignore
-                                actual_target_entity_obj = await self.character_action_processor._npc_manager.get_npc(guild_id, target_entity_data.get("id")) # type: ignore
+                                actual_target_entity_obj = self.character_action_processor._npc_manager.get_npc(guild_id, target_entity_data.get("id")) # type: ignore
 
                     if item_entity and item_entity.get("id"):
                         item_id_from_nlu = item_entity.get("id")
@@ -322,6 +372,7 @@ class TurnProcessingService:
                 if transaction_begun and db_service and hasattr(db_service, 'is_transaction_active') and db_service.is_transaction_active(): # type: ignore
                     print(f"TPS: WARNING - Transaction for action {action_id_log} ({normalized_intent_type}) was still active in finally block. Rolling back.")
                     await db_service.rollback_transaction()
+                TICK_PROFILER.record(f"turns.action.{normalized_intent_type.lower()}", time.perf_counter() - action_started, guild_id)
 
             await self.game_log_manager.log_event(
                 guild_id=guild_id, event_type="action_executed",
@@ -336,7 +387,7 @@ class TurnProcessingService:
                 await self.game_manager.save_game_state_after_action(guild_id, reason=f"Post-action: {normalized_intent_type}")
 
         for player_id_status_update in player_ids:
-            char_to_update = await self.character_manager.get_character(guild_id, player_id_status_update)
+            char_to_update = self.character_manager.get_character(guild_id, player_id_status_update)
             if char_to_update:
                 final_status = "turn_processed"
                 player_actions_this_turn = [res for res in all_processed_action_results if res.get("character_id") == player_id_status_update]
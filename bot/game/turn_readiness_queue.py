@@ -0,0 +1,101 @@
+# bot/game/turn_readiness_queue.py
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+# Почему персонаж стоит в очереди.
+REASON_ACTIONS = "actions"    # подал действия (обрабатываются на тике мира)
+REASON_END_TURN = "end_turn"  # завершил ход (/end_turn, статус 'ожидание_обработки')
+REASONS = (REASON_ACTIONS, REASON_END_TURN)
+
+DEFAULT_RETRY_DELAY_SECONDS = 10.0
+
+
+class TurnReadinessQueue:
+    """
+    Guilds and characters that have something for the turn scheduler to process.
+
+    Characters enqueue themselves when they submit actions (ActionBuffer) or end their turn; the
+    consumers take only the entries for their reason, so a cycle with nothing ready touches no guild,
+    character or game_logs row. An end-of-turn entry supersedes an actions entry for the same
+    character: processing the turn drains the character's actions as well.
+    """
+
+    def __init__(self):
+        # reason -> guild_id -> character ids in enqueue order
+        self._ready: Dict[str, Dict[str, Dict[str, None]]] = {reason: {} for reason in REASONS}
+        self._events: Dict[str, asyncio.Event] = {}
+
+    def mark_ready(self, guild_id: str, character_id: str, reason: str = REASON_ACTIONS) -> None:
+        if reason not in self._ready:
+            raise ValueError(f"Unknown turn readiness reason '{reason}'. Expected one of {REASONS}.")
+        guild_id, character_id = str(guild_id), str(character_id)
+        if reason == REASON_END_TURN:
+            self._remove(REASON_ACTIONS, guild_id, character_id)
+        elif character_id in self._ready[REASON_END_TURN].get(guild_id, {}):
+            return
+        self._ready[reason].setdefault(guild_id, {})[character_id] = None
+        self._event(reason).set()
+
+    def retry_later(self, guild_id: str, character_ids: Iterable[str], reason: str,
+                    delay: float = DEFAULT_RETRY_DELAY_SECONDS) -> None:
+        """
+        Re-enqueues characters whose processing failed or was aborted. The delay keeps a persistent
+        error (DB down, rules not loaded) from turning the scheduler into a busy loop.
+        """
+        if reason not in self._ready:
+            raise ValueError(f"Unknown turn readiness reason '{reason}'. Expected one of {REASONS}.")
+        character_ids = list(character_ids)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or delay <= 0:
+            self._mark_all_ready(guild_id, character_ids, reason)
+        else:
+            loop.call_later(delay, self._mark_all_ready, guild_id, character_ids, reason)
+
+    def _mark_all_ready(self, guild_id: str, character_ids: List[str], reason: str) -> None:
+        for character_id in character_ids:
+            self.mark_ready(guild_id, character_id, reason)
+
+    def discard(self, guild_id: str, character_id: str) -> None:
+        for reason in REASONS:
+            self._remove(reason, str(guild_id), str(character_id))
+
+    def _remove(self, reason: str, guild_id: str, character_id: str) -> None:
+        guild_entries = self._ready[reason].get(guild_id)
+        if guild_entries is None:
+            return
+        guild_entries.pop(character_id, None)
+        if not guild_entries:
+            del self._ready[reason][guild_id]
+
+    def ready_guilds(self, reason: str) -> List[str]:
+        return list(self._ready[reason])
+
+    def has_ready(self, reason: Optional[str] = None) -> bool:
+        reasons: Iterable[str] = REASONS if reason is None else (reason,)
+        return any(self._ready[r] for r in reasons)
+
+    def take(self, reason: str) -> Dict[str, List[str]]:
+        """Removes and returns {guild_id: [character_id, ...]} for one reason."""
+        taken = {guild_id: list(character_ids) for guild_id, character_ids in self._ready[reason].items()}
+        self._ready[reason] = {}
+        self._event(reason).clear()
+        return taken
+
+    async def wait(self, reason: str, timeout: Optional[float] = None) -> bool:
+        """Waits until an entry for the reason is enqueued; False on timeout."""
+        if self._ready[reason]:
+            return True
+        try:
+            await asyncio.wait_for(self._event(reason).wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return bool(self._ready[reason])
+
+    def _event(self, reason: str) -> asyncio.Event:
+        event = self._events.get(reason)
+        if event is None:
+            event = self._events[reason] = asyncio.Event()
+        return event
@@ -0,0 +1,67 @@
+# bot/game/utils/location_occupancy.py
+from typing import Dict, Optional, Set, Tuple
+
+CHARACTERS = "characters"
+NPCS = "npcs"
+PARTIES = "parties"
+
+
+class LocationOccupancyIndex:
+    """
+    Per-guild location -> {characters, npcs, parties} index, shared by the managers that move entities.
+
+    Same layout as ItemManager._items_by_location: guild_id -> location_id -> kind -> set of entity ids,
+    plus the reverse map so a move only touches the old and new location. Every method is synchronous,
+    so a move is applied in one step with no await in between.
+    """
+
+    def __init__(self):
+        self._by_location: Dict[str, Dict[str, Dict[str, Set[str]]]] = {}
+        self._location_of: Dict[str, Dict[Tuple[str, str], str]] = {}
+
+    def place(self, guild_id: str, kind: str, entity_id: str, location_id: Optional[str]) -> None:
+        """Records the entity at location_id, removing it from its previous location. None removes it entirely."""
+        guild_id_str, key = str(guild_id), (kind, str(entity_id))
+        new_location = str(location_id) if location_id else None
+        locations_of = self._location_of.setdefault(guild_id_str, {})
+        old_location = locations_of.get(key)
+        if old_location == new_location:
+            return
+        if old_location is not None:
+            self._discard(guild_id_str, kind, key[1], old_location)
+        if new_location is None:
+            locations_of.pop(key, None)
+            return
+        locations_of[key] = new_location
+        self._by_location.setdefault(guild_id_str, {}).setdefault(new_location, {}).setdefault(kind, set()).add(key[1])
+
+    def remove(self, guild_id: str, kind: str, entity_id: str) -> None:
+        self.place(guild_id, kind, entity_id, None)
+
+    def occupants(self, guild_id: str, location_id: str, kind: str) -> Set[str]:
+        return set(self._by_location.get(str(guild_id), {}).get(str(location_id), {}).get(kind, ()))
+
+    def location_of(self, guild_id: str, kind: str, entity_id: str) -> Optional[str]:
+        return self._location_of.get(str(guild_id), {}).get((kind, str(entity_id)))
+
+    def clear(self, guild_id: str, kind: Optional[str] = None) -> None:
+        """Forgets a guild, or only one kind of entity in it (each manager reloads its own entities)."""
+        guild_id_str = str(guild_id)
+        if kind is None:
+            self._by_location.pop(guild_id_str, None)
+            self._location_of.pop(guild_id_str, None)
+            return
+        locations_of = self._location_of.get(guild_id_str, {})
+        for key in [key for key in locations_of if key[0] == kind]:
+            self._discard(guild_id_str, kind, key[1], locations_of.pop(key))
+
+    def _discard(self, guild_id_str: str, kind: str, entity_id: str, location_id: str) -> None:
+        guild_locations = self._by_location.get(guild_id_str, {})
+        location_kinds = guild_locations.get(location_id)
+        if not location_kinds or kind not in location_kinds:
+            return
+        location_kinds[kind].discard(entity_id)
+        if not location_kinds[kind]:
+            location_kinds.pop(kind)
+        if not location_kinds:
+            guild_locations.pop(location_id)
@@ -1,10 +1,17 @@
 """
 Calculates effective character/NPC statistics based on base stats, items, and status effects.
 """
+import asyncio
 import json
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 
 from bot.ai.rules_schema import CoreGameRulesConfig, StatModifierRule, GrantedAbilityOrSkill
+from bot.utils.json_codec import dumps
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, batch stats fall back to the scalar pipeline
+    np = None
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -15,14 +22,20 @@ if TYPE_CHECKING:
     from bot.game.managers.status_manager import StatusManager
     from bot.game.models.character import Character
     from bot.game.models.npc import NPC as NpcModel
-    from bot.game.models.item import ItemTemplate # For item_manager.get_item_template
-    from bot.game.models.status_effect import StatusEffectTemplate # For status_manager.get_status_template
     from bot.game.models.status_effect import StatusEffect as StatusEffectInstance # For active statuses
     # This import was missing in the original file for the __main__ block, adding it here for completeness
     # although the __main__ block itself is commented out.
     from unittest.mock import MagicMock
 
 
+def _equipped_item_instances(entity: Any) -> List[Dict[str, Any]]:
+    raw_inventory = getattr(entity, 'inventory', None)
+    if isinstance(raw_inventory, str): raw_inventory = json.loads(raw_inventory or '[]')
+    if not isinstance(raw_inventory, list):
+        return []
+    return [item for item in raw_inventory if isinstance(item, dict) and item.get("equipped")]
+
+
 async def calculate_effective_stats(
     db_service: "DBService",
     guild_id: str,
@@ -44,23 +57,25 @@ async def calculate_effective_stats(
     6. Derived Stats.
     7. Collects granted abilities/skills throughout.
     """
-    raw_stats: Dict[str, Any] = {} # Holds initial stats + skills
-    granted_abilities_skills: List[GrantedAbilityOrSkill] = []
-
-    entity: Optional[Union["Character", "NpcModel"]] = None
-    if entity_type.lower() == "character" or entity_type.lower() == "player":
-        entity = await character_manager.get_character(guild_id, entity_id)
-        entity_type = "Character"
-    elif entity_type.lower() == "npc":
-        entity = await npc_manager.get_npc(guild_id, entity_id)
-        entity_type = "NPC"
-    else:
-        raise ValueError(f"Unknown entity_type: {entity_type}. Expected 'Character' or 'NPC'.")
+    entity_type = _normalize_entity_type(entity_type)
+    entity: Optional[Union["Character", "NpcModel"]] = _get_entity(guild_id, entity_id, entity_type, character_manager, npc_manager)
 
     if not entity:
         print(f"Error: Entity {entity_id} of type {entity_type} not found in guild {guild_id}.")
         return {}
 
+    raw_stats = _raw_stats(entity, entity_type, rules_config_data)
+    item_modifiers_all, status_modifiers_all, granted_abilities_skills = _collect_modifiers(
+        guild_id, entity_id, entity_type, entity, item_manager, status_manager
+    )
+    effective_stats = _apply_stat_modifiers(raw_stats, item_modifiers_all, status_modifiers_all, rules_config_data)
+    return _finish_effective_stats(effective_stats, granted_abilities_skills, rules_config_data)
+
+
+def _raw_stats(entity: Any, entity_type: str, rules_config_data: CoreGameRulesConfig) -> Dict[str, Any]:
+    """Base stat defaults, overridden by the entity's stored stats, plus its skills. Keys are lower-case."""
+    raw_stats: Dict[str, Any] = {} # Holds initial stats + skills
+
     # Initialize with base stat definitions (default values)
     for stat_id_key, stat_def in rules_config_data.base_stats.items():
         raw_stats[stat_id_key.lower()] = stat_def.default_value
@@ -86,27 +101,89 @@ async def calculate_effective_stats(
 
     for skill_name, value in base_skills_source.items():
         raw_stats[skill_name.lower()] = value
+    return raw_stats
 
-    # --- Stage 1: Apply Flat Bonuses ---
-    stats_after_flats = raw_stats.copy()
 
-    # Get item modifiers
-    equipped_item_instances = []
-    if hasattr(entity, 'inventory'):
-        raw_inventory = getattr(entity, 'inventory')
-        if isinstance(raw_inventory, str): raw_inventory = json.loads(raw_inventory or '[]')
-        if isinstance(raw_inventory, list):
-            equipped_item_instances = [item for item in raw_inventory if isinstance(item, dict) and item.get("equipped")]
+def _get_entity(
+    guild_id: str, entity_id: str, entity_type: str,
+    character_manager: "CharacterManager", npc_manager: "NpcManager"
+) -> Optional[Union["Character", "NpcModel"]]:
+    """The cached Character or NPC; entity_type is already normalized."""
+    if entity_type == "Character":
+        return character_manager.get_character(guild_id, entity_id)
+    return npc_manager.get_npc(guild_id, entity_id)
+
+
+def _template_effects(template: Any) -> Tuple[List[StatModifierRule], List[GrantedAbilityOrSkill]]:
+    """
+    stat_modifiers and grants_abilities_or_skills of an item or status template.
+    ItemManager and StatusManager return templates as dicts (model_dump of the rules definitions).
+    """
+    if isinstance(template, dict):
+        raw_modifiers = template.get('stat_modifiers')
+        raw_granted = template.get('grants_abilities_or_skills')
+    else:
+        raw_modifiers = getattr(template, 'stat_modifiers', None)
+        raw_granted = getattr(template, 'grants_abilities_or_skills', None)
+    modifiers = [
+        mod if isinstance(mod, StatModifierRule) else StatModifierRule(**mod)
+        for mod in (raw_modifiers if isinstance(raw_modifiers, list) else [])
+        if isinstance(mod, (StatModifierRule, dict))
+    ]
+    granted = [
+        gas if isinstance(gas, GrantedAbilityOrSkill) else GrantedAbilityOrSkill(**gas)
+        for gas in (raw_granted if isinstance(raw_granted, list) else [])
+        if isinstance(gas, (GrantedAbilityOrSkill, dict))
+    ]
+    return modifiers, granted
+
+
+def _collect_modifiers(
+    guild_id: str, entity_id: str, entity_type: str, entity: Any,
+    item_manager: "ItemManager", status_manager: "StatusManager",
+    template_memo: Optional[Dict[Tuple[str, Any], Any]] = None
+) -> Tuple[List[StatModifierRule], List[StatModifierRule], List[GrantedAbilityOrSkill]]:
+    """
+    Item and status modifiers (in application order) and granted abilities of an entity.
+    template_memo, when given, remembers template lookups across several entities.
+    """
+    if template_memo is None:
+        template_memo = {}
+    granted_abilities_skills: List[GrantedAbilityOrSkill] = []
 
     item_modifiers_all: List[StatModifierRule] = []
-    for item_instance_data in equipped_item_instances:
+    for item_instance_data in _equipped_item_instances(entity):
         template_id = item_instance_data.get("template_id")
-        item_template: Optional["ItemTemplate"] = await item_manager.get_item_template(guild_id, template_id) if template_id else None
-        if item_template:
-            if hasattr(item_template, 'stat_modifiers') and isinstance(item_template.stat_modifiers, list):
-                item_modifiers_all.extend(item_template.stat_modifiers)
-            if hasattr(item_template, 'grants_abilities_or_skills') and isinstance(item_template.grants_abilities_or_skills, list):
-                granted_abilities_skills.extend(item_template.grants_abilities_or_skills)
+        if not template_id:
+            continue
+        if ("item", template_id) not in template_memo:
+            template_memo[("item", template_id)] = _template_effects(item_manager.get_item_template(template_id))
+        modifiers, granted = template_memo[("item", template_id)]
+        item_modifiers_all.extend(modifiers)
+        granted_abilities_skills.extend(granted)
+
+    active_status_instances: List["StatusEffectInstance"] = status_manager.get_status_effects_for_target(guild_id, entity_id, entity_type)
+    status_modifiers_all: List[StatModifierRule] = []
+    for status_instance in active_status_instances:
+        status_type = status_instance.status_type
+        if ("status", status_type) not in template_memo:
+            template_memo[("status", status_type)] = _template_effects(status_manager.get_status_template(status_type))
+        modifiers, granted = template_memo[("status", status_type)]
+        status_modifiers_all.extend(modifiers)
+        granted_abilities_skills.extend(granted)
+
+    return item_modifiers_all, status_modifiers_all, granted_abilities_skills
+
+
+def _apply_stat_modifiers(
+    raw_stats: Dict[str, Any],
+    item_modifiers_all: List[StatModifierRule],
+    status_modifiers_all: List[StatModifierRule],
+    rules_config_data: CoreGameRulesConfig
+) -> Dict[str, Any]:
+    """Flat, percentage and multiplier stages followed by the stat caps, for a single entity."""
+    # --- Stage 1: Apply Flat Bonuses ---
+    stats_after_flats = raw_stats.copy()
 
     # Apply flat item bonuses
     for mod_rule in item_modifiers_all:
@@ -114,17 +191,6 @@ async def calculate_effective_stats(
             stat_key = mod_rule.stat_name.lower()
             stats_after_flats[stat_key] = stats_after_flats.get(stat_key, 0.0) + mod_rule.value
 
-    # Get status effect modifiers
-    active_status_instances: List["StatusEffectInstance"] = await status_manager.get_active_statuses_for_entity(guild_id, entity_id, entity_type)
-    status_modifiers_all: List[StatModifierRule] = []
-    for status_instance in active_status_instances:
-        status_template: Optional["StatusEffectTemplate"] = await status_manager.get_status_template(guild_id, status_instance.template_id)
-        if status_template:
-            if hasattr(status_template, 'stat_modifiers') and isinstance(status_template.stat_modifiers, list):
-                status_modifiers_all.extend(status_template.stat_modifiers)
-            if hasattr(status_template, 'grants_abilities_or_skills') and isinstance(status_template.grants_abilities_or_skills, list):
-                granted_abilities_skills.extend(status_template.grants_abilities_or_skills)
-
     # Apply flat status bonuses
     for mod_rule in status_modifiers_all:
         if mod_rule.bonus_type == "flat":
@@ -178,9 +244,18 @@ async def calculate_effective_stats(
             effective_stats[stat_key] = max(min_val, min(current_value, max_val))
             if isinstance(stat_def.default_value, int):
                  effective_stats[stat_key] = round(effective_stats[stat_key])
+    return effective_stats
+
 
+def _finish_effective_stats(
+    effective_stats: Dict[str, Any],
+    granted_abilities_skills: List[GrantedAbilityOrSkill],
+    rules_config_data: CoreGameRulesConfig
+) -> Dict[str, Any]:
+    """Derived stats and the granted abilities list, applied after the caps."""
     # --- Stage 5: Calculate Derived Stats ---
-    if rules_config_data.derived_stat_rules:
+    derived_stat_rules = getattr(rules_config_data, 'derived_stat_rules', None) # Not part of CoreGameRulesConfig yet
+    if derived_stat_rules:
         # This import is here because MagicMock is only used in this section,
         # which itself is only relevant if rules_config_data.derived_stat_rules exists.
         # If this section were active, and MagicMock was needed for a default, it would be here.
@@ -191,8 +266,8 @@ async def calculate_effective_stats(
                                                                       MagicMock(default_value=10) if TYPE_CHECKING else type('obj', (object,), {'default_value': 10})()
                                                                      ).default_value
                                     )
-        hp_per_con = rules_config_data.derived_stat_rules.get('hp_per_constitution_point', 10.0)
-        base_hp_offset = rules_config_data.derived_stat_rules.get('base_hp_offset', 0.0)
+        hp_per_con = derived_stat_rules.get('hp_per_constitution_point', 10.0)
+        base_hp_offset = derived_stat_rules.get('base_hp_offset', 0.0)
 
         max_hp_base_default_obj = rules_config_data.base_stats.get("MAX_HP")
         max_hp_base_default = max_hp_base_default_obj.default_value if max_hp_base_default_obj else 0.0
@@ -203,6 +278,279 @@ async def calculate_effective_stats(
     effective_stats['granted_abilities_skills'] = [gas.model_dump(mode='python') for gas in granted_abilities_skills]
     return effective_stats
 
+
+async def calculate_effective_stats_batch(
+    db_service: "DBService",
+    guild_id: str,
+    entities: List[Tuple[str, str]],
+    rules_config_data: CoreGameRulesConfig,
+    character_manager: "CharacterManager",
+    npc_manager: "NpcManager",
+    item_manager: "ItemManager",
+    status_manager: "StatusManager"
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Calculates effective stats for many (entity_id, entity_type) pairs at once, keyed by entity id.
+
+    Each result is identical to calculate_effective_stats for that entity ({} when it is not found).
+    Item and status templates are looked up once per batch, and the flat, percentage, multiplier and
+    cap stages run as array operations over all entities when NumPy is installed.
+    """
+    template_memo: Dict[Tuple[str, Any], Any] = {}
+    results: Dict[str, Dict[str, Any]] = {}
+    found_ids: List[str] = []
+    inputs: List[Tuple[Dict[str, Any], List[StatModifierRule], List[StatModifierRule]]] = []
+    granted: List[List[GrantedAbilityOrSkill]] = []
+
+    for entity_id, entity_type in entities:
+        kind = _normalize_entity_type(entity_type)
+        results[entity_id] = {}
+        entity = _get_entity(guild_id, entity_id, kind, character_manager, npc_manager)
+        if not entity:
+            print(f"Error: Entity {entity_id} of type {kind} not found in guild {guild_id}.")
+            continue
+        item_modifiers, status_modifiers, granted_abilities_skills = _collect_modifiers(
+            guild_id, entity_id, kind, entity, item_manager, status_manager, template_memo
+        )
+        found_ids.append(entity_id)
+        inputs.append((_raw_stats(entity, kind, rules_config_data), item_modifiers, status_modifiers))
+        granted.append(granted_abilities_skills)
+
+    for entity_id, effective_stats, granted_abilities_skills in zip(
+        found_ids, _apply_stat_modifiers_batch(inputs, rules_config_data), granted
+    ):
+        results[entity_id] = _finish_effective_stats(effective_stats, granted_abilities_skills, rules_config_data)
+    return results
+
+
+def _apply_stat_modifiers_batch(
+    inputs: List[Tuple[Dict[str, Any], List[StatModifierRule], List[StatModifierRule]]],
+    rules_config_data: CoreGameRulesConfig
+) -> List[Dict[str, Any]]:
+    """_apply_stat_modifiers for several entities. Entities with non-numeric stats take the scalar path."""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(inputs)
+    vector_rows: List[int] = []
+    for row, (raw_stats, item_modifiers, status_modifiers) in enumerate(inputs):
+        if np is not None and all(isinstance(value, (int, float)) for value in raw_stats.values()):
+            vector_rows.append(row)
+        else:
+            results[row] = _apply_stat_modifiers(raw_stats, item_modifiers, status_modifiers, rules_config_data)
+    if vector_rows:
+        vectorized = _apply_stat_modifiers_vectorized([inputs[row] for row in vector_rows], rules_config_data)
+        for row, effective_stats in zip(vector_rows, vectorized):
+            results[row] = effective_stats
+    return results  # type: ignore[return-value]
+
+
+def _apply_stat_modifiers_vectorized(
+    inputs: List[Tuple[Dict[str, Any], List[StatModifierRule], List[StatModifierRule]]],
+    rules_config_data: CoreGameRulesConfig
+) -> List[Dict[str, Any]]:
+    """
+    NumPy version of _apply_stat_modifiers: one row per entity, one column per stat key.
+
+    Modifiers are applied by rank (the k-th modifier of every entity in one array operation), which
+    keeps the per-entity order of float operations and therefore the exact scalar results.
+    """
+    columns: Dict[str, int] = {}
+    key_orders: List[List[str]] = []
+    modified_keys: List[set] = []
+    # stage -> (row, rank, column, value) for every modifier of that stage
+    stages: Dict[str, List[Tuple[int, int, int, float]]] = {"flat": [], "percentage_increase": [], "item_multiplier": [], "status_multiplier": []}
+
+    for row, (raw_stats, item_modifiers, status_modifiers) in enumerate(inputs):
+        key_order = list(raw_stats)
+        seen = set(key_order)
+        modified = set()
+        for stage, modifiers, bonus_type in (
+            ("flat", item_modifiers + status_modifiers, "flat"),
+            ("percentage_increase", item_modifiers + status_modifiers, "percentage_increase"),
+            ("item_multiplier", item_modifiers, "multiplier"),
+            ("status_multiplier", status_modifiers, "multiplier"),
+        ):
+            rank = 0
+            for mod_rule in modifiers:
+                if mod_rule.bonus_type != bonus_type:
+                    continue
+                stat_key = mod_rule.stat_name.lower()
+                if stat_key not in seen:
+                    seen.add(stat_key)
+                    key_order.append(stat_key)
+                modified.add(stat_key)
+                stages[stage].append((row, rank, columns.setdefault(stat_key, len(columns)), mod_rule.value))
+                rank += 1
+        for stat_key in raw_stats:
+            columns.setdefault(stat_key, len(columns))
+        key_orders.append(key_order)
+        modified_keys.append(modified)
+
+    base = np.zeros((len(inputs), len(columns)), dtype=np.float64)
+    for row, (raw_stats, _, _) in enumerate(inputs):
+        for stat_key, value in raw_stats.items():
+            base[row, columns[stat_key]] = value
+
+    def by_rank(stage: str):
+        entries = stages[stage]
+        if not entries:
+            return
+        rows, ranks, cols, values = (np.array(part) for part in zip(*entries))
+        values = values.astype(np.float64)
+        for rank in range(int(ranks.max()) + 1):
+            selected = ranks == rank
+            yield rows[selected], cols[selected], values[selected]
+
+    after_flats = base.copy()
+    for rows, cols, values in by_rank("flat"):
+        after_flats[rows, cols] += values
+
+    after_percentages = after_flats.copy()
+    for rows, cols, values in by_rank("percentage_increase"):
+        after_percentages[rows, cols] += after_flats[rows, cols] * (values / 100.0)
+
+    effective = after_percentages.copy()
+    for rows, cols, values in by_rank("item_multiplier"):
+        effective[rows, cols] = after_percentages[rows, cols] * values
+    for rows, cols, values in by_rank("status_multiplier"):
+        effective[rows, cols] *= values
+
+    # Caps, in rules order; a later definition of the same key decides whether it is rounded.
+    capped_columns: Dict[int, bool] = {}
+    for stat_id_key, stat_def in rules_config_data.base_stats.items():
+        col = columns.get(stat_id_key.lower())
+        if col is None:
+            continue
+        effective[:, col] = np.maximum(float(stat_def.min_value), np.minimum(effective[:, col], float(stat_def.max_value)))
+        is_int = isinstance(stat_def.default_value, int)
+        if is_int:
+            effective[:, col] = np.round(effective[:, col])
+        capped_columns[col] = is_int
+
+    results: List[Dict[str, Any]] = []
+    for row, (raw_stats, _, _) in enumerate(inputs):
+        effective_stats: Dict[str, Any] = {}
+        for stat_key in key_orders[row]:
+            col = columns[stat_key]
+            if col in capped_columns:
+                value = float(effective[row, col])
+                effective_stats[stat_key] = int(value) if capped_columns[col] else value
+            elif stat_key in modified_keys[row]:
+                effective_stats[stat_key] = float(effective[row, col])
+            else:
+                effective_stats[stat_key] = raw_stats[stat_key]
+        results.append(effective_stats)
+    return results
+
+class EffectiveStatsCache:
+    """
+    Memoizes calculate_effective_stats per entity.
+
+    Each entry is stored with a version stamp of the calculator's inputs: base stats and skills,
+    equipped item templates, active statuses and the rules config object. The stamp only needs the
+    entity and its status list, so an unchanged entity skips the template lookups and the whole
+    modifier pipeline. Requests for the same entity made in the same event-loop tick share one
+    computation.
+    """
+
+    def __init__(self):
+        # guild_id -> (entity_type, entity_id) -> (rules_config, stamp, effective_stats)
+        self._entries: Dict[str, Dict[Tuple[str, str], Tuple[Any, Tuple, Dict[str, Any]]]] = {}
+        self._pending: Dict[Tuple[str, str, str], "asyncio.Future"] = {}
+
+    async def get_effective_stats(
+        self,
+        db_service: "DBService",
+        guild_id: str,
+        entity_id: str,
+        entity_type: str,
+        rules_config_data: CoreGameRulesConfig,
+        character_manager: "CharacterManager",
+        npc_manager: "NpcManager",
+        item_manager: "ItemManager",
+        status_manager: "StatusManager"
+    ) -> Dict[str, Any]:
+        """Same arguments and result as calculate_effective_stats. The returned dict is shared, do not modify it."""
+        kind = _normalize_entity_type(entity_type)
+        pending_key = (str(guild_id), kind, str(entity_id))
+        pending = self._pending.get(pending_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._refresh(
+                pending_key, db_service, rules_config_data,
+                character_manager, npc_manager, item_manager, status_manager
+            ))
+            self._pending[pending_key] = pending
+        return await asyncio.shield(pending)
+
+    def invalidate(self, guild_id: str, entity_id: Optional[str] = None, entity_type: Optional[str] = None) -> None:
+        """Drops one entity (or a whole guild) so the next request recomputes it."""
+        guild_entries = self._entries.get(str(guild_id))
+        if guild_entries is None:
+            return
+        if entity_id is None:
+            self._entries.pop(str(guild_id), None)
+            return
+        kinds = [_normalize_entity_type(entity_type)] if entity_type else ["Character", "NPC"]
+        for kind in kinds:
+            guild_entries.pop((kind, str(entity_id)), None)
+
+    async def _refresh(
+        self, pending_key: Tuple[str, str, str], db_service: "DBService", rules_config_data: CoreGameRulesConfig,
+        character_manager: "CharacterManager", npc_manager: "NpcManager",
+        item_manager: "ItemManager", status_manager: "StatusManager"
+    ) -> Dict[str, Any]:
+        guild_id, kind, entity_id = pending_key
+        try:
+            # Let every trigger of this tick join the pending computation before reading the inputs.
+            await asyncio.sleep(0)
+        finally:
+            self._pending.pop(pending_key, None)
+
+        entity = _get_entity(guild_id, entity_id, kind, character_manager, npc_manager)
+        if not entity:
+            self.invalidate(guild_id, entity_id, kind)
+            print(f"Error: Entity {entity_id} of type {kind} not found in guild {guild_id}.")
+            return {}
+
+        active_statuses = status_manager.get_status_effects_for_target(guild_id, entity_id, kind)
+        stamp = _input_stamp(entity, kind, active_statuses)
+        guild_entries = self._entries.setdefault(guild_id, {})
+        cached = guild_entries.get((kind, entity_id))
+        if cached is not None and cached[0] is rules_config_data and cached[1] == stamp:
+            return cached[2]
+
+        effective_stats = await calculate_effective_stats(
+            db_service=db_service, guild_id=guild_id, entity_id=entity_id, entity_type=kind,
+            rules_config_data=rules_config_data, character_manager=character_manager,
+            npc_manager=npc_manager, item_manager=item_manager, status_manager=status_manager
+        )
+        if effective_stats:
+            guild_entries[(kind, entity_id)] = (rules_config_data, stamp, effective_stats)
+        return effective_stats
+
+
+def _normalize_entity_type(entity_type: str) -> str:
+    if entity_type.lower() in ("character", "player"):
+        return "Character"
+    if entity_type.lower() == "npc":
+        return "NPC"
+    raise ValueError(f"Unknown entity_type: {entity_type}. Expected 'Character' or 'NPC'.")
+
+
+def _input_stamp(entity: Any, entity_type: str, active_statuses: List["StatusEffectInstance"]) -> Tuple:
+    """Version stamp of everything calculate_effective_stats reads for an entity, except the rules config."""
+    if entity_type == "Character":
+        skills = getattr(entity, 'skills_data_json', None)
+    else:
+        skills = getattr(entity, 'skills', getattr(entity, 'skills_data_json', None))
+    stats = getattr(entity, 'stats', None)
+    equipped_templates = sorted(str(item.get("template_id")) for item in _equipped_item_instances(entity))
+    statuses = sorted((str(getattr(status, 'id', '')), str(getattr(status, 'status_type', ''))) for status in active_statuses or [])
+    return (
+        stats if isinstance(stats, str) else dumps(stats),
+        skills if isinstance(skills, str) else dumps(skills),
+        tuple(equipped_templates),
+        tuple(statuses),
+    )
+
 # --- Main Test Block (Commented out as per plan) ---
 # if __name__ == '__main__':
 #     from unittest.mock import MagicMock # Added import
@@ -2,7 +2,9 @@
 
 # --- Импорты ---
 import asyncio
+import time
 import traceback
+from contextlib import contextmanager
 # ИСПРАВЛЕНИЕ: Добавляем Union для аннотаций, если нужно
 from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable, Set, Union
 
@@ -34,6 +36,7 @@ from bot.game.managers.relationship_manager import RelationshipManager
 from bot.game.managers.game_log_manager import GameLogManager
 
 # --- Импорт Сервисов ---
+from bot.utils.tick_profiler import TICK_PROFILER
 from bot.services.openai_service import OpenAIService
 from bot.ai.multilingual_prompt_generator import MultilingualPromptGenerator
 
@@ -156,6 +159,18 @@ class WorldSimulationProcessor:
 
         self._command_prefix = settings.get('discord_command_prefix', '/')
 
+        # --- Планировщик мирового тика ---
+        world_tick_settings = settings.get('world_tick_settings', {}) or {}
+        self._tick_max_concurrency: int = max(1, int(world_tick_settings.get('max_concurrent_guilds', 8)))
+        self._tick_overrun_policy: str = world_tick_settings.get('overrun_policy', 'coalesce') # 'coalesce' | 'drop'
+        self._guild_tick_semaphore = asyncio.Semaphore(self._tick_max_concurrency)
+        self._tick_in_progress: bool = False
+        self._pending_game_time_delta: float = 0.0
+        self._tick_count: int = 0
+        self._overrun_count: int = 0
+        self._dropped_tick_count: int = 0
+        self.last_tick_stats: Dict[str, Any] = {}
+
         print("WorldSimulationProcessor initialized.")
 
 
@@ -477,270 +492,267 @@ class WorldSimulationProcessor:
     async def process_world_tick(self, game_time_delta: float, **kwargs: Any) -> None:
         """
         Обрабатывает один "тик" игрового времени.
-        Координирует вызовы tick-методов у других менеджеров и процессоров.
+        Гильдии тикают параллельно (не более max_concurrent_guilds одновременно), ошибка или
+        медленная гильдия не задерживает остальные. Вызов во время незавершенного тика считается
+        перегрузкой и, в зависимости от overrun_policy, сливается со следующим тиком или отбрасывается.
         """
-        # print(f"WorldSimulationProcessor: Processing world tick with delta: {game_time_delta}") # Бывает очень шумно
-
-        # --- Передаем все необходимые менеджеры/сервисы в kwargs для tick методов ---
-        # Это нужно, если компонент X в своем process_tick нуждается в компоненте Y,
-        # и Y не был инжектирован в X при его __init__.
-        # Передаем ссылки на все компоненты, которые WorldSimulationProcessor сам имеет.
-        # ИСПРАВЛЕНИЕ: Собираем все менеджеры и процессоры из self._ атрибутов для передачи в kwargs.
-        # Приоритет отдается тем, что инжектированы (self._...).
-        # Также включаем те, что пришли в kwargs этого метода process_world_tick (если GameManager передал их иначе).
-        # Но лучший подход - чтобы GameManager передавал все менеджеры/процессоры в kwargs в initialize() WorldSimulationProcessor,
-        # а затем WSP просто использовал self._атрибуты или передавал их в kwargs.
-        # Поскольку GameManager собирает словарь в _world_tick_loop и передает его как **kwargs: Any
-        # managers_and_processors_for_tick = {k: v for k, v in self.__dict__.items() if isinstance(v, (EventManager, CharacterManager, ...))}
-        #
-        # Вместо сбора всех self._ атрибутов, просто используем **kwargs, которые УЖЕ содержат все менеджеры
-        # из GameManager._world_tick_loop. Это более чистый подход.
-        # Проверим, что GameManager передает все нужные зависимости в kwargs.
-        # managers_and_processors_for_tick = kwargs # Все менеджеры и т.д. из GameManager.tick_context_kwargs
-
-
-        # WorldSimulationProcessor должен работать per-guild.
-        # GameManager передает tick_context_kwargs, который содержит ссылку на PersistenceManager.
-        # PersistenceManager должен знать, для каких guild_ids нужно симулировать тик.
-        # Или WorldSimulationProcessor запрашивает список активных гильдий у PersistenceManager?
-        # PersistenceManager.get_active_guild_ids()?
-        #
-        # Или же WorldSimulationProcessor.process_world_tick вызывается GameManager для каждой гильдии?
-        # Нет, судя по GameManager._world_tick_loop, process_world_tick вызывается ОДИН раз на тик для ВСЕХ гильдий.
-        # Значит, WorldSimulationProcessor должен получить список активных гильдий и итерировать по ним.
+        if self._tick_in_progress:
+             self._note_overrun(game_time_delta, reason="previous tick still running")
+             return
 
+        # WorldSimulationProcessor должен работать per-guild: список загруженных гильдий знает PersistenceManager.
         active_guild_ids: List[str] = []
         persistence_manager = kwargs.get('persistence_manager') # Type: Optional[PersistenceManager]
         if persistence_manager and hasattr(persistence_manager, 'get_loaded_guild_ids'):
-            # PersistenceManager знает, какие гильдии он загрузил.
             active_guild_ids = persistence_manager.get_loaded_guild_ids() # Assumes this method exists
 
-
         if not active_guild_ids:
              # print("WorldSimulationProcessor: No active guilds to tick.") # Too noisy
              return # Нечего тикать
 
+        # Время, пропущенное из-за слитых тиков, добавляется к текущему, чтобы игровое время не отставало.
+        effective_delta = game_time_delta + self._pending_game_time_delta
+        self._pending_game_time_delta = 0.0
 
-        # Итерируем по каждой активной гильдии и обрабатываем ее состояние
-        for guild_id in active_guild_ids:
-             # print(f"WorldSimulationProcessor: Ticking for guild {guild_id}...") # Debug print per guild
-
-             # TODO: Передавать контекст, специфичный для гильдии, в tick методы менеджеров
-             # kwargs уже содержат все менеджеры. Нужно добавить guild_id.
-             # Можно создать новый словарь контекста для передачи в tick методы менеджеров для этой гильдии.
-             guild_tick_context: Dict[str, Any] = {'guild_id': guild_id}
-             guild_tick_context.update(kwargs) # Добавляем все менеджеры и т.д. из общего kwargs
-
-
-             # 1. Обновление времени игры (TimeManager)
-             if self._time_manager:
-                 try:
-                      # TimeManager.process_tick должен принимать guild_id и context
-                      await self._time_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                      # print(f"WorldSimulationProcessor: TimeManager tick processed for guild {guild_id}.")
-                 except Exception as e: print(f"WorldSimulationProcessor: Error during TimeManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
-
-
-             # 2. Обработка статусов (StatusManager)
-             if self._status_manager:
-                  try:
-                       # StatusManager.process_tick должен принимать guild_id и context
-                       await self._status_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                       # print(f"WorldSimulationProcessor: StatusManager tick processed for guild {guild_id}.")
-                  except Exception as e: print(f"WorldSimulationProcessor: Error during StatusManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
-
-
-             # 3. Обработка очередей крафтинга (CraftingManager)
-             if self._crafting_manager:
-                  try:
-                       # CraftingManager.process_tick должен принимать guild_id и context
-                       await self._crafting_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                       # print(f"WorldSimulationProcessor: CraftingManager tick processed for guild {guild_id}.")
-                  except Exception as e: print(f"WorldSimulationProcessor: Error during CraftingManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
-
+        self._tick_in_progress = True
+        tick_started = time.perf_counter()
+        guild_timings: Dict[str, Dict[str, float]] = {}
+        failed_guild_ids: List[str] = []
+        try:
+            await asyncio.gather(*(
+                self._run_guild_tick(str(guild_id), effective_delta, kwargs, guild_timings, failed_guild_ids)
+                for guild_id in active_guild_ids
+            ))
+        finally:
+            self._tick_in_progress = False
+            tick_duration = time.perf_counter() - tick_started
+            self._tick_count += 1
+            self.last_tick_stats = {
+                'tick': self._tick_count,
+                'game_time_delta': effective_delta,
+                'duration_seconds': tick_duration,
+                'guild_count': len(active_guild_ids),
+                'failed_guild_ids': failed_guild_ids,
+                'guild_timings': guild_timings,
+                'overrun_count': self._overrun_count,
+                'dropped_tick_count': self._dropped_tick_count,
+            }
+            TICK_PROFILER.record_tick(tick_duration, {
+                'tick': self._tick_count,
+                'game_time_delta': effective_delta,
+                'failed_guild_ids': list(failed_guild_ids),
+                'guild_timings': guild_timings,
+            })
+
+        tick_interval = self._get_tick_interval(kwargs)
+        if tick_interval and tick_duration > tick_interval:
+             self._overrun_count += 1
+             slowest_guild = max(guild_timings.items(), key=lambda item: item[1].get('total', 0.0), default=(None, {}))[0]
+             print(f"WorldSimulationProcessor: Warning: World tick took {tick_duration:.3f}s, longer than the tick interval {tick_interval:.3f}s (slowest guild: {slowest_guild}).")
+
+    def note_missed_ticks(self, missed_ticks: int, game_time_delta: float) -> None:
+        """
+        Сообщает о тиках, пропущенных из-за перегрузки (их время срабатывания уже прошло).
+        При overrun_policy='coalesce' их игровое время добавляется к следующему тику, при 'drop' - теряется.
+        """
+        for _ in range(max(0, int(missed_ticks))):
+             self._note_overrun(game_time_delta, reason="tick deadline missed")
 
-             # 4. Обработка активных боев (CombatManager)
-             if self._combat_manager:
-                 try:
-                      # CombatManager должен сам найти свои активные бои ДЛЯ ЭТОЙ ГИЛЬДИИ и иметь метод end_combat
-                      # Если CombatManager.process_tick_for_guild существует
-                      if hasattr(self._combat_manager, 'process_tick_for_guild'):
-                           # process_tick_for_guild должен обрабатывать все бои одной гильдии
-                           await self._combat_manager.process_tick_for_guild(guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                      # Иначе, если CombatManager имеет общую process_tick, он должен сам итерировать по гильдиям
-                      # Это зависит от реализации CombatManager.
-                      # Пока предполагаем, что CombatManager либо сам работает per-guild, либо WSP вызывает его метод per-guild.
-                      # Если CombatManager.process_combat_round(combat_id, ...) вызвается WSP, то WSP должен получить список активных боев per-guild.
-                      elif hasattr(self._combat_manager, 'get_active_combats_by_guild'): # Метод для получения активных боев per-guild
-                          active_combats_in_guild = self._combat_manager.get_active_combats_by_guild(guild_id)
-                          combats_to_end_ids: List[str] = []
-                          if active_combats_in_guild:
-                               for combat in list(active_combats_in_guild):
-                                    if not combat.is_active: continue # Проверка на всякий случай
-                                    # process_combat_round должен быть методом CombatManager, принимать combat_id, guild_id, game_time_delta, context
-                                    combat_finished_signal = await self._combat_manager.process_combat_round(combat_id=combat.id, guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                                    if combat_finished_signal: combats_to_end_ids.append(combat.id)
-
-                           # Обрабатываем завершившиеся бои для этой гильдии
-                          for combat_id in combats_to_end_ids:
-                                # end_combat должен принимать combat_id, guild_id, context
-                                await self._combat_manager.end_combat(combat_id, guild_id=guild_id, **guild_tick_context)
-
-                      else:
-                           print(f"WorldSimulationProcessor: Warning: CombatManager or its required methods not available for tick processing for guild {guild_id}.")
-
-
-                 except Exception as e: print(f"WorldSimulationProcessor: Error during CombatManager tick processing for guild {guild_id}: {e}"); traceback.print_exc()
-
-
-             # 5. Обработка индивидуальных действий персонажей (CharacterActionProcessor)
-             if self._character_manager and self._character_action_processor:
-                  try:
-                       # CharacterManager должен иметь метод get_entities_with_active_action(guild_id)
-                       if hasattr(self._character_manager, 'get_entities_with_active_action') and hasattr(self._character_action_processor, 'process_tick'):
-                            # Получаем активных персонажей ДЛЯ ЭТОЙ ГИЛЬДИИ
-                            characters_with_active_action = self._character_manager.get_entities_with_active_action(guild_id) # Передаем guild_id
-                            if characters_with_active_action:
-                                # print(f"WorldSimulationProcessor: Ticking {len(characters_with_active_action)} active Characters for guild {guild_id}...") # Debug print
+    def _note_overrun(self, game_time_delta: float, reason: str) -> None:
+        if self._tick_overrun_policy == 'drop':
+             self._dropped_tick_count += 1
+             print(f"WorldSimulationProcessor: Warning: Dropping world tick ({reason}).")
+        else:
+             self._pending_game_time_delta += game_time_delta
+             print(f"WorldSimulationProcessor: Warning: Coalescing world tick into the next one ({reason}).")
+
+    def _get_tick_interval(self, tick_context: Dict[str, Any]) -> Optional[float]:
+        settings = tick_context.get('settings') or self._settings or {}
+        interval = settings.get('world_tick_interval_seconds')
+        return float(interval) if isinstance(interval, (int, float)) else None
+
+    def get_tick_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику последнего тика: длительность, время по гильдиям и фазам, перегрузки."""
+        stats = dict(self.last_tick_stats)
+        stats['overrun_count'] = self._overrun_count
+        stats['dropped_tick_count'] = self._dropped_tick_count
+        stats['pending_game_time_delta'] = self._pending_game_time_delta
+        return stats
+
+    @contextmanager
+    def _tick_phase(self, timings: Dict[str, float], phase: str, guild_id: str):
+        """Замеряет время фазы тика гильдии (и пишет его в гистограмму TICK_PROFILER)."""
+        phase_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - phase_started
+            timings[phase] = timings.get(phase, 0.0) + elapsed
+            TICK_PROFILER.record(f"world_tick.{phase}", elapsed, guild_id)
+
+    @staticmethod
+    def _has_tick_work(manager: Any, guild_id: str) -> bool:
+        """Менеджер может сообщить через has_tick_work(guild_id), что ему нечего обрабатывать в этом тике."""
+        has_tick_work = getattr(manager, 'has_tick_work', None)
+        if has_tick_work is None:
+            return True
+        return bool(has_tick_work(guild_id))
+
+    async def _run_guild_tick(self, guild_id: str, game_time_delta: float, tick_context: Dict[str, Any],
+                              guild_timings: Dict[str, Dict[str, float]], failed_guild_ids: List[str]) -> None:
+        """Тик одной гильдии под семафором конкурентности; ошибка не влияет на другие гильдии."""
+        timings: Dict[str, float] = {}
+        guild_timings[guild_id] = timings
+        async with self._guild_tick_semaphore:
+            guild_started = time.perf_counter()
+            try:
+                # kwargs уже содержат все менеджеры; добавляем guild_id для tick методов менеджеров.
+                guild_tick_context: Dict[str, Any] = {'guild_id': guild_id}
+                guild_tick_context.update(tick_context)
+                guild_tick_context['guild_id'] = guild_id
+                await self._process_guild_tick(guild_id, game_time_delta, guild_tick_context, timings)
+            except Exception as e:
+                failed_guild_ids.append(guild_id)
+                print(f"WorldSimulationProcessor: ❌ World tick failed for guild {guild_id}: {e}")
+                traceback.print_exc()
+            finally:
+                timings['total'] = time.perf_counter() - guild_started
+                TICK_PROFILER.record('world_tick.guild_total', timings['total'], guild_id)
+
+    async def _process_guild_tick(self, guild_id: str, game_time_delta: float, guild_tick_context: Dict[str, Any], timings: Dict[str, float]) -> None:
+        """Фазы тика одной гильдии. Фазы без работы для гильдии пропускаются."""
+        # guild_id передается явно, поэтому в распаковываемом контексте его быть не должно
+        # (иначе вызов падает с "got multiple values for keyword argument 'guild_id'").
+        phase_kwargs: Dict[str, Any] = {k: v for k, v in guild_tick_context.items() if k not in ('guild_id', 'game_time_delta')}
+
+        # 1. Обновление времени игры (TimeManager) - выполняется всегда, т.к. двигает игровое время
+        if self._time_manager:
+            with self._tick_phase(timings, 'time', guild_id):
+                try:
+                     await self._time_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **phase_kwargs)
+                except Exception as e: print(f"WorldSimulationProcessor: Error during TimeManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
+
+        # 2. Обработка статусов (StatusManager)
+        if self._status_manager and self._has_tick_work(self._status_manager, guild_id):
+            with self._tick_phase(timings, 'statuses', guild_id):
+                try:
+                     await self._status_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **phase_kwargs)
+                except Exception as e: print(f"WorldSimulationProcessor: Error during StatusManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
+
+        # 3. Обработка очередей крафтинга (CraftingManager)
+        if self._crafting_manager and self._has_tick_work(self._crafting_manager, guild_id):
+            with self._tick_phase(timings, 'crafting', guild_id):
+                try:
+                     await self._crafting_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **phase_kwargs)
+                except Exception as e: print(f"WorldSimulationProcessor: Error during CraftingManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
+
+        # 4. Обработка активных боев (CombatManager)
+        if self._combat_manager:
+            try:
+                 if hasattr(self._combat_manager, 'process_tick_for_guild'):
+                      # process_tick_for_guild должен обрабатывать все бои одной гильдии
+                      if self._has_tick_work(self._combat_manager, guild_id):
+                           with self._tick_phase(timings, 'combat', guild_id):
+                                await self._combat_manager.process_tick_for_guild(guild_id=guild_id, game_time_delta=game_time_delta, **phase_kwargs)
+                 elif hasattr(self._combat_manager, 'get_active_combats_by_guild'): # Метод для получения активных боев per-guild
+                      active_combats_in_guild = self._combat_manager.get_active_combats_by_guild(guild_id)
+                      if active_combats_in_guild:
+                           with self._tick_phase(timings, 'combat', guild_id):
+                                combats_to_end_ids: List[str] = []
+                                for combat in list(active_combats_in_guild):
+                                     if not combat.is_active: continue # Проверка на всякий случай
+                                     # process_combat_round должен быть методом CombatManager, принимать combat_id, guild_id, game_time_delta, context
+                                     combat_finished_signal = await self._combat_manager.process_combat_round(combat_id=combat.id, guild_id=guild_id, game_time_delta=game_time_delta, **phase_kwargs)
+                                     if combat_finished_signal: combats_to_end_ids.append(combat.id)
+
+                                # Обрабатываем завершившиеся бои для этой гильдии
+                                for combat_id in combats_to_end_ids:
+                                     await self._combat_manager.end_combat(combat_id, guild_id=guild_id, **phase_kwargs)
+                 else:
+                      print(f"WorldSimulationProcessor: Warning: CombatManager or its required methods not available for tick processing for guild {guild_id}.")
+            except Exception as e: print(f"WorldSimulationProcessor: Error during CombatManager tick processing for guild {guild_id}: {e}"); traceback.print_exc()
+
+        # 5. Обработка индивидуальных действий персонажей (CharacterActionProcessor)
+        if self._character_manager and self._character_action_processor:
+            try:
+                 if hasattr(self._character_manager, 'get_entities_with_active_action') and hasattr(self._character_action_processor, 'process_tick'):
+                      characters_with_active_action = self._character_manager.get_entities_with_active_action(guild_id)
+                      if characters_with_active_action:
+                           with self._tick_phase(timings, 'character_actions', guild_id):
                                 for char_id in list(characters_with_active_action):
                                      # CharacterActionProcessor.process_tick должен принимать entity_id, guild_id, game_time_delta, context
-                                     await self._character_action_processor.process_tick(entity_id=char_id, guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-
-                       # else:
-                            # print(f"WorldSimulationProcessor: Info: No active characters to tick for guild {guild_id}.")
-
-                  except Exception as e: print(f"WorldSimulationProcessor: Error during CharacterActionProcessor process_tick for guild {guild_id}: {e}"); traceback.print_exc()
-
-
-             # 6. Обработка индивидуальных действий NPC (NpcManager / NpcActionProcessor)
-             if self._npc_manager:
-                  # TODO: Если создан NpcActionProcessor, используем его.
-                  # if self._npc_action_processor and hasattr(self._npc_action_processor, 'process_tick'):
-                  #      try:
-                  #           if hasattr(self._npc_manager, 'get_entities_with_active_action'):
-                  #                npcs_with_active_action = self._npc_manager.get_entities_with_active_action(guild_id) # Передаем guild_id
-                  #                if npcs_with_active_action:
-                  #                     # print(f"WorldSimulationProcessor: Ticking {len(npcs_with_active_action)} active NPCs via NpcActionProcessor for guild {guild_id}...")
-                  #                     for npc_id in list(npcs_with_active_action):
-                  #                          await self._npc_action_processor.process_tick(entity_id=npc_id, guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                  #      except Exception as e: ...
-                  # else: # Если NpcActionProcessor не создан, и NpcManager сам обрабатывает тик
-                  #      try:
-                  #           if hasattr(self._npc_manager, 'get_entities_with_active_action') and hasattr(self._npc_manager, 'process_tick'):
-                  #                npcs_with_active_action = self._npc_manager.get_entities_with_active_action(guild_id) # Передаем guild_id
-                  #                if npcs_with_active_action:
-                  #                     # print(f"WorldSimulationProcessor: Ticking {len(npcs_with_active_action)} active NPCs via NpcManager for guild {guild_id}...")
-                  #                     for npc_id in list(npcs_with_active_action):
-                  #                          await self._npc_manager.process_tick(entity_id=npc_id, guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                  #      except Exception as e: ...
-                  pass # Placeholder for NPC tick logic
-
-             # 7. Обработка групповых действий партий (PartyActionProcessor)
-             if self._party_manager and self._party_action_processor:
-                  try:
-                       # PartyManager должен иметь метод get_parties_with_active_action(guild_id)
-                       if hasattr(self._party_manager, 'get_parties_with_active_action') and hasattr(self._party_action_processor, 'process_tick'):
-                            # Получаем активные партии ДЛЯ ЭТОЙ ГИЛЬДИИ
-                            parties_with_active_action = self._party_manager.get_parties_with_active_action(guild_id) # Передаем guild_id
-                            if parties_with_active_action:
-                                 # print(f"WorldSimulationProcessor: Ticking {len(parties_with_active_action)} active Parties for guild {guild_id}...") # Debug print
-                                 for party_id in list(parties_with_active_action):
-                                      # PartyActionProcessor.process_tick должен принимать party_id, guild_id, game_time_delta, context
-                                      await self._party_action_processor.process_tick(party_id=party_id, guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-
-                       # else:
-                            # print(f"WorldSimulationProcessor: Info: No active parties to tick for guild {guild_id}.")
-
-                  except Exception as e: print(f"WorldSimulationProcessor: Error during PartyActionProcessor process_tick for guild {guild_id}: {e}"); traceback.print_exc()
-
-
-             # 8. Обработка других менеджеров, которым нужен тик (ItemManager, LocationManager, EconomyManager)
-             # ItemManager.process_tick должен принимать guild_id и context
-             if self._item_manager and hasattr(self._item_manager, 'process_tick'):
-                  try: await self._item_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                  except Exception as e: print(f"WorldSimulationProcessor: Error during ItemManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
-
-             # LocationManager.process_tick должен принимать guild_id и context
-             if self._location_manager and hasattr(self._location_manager, 'process_tick'):
-                  try: await self._location_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                  except Exception as e: print(f"WorldSimulationProcessor: Error during LocationManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
-
-             # EconomyManager.process_tick должен принимать guild_id и context
-             if self._economy_manager and hasattr(self._economy_manager, 'process_tick'):
-                  try: await self._economy_manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **guild_tick_context)
-                  except Exception as e: print(f"WorldSimulationProcessor: Error during EconomyManager process_tick for guild {guild_id}: {e}"); traceback.print_exc()
-
-
-             # 9. Проверка активных событий на автоматические переходы стадий (по времени, условиям)
-             if self._event_manager and self._event_stage_processor:
-                  # EventManager должен уметь получить активные события ДЛЯ ЭТОЙ ГИЛЬДИИ
-                  if hasattr(self._event_manager, 'get_active_events_by_guild') and hasattr(self, '_check_event_for_auto_transition') and hasattr(self._event_stage_processor, 'advance_stage'):
-                       active_events: List[Event] = self._event_manager.get_active_events_by_guild(guild_id) # Передаем guild_id
-                       events_to_auto_advance_info: List[Tuple[Event, str]] = []
-
-                       for event in list(active_events):
-                            if not event.is_active or event.current_stage_id == 'event_end': continue
-                            # _check_event_for_auto_transition использует self._атрибуты (TimeManager, RuleEngine, NpcManager),
-                            # которые инжектированы в WSP. Оно должно работать с пер-гильдийными данными.
-                            # Возможно, _check_event_for_auto_transition должен принимать guild_id?
-                            # Нет, он принимает Event объект, который уже должен иметь guild_id.
-                            next_stage_id_auto = self._check_event_for_auto_transition(event) # Передаем Event объект
-                            if next_stage_id_auto:
-                                 print(f"WorldSimulationProcessor: Event {event.id} ('{getattr(event, 'name', 'N/A')}') for guild {guild_id}: Auto-transition condition met from stage '{event.current_stage_id}' to stage '{next_stage_id_auto}'. Scheduling transition.")
-                                 events_to_auto_advance_info.append((event, next_stage_id_auto))
-
-                       # --- Обработка Обнаруженных Авто-Переходов ---
-                       for event_to_advance, target_stage_id_auto in events_to_auto_advance_info:
-                            try:
-                                 if event_to_advance.channel_id is None:
-                                      print(f"WorldSimulationProcessor: Warning: Cannot auto-advance event {event_to_advance.id} for guild {guild_id}. Event has no channel_id for notifications.")
-                                      continue
-
-                                 event_channel_callback = self._send_callback_factory(event_to_advance.channel_id)
-
-                                 # EventStageProcessor.advance_stage ожидает context, guild_id уже в контексте
-                                 # Передаем все зависимости из guild_tick_context
-                                 await self._event_stage_processor.advance_stage(
-                                     event=event_to_advance, target_stage_id=target_stage_id_auto,
-                                     send_message_callback=event_channel_callback,
-                                     **guild_tick_context, # Передаем все зависимости, включая guild_id
-                                     transition_context={"trigger": "auto_advance", "from_stage_id": event_to_advance.current_stage_id, "to_stage_id": target_stage_id_auto}
-                                 )
-                                 print(f"WorldSimulationProcessor: Auto-transition to '{target_stage_id_auto}' completed for event {event_to_advance.id} in guild {guild_id}.")
-                            except Exception as e: print(f"WorldSimulationProcessor: Error during auto-transition execution for event {event_to_advance.id} to stage {target_stage_id_auto} in guild {guild_id}: {e}"); traceback.print_exc()
-
-                  else:
-                       print(f"WorldSimulationProcessor: Warning: EventManager or EventStageProcessor or their required methods not available for auto-transition check for guild {guild_id}.")
+                                     await self._character_action_processor.process_tick(entity_id=char_id, guild_id=guild_id, game_time_delta=game_time_delta, **phase_kwargs)
+            except Exception as e: print(f"WorldSimulationProcessor: Error during CharacterActionProcessor process_tick for guild {guild_id}: {e}"); traceback.print_exc()
 
+        # 6. Обработка индивидуальных действий NPC (NpcManager / NpcActionProcessor)
+        # TODO: Если будет создан NpcActionProcessor, тикать NPC с активными действиями так же, как персонажей.
 
-             # 10. Очистка завершившихся событий ('event_end' stage)
-             if self._event_manager and hasattr(self._event_manager, 'get_active_events_by_guild'): # ИСПОЛЬЗУЕМ get_active_events_by_guild
-                  events_already_ending_ids: List[str] = [ event.id for event in list(self._event_manager.get_active_events_by_guild(guild_id)) if event.current_stage_id == 'event_end' ]
-                  for event_id in events_already_ending_ids:
-                       # end_event должен принимать guild_id и event_id
-                       await self.end_event(guild_id, event_id)
-
-
-             # 11. Опционально: Сохранение состояния игры для этой гильдии (периодически)
-             if self._persistence_manager:
-                  # TODO: Добавить логику определения, нужно ли сейчас сохранять (например, по счетчику тиков) ДЛЯ ЭТОЙ ГИЛЬДИИ
-                  should_auto_save_logic_here = False # Placeholder
-                  # Пример получения интервала сохранения из настроек для этой гильдии
-                  # guild_settings = kwargs.get('settings', {}).get('guilds', {}).get(guild_id, {})
-                  # auto_save_interval = guild_settings.get('auto_save_interval_seconds', kwargs.get('settings', {}).get('auto_save_interval_seconds', 300))
-                  # Requires tracking last_save_time per guild. PersistenceManager might handle this internally.
-                  # If WSP handles save logic, it needs a self._last_save_time_per_guild: Dict[str, float]
-
-                  if should_auto_save_logic_here:
-                       try:
-                            # PersistenceManager.save_game_state ожидает guild_ids: List[str]
-                            await self._persistence_manager.save_game_state(guild_ids=[guild_id], **guild_tick_context) # Сохраняем только для этой гильдии, передаем контекст
-                            # TODO: Обновить self._last_save_time_per_guild[guild_id] = current_game_time
-                       except Exception as e: print(f"WorldSimulationProcessor: Error during auto-save for guild {guild_id}: {e}"); traceback.print_exc()
-
+        # 7. Обработка групповых действий партий (PartyActionProcessor)
+        if self._party_manager and self._party_action_processor:
+            try:
+                 if hasattr(self._party_manager, 'get_parties_with_active_action') and hasattr(self._party_action_processor, 'process_tick'):
+                      parties_with_active_action = self._party_manager.get_parties_with_active_action(guild_id)
+                      if parties_with_active_action:
+                           with self._tick_phase(timings, 'party_actions', guild_id):
+                                for party_id in list(parties_with_active_action):
+                                     # PartyActionProcessor.process_tick должен принимать party_id, guild_id, game_time_delta, context
+                                     await self._party_action_processor.process_tick(party_id=party_id, guild_id=guild_id, game_time_delta=game_time_delta, **phase_kwargs)
+            except Exception as e: print(f"WorldSimulationProcessor: Error during PartyActionProcessor process_tick for guild {guild_id}: {e}"); traceback.print_exc()
+
+        # 8. Обработка других менеджеров, которым нужен тик (ItemManager, LocationManager, EconomyManager)
+        for phase, manager in (('items', self._item_manager), ('locations', self._location_manager), ('economy', self._economy_manager)):
+            if manager and hasattr(manager, 'process_tick') and self._has_tick_work(manager, guild_id):
+                with self._tick_phase(timings, phase, guild_id):
+                    try: await manager.process_tick(guild_id=guild_id, game_time_delta=game_time_delta, **phase_kwargs)
+                    except Exception as e: print(f"WorldSimulationProcessor: Error during {type(manager).__name__} process_tick for guild {guild_id}: {e}"); traceback.print_exc()
+
+        # 9. Проверка активных событий на автоматические переходы стадий (по времени, условиям)
+        active_events: List[Event] = []
+        if self._event_manager and hasattr(self._event_manager, 'get_active_events_by_guild'):
+            active_events = list(self._event_manager.get_active_events_by_guild(guild_id) or [])
+        if not active_events:
+            return # Нет активных событий - фазы 9 и 10 пропускаются
+
+        with self._tick_phase(timings, 'events', guild_id):
+            if self._event_stage_processor and hasattr(self._event_stage_processor, 'advance_stage'):
+                 events_to_auto_advance_info: List[Tuple[Event, str]] = []
+
+                 for event in active_events:
+                      if not event.is_active or event.current_stage_id == 'event_end': continue
+                      # _check_event_for_auto_transition принимает Event объект, который уже должен иметь guild_id.
+                      next_stage_id_auto = self._check_event_for_auto_transition(event)
+                      if next_stage_id_auto:
+                           print(f"WorldSimulationProcessor: Event {event.id} ('{getattr(event, 'name', 'N/A')}') for guild {guild_id}: Auto-transition condition met from stage '{event.current_stage_id}' to stage '{next_stage_id_auto}'. Scheduling transition.")
+                           events_to_auto_advance_info.append((event, next_stage_id_auto))
+
+                 # --- Обработка Обнаруженных Авто-Переходов ---
+                 for event_to_advance, target_stage_id_auto in events_to_auto_advance_info:
+                      try:
+                           if event_to_advance.channel_id is None:
+                                print(f"WorldSimulationProcessor: Warning: Cannot auto-advance event {event_to_advance.id} for guild {guild_id}. Event has no channel_id for notifications.")
+                                continue
+
+                           event_channel_callback = self._send_callback_factory(event_to_advance.channel_id)
+
+                           # EventStageProcessor.advance_stage ожидает context, guild_id уже в контексте
+                           await self._event_stage_processor.advance_stage(
+                               event=event_to_advance, target_stage_id=target_stage_id_auto,
+                               send_message_callback=event_channel_callback,
+                               **guild_tick_context, # Передаем все зависимости, включая guild_id
+                               transition_context={"trigger": "auto_advance", "from_stage_id": event_to_advance.current_stage_id, "to_stage_id": target_stage_id_auto}
+                           )
+                           print(f"WorldSimulationProcessor: Auto-transition to '{target_stage_id_auto}' completed for event {event_to_advance.id} in guild {guild_id}.")
+                      except Exception as e: print(f"WorldSimulationProcessor: Error during auto-transition execution for event {event_to_advance.id} to stage {target_stage_id_auto} in guild {guild_id}: {e}"); traceback.print_exc()
+            else:
+                 print(f"WorldSimulationProcessor: Warning: EventStageProcessor or its required methods not available for auto-transition check for guild {guild_id}.")
 
-        # print("DEBUG: WorldSimulationProcessor tick processing finished for all guilds.") # Debug
+            # 10. Очистка завершившихся событий ('event_end' stage)
+            events_already_ending_ids: List[str] = [ event.id for event in list(self._event_manager.get_active_events_by_guild(guild_id)) if event.current_stage_id == 'event_end' ]
+            for event_id in events_already_ending_ids:
+                 # end_event должен принимать guild_id и event_id
+                 await self.end_event(guild_id, event_id)
 
+        # 11. Автосохранение по тикам не выполняется здесь: PersistenceManager.save_game_state вызывается GameManager.
 
     # --- Вспомогательные методы ---
 
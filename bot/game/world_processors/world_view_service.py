@@ -45,6 +45,7 @@ if TYPE_CHECKING:
     from bot.services.db_service import DBService
     from bot.game.managers.relationship_manager import RelationshipManager
     from bot.game.managers.quest_manager import QuestManager
+    from bot.services.global_state_cache import GlobalStateCache
 
 
 class WorldViewService:
@@ -70,6 +71,7 @@ class WorldViewService:
                  db_service: Optional['DBService'] = None,
                  relationship_manager: Optional['RelationshipManager'] = None,
                  quest_manager: Optional['QuestManager'] = None, # Добавляем QuestManager
+                 global_state_cache: Optional['GlobalStateCache'] = None, # Состояние мира из памяти вместо SELECT на каждый /look
                  # TODO: Добавьте другие менеджеры/сервисы, нужные для получения ДОПОЛНИТЕЛЬНЫХ данных
                  # combat_manager: Optional['CombatManager'] = None, # Если нужно видеть информацию о бое в локации
                 ):
@@ -89,6 +91,7 @@ class WorldViewService:
         self._db_service = db_service
         self._relationship_manager = relationship_manager
         self._quest_manager = quest_manager # Сохраняем QuestManager
+        self._global_state_cache = global_state_cache
         # self._combat_manager = combat_manager
 
 
@@ -122,7 +125,7 @@ class WorldViewService:
 
         # --- Получение данных о глобальном состоянии мира ---
         world_state_description_parts = []
-        if self._db_service:
+        if self._global_state_cache or self._db_service:
             relevant_world_states = [
                 "current_era",
                 "sky_condition",
@@ -173,8 +176,13 @@ class WorldViewService:
                 # Добавьте другие состояния и их описания здесь
             }
 
+            if self._global_state_cache and self._global_state_cache.is_loaded:
+                world_state_values = self._global_state_cache.get_many(relevant_world_states)
+            else:
+                world_state_values = {key: await self._db_service.get_global_state_value(key) for key in relevant_world_states} # type: ignore[union-attr]
+
             for key in relevant_world_states:
-                raw_value = await self._db_service.get_global_state_value(key)
+                raw_value = world_state_values.get(key)
                 if raw_value:
                     consequence_data = world_state_consequences_i18n.get(raw_value)
                     if consequence_data:
@@ -195,39 +203,26 @@ class WorldViewService:
         # Используем viewer_char_obj.id для исключения, если он доступен
         excluded_id = viewer_char_obj.id if viewer_char_obj else viewer_entity_id
 
-        all_characters = self._character_manager.get_all_characters()
-        for char_obj in all_characters: # Переименовано, чтобы не конфликтовать с Character
-             # Убедимся, что viewer_char_obj это Character перед сравнением ID с char_obj.id
-             if viewer_entity_type == 'Character' and viewer_char_obj and char_obj.id == viewer_char_obj.id:
-                 continue # Пропускаем самого смотрящего персонажа
-             if getattr(char_obj, 'location_id', None) == location_id:
-                  entities_in_location.append(char_obj)
-
-        all_npcs = self._npc_manager.get_all_npcs()
-        for npc_obj in all_npcs: # Переименовано
-             # Если смотрящий - NPC, и это текущий NPC в цикле, пропускаем
+        # Кто здесь - берем из индекса занятости локаций (O(число присутствующих)), а не перебором всех сущностей гильдии.
+        for char_obj in self._character_manager.get_characters_in_location(guild_id, location_id):
+             # Пропускаем самого смотрящего персонажа
+             if viewer_entity_type == 'Character' and char_obj.id == excluded_id:
+                 continue
+             entities_in_location.append(char_obj)
+
+        for npc_obj in self._npc_manager.get_npcs_in_location(guild_id, location_id):
+             # Если смотрящий - NPC, пропускаем его самого
              if viewer_entity_type == 'NPC' and npc_obj.id == viewer_entity_id:
                  continue
-             if getattr(npc_obj, 'location_id', None) == location_id:
-                  entities_in_location.append(npc_obj)
-
-        # Добавляем предметы на земле в этой локации
-        # ItemManager должен иметь метод get_items_in_location или получить все и отфильтровать по location_id И owner_id = None.
-        all_items = self._item_manager.get_all_items() # ItemManager.get_all_items() возвращает List[Item]
-        for item in all_items:
-             if getattr(item, 'location_id', None) == location_id and getattr(item, 'owner_id', None) is None:
+             entities_in_location.append(npc_obj)
+
+        # Предметы на земле в этой локации (ItemManager ведет свой индекс по локациям)
+        for item in await self._item_manager.get_items_in_location(guild_id, location_id):
+             if getattr(item, 'owner_id', None) is None:
                   entities_in_location.append(item)
 
-        # Добавляем партии в этой локации? (Если партии имеют location_id)
-        # PartyManager должен иметь метод get_parties_in_location или получить все и отфильтровать.
-        all_parties = self._party_manager.get_all_parties() # PartyManager.get_all_parties() возвращает List[Party]
-        for party in all_parties:
-             # Как определить, находится ли партия в локации? По party.location_id? По лидеру? По большинству участников?
-             # Предположим, что у Party модели есть location_id
-             if getattr(party, 'location_id', None) == location_id:
-                  # Решаем, как отображать партию. Как одну сущность? Как список участников?
-                  # Пока добавим как одну сущность 'Party'
-                  entities_in_location.append(party)
+        # Партии в этой локации (по current_location_id партии). Пока отображаем партию как одну сущность 'Party'.
+        entities_in_location.extend(self._party_manager.get_parties_in_location(guild_id, location_id))
 
 
         # TODO: Фильтрация видимости сущностей на основе перцепции смотрящего иRuleEngine.
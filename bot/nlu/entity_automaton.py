@@ -0,0 +1,155 @@
+# bot/nlu/entity_automaton.py
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+class EntityMatch(NamedTuple):
+    start: int  # character offsets into the scanned text
+    end: int
+    entities: Tuple[Dict[str, Any], ...]  # every entity sharing this name
+
+
+def _fold(text: str) -> Tuple[str, List[int]]:
+    """Case-folds text and collapses whitespace runs; returns the folded string and, per folded char, its source index."""
+    folded: List[str] = []
+    offsets: List[int] = []
+    previous_space = False
+    for index, char in enumerate(text):
+        if char.isspace():
+            if previous_space:
+                continue
+            folded.append(" ")
+            offsets.append(index)
+            previous_space = True
+            continue
+        previous_space = False
+        for folded_char in char.casefold():
+            folded.append(folded_char)
+            offsets.append(index)
+    return "".join(folded), offsets
+
+
+class EntityAutomaton:
+    """
+    Aho–Corasick automaton over entity names: one linear pass over the text finds every name,
+    regardless of how many entities the guild has, without spaCy tokenization.
+
+    Matching is case-folded and whole-word; overlapping hits are resolved leftmost-longest, so
+    "Old Tree" wins over "Tree" inside "old tree".
+    """
+
+    def __init__(self, game_entities: Dict[str, List[Dict[str, Any]]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._pattern_length: List[int] = [0]  # length of the name ending at a node, 0 if none
+        self._output_link: List[int] = [0]  # nearest suffix node that ends a name
+        self._entities: Dict[int, List[Dict[str, Any]]] = {}
+        for entities_list in game_entities.values():
+            for entity_data in entities_list:
+                name = entity_data.get('name')
+                pattern = _fold(name.strip())[0] if name else ""
+                if pattern:
+                    self._entities.setdefault(self._insert(pattern), []).append(entity_data)
+        self._build_links()
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def _insert(self, pattern: str) -> int:
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._pattern_length.append(0)
+                self._output_link.append(0)
+                self._goto[node][char] = next_node
+            node = next_node
+        self._pattern_length[node] = len(pattern)
+        return node
+
+    def _build_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                suffix = self._fail[child]
+                self._output_link[child] = suffix if self._pattern_length[suffix] else self._output_link[suffix]
+                queue.append(child)
+
+    def find(self, text: str) -> List[EntityMatch]:
+        """Non-overlapping whole-word entity matches in text order."""
+        if not self._entities:
+            return []
+        folded, offsets = _fold(text)
+        candidates: List[Tuple[int, int, int]] = []  # (start, -length, node) in folded coordinates
+        node = 0
+        for position, char in enumerate(folded):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            hit = node if self._pattern_length[node] else self._output_link[node]
+            while hit:
+                length = self._pattern_length[hit]
+                start, end = position + 1 - length, position + 1
+                if (start == 0 or not folded[start - 1].isalnum()) and (end == len(folded) or not folded[end].isalnum()):
+                    candidates.append((start, -length, hit))
+                hit = self._output_link[hit]
+
+        matches: List[EntityMatch] = []
+        covered_until = 0
+        for start, negative_length, hit in sorted(candidates):
+            if start < covered_until:
+                continue
+            end = start - negative_length
+            covered_until = end
+            matches.append(EntityMatch(offsets[start], offsets[end - 1] + 1, tuple(self._entities[hit])))
+        return matches
+
+
+class _AutomatonEntry:
+    def __init__(self, automaton: EntityAutomaton, source_version: Optional[int]):
+        self.automaton = automaton
+        self.source_version = source_version
+
+
+class EntityAutomatonCache:
+    """
+    One EntityAutomaton per (guild_id, language), rebuilt only when the NLUDataService entity
+    version changes. The spaCy-free counterpart of EntityMatcherCache.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], _AutomatonEntry] = {}
+
+    def get_automaton(
+        self,
+        guild_id: str,
+        language: str,
+        game_entities: Dict[str, List[Dict[str, Any]]],
+        source_version: Optional[int] = None
+    ) -> EntityAutomaton:
+        key = (str(guild_id), language)
+        entry = self._entries.get(key)
+        if entry is None or source_version is None or entry.source_version != source_version:
+            entry = _AutomatonEntry(EntityAutomaton(game_entities), source_version)
+            self._entries[key] = entry
+        return entry.automaton
+
+    def invalidate(self, guild_id: Optional[str] = None, language: Optional[str] = None) -> None:
+        """Drops automata for a guild (and optionally one language); None clears everything."""
+        for key in list(self._entries.keys()):
+            if guild_id is not None and key[0] != str(guild_id):
+                continue
+            if language is not None and key[1] != language:
+                continue
+            del self._entries[key]
+
+
+ENTITY_AUTOMATON_CACHE = EntityAutomatonCache()
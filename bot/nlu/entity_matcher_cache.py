@@ -0,0 +1,95 @@
+# bot/nlu/entity_matcher_cache.py
+from typing import Any, Dict, List, Optional, Tuple
+
+from spacy.language import Language
+from spacy.matcher import PhraseMatcher
+
+
+class _MatcherEntry:
+    """A compiled PhraseMatcher for one (guild_id, language) plus its entity index."""
+
+    def __init__(self, nlp: Language):
+        self.nlp = nlp
+        self.matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+        # match_id -> entity data returned on a match
+        self.entity_map: Dict[str, Dict[str, Any]] = {}
+        # match_id -> pattern names currently compiled into the matcher
+        self.patterns: Dict[str, Tuple[str, ...]] = {}
+        self.source_version: Optional[int] = None
+
+
+class EntityMatcherCache:
+    """
+    Caches one PhraseMatcher per (guild_id, language) so entity patterns are compiled
+    once instead of on every parsed message.
+
+    The entry is resynchronised only when the NLUDataService entity version changes.
+    Resync is incremental: only added, removed or renamed entities touch the matcher.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], _MatcherEntry] = {}
+
+    @staticmethod
+    def _build_desired(game_entities: Dict[str, List[Dict[str, Any]]]) -> Tuple[Dict[str, Tuple[str, ...]], Dict[str, Dict[str, Any]]]:
+        desired_patterns: Dict[str, List[str]] = {}
+        desired_entities: Dict[str, Dict[str, Any]] = {}
+        for entity_type, entities_list in game_entities.items():
+            for entity_data in entities_list:
+                name = entity_data.get('name')
+                if not name:
+                    continue
+                match_id = f"{entity_type.upper()}_{entity_data['id']}"
+                desired_patterns.setdefault(match_id, []).append(name)
+                desired_entities[match_id] = entity_data
+        return {k: tuple(v) for k, v in desired_patterns.items()}, desired_entities
+
+    def get_entry(
+        self,
+        nlp: Language,
+        guild_id: str,
+        language: str,
+        game_entities: Dict[str, List[Dict[str, Any]]],
+        source_version: Optional[int] = None
+    ) -> _MatcherEntry:
+        """
+        Returns the matcher entry for (guild_id, language), syncing it with game_entities
+        when source_version differs from the one it was built from (or is None).
+        """
+        key = (str(guild_id), language)
+        entry = self._entries.get(key)
+        if entry is None or entry.nlp is not nlp:
+            entry = _MatcherEntry(nlp)
+            self._entries[key] = entry
+        elif source_version is not None and entry.source_version == source_version:
+            return entry
+
+        desired_patterns, desired_entities = self._build_desired(game_entities)
+
+        for match_id in [m for m in entry.patterns if m not in desired_patterns]:
+            entry.matcher.remove(match_id)
+            del entry.patterns[match_id]
+            entry.entity_map.pop(match_id, None)
+
+        for match_id, names in desired_patterns.items():
+            if entry.patterns.get(match_id) != names:
+                if match_id in entry.patterns:
+                    entry.matcher.remove(match_id)
+                entry.matcher.add(match_id, [nlp.make_doc(name) for name in names])
+                entry.patterns[match_id] = names
+            entry.entity_map[match_id] = desired_entities[match_id]
+
+        entry.source_version = source_version
+        return entry
+
+    def invalidate(self, guild_id: Optional[str] = None, language: Optional[str] = None) -> None:
+        """Drops compiled matchers for a guild (and optionally one language); None clears everything."""
+        for key in list(self._entries.keys()):
+            if guild_id is not None and key[0] != str(guild_id):
+                continue
+            if language is not None and key[1] != language:
+                continue
+            del self._entries[key]
+
+
+ENTITY_MATCHER_CACHE = EntityMatcherCache()
@@ -0,0 +1,85 @@
+# bot/nlu/lemma_table.py
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bot.nlu.nlu_executor import NLUToken
+
+DEFAULT_LEARNED_CAPACITY = 50000
+
+
+def normalize_token(text: str) -> str:
+    return text.lower().replace("ё", "е")
+
+
+def _is_punctuation(text: str) -> bool:
+    return not any(ch.isalnum() for ch in text)
+
+
+class LemmaTable:
+    """
+    Normalized token -> (lemma, pos) lookup for one language, used to parse simple commands
+    without running the spaCy model.
+
+    Seed entries come from the intent keywords and direction words (a keyword is its own lemma for
+    intent matching). Lemmas the model produced for other tokens are remembered in a bounded LRU.
+    """
+
+    def __init__(self, seed: Optional[Dict[str, Tuple[str, str]]] = None, learned_capacity: int = DEFAULT_LEARNED_CAPACITY):
+        self._seed: Dict[str, Tuple[str, str]] = dict(seed or {})
+        self._learned: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self.learned_capacity = learned_capacity
+
+    @classmethod
+    def from_keywords(
+        cls,
+        intent_keywords: Dict[str, List[str]],
+        extra_words: Iterable[str] = (),
+        learned_capacity: int = DEFAULT_LEARNED_CAPACITY
+    ) -> "LemmaTable":
+        seed: Dict[str, Tuple[str, str]] = {}
+        for keywords in intent_keywords.values():
+            for keyword in keywords:
+                if " " not in keyword:  # has_keyword compares single lemmas only
+                    seed.setdefault(normalize_token(keyword), (keyword, "VERB"))
+        for word in extra_words:
+            seed.setdefault(normalize_token(word), (word, ""))
+        return cls(seed, learned_capacity)
+
+    def lookup(self, text: str) -> Optional[Tuple[str, str]]:
+        key = normalize_token(text)
+        entry = self._learned.get(key)
+        if entry is not None:
+            self._learned.move_to_end(key)
+            return entry
+        entry = self._seed.get(key)
+        if entry is None and _is_punctuation(text):
+            return (text, "PUNCT")
+        return entry
+
+    def resolve(self, words: Sequence[str], whitespaces: Sequence[str]) -> Optional[List[NLUToken]]:
+        """Tokens for the words if every one of them is known, otherwise None (the model is needed)."""
+        if not words:
+            return None
+        tokens: List[NLUToken] = []
+        for word, whitespace in zip(words, whitespaces):
+            entry = self.lookup(word)
+            if entry is None:
+                return None
+            tokens.append(NLUToken(word, whitespace, entry[0], entry[1]))
+        return tokens
+
+    def learn(self, tokens: Iterable[NLUToken]) -> None:
+        """Remembers lemmas and POS tags produced by the model."""
+        if self.learned_capacity <= 0:
+            return
+        for token in tokens:
+            if _is_punctuation(token.text):
+                continue
+            key = normalize_token(token.text)
+            self._learned[key] = (token.lemma, token.pos)
+            self._learned.move_to_end(key)
+        while len(self._learned) > self.learned_capacity:
+            self._learned.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._seed) + len(self._learned)
@@ -0,0 +1,201 @@
+# bot/nlu/nlu_executor.py
+"""
+Runs spaCy analysis off the event loop.
+
+Worker processes pre-load the language models once. Texts submitted within `batch_window` seconds of
+each other are grouped per language and analysed with a single nlp.pipe call in a worker; the caller
+only awaits a future. Workers return plain NLUToken tuples, so no spaCy objects cross processes.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+SUPPORTED_LANGUAGES: Tuple[str, ...] = ("en", "ru")
+
+DEFAULT_BATCH_WINDOW_SECONDS = 0.005
+DEFAULT_MAX_BATCH_SIZE = 32
+
+# Entity recognizer backends understood by parse_player_action.
+ENTITY_RECOGNIZERS: Tuple[str, ...] = ("phrase_matcher", "aho_corasick")
+
+
+class NLUToken(NamedTuple):
+    text: str
+    whitespace: str
+    lemma: str
+    pos: str
+
+
+# --- Worker side ---
+# Models loaded by this process (a pool worker, or the main process in thread mode).
+_WORKER_MODELS: Dict[str, Any] = {}
+
+
+def _load_model(language: str) -> Any:
+    if language not in _WORKER_MODELS:
+        from bot.nlu import player_action_parser  # spaCy is imported only where models are used
+        loaders = {"en": player_action_parser.load_spacy_model_en, "ru": player_action_parser.load_spacy_model_ru}
+        loader = loaders.get(language)
+        _WORKER_MODELS[language] = loader() if loader else None
+    return _WORKER_MODELS[language]
+
+
+def _configure_worker(pipeline_profiles: Optional[Dict[str, Dict[str, List[str]]]]) -> None:
+    if pipeline_profiles:
+        from bot.nlu import player_action_parser
+        player_action_parser.configure_pipeline_profiles(pipeline_profiles)
+
+
+def _init_worker(languages: Sequence[str], pipeline_profiles: Optional[Dict[str, Dict[str, List[str]]]] = None) -> None:
+    """Pool initializer: loads every model up front so the first message does not pay for it."""
+    _configure_worker(pipeline_profiles)
+    for language in languages:
+        _load_model(language)
+
+
+def _analyze_batch(language: str, texts: List[str]) -> Optional[List[List[NLUToken]]]:
+    """Tokens of each text, or None when no model is available for the language."""
+    nlp = _load_model(language)
+    if nlp is None:
+        return None
+    return [
+        [NLUToken(token.text, token.whitespace_, token.lemma_, token.pos_) for token in doc]
+        for doc in nlp.pipe(texts)
+    ]
+
+
+# --- Event loop side ---
+class NLUExecutor:
+    """
+    Async front end of the worker pool.
+
+    max_workers=0 runs analysis in the event loop's default thread pool instead of worker processes
+    (still off the loop, but sharing the GIL); None lets ProcessPoolExecutor pick one per core.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        batch_window: float = DEFAULT_BATCH_WINDOW_SECONDS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        languages: Sequence[str] = SUPPORTED_LANGUAGES,
+        executor: Optional[Executor] = None,
+        pipeline_profiles: Optional[Dict[str, Dict[str, List[str]]]] = None,
+        entity_recognizer: str = "phrase_matcher"
+    ):
+        if entity_recognizer not in ENTITY_RECOGNIZERS:
+            raise ValueError(f"Unknown entity recognizer '{entity_recognizer}'. Expected one of {ENTITY_RECOGNIZERS}")
+        self.max_workers = max_workers
+        self.batch_window = batch_window
+        self.max_batch_size = max(1, max_batch_size)
+        self.languages = tuple(languages)
+        self.pipeline_profiles = pipeline_profiles
+        self.entity_recognizer = entity_recognizer
+        self._started = False
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._in_flight: set = set()
+
+    @classmethod
+    def from_settings(cls, settings: Optional[Dict[str, Any]]) -> "NLUExecutor":
+        settings = settings or {}
+        return cls(
+            max_workers=settings.get('workers'),
+            batch_window=settings.get('batch_window_ms', DEFAULT_BATCH_WINDOW_SECONDS * 1000) / 1000,
+            max_batch_size=settings.get('max_batch_size', DEFAULT_MAX_BATCH_SIZE),
+            languages=settings.get('languages', SUPPORTED_LANGUAGES),
+            pipeline_profiles=settings.get('pipeline_profiles'),
+            entity_recognizer=settings.get('entity_recognizer', "phrase_matcher")
+        )
+
+    def start(self) -> None:
+        """Creates the worker pool. Called lazily by analyze(); idempotent."""
+        if self._started:
+            return
+        self._started = True
+        if self._executor is not None:
+            return
+        if self.max_workers == 0:
+            _configure_worker(self.pipeline_profiles)  # models load in this process
+            return
+        # spawn: forking a process that already runs the Discord client's threads is unsafe.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.languages, self.pipeline_profiles)
+        )
+        self._owns_executor = True
+
+    async def analyze(self, text: str, language: str) -> Optional[List[NLUToken]]:
+        """Tokens of `text`, or None when no spaCy model is available for `language`."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        pending = self._pending.setdefault(language, [])
+        pending.append((text, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(language)
+        elif language not in self._flush_handles:
+            self._flush_handles[language] = loop.call_later(self.batch_window, self._flush, language)
+        return await future
+
+    def _flush(self, language: str) -> None:
+        handle = self._flush_handles.pop(language, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self._pending.pop(language, [])
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        texts = [text for text, _ in batch]
+        task = loop.run_in_executor(self._executor, _analyze_batch, language, texts)
+        self._in_flight.add(task)
+        task.add_done_callback(lambda done: self._resolve(batch, done))
+
+    def _resolve(self, batch: List[Tuple[str, asyncio.Future]], done: asyncio.Future) -> None:
+        self._in_flight.discard(done)
+        error = done.exception() if not done.cancelled() else asyncio.CancelledError()
+        results = done.result() if error is None else None
+        for index, (_, future) in enumerate(batch):
+            if future.done():  # caller gave up waiting
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[index] if results is not None else None)
+
+    async def shutdown(self) -> None:
+        """Fails pending requests and stops the worker pool."""
+        for handle in self._flush_handles.values():
+            handle.cancel()
+        self._flush_handles.clear()
+        for batch in self._pending.values():
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("NLUExecutor has been shut down"))
+        self._pending.clear()
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._started = False
+
+
+_default_executor: Optional[NLUExecutor] = None
+
+
+def get_nlu_executor() -> NLUExecutor:
+    """The process-wide executor used by parse_player_action."""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = NLUExecutor()
+    return _default_executor
+
+
+def set_nlu_executor(executor: Optional[NLUExecutor]) -> None:
+    """Replaces the process-wide executor (GameManager installs one built from settings)."""
+    global _default_executor
+    _default_executor = executor
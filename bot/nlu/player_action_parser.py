@@ -1,8 +1,13 @@
 # bot/nlu/player_action_parser.py
 import re
+from functools import lru_cache
 from typing import Optional, List, Dict, Any # Tuple removed, Union added later if needed for return type
 import spacy
-from spacy.matcher import PhraseMatcher # Import PhraseMatcher
+from spacy.tokens import Doc
+from bot.nlu.entity_matcher_cache import ENTITY_MATCHER_CACHE
+from bot.nlu.entity_automaton import ENTITY_AUTOMATON_CACHE
+from bot.nlu.nlu_executor import NLUExecutor, NLUToken, get_nlu_executor
+from bot.nlu.lemma_table import LemmaTable
 # Forward declare NLUDataService if not importing directly at top level for main parser logic
 # from bot.services.nlu_data_service import NLUDataService
 from bot.game.managers.game_log_manager import GameLogManager
@@ -12,36 +17,52 @@ from bot.game.managers.game_log_manager import GameLogManager
 NLP_EN = None
 NLP_RU = None
 
+# Components excluded at load time, per language. The parser reads tokens, lemmas and POS tags only,
+# so the dependency parser and NER are never needed; the lemmatizers depend on the tagger /
+# morphologizer and attribute_ruler, which therefore stay. Overridable via nlu_settings.pipeline_profiles.
+PIPELINE_PROFILES: Dict[str, Dict[str, List[str]]] = {
+    "en": {"exclude": ["parser", "ner"]},
+    "ru": {"exclude": ["parser", "ner"]},
+}
+
+def configure_pipeline_profiles(overrides: Optional[Dict[str, Dict[str, List[str]]]]) -> None:
+    """Applies per-language profile overrides; must run before the models are loaded."""
+    for language, profile in (overrides or {}).items():
+        PIPELINE_PROFILES.setdefault(language, {}).update(profile)
+
+def _load_spacy_model(model_name: str, language: str):
+    exclude = PIPELINE_PROFILES.get(language, {}).get("exclude", [])
+    try:
+        return spacy.load(model_name, exclude=exclude)
+    except OSError:
+        print(f"Downloading {model_name} model...")
+        try:
+            spacy.cli.download(model_name)
+            return spacy.load(model_name, exclude=exclude)
+        except Exception as e:
+            print(f"Failed to download/load {model_name}: {e}")
+            return None
+
 def load_spacy_model_en():
     global NLP_EN
     if NLP_EN is None:
-        try:
-            NLP_EN = spacy.load('en_core_web_sm')
-        except OSError:
-            print("Downloading en_core_web_sm model...")
-            try:
-                spacy.cli.download('en_core_web_sm')
-                NLP_EN = spacy.load('en_core_web_sm')
-            except Exception as e:
-                print(f"Failed to download/load en_core_web_sm: {e}")
-                NLP_EN = None
+        NLP_EN = _load_spacy_model('en_core_web_sm', "en")
     return NLP_EN
 
 def load_spacy_model_ru():
     global NLP_RU
     if NLP_RU is None:
-        try:
-            NLP_RU = spacy.load('ru_core_news_sm')
-        except OSError:
-            print("Downloading ru_core_news_sm model...")
-            try:
-                spacy.cli.download('ru_core_news_sm')
-                NLP_RU = spacy.load('ru_core_news_sm')
-            except Exception as e:
-                print(f"Failed to download/load ru_core_news_sm: {e}")
-                NLP_RU = None
+        NLP_RU = _load_spacy_model('ru_core_news_sm', "ru")
     return NLP_RU
 
+@lru_cache(maxsize=None)
+def get_matcher_nlp(language: str):
+    """Model-free pipeline whose vocab backs the PhraseMatcher in the main process."""
+    return spacy.blank(language)
+
+def _tokens_to_doc(nlp, tokens: List[NLUToken]) -> Doc:
+    return Doc(nlp.vocab, words=[t.text for t in tokens], spaces=[bool(t.whitespace) for t in tokens])
+
 # --- Keyword Dictionaries (can be used by SpaCy logic later or alongside) ---
 INTENT_KEYWORDS_EN = {
     "move": ["move", "go", "walk", "head", "proceed", "travel"],
@@ -65,6 +86,18 @@ INTENT_KEYWORDS_RU = {
     "search": ["ищи", "обыщи", "исследуй", "найди", "поищи", "искать"],
 }
 
+DIRECTION_WORDS = ["north", "south", "east", "west", "up", "down", "север", "юг", "восток", "запад", "вверх", "вниз"]
+
+# Function words allowed in a command that is parsed without the model ("go to the north", "иди на север").
+FAST_PATH_WORDS_EN = ["to", "the", "a", "an", "at", "around", "for", "in", "into", "on", "with", "towards", "please"]
+FAST_PATH_WORDS_RU = ["в", "во", "на", "к", "ко", "с", "со", "по", "за", "у", "вокруг", "пожалуйста"]
+
+# Simple commands made only of known words skip spaCy; see LemmaTable.
+LEMMA_TABLES: Dict[str, LemmaTable] = {
+    "en": LemmaTable.from_keywords(INTENT_KEYWORDS_EN, DIRECTION_WORDS + FAST_PATH_WORDS_EN),
+    "ru": LemmaTable.from_keywords(INTENT_KEYWORDS_RU, DIRECTION_WORDS + FAST_PATH_WORDS_RU),
+}
+
 # (Old PATTERNS_EN, PATTERNS_RU, and _find_matching_db_entity can be removed if not used by new logic)
 # For now, they are kept as they are not in the direct path of parse_player_action's SpaCy logic.
 # If they are confirmed unused after full SpaCy implementation, they can be cleaned up.
@@ -92,7 +125,8 @@ async def parse_player_action(
     language: str,
     guild_id: str,
     game_log_manager: Optional[GameLogManager] = None,
-    nlu_data_service: Optional['NLUDataService'] = None
+    nlu_data_service: Optional['NLUDataService'] = None,
+    nlu_executor: Optional[NLUExecutor] = None
 ) -> Optional[Dict[str, Any]]:
     raw_input_text = text
 
@@ -103,52 +137,73 @@ async def parse_player_action(
         'processed_tokens': []
     }
 
-    nlp = None
-    if language == "en":
-        nlp = load_spacy_model_en()
-    elif language == "ru":
-        nlp = load_spacy_model_ru()
-
-    if not nlp:
+    # Simple commands resolve from the lemma table; anything else is tagged and lemmatized in
+    # NLU worker processes, and the loop only awaits the tokens.
+    executor = nlu_executor or get_nlu_executor()
+    lemma_table = LEMMA_TABLES.get(language)
+    tokens: Optional[List[NLUToken]] = None
+    probe: Optional[Doc] = None
+    if lemma_table is not None:
+        probe = get_matcher_nlp(language).make_doc(text)  # tokenizer only
+        tokens = lemma_table.resolve([t.text for t in probe], [t.whitespace_ for t in probe])
+    used_fast_path = tokens is not None
+    if tokens is None and language in executor.languages:
+        tokens = await executor.analyze(text, language)
+        if tokens and lemma_table is not None:
+            lemma_table.learn(tokens)
+
+    if tokens is None:
         if game_log_manager:
             await game_log_manager.log_event(guild_id, "NLU_ERROR", {"error": f"SpaCy model not loaded for language: {language}"})
         return None
 
-    doc = nlp(text)
-    action_data['processed_tokens'] = [{"text": t.text, "lemma": t.lemma_, "pos": t.pos_} for t in doc]
+    action_data['processed_tokens'] = [{"text": t.text, "lemma": t.lemma, "pos": t.pos} for t in tokens]
 
     # --- 1. Entity Recognition ---
     recognized_entities: List[Dict[str, Any]] = []
     game_entities: Dict[str, List[Dict[str, Any]]] = {}
 
+    entities_version: Optional[int] = None
+
     if nlu_data_service:
         game_entities = await nlu_data_service.get_game_entities(guild_id, language)
-
-    matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
-    entity_map: Dict[str, Dict[str, Any]] = {}
-
-    for entity_type, entities_list in game_entities.items():
-        for entity_data in entities_list:
-            patterns = [nlp.make_doc(entity_data['name'])]
-            match_id = f"{entity_type.upper()}_{entity_data['id']}"
-            matcher.add(match_id, patterns)
-            entity_map[match_id] = entity_data
-
-    matches = matcher(doc)
-    for match_id, start, end in matches:
-        matched_entity_data = entity_map[nlp.vocab.strings[match_id]]
-        recognized_entities.append({
-            "id": matched_entity_data['id'],
-            "name": doc[start:end].text,
-            "type": matched_entity_data['type'],
-            "lang": matched_entity_data['lang']
-        })
+        if hasattr(nlu_data_service, 'get_cache_version'):
+            version = nlu_data_service.get_cache_version(guild_id, language)
+            entities_version = version if isinstance(version, int) else None
+
+    if executor.entity_recognizer == "aho_corasick":
+        # Scans the raw text, so no Doc is built; the automaton is rebuilt on a new entity version.
+        automaton = ENTITY_AUTOMATON_CACHE.get_automaton(guild_id, language, game_entities, entities_version)
+        for match in automaton.find(text):
+            for matched_entity_data in match.entities:
+                recognized_entities.append({
+                    "id": matched_entity_data['id'],
+                    "name": text[match.start:match.end],
+                    "type": matched_entity_data['type'],
+                    "lang": matched_entity_data['lang']
+                })
+    else:
+        nlp = get_matcher_nlp(language)
+        doc = probe if used_fast_path else _tokens_to_doc(nlp, tokens)
+        # The compiled matcher is reused until NLUDataService reports a new entity version.
+        matcher_entry = ENTITY_MATCHER_CACHE.get_entry(nlp, guild_id, language, game_entities, entities_version)
+        entity_map = matcher_entry.entity_map
+
+        matches = matcher_entry.matcher(doc)
+        for match_id, start, end in matches:
+            matched_entity_data = entity_map[nlp.vocab.strings[match_id]]
+            recognized_entities.append({
+                "id": matched_entity_data['id'],
+                "name": doc[start:end].text,
+                "type": matched_entity_data['type'],
+                "lang": matched_entity_data['lang']
+            })
     action_data['entities'] = recognized_entities
 
     # --- Old Regex/Keyword logic has been removed ---
 
     # --- 2. Intent Classification (Rule-Based) ---
-    lemmatized_tokens = [token.lemma_.lower() for token in doc]
+    lemmatized_tokens = [token.lemma.lower() for token in tokens]
     current_keywords = INTENT_KEYWORDS_EN if language == "en" else INTENT_KEYWORDS_RU
 
     def has_keyword(lemmas: List[str], intent_key: str) -> bool:
@@ -171,10 +226,10 @@ async def parse_player_action(
 
     if not action_data['intent'] and has_keyword(lemmatized_tokens, "move"):
         action_data['intent'] = "move"
-        for token in doc:
-            if token.lemma_.lower() in ["north", "south", "east", "west", "up", "down", "север", "юг", "восток", "запад", "вверх", "вниз"]:
-                if not any(e['type'] == 'direction' and e['name'] == token.lemma_.lower() for e in action_data['entities']):
-                    action_data['entities'].append({"id": None, "name": token.lemma_.lower(), "type": "direction", "lang": language})
+        for token in tokens:
+            if token.lemma.lower() in DIRECTION_WORDS:
+                if not any(e['type'] == 'direction' and e['name'] == token.lemma.lower() for e in action_data['entities']):
+                    action_data['entities'].append({"id": None, "name": token.lemma.lower(), "type": "direction", "lang": language})
                 break
 
     if not action_data['intent'] and has_keyword(lemmatized_tokens, "look"):
@@ -190,7 +245,9 @@ async def parse_player_action(
             "parsed_intent": action_data['intent'], "parsed_entities": action_data['entities'],
             "processed_tokens": action_data['processed_tokens'],
             "recognition_successful": bool(action_data['intent']),
-            "parser_type": "spacy_custom_rules"
+            "parser_type": "spacy_custom_rules",
+            "fast_path": used_fast_path,
+            "entity_recognizer": executor.entity_recognizer
         }
         log_message_params = {
             "intent": action_data['intent'] if action_data['intent'] else "None",
@@ -0,0 +1,207 @@
+# bot/services/action_buffer.py
+import asyncio
+import time
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bot.services.db_service import DBService
+    from bot.game.turn_readiness_queue import TurnReadinessQueue
+
+DEFAULT_FLUSH_DELAY_SECONDS = 1.0
+
+
+@dataclass
+class CollectedAction:
+    """One parsed player action waiting for the next turn."""
+    intent: Optional[str]
+    entities: List[Dict[str, Any]] = field(default_factory=list)
+    original_text: str = ""
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    submitted_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The action dict shape consumed by ConflictResolver and the action processors."""
+        return {"intent": self.intent, "entities": self.entities, "original_text": self.original_text}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], **kwargs: Any) -> "CollectedAction":
+        return cls(
+            intent=data.get("intent"),
+            entities=data.get("entities") or [],
+            original_text=data.get("original_text", ""),
+            **kwargs
+        )
+
+
+class ActionBuffer:
+    """
+    Per-character queue of collected actions, held in memory.
+
+    Appending never touches the database: new actions are inserted into the append-only
+    player_collected_actions table in batches, by a short delayed flush and by PersistenceManager
+    (save_state). Draining for a turn removes the actions from memory and deletes their rows at the
+    next flush, unless the turn is aborted and restore() puts them back; load_state restores undrained
+    actions after a restart. Characters with actions are
+    enqueued in the TurnReadinessQueue, if one is attached.
+    """
+
+    def __init__(self, db_service: Optional["DBService"] = None, flush_delay: float = DEFAULT_FLUSH_DELAY_SECONDS,
+                 readiness_queue: Optional["TurnReadinessQueue"] = None):
+        self._db_service = db_service
+        self.flush_delay = flush_delay
+        self.readiness_queue = readiness_queue
+        # (guild_id, character_id) -> actions in submission order
+        self._actions: Dict[Tuple[str, str], List[CollectedAction]] = {}
+        # guild_id -> actions / row ids not yet written / deleted
+        self._unsaved: Dict[str, Dict[str, Tuple[str, CollectedAction]]] = {}
+        self._deleted: Dict[str, Set[str]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+
+    # --- Memory ---
+
+    def append(self, guild_id: str, character_id: str, action: CollectedAction) -> None:
+        guild_id, character_id = str(guild_id), str(character_id)
+        self._actions.setdefault((guild_id, character_id), []).append(action)
+        self._unsaved.setdefault(guild_id, {})[action.id] = (character_id, action)
+        self._schedule_flush()
+        if self.readiness_queue is not None:
+            self.readiness_queue.mark_ready(guild_id, character_id)
+
+    def get_actions(self, guild_id: str, character_id: str) -> List[CollectedAction]:
+        return list(self._actions.get((str(guild_id), str(character_id)), []))
+
+    def has_actions(self, guild_id: str, character_id: str) -> bool:
+        return bool(self._actions.get((str(guild_id), str(character_id))))
+
+    def characters_with_actions(self, guild_id: str) -> List[str]:
+        guild_id = str(guild_id)
+        return [character_id for (gid, character_id), actions in self._actions.items() if gid == guild_id and actions]
+
+    def drain(self, guild_id: str, character_id: str) -> List[CollectedAction]:
+        """Removes and returns the character's actions."""
+        actions = self._actions.pop((str(guild_id), str(character_id)), [])
+        for action in actions:
+            self._forget(str(guild_id), action)
+        return actions
+
+    def restore(self, guild_id: str, character_id: str, actions: List[CollectedAction]) -> None:
+        """
+        Puts drained actions back in front of the character's queue (turn aborted or failed).
+        Pending deletes of their rows are cancelled; rows that are already gone are written again.
+        """
+        if not actions:
+            return
+        guild_id, character_id = str(guild_id), str(character_id)
+        key = (guild_id, character_id)
+        self._actions[key] = list(actions) + self._actions.get(key, [])
+        deleted = self._deleted.get(guild_id, set())
+        for action in actions:
+            if action.id in deleted:
+                deleted.discard(action.id)
+            else:
+                self._unsaved.setdefault(guild_id, {})[action.id] = (character_id, action)
+        if guild_id in self._deleted and not deleted:
+            del self._deleted[guild_id]
+        self._schedule_flush()
+
+    def pop_last(self, guild_id: str, character_id: str) -> Optional[CollectedAction]:
+        """Removes the most recently submitted action (used by /undo_action)."""
+        actions = self._actions.get((str(guild_id), str(character_id)))
+        if not actions:
+            return None
+        action = actions.pop()
+        self._forget(str(guild_id), action)
+        return action
+
+    def _forget(self, guild_id: str, action: CollectedAction) -> None:
+        if self._unsaved.get(guild_id, {}).pop(action.id, None) is None:
+            # Already written, so the row has to go.
+            self._deleted.setdefault(guild_id, set()).add(action.id)
+            self._schedule_flush()
+
+    # --- Persistence ---
+
+    def _schedule_flush(self) -> None:
+        if self._db_service is None or self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop (sync caller); PersistenceManager will flush
+        self._flush_handle = loop.call_later(self.flush_delay, lambda: asyncio.ensure_future(self._delayed_flush()))
+
+    async def _delayed_flush(self) -> None:
+        self._flush_handle = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"ActionBuffer: Error flushing collected actions: {e}")
+            traceback.print_exc()
+
+    async def flush(self, guild_id: Optional[str] = None) -> None:
+        """Writes pending inserts and deletes for one guild (or all) in one batch each."""
+        if self._db_service is None:
+            return
+        async with self._flush_lock:
+            guild_ids = [str(guild_id)] if guild_id is not None else list(set(self._unsaved) | set(self._deleted))
+            for gid in guild_ids:
+                unsaved = self._unsaved.pop(gid, {})
+                deleted = self._deleted.pop(gid, set())
+                try:
+                    if unsaved:
+                        await self._db_service.insert_collected_actions([
+                            (action.id, gid, character_id, action.to_dict(), action.submitted_at)
+                            for character_id, action in unsaved.values()
+                        ])
+                    if deleted:
+                        await self._db_service.delete_collected_actions(gid, list(deleted))
+                except Exception:
+                    self._requeue(gid, unsaved, deleted)
+                    raise
+
+    def _requeue(self, guild_id: str, unsaved: Dict[str, Tuple[str, CollectedAction]], deleted: Set[str]) -> None:
+        # Requeue everything that was not confirmed; inserts drained meanwhile are dropped.
+        for action_id, entry in unsaved.items():
+            if any(a.id == action_id for a in self._actions.get((guild_id, entry[0]), [])):
+                self._unsaved.setdefault(guild_id, {})[action_id] = entry
+        if deleted:
+            self._deleted.setdefault(guild_id, set()).update(deleted)
+
+    async def save_state(self, guild_id: str, **kwargs: Any) -> None:
+        await self.flush(guild_id)
+
+    def snapshot_pending_save(self, guild_id: str) -> Tuple[Dict[str, Tuple[str, CollectedAction]], Set[str]]:
+        guild_id = str(guild_id)
+        return dict(self._unsaved.get(guild_id, {})), set(self._deleted.get(guild_id, ()))
+
+    def restore_pending_save(self, guild_id: str, snapshot: Tuple[Dict[str, Tuple[str, CollectedAction]], Set[str]]) -> None:
+        """Called by PersistenceManager when the guild's save transaction rolls back after save_state flushed."""
+        unsaved, deleted = snapshot
+        self._requeue(str(guild_id), unsaved, deleted)
+        if unsaved or deleted:
+            self._schedule_flush()
+
+    async def load_state(self, guild_id: str, **kwargs: Any) -> None:
+        """Restores actions that were submitted but not yet processed before the last shutdown."""
+        if self._db_service is None:
+            return
+        guild_id = str(guild_id)
+        rows = await self._db_service.get_collected_actions(guild_id)
+        for key in [k for k in self._actions if k[0] == guild_id]:
+            del self._actions[key]
+        for row in rows:
+            action = CollectedAction.from_dict(row.get("action_data") or {}, id=row["id"], submitted_at=row.get("submitted_at") or 0.0)
+            self._actions.setdefault((guild_id, str(row["player_id"])), []).append(action)
+            if self.readiness_queue is not None:
+                self.readiness_queue.mark_ready(guild_id, str(row["player_id"]))
+        print(f"ActionBuffer: Loaded {len(rows)} pending actions for guild {guild_id}.")
+
+    async def shutdown(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        await self.flush()
@@ -1,10 +1,11 @@
 # bot/services/db_service.py
 import json
 import traceback # Added for update_player_field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 # import aiosqlite # No longer required for aiosqlite.Row type hint
 
 from bot.database.postgres_adapter import PostgresAdapter
+from bot.utils.json_codec import from_db_json
 
 class DBService:
     """
@@ -13,8 +14,32 @@ class DBService:
     PostgresAdapter methods fetchone/fetchall now return dicts directly.
     """
 
-    def __init__(self):
-        self.adapter = PostgresAdapter()
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        # settings: the "database_settings" section of settings.json (pool sizing, statement cache).
+        self.adapter = PostgresAdapter(settings=settings)
+
+    def unit_of_work(self, transactional: bool = False):
+        """Pins one DB connection for a batch of operations (see PostgresAdapter.unit_of_work)."""
+        return self.adapter.unit_of_work(transactional=transactional)
+
+    def savepoint(self, on_rollback: Optional[Callable[[], None]] = None):
+        """Isolates a block inside the current transaction (see PostgresAdapter.savepoint)."""
+        return self.adapter.savepoint(on_rollback=on_rollback)
+
+    async def begin_transaction(self) -> None:
+        """Begins a transaction on the connection used by this task's queries; nested calls open savepoints."""
+        await self.adapter.begin_transaction()
+
+    async def commit_transaction(self) -> None:
+        """Commits the innermost transaction opened by begin_transaction (releases its savepoint if nested)."""
+        await self.adapter.commit()
+
+    async def rollback_transaction(self) -> None:
+        """Rolls back the innermost transaction opened by begin_transaction (to its savepoint if nested)."""
+        await self.adapter.rollback()
+
+    def is_transaction_active(self) -> bool:
+        return self.adapter.is_transaction_active()
 
     async def connect(self) -> None:
         """Connects to the database."""
@@ -45,6 +70,25 @@ class DBService:
             traceback.print_exc()
         return None
 
+    async def get_all_global_state(self) -> Dict[str, Optional[str]]:
+        """Fetches the whole global_state table as a key -> value dict."""
+        if not self.adapter:
+            print("DBService: Adapter not available for get_all_global_state.")
+            return {}
+        rows = await self.adapter.fetchall("SELECT key, value FROM global_state")
+        return {str(row['key']): (str(row['value']) if row.get('value') is not None else None) for row in rows}
+
+    async def set_global_state_value(self, key: str, value: Optional[str]) -> None:
+        """Inserts or updates a single global_state value."""
+        await self.adapter.execute(
+            "INSERT INTO global_state (key, value) VALUES ($1, $2) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+            (key, value)
+        )
+
+    async def delete_global_state_value(self, key: str) -> None:
+        """Removes a key from the global_state table."""
+        await self.adapter.execute("DELETE FROM global_state WHERE key = $1", (key,))
+
     # _row_to_dict and _rows_to_dicts are no longer needed as PostgresAdapter
     # methods fetchone() and fetchall() return dicts directly.
 
@@ -86,9 +130,8 @@ class DBService:
             print(f"DBService: Invalid field_name '{field_name}' for player update.")
             return False
 
-        processed_value = value
-        if isinstance(value, (dict, list)):
-            processed_value = json.dumps(value)
+        # current_action is a VARCHAR column holding JSON text; the JSON columns take the objects as is.
+        processed_value = json.dumps(value) if field_name == 'current_action' and isinstance(value, (dict, list)) else value
 
         # Check if player exists in the guild
         sql_check = "SELECT id FROM players WHERE id = $1 AND guild_id = $2"
@@ -140,7 +183,7 @@ class DBService:
         """ # Added RETURNING id
         params = (
             player_id, discord_user_id, name, race, guild_id, location_id,
-            hp, mp, attack, defense, json.dumps(stats) if stats else '{}',
+            hp, mp, attack, defense, stats or {},
             experience, level, unspent_xp
         )
         # Use execute_insert if you expect a return value like the ID.
@@ -238,8 +281,8 @@ class DBService:
         # Prepare i18n JSON for name and description
         # Assuming 'en' and 'ru' are desired default languages for now.
         # A more robust solution might get default languages from settings.
-        name_i18n_json = json.dumps({"en": name, "ru": name})
-        description_i18n_json = json.dumps({"en": description, "ru": description})
+        name_i18n = {"en": name, "ru": name}
+        description_i18n = {"en": description, "ru": description}
 
         sql = """
             INSERT INTO item_templates (id, name_i18n, description_i18n, type, properties)
@@ -247,7 +290,7 @@ class DBService:
             RETURNING id;
         """
         # Parameters match the new SQL query structure
-        params = (item_id, name_i18n_json, description_i18n_json, item_type, json.dumps(properties_data))
+        params = (item_id, name_i18n, description_i18n, item_type, properties_data)
         inserted_id = await self.adapter.execute_insert(sql, params)
         if inserted_id:
             return await self.get_item_definition(item_id)
@@ -289,9 +332,9 @@ class DBService:
             RETURNING id;
         """ # Added RETURNING id
         params = (
-            loc_id, template_id, json.dumps(name_i18n), json.dumps(description_i18n), guild_id,
-            json.dumps(exits) if exits else '{}',
-            json.dumps(properties) if properties else '{}', True  # Changed 1 to True for PostgreSQL boolean
+            loc_id, template_id, name_i18n, description_i18n, guild_id,
+            exits or {},
+            properties or {}, True  # Changed 1 to True for PostgreSQL boolean
         )
         inserted_id = await self.adapter.execute_insert(sql, params)
         if inserted_id:
@@ -363,27 +406,10 @@ class DBService:
         behavior_tags = kwargs.get('behavior_tags')
         loot_table_id = kwargs.get('loot_table_id')
 
-        skills_data_json = json.dumps(skills_data) if skills_data is not None else None
-        equipment_data_json = json.dumps(equipment_data) if equipment_data is not None else None
-        abilities_data_json = json.dumps(abilities_data) if abilities_data is not None else None
-        faction_json = json.dumps(faction) if faction is not None else None
-        behavior_tags_json = json.dumps(behavior_tags) if behavior_tags is not None else None
         # loot_table_id is a string, so no json.dumps needed if it's directly passed
-
-        # Prepare data for JSON fields, ensuring None becomes empty JSON object/array
-        name_i18n_json = json.dumps(name_i18n or {})
-        description_i18n_json = json.dumps(description_i18n or {})
-        persona_i18n_json = json.dumps(persona_i18n or {}) # Assuming persona_i18n is a new field
-        backstory_i18n_json = json.dumps(backstory_i18n or {})
-        stats_json = json.dumps(stats or {})
-        inventory_json = json.dumps(inventory or [])
+        # current_action is a VARCHAR column and is stored as JSON text; the other JSON columns
+        # get Python objects (the pool's json/jsonb codec encodes them), with None as {} / [].
         current_action_json = json.dumps(current_action) if current_action is not None else None # Can be NULL in DB
-        action_queue_json = json.dumps(action_queue or [])
-        state_variables_json = json.dumps(state_variables or {})
-        status_effects_json = json.dumps(status_effects or [])
-        traits_json = json.dumps(traits or [])
-        desires_json = json.dumps(desires or [])
-        motives_json = json.dumps(motives or [])
 
         # Note: 'name' and 'description' simple text columns are no longer primary for i18n.
         # The 'npcs' table schema from migration 6d887g92h0f1 uses i18n columns.
@@ -403,10 +429,10 @@ class DBService:
         """
         params = (
             npc_id, template_id, guild_id, location_id,
-            name_i18n_json, description_i18n_json, persona_i18n_json, backstory_i18n_json,
-            stats_json, inventory_json, current_action_json, action_queue_json, party_id,
-            state_variables_json, current_health, max_health, True, status_effects_json,
-            is_temporary, archetype, traits_json, desires_json, motives_json, skills_data_json, equipment_data_json, abilities_data_json, faction_json, behavior_tags_json, loot_table_id
+            name_i18n or {}, description_i18n or {}, persona_i18n or {}, backstory_i18n or {},
+            stats or {}, inventory or [], current_action_json, action_queue or [], party_id,
+            state_variables or {}, current_health, max_health, True, status_effects or [],
+            is_temporary, archetype, traits or [], desires or [], motives or [], skills_data, equipment_data, abilities_data, faction, behavior_tags, loot_table_id
         )
 
         inserted_id = await self.adapter.execute_insert(sql, params)
@@ -480,8 +506,8 @@ class DBService:
         # For simplicity, letting the DB handle timestamp with NOW().
         params = (
             log_id, guild_id, channel_id, player_id_column, event_type, message,
-            json.dumps(related_entities) if related_entities else '{}',
-            json.dumps(context_data) if context_data else '{}'
+            related_entities or {},
+            context_data or {}
         )
         await self.adapter.execute(sql, params)
 
@@ -633,12 +659,11 @@ class DBService:
         """
         Retrieves an active dialogue session or creates a new one if none exists.
         A session is identified by the participants (player and NPC) and guild.
-        The 'participants' field in the DB should store a sorted list of IDs as a JSON string
+        The 'participants' field in the DB should store a sorted list of IDs as a JSON array
         to ensure (player_id, npc_id) and (npc_id, player_id) map to the same session.
         """
         # Sort participant IDs to ensure consistent lookup/storage
         participant_list = sorted([player_id, npc_id])
-        participants_json = json.dumps(participant_list)
 
         sql_find = """
             SELECT id, conversation_history, state_variables, current_stage_id, template_id, is_active
@@ -650,19 +675,15 @@ class DBService:
         # WHERE ( (participants LIKE '%' || ? || '%') AND (participants LIKE '%' || ? || '%') ) ...
         # But storing sorted JSON list is cleaner for exact match.
 
-        session = await self.adapter.fetchone(sql_find, (participants_json, guild_id))
+        session = await self.adapter.fetchone(sql_find, (participant_list, guild_id))
         # session = self._row_to_dict(row) # No longer needed
 
         if session: # row is now session (already a dict)
-            if session.get('conversation_history') and isinstance(session['conversation_history'], str):
-                session['conversation_history'] = json.loads(session['conversation_history'])
-            else:
-                session['conversation_history'] = [] # Ensure it's a list
+            history = from_db_json(session.get('conversation_history'), [])
+            session['conversation_history'] = history if isinstance(history, list) else [] # Ensure it's a list
 
-            if session.get('state_variables') and isinstance(session['state_variables'], str):
-                session['state_variables'] = json.loads(session['state_variables'])
-            else:
-                session['state_variables'] = {}
+            state_variables = from_db_json(session.get('state_variables'), {})
+            session['state_variables'] = state_variables if isinstance(state_variables, dict) else {}
 
             # Update last activity time (optional, could be separate method)
             # For now, let's assume it's handled by update_dialogue_history or another mechanism
@@ -688,8 +709,8 @@ class DBService:
         initial_state_vars = {}
 
         params = (
-            dialogue_id, guild_id, participants_json, channel_id,
-            json.dumps(initial_history), json.dumps(initial_state_vars), True, # is_active = True (boolean)
+            dialogue_id, guild_id, participant_list, channel_id,
+            initial_history, initial_state_vars, True, # is_active = True (boolean)
             current_time, None, None # current_stage_id, template_id (can be set later)
         )
         # Use execute_insert if RETURNING id is important, otherwise execute is fine
@@ -741,7 +762,7 @@ class DBService:
             # For PostgreSQL, last_activity_game_time should ideally be a timestamp column.
             # If current_time is float (epoch), ensure DB column type is compatible (e.g., numeric or timestamp correctly handled by asyncpg).
             # Using NOW() in the query itself might be better: last_activity_game_time = NOW()
-            await self.adapter.execute(sql_update, (json.dumps(current_history), current_time, dialogue_id))
+            await self.adapter.execute(sql_update, (current_history, current_time, dialogue_id))
             # Check status from execute if it indicates rows affected
             print(f"DBService: Updated dialogue history for session {dialogue_id}.")
             return True
@@ -761,7 +782,7 @@ class DBService:
         # PostgresAdapter uses $1, $2, $3 placeholders.
         sql_update = "UPDATE dialogues SET conversation_history = $1, last_activity_game_time = $2 WHERE id = $3"
         try:
-            await self.adapter.execute(sql_update, (json.dumps(full_history), current_time, dialogue_id))
+            await self.adapter.execute(sql_update, (full_history, current_time, dialogue_id))
             # Check status from execute
             print(f"DBService: Set (overwrote) dialogue history for session {dialogue_id}.")
             return True
@@ -840,7 +861,7 @@ class DBService:
         params = (
             item_instance_id, template_id, guild_id, owner_id, owner_type,
             location_id, quantity,
-            json.dumps(state_variables) if state_variables else '{}',
+            state_variables or {},
             False # Default is_temporary to False (boolean for PostgreSQL)
         )
         try:
@@ -873,6 +894,35 @@ class DBService:
     async def delete_pending_conflict(self, conflict_id: str) -> None:
         await self.adapter.delete_pending_conflict(conflict_id)
 
+    # --- Collected Player Actions (append-only, see ActionBuffer) ---
+
+    async def insert_collected_actions(self, rows: List[tuple]) -> None:
+        """Batch-inserts (id, guild_id, player_id, action_data, submitted_at) rows."""
+        await self.adapter.execute_many(
+            "INSERT INTO player_collected_actions (id, guild_id, player_id, action_data, submitted_at) "
+            "VALUES ($1, $2, $3, $4, $5) ON CONFLICT (id) DO NOTHING",
+            [(action_id, guild_id, player_id, action_data, submitted_at)
+             for action_id, guild_id, player_id, action_data, submitted_at in rows]
+        )
+
+    async def delete_collected_actions(self, guild_id: str, action_ids: List[str]) -> None:
+        await self.adapter.execute(
+            "DELETE FROM player_collected_actions WHERE guild_id = $1 AND id = ANY($2::text[])",
+            (guild_id, action_ids)
+        )
+
+    async def get_collected_actions(self, guild_id: str) -> List[Dict[str, Any]]:
+        """Unprocessed actions of a guild in submission order; action_data is decoded."""
+        rows = await self.adapter.fetchall(
+            "SELECT id, player_id, action_data, submitted_at FROM player_collected_actions "
+            "WHERE guild_id = $1 ORDER BY submitted_at, id",
+            (guild_id,)
+        )
+        for row in rows:
+            if isinstance(row.get('action_data'), str):
+                row['action_data'] = json.loads(row['action_data'])
+        return rows
+
     # --- Generic CRUD Operations ---
 
     async def create_entity(self, table_name: str, data: Dict[str, Any], id_field: str = 'id') -> Optional[str]:
@@ -888,13 +938,9 @@ class DBService:
         if id_field == 'id' and 'id' not in data:
             data['id'] = str(uuid.uuid4())
 
-        processed_data = {}
-        for key, value in data.items():
-            if isinstance(value, (dict, list)):
-                processed_data[key] = json.dumps(value)
-            else:
-                processed_data[key] = value
-        
+        # dict/list values go to JSON columns as is; the pool's json/jsonb codec encodes them.
+        processed_data = dict(data)
+
         columns = ', '.join(processed_data.keys())
         placeholders = ', '.join([f'${i+1}' for i in range(len(processed_data))]) # $1, $2, ...
         sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
@@ -964,7 +1010,7 @@ class DBService:
         for key, value in data.items():
             if isinstance(value, (dict, list)):
                 set_clauses.append(f"{key} = ${param_idx}::jsonb") # Use ::jsonb for PostgreSQL
-                params_list.append(json.dumps(value))
+                params_list.append(value)
             else:
                 set_clauses.append(f"{key} = ${param_idx}")
                 params_list.append(value)
@@ -1051,7 +1097,7 @@ class DBService:
     async def set_guild_setting(self, guild_id: str, setting_key: str, setting_value: Any) -> bool:
         """
         Sets or updates a specific setting for a guild.
-        Settings are stored as key-value pairs, with value stored as JSON string.
+        Settings are stored as key-value pairs, with value stored as JSON.
         """
         if not self.adapter:
             print(f"DBService: Adapter not available. Cannot set guild setting for {guild_id}.")
@@ -1060,8 +1106,6 @@ class DBService:
         # import json # Already imported at the top
         # import traceback # Already imported at the top
 
-        value_json = json.dumps(setting_value)
-
         sql = """
             INSERT INTO guild_settings (guild_id, key, value)
             VALUES ($1, $2, $3)
@@ -1069,7 +1113,7 @@ class DBService:
                 value = EXCLUDED.value;
         """
         try:
-            status = await self.adapter.execute(sql, (guild_id, setting_key, value_json))
+            status = await self.adapter.execute(sql, (guild_id, setting_key, setting_value))
             # Example status strings from asyncpg: "INSERT 0 1", "UPDATE 1"
             if isinstance(status, str) and ("INSERT" in status.upper() or "UPDATE" in status.upper()):
                  if "UPDATE" in status.upper():
@@ -0,0 +1,91 @@
+# bot/services/global_state_cache.py
+import asyncio
+import traceback
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bot.services.db_service import DBService
+
+# Called with (key, new_value); new_value is None when the key was deleted. May be sync or async.
+GlobalStateListener = Callable[[str, Optional[str]], Union[None, Awaitable[None]]]
+
+
+class GlobalStateCache:
+    """
+    In-memory copy of the global_state table.
+
+    The table is loaded once at startup and reads are served from memory. Writes go to the database
+    first and then update the copy (write-through), after which subscribers are notified so that
+    caches derived from world state can be invalidated.
+    """
+
+    def __init__(self, db_service: Optional["DBService"] = None):
+        self._db_service = db_service
+        self._values: Dict[str, Optional[str]] = {}
+        self._listeners: List[GlobalStateListener] = []
+        self._loaded = False
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    async def load(self) -> None:
+        """(Re)loads the whole table. On failure the previous contents are kept."""
+        if not self._db_service:
+            print("GlobalStateCache: DBService not available, global state stays empty.")
+            return
+        try:
+            self._values = await self._db_service.get_all_global_state()
+            self._loaded = True
+            print(f"GlobalStateCache: Loaded {len(self._values)} global state entries.")
+        except Exception as e:
+            print(f"GlobalStateCache: Error loading global_state: {e}")
+            traceback.print_exc()
+
+    # --- Reads (memory only) ---
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        value = self._values.get(key)
+        return default if value is None else value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Values for several keys at once; missing keys map to None."""
+        return {key: self._values.get(key) for key in keys}
+
+    # --- Writes (write-through) ---
+
+    async def set(self, key: str, value: Optional[str]) -> None:
+        """Stores the value in the database, then in memory, then notifies subscribers."""
+        if self._db_service:
+            await self._db_service.set_global_state_value(key, value)
+        if key in self._values and self._values[key] == value:
+            return
+        self._values[key] = value
+        await self._notify(key, value)
+
+    async def delete(self, key: str) -> None:
+        if self._db_service:
+            await self._db_service.delete_global_state_value(key)
+        if self._values.pop(key, None) is not None:
+            await self._notify(key, None)
+
+    # --- Change notifications ---
+
+    def subscribe(self, listener: GlobalStateListener) -> Callable[[], None]:
+        """Registers a change listener and returns a function that unregisters it."""
+        self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+        return unsubscribe
+
+    async def _notify(self, key: str, value: Optional[str]) -> None:
+        for listener in list(self._listeners):
+            try:
+                result = listener(key, value)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"GlobalStateCache: Listener error for key '{key}': {e}")
+                traceback.print_exc()
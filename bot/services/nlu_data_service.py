@@ -1,3 +1,4 @@
+import asyncio
 import time
 import json
 from typing import Dict, List, Any, Optional, Tuple, TypedDict
@@ -110,14 +111,40 @@ ENTITY_CONFIG: Dict[str, Dict[str, Any]] = {
 
 class NLUDataService:
     CACHE_TTL_SECONDS = 300
+    # Fraction of the TTL after which a cache hit also triggers a background refresh.
+    REFRESH_AHEAD_FRACTION = 0.8
 
     def __init__(self, db_service: Any):
         if db_service is None:
             raise ValueError("NLUDataService requires a valid db_service instance.")
         self.db_service = db_service
         self._cache: Dict[Tuple[str, str, bool], Dict[str, Any]] = {} # Key: (guild_id, language, fetch_global_too)
+        # Bumped whenever the entity list for (guild_id, language) is refetched or invalidated,
+        # so derived caches (e.g. the NLU PhraseMatcher cache) know when to resync.
+        self._cache_versions: Dict[Tuple[str, str], int] = {}
+        self._inflight: Dict[Tuple[str, str, bool], "asyncio.Task[Dict[str, List[GameEntity]]]"] = {}
         print("NLUDataService initialized with DBService.")
 
+    def get_cache_version(self, guild_id: str, language: str) -> int:
+        """Returns the current entity-list version for (guild_id, language)."""
+        return self._cache_versions.get((str(guild_id), language), 0)
+
+    def _bump_cache_version(self, guild_id: str, language: str) -> None:
+        key = (str(guild_id), language)
+        self._cache_versions[key] = self._cache_versions.get(key, 0) + 1
+
+    def invalidate_cache(self, guild_id: Optional[str] = None, language: Optional[str] = None) -> None:
+        """Drops cached entities for a guild (and optionally a single language); None clears everything."""
+        for cache_key in list(self._cache.keys()):
+            key_guild, key_lang, _ = cache_key
+            if guild_id is not None and key_guild != str(guild_id):
+                continue
+            if language is not None and key_lang != language:
+                continue
+            del self._cache[cache_key]
+            self._bump_cache_version(key_guild, key_lang)
+        self._discard_inflight(guild_id, language)
+
     def _get_i18n_name(self, raw_value: Optional[Any], language: str, is_i18n_field: bool = True, default_lang: str = "en") -> Optional[str]:
         """Safely extracts the name, handling i18n if specified."""
         if raw_value is None:
@@ -143,105 +170,191 @@ class NLUDataService:
 
         if cache_key in self._cache:
             cached_item = self._cache[cache_key]
-            if current_time - cached_item['timestamp'] < self.CACHE_TTL_SECONDS:
+            age = current_time - cached_item['timestamp']
+            if age < self.CACHE_TTL_SECONDS:
                 print(f"NLUDataService: Cache hit for {cache_key}.")
+                # Refresh-ahead: near expiry, serve the cached data and refetch in the background.
+                if age >= self.CACHE_TTL_SECONDS * self.REFRESH_AHEAD_FRACTION:
+                    self._get_or_start_fetch(cache_key)
                 return cached_item['data']
             else:
                 print(f"NLUDataService: Cache expired for {cache_key}.")
                 del self._cache[cache_key]
 
         print(f"NLUDataService: Cache miss for {cache_key}. Fetching from DB.")
-
+        # Single-flight: concurrent misses for the same key share one fetch. Shielded so a
+        # cancelled caller does not cancel the fetch other callers are waiting on.
+        return await asyncio.shield(self._get_or_start_fetch(cache_key))
+
+    def _get_or_start_fetch(self, cache_key: Tuple[str, str, bool]) -> "asyncio.Task[Dict[str, List[GameEntity]]]":
+        task = self._inflight.get(cache_key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch_and_cache(cache_key))
+            self._inflight[cache_key] = task
+        return task
+
+    async def _fetch_and_cache(self, cache_key: Tuple[str, str, bool]) -> Dict[str, List[GameEntity]]:
+        guild_id, language, fetch_global_too = cache_key
+        this_task = asyncio.current_task()
+        try:
+            fetched_at = time.time()
+            all_entities = await self._fetch_all_entities(guild_id, language, fetch_global_too)
+            # Only publish if no invalidation happened while the fetch was running.
+            if self._inflight.get(cache_key) is this_task:
+                self._cache[cache_key] = {'timestamp': fetched_at, 'data': all_entities}
+                self._bump_cache_version(guild_id, language)
+            if not any(all_entities.values()):
+                 print(f"NLUDataService: No game entities found or fetched from DB for {cache_key}.")
+            return all_entities
+        finally:
+            if self._inflight.get(cache_key) is this_task:
+                del self._inflight[cache_key]
+
+    async def _fetch_all_entities(self, guild_id: str, language: str, fetch_global_too: bool) -> Dict[str, List[GameEntity]]:
         all_entity_types = [cfg["type_name"] for cfg in ENTITY_CONFIG.values()]
         all_entity_types.append("location_feature") # Handled specially
         all_entity_types.append("location_tag")     # Handled specially
         all_entities: Dict[str, List[GameEntity]] = {entity_type: [] for entity_type in set(all_entity_types)}
 
-
-        for config_key, config in ENTITY_CONFIG.items():
-            table_name = config["table"]
-            name_field = config["name_field"]
-            type_name = config["type_name"]
-            guild_column = config.get("guild_column")
-            nullable_guild = config.get("nullable_guild", False)
-            tags_field = config.get("tags_field")
-            tag_type_name = config.get("tag_type_name")
-            features_field = config.get("features_field") # For locations
-            feature_type_name = config.get("feature_type_name") # For locations
-
-            is_i18n_name = name_field.endswith("_i18n")
-            
-            select_fields = ["id", name_field]
-            if tags_field: select_fields.append(tags_field)
-            if features_field: select_fields.append(features_field)
-
-            query = f"SELECT {', '.join(select_fields)} FROM {table_name}"
-            params: List[Any] = []
-
-            where_clauses = []
-            if guild_column:
-                if nullable_guild and fetch_global_too:
-                    where_clauses.append(f"({guild_column} = ? OR {guild_column} IS NULL)")
-                    params.append(guild_id)
-                else:
-                    where_clauses.append(f"{guild_column} = ?")
-                    params.append(guild_id)
-
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
-
-            query += ";"
-
-            try:
-                rows = await self.db_service.fetchall(query, tuple(params))
-                for row in rows:
-                    entity_name = self._get_i18n_name(row[name_field], language, is_i18n_field=is_i18n_name)
-                    if entity_name:
-                        all_entities[type_name].append(GameEntity(
-                            id=str(row['id']), name=entity_name, type=type_name, lang=language, parent_location_id=None
-                        ))
-
-                    # Handle tags
-                    if tags_field and tag_type_name and row.get(tags_field):
-                        tags_data = self._get_i18n_name(row[tags_field], language, is_i18n_field=True) # Tags are assumed i18n list
-                        if isinstance(tags_data, list): # Expecting list of strings after _get_i18n_name resolves language
-                            for tag_name in tags_data:
-                                if tag_name:
-                                    all_entities[tag_type_name].append(GameEntity(
-                                        id=f"{row['id']}_tag_{tag_name.replace(' ', '_').lower()}",
-                                        name=tag_name, type=tag_type_name, lang=language,
-                                        parent_location_id=str(row['id'])
-                                    ))
-                        elif tags_data: # If it's a single string (e.g. "tag1, tag2") - less ideal schema but handle defensively
-                             for tag_name_part in tags_data.split(','):
-                                tag_name_clean = tag_name_part.strip()
-                                if tag_name_clean:
-                                     all_entities[tag_type_name].append(GameEntity(
-                                        id=f"{row['id']}_tag_{tag_name_clean.replace(' ', '_').lower()}",
-                                        name=tag_name_clean, type=tag_type_name, lang=language,
-                                        parent_location_id=str(row['id'])
-                                    ))
-
-
-                    # Handle features (specific to locations for now)
-                    if features_field and feature_type_name and row.get(features_field):
-                        features_data = self._get_i18n_name(row[features_field], language, is_i18n_field=True)
-                        if isinstance(features_data, list):
-                            for feature_name in features_data:
-                                if feature_name:
-                                    all_entities[feature_type_name].append(GameEntity(
-                                        id=f"{row['id']}_feat_{feature_name.replace(' ', '_').lower()}",
-                                        name=feature_name, type=feature_type_name, lang=language,
-                                        parent_location_id=str(row['id'])
-                                    ))
-            except Exception as e:
-                print(f"NLUDataService: Database error for table {table_name} (guild {guild_id}, lang {language}): {e}")
-
-        self._cache[cache_key] = {'timestamp': current_time, 'data': all_entities}
-        if not any(all_entities.values()):
-             print(f"NLUDataService: No game entities found or fetched from DB for {cache_key}.")
+        # All entity tables are queried concurrently; results are merged in ENTITY_CONFIG
+        # order so the output is the same as a sequential fetch.
+        per_table_results = await asyncio.gather(*(
+            self._fetch_table_entities(config, guild_id, language, fetch_global_too)
+            for config in ENTITY_CONFIG.values()
+        ))
+        for table_entities in per_table_results:
+            for entity_type, entities in table_entities.items():
+                all_entities[entity_type].extend(entities)
         return all_entities
 
+    async def _fetch_table_entities(self, config: Dict[str, Any], guild_id: str, language: str, fetch_global_too: bool) -> Dict[str, List[GameEntity]]:
+        table_name = config["table"]
+        name_field = config["name_field"]
+        type_name = config["type_name"]
+        guild_column = config.get("guild_column")
+        nullable_guild = config.get("nullable_guild", False)
+        tags_field = config.get("tags_field")
+        tag_type_name = config.get("tag_type_name")
+        features_field = config.get("features_field") # For locations
+        feature_type_name = config.get("feature_type_name") # For locations
+
+        is_i18n_name = name_field.endswith("_i18n")
+
+        select_fields = ["id", name_field]
+        if tags_field: select_fields.append(tags_field)
+        if features_field: select_fields.append(features_field)
+
+        query = f"SELECT {', '.join(select_fields)} FROM {table_name}"
+        params: List[Any] = []
+
+        where_clauses = []
+        if guild_column:
+            if nullable_guild and fetch_global_too:
+                where_clauses.append(f"({guild_column} = ? OR {guild_column} IS NULL)")
+                params.append(guild_id)
+            else:
+                where_clauses.append(f"{guild_column} = ?")
+                params.append(guild_id)
+
+        if where_clauses:
+            query += " WHERE " + " AND ".join(where_clauses)
+
+        query += ";"
+
+        table_entities: Dict[str, List[GameEntity]] = {type_name: []}
+        if tag_type_name: table_entities[tag_type_name] = []
+        if feature_type_name: table_entities[feature_type_name] = []
+
+        try:
+            rows = await self.db_service.fetchall(query, tuple(params))
+            for row in rows:
+                entity_name = self._get_i18n_name(row[name_field], language, is_i18n_field=is_i18n_name)
+                if entity_name:
+                    table_entities[type_name].append(GameEntity(
+                        id=str(row['id']), name=entity_name, type=type_name, lang=language, parent_location_id=None
+                    ))
+
+                # Handle tags
+                if tags_field and tag_type_name and row.get(tags_field):
+                    tags_data = self._get_i18n_name(row[tags_field], language, is_i18n_field=True) # Tags are assumed i18n list
+                    if isinstance(tags_data, list): # Expecting list of strings after _get_i18n_name resolves language
+                        for tag_name in tags_data:
+                            if tag_name:
+                                table_entities[tag_type_name].append(GameEntity(
+                                    id=f"{row['id']}_tag_{tag_name.replace(' ', '_').lower()}",
+                                    name=tag_name, type=tag_type_name, lang=language,
+                                    parent_location_id=str(row['id'])
+                                ))
+                    elif tags_data: # If it's a single string (e.g. "tag1, tag2") - less ideal schema but handle defensively
+                         for tag_name_part in tags_data.split(','):
+                            tag_name_clean = tag_name_part.strip()
+                            if tag_name_clean:
+                                 table_entities[tag_type_name].append(GameEntity(
+                                    id=f"{row['id']}_tag_{tag_name_clean.replace(' ', '_').lower()}",
+                                    name=tag_name_clean, type=tag_type_name, lang=language,
+                                    parent_location_id=str(row['id'])
+                                ))
+
+
+                # Handle features (specific to locations for now)
+                if features_field and feature_type_name and row.get(features_field):
+                    features_data = self._get_i18n_name(row[features_field], language, is_i18n_field=True)
+                    if isinstance(features_data, list):
+                        for feature_name in features_data:
+                            if feature_name:
+                                table_entities[feature_type_name].append(GameEntity(
+                                    id=f"{row['id']}_feat_{feature_name.replace(' ', '_').lower()}",
+                                    name=feature_name, type=feature_type_name, lang=language,
+                                    parent_location_id=str(row['id'])
+                                ))
+        except Exception as e:
+            print(f"NLUDataService: Database error for table {table_name} (guild {guild_id}, lang {language}): {e}")
+        return table_entities
+
+    # --- Invalidation hooks (called by LocationManager, NpcManager, ItemManager) ---
+
+    def upsert_entity(self, guild_id: str, entity_type: str, entity_id: str, name_i18n: Optional[Dict[str, str]]) -> None:
+        """
+        Patches a created or renamed entity into every cached language for the guild.
+        Without a name the guild cache is invalidated instead, so the next read refetches.
+        """
+        if not isinstance(name_i18n, dict) or not name_i18n:
+            self.invalidate_cache(guild_id)
+            return
+        entity_id_str = str(entity_id)
+        for cache_key in self._guild_cache_keys(guild_id):
+            key_guild, key_lang, _ = cache_key
+            entities = self._cache[cache_key]['data'].setdefault(entity_type, [])
+            entities[:] = [e for e in entities if e['id'] != entity_id_str]
+            entity_name = self._get_i18n_name(name_i18n, key_lang, is_i18n_field=True)
+            if entity_name:
+                entities.append(GameEntity(id=entity_id_str, name=entity_name, type=entity_type, lang=key_lang, parent_location_id=None))
+            self._bump_cache_version(key_guild, key_lang)
+        self._discard_inflight(guild_id)
+
+    def remove_entity(self, guild_id: str, entity_type: str, entity_id: str) -> None:
+        """Removes a deleted entity from every cached language for the guild."""
+        entity_id_str = str(entity_id)
+        for cache_key in self._guild_cache_keys(guild_id):
+            key_guild, key_lang, _ = cache_key
+            entities = self._cache[cache_key]['data'].get(entity_type)
+            if entities:
+                entities[:] = [e for e in entities if e['id'] != entity_id_str]
+            self._bump_cache_version(key_guild, key_lang)
+        self._discard_inflight(guild_id)
+
+    def _guild_cache_keys(self, guild_id: str) -> List[Tuple[str, str, bool]]:
+        return [key for key in self._cache if key[0] == str(guild_id)]
+
+    def _discard_inflight(self, guild_id: Optional[str], language: Optional[str] = None) -> None:
+        # A fetch started before the change may return stale rows; forget it so it is not cached.
+        for cache_key in list(self._inflight.keys()):
+            if guild_id is not None and cache_key[0] != str(guild_id):
+                continue
+            if language is not None and cache_key[1] != language:
+                continue
+            del self._inflight[cache_key]
+
 
 if __name__ == '__main__':
     import asyncio
@@ -0,0 +1,70 @@
+# bot/utils/json_codec.py
+"""
+Fast JSON encoding/decoding shared by the asyncpg type codecs and the managers.
+
+orjson is used when it is installed, the stdlib json module otherwise.
+"""
+import json
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # Sets, tuples from dataclass fields etc. are stored as JSON arrays; anything else as its str().
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+if orjson is not None:
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def loads(data: Any) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, default=_default)
+
+    def loads(data: Any) -> Any:
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class RawJSON(str):
+    """
+    JSON text that is already serialised (json.dumps() output, effective_stats_json, ...).
+    encode_db_json writes it unchanged; a plain str is encoded as a JSON string value.
+    """
+    __slots__ = ()
+
+
+def encode_db_json(value: Any) -> str:
+    """Encoder for json/jsonb columns. Only RawJSON is passed through as is."""
+    if isinstance(value, RawJSON):
+        return str(value)
+    return dumps(value)
+
+
+def raw_json(value: Any) -> Any:
+    """Marks JSON text kept in memory as a string as RawJSON; None and objects are returned as is."""
+    return RawJSON(value) if isinstance(value, str) else value
+
+
+def from_db_json(value: Any, default: Optional[Any] = None, text: bool = False) -> Any:
+    """
+    Value of a JSON column as a Python object. json/jsonb columns fetched through the pool are
+    already decoded by the codec, so a str there is a JSON string value and is returned as is.
+    Bytes are parsed; a str is parsed only with text=True, for JSON kept in text columns or
+    *_json_str attributes. None, empty bytes and (with text=True) empty strings give `default`.
+    """
+    if value is None:
+        return default
+    if isinstance(value, (bytes, bytearray)) or (text and isinstance(value, str)):
+        return loads(value) if value else default
+    return value
@@ -0,0 +1,168 @@
+# bot/utils/tick_profiler.py
+import functools
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+GLOBAL_SCOPE = "global"
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram with log-linear buckets.
+
+    Values are recorded in microseconds. Each power of two is split into
+    2**SUB_BUCKET_BITS / 2 linear sub-buckets, so any recorded value is reported
+    within ~1.6% of its true value regardless of magnitude, using O(log range) memory.
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self):
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    @classmethod
+    def _bucket_index(cls, value_us: int) -> int:
+        shift = max(0, value_us.bit_length() - cls.SUB_BUCKET_BITS)
+        return (shift << cls.SUB_BUCKET_BITS) | (value_us >> shift)
+
+    @classmethod
+    def _bucket_upper_value(cls, index: int) -> int:
+        shift = index >> cls.SUB_BUCKET_BITS
+        sub_bucket = index & ((1 << cls.SUB_BUCKET_BITS) - 1)
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        value_us = max(0, int(seconds * 1_000_000))
+        index = self._bucket_index(value_us)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total_us += value_us
+        self.max_us = max(self.max_us, value_us)
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+
+    def percentile(self, percent: float) -> float:
+        """Returns the value (in seconds) at or below which `percent` of recorded values fall."""
+        if not self.count:
+            return 0.0
+        target = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(self._bucket_upper_value(index), self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max_us / 1_000_000,
+            'min': (self.min_us or 0) / 1_000_000,
+            'mean': (self.total_us / self.count / 1_000_000) if self.count else 0.0,
+        }
+
+
+class TickProfiler:
+    """
+    Collects latency histograms per (guild_id, phase) plus a bounded window of recent
+    world ticks, so the slowest ticks and their per-guild/per-phase breakdown can be dumped.
+
+    Phases are dotted names such as 'world_tick.statuses', 'turns.process_player_turns'
+    or 'persistence.save_game_state'. Timings without a guild go under GLOBAL_SCOPE.
+    """
+
+    def __init__(self, recent_ticks: int = 256):
+        self.enabled = True
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._recent_ticks: Deque[Dict[str, Any]] = deque(maxlen=recent_ticks)
+
+    def record(self, phase: str, seconds: float, guild_id: Optional[str] = None) -> None:
+        if not self.enabled:
+            return
+        key = (str(guild_id) if guild_id is not None else GLOBAL_SCOPE, phase)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram()
+        histogram.record(seconds)
+
+    @contextmanager
+    def measure(self, phase: str, guild_id: Optional[str] = None) -> Iterator[None]:
+        """Context manager that records the wall time of its block under `phase`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started, guild_id)
+
+    def timed(self, phase: str, guild_arg: Optional[str] = 'guild_id') -> Callable:
+        """Decorator for coroutine functions; the guild is taken from the `guild_arg` keyword argument."""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.measure(phase, kwargs.get(guild_arg) if guild_arg else None):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_tick(self, duration_seconds: float, details: Optional[Dict[str, Any]] = None) -> None:
+        """Records one completed world tick (total duration plus any breakdown) in the recent-ticks window."""
+        if not self.enabled:
+            return
+        self.record('world_tick.total', duration_seconds)
+        self._recent_ticks.append({'finished_at': time.time(), 'duration_seconds': duration_seconds, **(details or {})})
+
+    def get_histogram(self, phase: str, guild_id: Optional[str] = None) -> Optional[LatencyHistogram]:
+        return self._histograms.get((str(guild_id) if guild_id is not None else GLOBAL_SCOPE, phase))
+
+    def slowest_ticks(self, limit: int = 5, guild_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Slowest recent ticks. With guild_id only ticks that ran that guild are returned, ranked by
+        the guild's own time, and their per-guild breakdown is cut down to that guild.
+        """
+        if guild_id is None:
+            return sorted(self._recent_ticks, key=lambda tick: tick['duration_seconds'], reverse=True)[:limit]
+        guild_id = str(guild_id)
+        ticks = []
+        for tick in self._recent_ticks:
+            timings = (tick.get('guild_timings') or {}).get(guild_id)
+            if timings is None:
+                continue
+            ticks.append({
+                **tick,
+                'guild_timings': {guild_id: timings},
+                'failed_guild_ids': [g for g in tick.get('failed_guild_ids') or [] if g == guild_id],
+            })
+        return sorted(ticks, key=lambda tick: tick['guild_timings'][guild_id].get('total', 0.0), reverse=True)[:limit]
+
+    def snapshot(self, guild_id: Optional[str] = None, slowest: int = 5) -> Dict[str, Any]:
+        """
+        JSON-serialisable summary: p50/p95/p99 per (guild, phase), slowest p99 first,
+        plus the slowest recent ticks. When guild_id is given only that guild and global timings are
+        included, and no other guild's tick breakdown is exposed.
+        """
+        phases = []
+        for (scope, phase), histogram in self._histograms.items():
+            if guild_id is not None and scope not in (str(guild_id), GLOBAL_SCOPE):
+                continue
+            phases.append({'guild_id': scope, 'phase': phase, **histogram.summary()})
+        phases.sort(key=lambda entry: entry['p99'], reverse=True)
+        return {'phases': phases, 'slowest_ticks': self.slowest_ticks(slowest, guild_id=guild_id)}
+
+    def to_json(self, guild_id: Optional[str] = None, slowest: int = 5) -> str:
+        return json.dumps(self.snapshot(guild_id=guild_id, slowest=slowest), ensure_ascii=False, indent=2, default=str)
+
+    def reset(self) -> None:
+        self._histograms.clear()
+        self._recent_ticks.clear()
+
+
+TICK_PROFILER = TickProfiler()
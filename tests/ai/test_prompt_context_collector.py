@@ -1,8 +1,10 @@
+import asyncio
 import unittest
 import json
 from unittest.mock import MagicMock, patch, mock_open
 
 from bot.ai.prompt_context_collector import PromptContextCollector
+from bot.game.managers.ability_manager import AbilityManager
 from bot.ai.ai_data_models import GameTerm, ScalingParameter, GenerationContext # Assuming these are in this path
 
 # Mocking the actual game models that might be returned by managers
@@ -625,7 +627,7 @@ class TestPromptContextCollector(unittest.TestCase):
         self.assertEqual(full_context_char.request_params, request_params)
         self.assertEqual(full_context_char.game_rules_summary, mock_game_rules_summary)
         # For Pydantic v1, direct list comparison works. For v2, might need to compare dicts if model_dump is used.
-        self.assertEqual(full_context_char.lore_snippets, mock_lore_context) # lore_snippets is the key in GenerationContext
+        self.assertEqual(full_context_char.game_lore_snippets, mock_lore_context)
         self.assertEqual(full_context_char.world_state, mock_world_state)
         self.assertEqual(full_context_char.game_terms_dictionary, mock_game_terms)
         self.assertEqual(full_context_char.scaling_parameters, mock_scaling_params)
@@ -659,5 +661,59 @@ class TestPromptContextCollector(unittest.TestCase):
         self.assertEqual(full_context_npc.active_quests_summary, []) # No quests for NPC target
 
 
+    def test_full_context_reuses_cached_fragments_until_sources_change(self):
+        self.collector.get_world_state_context = MagicMock(return_value={})
+        self.mock_item_manager._item_templates = {"sword": {"name_i18n": {"en": "Sword"}}}
+        self.mock_item_manager.templates_version = 1
+        self.collector.get_game_terms_dictionary = MagicMock(wraps=self.collector.get_game_terms_dictionary)
+        self.collector.get_scaling_parameters = MagicMock(wraps=self.collector.get_scaling_parameters)
+
+        first = self.collector.get_full_context(self.guild_id, "generate_npc", {})
+        second = self.collector.get_full_context(self.guild_id, "generate_quest", {"level": 3})
+        self.assertEqual(self.collector.get_game_terms_dictionary.call_count, 1)
+        self.assertIs(first.game_terms_dictionary, second.game_terms_dictionary)
+        self.assertEqual(second.request_params, {"level": 3})
+
+        # An in-place edit is not seen until the owning manager bumps its templates_version.
+        self.mock_item_manager._item_templates["shield"] = {"name_i18n": {"en": "Shield"}}
+        self.collector.get_full_context(self.guild_id, "generate_npc", {})
+        self.assertEqual(self.collector.get_game_terms_dictionary.call_count, 1)
+
+        # A template reload bumps the version: only the terms are rebuilt.
+        self.mock_item_manager.templates_version += 1
+        third = self.collector.get_full_context(self.guild_id, "generate_npc", {})
+        self.assertEqual(self.collector.get_game_terms_dictionary.call_count, 2)
+        self.assertIn("shield", [term.id for term in third.game_terms_dictionary])
+        self.assertEqual(self.collector.get_scaling_parameters.call_count, 1)
+
+        self.collector.invalidate_fragments(self.guild_id)
+        self.collector.get_full_context(self.guild_id, "generate_npc", {})
+        self.assertEqual(self.collector.get_scaling_parameters.call_count, 2)
+
+    def test_template_reload_rebuilds_terms_even_when_cache_size_is_unchanged(self):
+        ability_manager = AbilityManager()
+        campaign_data = {"ability_templates": [
+            {"id": "ab_fire", "type": "activated_attack", "name_i18n": {"en": "Fire Bolt"}, "description_i18n": {"en": "Burns."}}
+        ]}
+        self.collector.ability_manager = ability_manager
+        self.collector.get_world_state_context = MagicMock(return_value={})
+        self.collector.get_game_terms_dictionary = MagicMock(wraps=self.collector.get_game_terms_dictionary)
+
+        asyncio.run(ability_manager.load_ability_templates(self.guild_id, campaign_data))
+        self.collector.get_full_context(self.guild_id, "generate_npc", {})
+        # Same guild dict, same number of templates: only the version counter tells the reload apart.
+        campaign_data["ability_templates"][0]["name_i18n"] = {"en": "Flame Lance"}
+        asyncio.run(ability_manager.load_ability_templates(self.guild_id, campaign_data))
+        self.collector.get_full_context(self.guild_id, "generate_npc", {})
+
+        self.assertEqual(ability_manager.templates_version, 2)
+        self.assertEqual(self.collector.get_game_terms_dictionary.call_count, 2)
+
+    def test_full_context_still_validates_request_parts(self):
+        self.collector.get_world_state_context = MagicMock(return_value=["not", "a", "dict"])
+        with self.assertRaises(ValueError):
+            self.collector.get_full_context(self.guild_id, "generate_npc", {})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,69 @@
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+
+from bot.command_modules.gm_app_cmds import GMAppCog
+from bot.utils.tick_profiler import TickProfiler
+
+
+class TestGMTickStatsCommand(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.profiler = TickProfiler()
+        self.profiler.record('world_tick.statuses', 0.1, '111')
+        self.profiler.record('world_tick.statuses', 0.3, '222')
+        self.profiler.record_tick(0.5, {'tick': 1, 'failed_guild_ids': ['222'],
+                                        'guild_timings': {'111': {'total': 0.1}, '222': {'total': 0.4}}})
+
+        self.bot = MagicMock()
+        self.bot.is_owner = AsyncMock(return_value=False)
+        self.cog = GMAppCog(self.bot)
+
+        self.interaction = AsyncMock(spec=discord.Interaction)
+        self.interaction.guild_id = 111
+        self.interaction.user = MagicMock(spec=discord.User)
+        self.interaction.response = AsyncMock(spec=discord.InteractionResponse)
+        self.interaction.followup = AsyncMock(spec=discord.Webhook)
+
+        patcher = patch('bot.command_modules.gm_app_cmds.TICK_PROFILER', self.profiler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('bot.command_modules.gm_app_cmds.is_master_or_admin_check', new_callable=AsyncMock, return_value=True)
+    async def test_text_report_shows_only_the_current_guild(self, _):
+        await self.cog.cmd_gm_tick_stats.callback(self.cog, self.interaction)
+
+        message = self.interaction.followup.send.await_args.args[0]
+        self.assertIn('111 | world_tick.statuses', message)
+        self.assertNotIn('222', message)
+
+    @patch('bot.command_modules.gm_app_cmds.is_master_or_admin_check', new_callable=AsyncMock, return_value=True)
+    async def test_json_report_shows_only_the_current_guild(self, _):
+        await self.cog.cmd_gm_tick_stats.callback(self.cog, self.interaction, as_json=True)
+
+        report = json.loads(self.interaction.followup.send.await_args.kwargs['file'].fp.read())
+        self.assertEqual({p['guild_id'] for p in report['phases']}, {'111', 'global'})
+        self.assertEqual(report['slowest_ticks'][0]['guild_timings'], {'111': {'total': 0.1}})
+        self.assertEqual(report['slowest_ticks'][0]['failed_guild_ids'], [])
+
+    @patch('bot.command_modules.gm_app_cmds.is_master_or_admin_check', new_callable=AsyncMock, return_value=True)
+    async def test_all_guilds_is_refused_for_non_owners(self, _):
+        await self.cog.cmd_gm_tick_stats.callback(self.cog, self.interaction, all_guilds=True)
+
+        self.interaction.response.send_message.assert_awaited_once()
+        self.interaction.followup.send.assert_not_awaited()
+
+    @patch('bot.command_modules.gm_app_cmds.is_master_or_admin_check', new_callable=AsyncMock, return_value=True)
+    async def test_owner_sees_all_guilds(self, _):
+        self.bot.is_owner.return_value = True
+        await self.cog.cmd_gm_tick_stats.callback(self.cog, self.interaction, all_guilds=True)
+
+        message = self.interaction.followup.send.await_args.args[0]
+        self.assertIn('222 | world_tick.statuses', message)
+        self.assertIn('медленнее всех: 222', message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+from bot.game.models.character import Character
+from bot.game.managers.character_manager import CharacterManager, PLAYER_SAVE_COLUMNS
+
+
+class TestCharacterManagerPartialSave(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.adapter = MagicMock()
+        self.adapter.bulk_upsert = AsyncMock()
+        self.adapter.bulk_delete = AsyncMock()
+        self.adapter.execute_many = AsyncMock()
+        db_service = MagicMock()
+        db_service.adapter = self.adapter
+        self.manager = CharacterManager(db_service=db_service)
+
+        self.guild_id = "guild_1"
+        self.char = Character.from_dict({
+            "id": "char_1", "discord_user_id": 42, "name": "Hero", "guild_id": self.guild_id,
+            "location_id": "town", "hp": 50.0, "max_health": 50.0,
+            "stats": {"strength": 10, "hp": 50.0, "max_health": 50.0},
+            "inventory": [{"item_id": "sword"}],
+        })
+        self.manager._characters[self.guild_id] = {self.char.id: self.char}
+
+    async def _save(self):
+        self.manager.mark_character_dirty(self.guild_id, self.char.id)
+        await self.manager.save_state(self.guild_id)
+
+    async def test_first_save_is_full_upsert_with_mapped_columns(self):
+        await self._save()
+
+        self.adapter.bulk_upsert.assert_awaited_once()
+        table, columns, rows = self.adapter.bulk_upsert.call_args.args
+        self.assertEqual(table, 'players')
+        row = dict(zip(columns, rows[0]))
+        self.assertEqual(columns, PLAYER_SAVE_COLUMNS)
+        self.assertEqual(row['discord_id'], "42")
+        self.assertEqual(row['current_location_id'], "town")
+        self.adapter.execute_many.assert_not_awaited()
+        self.assertNotIn(self.guild_id, self.manager._dirty_characters)
+
+    async def test_hp_change_writes_only_hp_and_stats_patch(self):
+        await self._save()
+        self.adapter.bulk_upsert.reset_mock()
+
+        self.char.hp = 30.0
+        await self._save()
+
+        self.adapter.bulk_upsert.assert_not_awaited()
+        self.adapter.execute_many.assert_awaited_once()
+        sql, rows = self.adapter.execute_many.call_args.args
+        self.assertEqual(
+            sql,
+            "UPDATE players SET stats = (COALESCE(stats::jsonb, '{}'::jsonb) || $2::jsonb)::json, hp = $3 WHERE id = $1",
+        )
+        self.assertEqual(rows, [("char_1", {"hp": 30.0}, 30.0)])
+
+    async def test_in_place_inventory_change_writes_only_inventory(self):
+        await self._save()
+
+        self.char.inventory.append({"item_id": "shield"})
+        await self._save()
+
+        sql, rows = self.adapter.execute_many.call_args.args
+        self.assertEqual(sql, "UPDATE players SET inventory = $2 WHERE id = $1")
+        self.assertEqual(rows, [("char_1", [{"item_id": "sword"}, {"item_id": "shield"}])])
+
+    async def test_unchanged_character_issues_no_queries(self):
+        await self._save()
+        self.adapter.bulk_upsert.reset_mock()
+
+        await self._save()
+
+        self.adapter.bulk_upsert.assert_not_awaited()
+        self.adapter.execute_many.assert_not_awaited()
+
+    async def test_failed_update_is_retried_on_next_save(self):
+        await self._save()
+        self.char.hp = 20.0
+        self.adapter.execute_many.side_effect = Exception("db down")
+        await self._save()
+        self.assertIn(self.char.id, self.manager._dirty_characters[self.guild_id])
+
+        self.adapter.execute_many.side_effect = None
+        self.adapter.execute_many.reset_mock()
+        await self._save()
+
+        _, rows = self.adapter.execute_many.call_args.args
+        self.assertEqual(rows, [("char_1", {"hp": 20.0}, 20.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
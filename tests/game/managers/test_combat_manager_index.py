@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+from bot.game.managers.combat_manager import CombatManager
+from bot.game.models.character import Character
+from bot.game.models.npc import NPC as NpcModel
+
+
+class TestCombatManagerParticipantIndex(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.guild_id = "guild1"
+        self.hero = Character.from_dict({"id": "hero", "discord_user_id": 1, "name": "Hero", "guild_id": self.guild_id, "hp": 30.0, "max_health": 30.0})
+        self.goblin = NpcModel(id="goblin", template_id="goblin", name_i18n={"en": "Goblin"}, guild_id=self.guild_id, health=10, max_health=10)
+
+        character_manager = MagicMock()
+        character_manager.get_character.side_effect = lambda guild_id, char_id: self.hero if char_id == "hero" else None
+        npc_manager = MagicMock()
+        npc_manager.get_npc.side_effect = lambda guild_id, npc_id: self.goblin if npc_id == "goblin" else None
+
+        self.combat_manager = CombatManager(
+            db_service=MagicMock(), rule_engine=MagicMock(),
+            character_manager=character_manager, npc_manager=npc_manager,
+        )
+
+    async def _start(self, **kwargs):
+        return await self.combat_manager.start_combat(
+            self.guild_id, "loc1", [("hero", "Character"), ("goblin", "NPC")], **kwargs
+        )
+
+    async def test_start_combat_indexes_participants_and_event(self):
+        combat = await self._start(event_id="event1")
+
+        self.assertIs(self.combat_manager.get_combat_by_participant_id(self.guild_id, "hero"), combat)
+        self.assertEqual(self.combat_manager.is_character_in_combat(self.guild_id, "goblin"), combat.id)
+        self.assertEqual(self.combat_manager.get_combats_by_event_id(self.guild_id, "event1"), [combat])
+        self.assertIsNone(self.combat_manager.is_character_in_combat("other_guild", "hero"))
+
+    async def test_end_combat_removes_index_entries(self):
+        combat = await self._start(event_id="event1")
+        self.combat_manager.process_combat_consequences = AsyncMock()
+
+        await self.combat_manager.end_combat(self.guild_id, combat.id, ["hero"], {})
+
+        self.assertIsNone(self.combat_manager.is_character_in_combat(self.guild_id, "hero"))
+        self.assertIsNone(self.combat_manager.is_character_in_combat(self.guild_id, "goblin"))
+        self.assertEqual(self.combat_manager.get_combats_by_event_id(self.guild_id, "event1"), [])
+
+    async def test_clean_up_for_entity_removes_only_that_participant(self):
+        combat = await self._start()
+
+        await self.combat_manager.clean_up_for_entity("goblin", "NPC", guild_id=self.guild_id, rule_engine=None)
+
+        self.assertIsNone(self.combat_manager.is_character_in_combat(self.guild_id, "goblin"))
+        self.assertEqual(self.combat_manager.is_character_in_combat(self.guild_id, "hero"), combat.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 import json
 import uuid
@@ -11,6 +12,7 @@ from bot.game.managers.game_log_manager import GameLogManager
 class MockPostgresAdapter:
     def __init__(self):
         self.execute = AsyncMock()
+        self.execute_many = AsyncMock()
         self.fetchall = AsyncMock()
 
 class MockDBService:
@@ -78,14 +80,14 @@ class TestGameLogManager(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(params[4], event_type)
         # Param 5: message_key
         self.assertEqual(params[5], message_key)
-        # Param 6: message_params (JSON string)
-        self.assertEqual(params[6], json.dumps(message_params))
+        # Param 6: message_params (encoded by the pool's JSON codec)
+        self.assertEqual(params[6], message_params)
         # Param 7: location_id
         self.assertEqual(params[7], location_id)
-        # Param 8: involved_entities_ids (JSON string)
-        self.assertEqual(params[8], json.dumps(involved_entities_ids))
-        # Param 9: details (JSON string)
-        self.assertEqual(params[9], json.dumps(details))
+        # Param 8: involved_entities_ids
+        self.assertEqual(params[8], involved_entities_ids)
+        # Param 9: details
+        self.assertEqual(params[9], details)
         # Param 10: channel_id
         self.assertEqual(params[10], channel_id)
 
@@ -139,5 +141,96 @@ class TestGameLogManager(unittest.IsolatedAsyncioTestCase):
         self.assertIn(f"ORDER BY timestamp DESC LIMIT $3 OFFSET $4", sql_statement)
         self.assertEqual(params, (guild_id, event_type, limit, offset))
 
+class TestGameLogManagerWriteBehind(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_db_service = MockDBService()
+
+    def _make_manager(self, **settings):
+        base_settings = {"batch_size": 10, "flush_interval_seconds": 60.0}
+        base_settings.update(settings)
+        return GameLogManager(db_service=self.mock_db_service, settings=base_settings)
+
+    async def test_log_event_is_buffered_and_flushed_in_one_batch(self):
+        manager = self._make_manager()
+        manager.start()
+        try:
+            for i in range(3):
+                await manager.log_event(guild_id="g1", event_type="DICE_ROLL", details={"i": i})
+
+            self.mock_db_service.adapter.execute.assert_not_called()
+            self.mock_db_service.adapter.execute_many.assert_not_called()
+
+            written = await manager.flush()
+            self.assertEqual(written, 3)
+            self.mock_db_service.adapter.execute_many.assert_called_once()
+            sql, rows = self.mock_db_service.adapter.execute_many.call_args[0]
+            self.assertIn("INSERT INTO game_logs", sql)
+            self.assertEqual(len(rows), 3)
+            self.assertEqual([r[10]["i"] for r in rows], [0, 1, 2])
+            self.assertEqual(rows[0][2], "g1")
+        finally:
+            await manager.stop()
+
+    async def test_reads_flush_pending_entries_first(self):
+        manager = self._make_manager()
+        manager.start()
+        try:
+            await manager.log_event(guild_id="g1", event_type="PLAYER_MOVE", details={})
+            self.mock_db_service.adapter.fetchall.return_value = []
+            await manager.get_logs_by_guild("g1")
+            self.mock_db_service.adapter.execute_many.assert_called_once()
+        finally:
+            await manager.stop()
+
+    async def test_stop_drains_queue(self):
+        manager = self._make_manager()
+        manager.start()
+        for i in range(25):
+            await manager.log_event(guild_id="g1", event_type="TICK", details={"i": i})
+        await manager.stop()
+
+        self.assertFalse(manager.is_write_behind_active)
+        total_rows = sum(len(c[0][1]) for c in self.mock_db_service.adapter.execute_many.call_args_list)
+        self.assertEqual(total_rows, 25)
+
+    async def test_stop_during_slow_write_keeps_in_flight_batch(self):
+        manager = self._make_manager(batch_size=2)
+        written_rows = []
+        write_started = asyncio.Event()
+
+        async def slow_execute_many(sql, rows):
+            write_started.set()
+            await asyncio.sleep(0.05)
+            written_rows.extend(rows)
+        self.mock_db_service.adapter.execute_many.side_effect = slow_execute_many
+
+        manager.start()
+        for i in range(3):
+            await manager.log_event(guild_id="g1", event_type="TICK", details={"i": i})
+        await write_started.wait()
+        await manager.stop()
+
+        self.assertEqual(sorted(r[10]["i"] for r in written_rows), [0, 1, 2])
+
+    async def test_drop_newest_overflow_policy(self):
+        manager = self._make_manager(batch_size=2, max_queue_size=2, overflow_policy="drop_newest")
+        manager.start()
+        # Keep the flusher from draining while the queue is filled.
+        async with manager._flush_lock:
+            for i in range(4):
+                await manager.log_event(guild_id="g1", event_type="SPAM", details={"i": i})
+            self.assertEqual(manager.dropped_events_count, 2)
+        await manager.stop()
+        rows = [r for c in self.mock_db_service.adapter.execute_many.call_args_list for r in c[0][1]]
+        self.assertEqual([r[10]["i"] for r in rows], [0, 1])
+
+    async def test_write_behind_disabled_writes_directly(self):
+        manager = self._make_manager(write_behind_enabled=False)
+        manager.start()
+        self.assertFalse(manager.is_write_behind_active)
+        await manager.log_event(guild_id="g1", event_type="TEST", details={})
+        self.mock_db_service.adapter.execute.assert_called_once()
+
 if __name__ == '__main__':
     unittest.main()
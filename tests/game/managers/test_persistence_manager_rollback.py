@@ -0,0 +1,122 @@
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import MagicMock, AsyncMock
+
+from bot.game.models.character import Character
+from bot.game.managers.character_manager import CharacterManager
+from bot.game.managers.npc_manager import NpcManager
+from bot.game.managers.persistence_manager import PersistenceManager
+
+
+class _FakeDBService:
+    """Mimics PostgresAdapter.savepoint: a failed statement aborts the transaction, so the savepoint rolls back."""
+
+    def __init__(self):
+        self.adapter = MagicMock()
+        self.adapter.bulk_delete = AsyncMock()
+        self.adapter.bulk_upsert = AsyncMock()
+        self.adapter.execute_many = AsyncMock()
+        self.statement_failed = False
+        self.fail_commit = False
+
+    def fail_next(self, mock):
+        async def _fail(*args, **kwargs):
+            mock.side_effect = None
+            self.statement_failed = True
+            raise ConnectionError("statement failed")
+        mock.side_effect = _fail
+
+    @asynccontextmanager
+    async def unit_of_work(self, transactional=False):
+        yield
+        if self.fail_commit:
+            raise ConnectionError("commit failed")
+
+    @asynccontextmanager
+    async def savepoint(self, on_rollback=None):
+        self.statement_failed = False
+        try:
+            yield
+        except BaseException:
+            on_rollback()
+            raise
+        if self.statement_failed and on_rollback is not None:
+            on_rollback()
+
+
+class _NpcManagerStub(NpcManager):
+    """Real pending-save hooks; save_state only clears the dirty set like a successful write would."""
+
+    def __init__(self):
+        super().__init__()
+        self._dirty_npcs = {"g1": {"npc1"}}
+
+    async def save_state(self, guild_id, **kwargs):
+        self._dirty_npcs.pop(guild_id, None)
+
+
+class TestPersistenceManagerRollback(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.db_service = _FakeDBService()
+        self.character_manager = CharacterManager(db_service=self.db_service)
+        self.char = Character.from_dict({
+            "id": "char_1", "discord_user_id": 42, "name": "Hero", "guild_id": "g1",
+            "location_id": "town", "hp": 50.0, "max_health": 50.0, "stats": {"hp": 50.0},
+        })
+        self.character_manager._characters["g1"] = {self.char.id: self.char}
+        self.character_manager._deleted_characters_ids["g1"] = {"char_old"}
+        self.character_manager.mark_character_dirty("g1", self.char.id)
+        self.npc_manager = _NpcManagerStub()
+        self.persistence = PersistenceManager(
+            event_manager=None, character_manager=self.character_manager, location_manager=None,
+            db_service=self.db_service, npc_manager=self.npc_manager,
+        )
+
+    async def test_delete_is_retried_when_a_later_statement_fails(self):
+        self.db_service.fail_next(self.db_service.adapter.bulk_upsert)
+
+        await self.persistence.save_game_state(["g1"])
+
+        self.assertEqual(self.character_manager._deleted_characters_ids["g1"], {"char_old"})
+        self.assertEqual(self.character_manager._dirty_characters["g1"], {"char_1"})
+
+        await self.persistence.save_game_state(["g1"])
+
+        self.assertEqual(self.db_service.adapter.bulk_delete.await_count, 2)
+        self.db_service.adapter.bulk_delete.assert_awaited_with('players', 'g1', ['char_old'])
+        self.assertEqual(self.db_service.adapter.bulk_upsert.await_count, 2)
+        self.assertNotIn("g1", self.character_manager._deleted_characters_ids)
+        self.assertNotIn("g1", self.character_manager._dirty_characters)
+
+    async def test_failed_commit_restores_every_manager(self):
+        self.db_service.fail_commit = True
+
+        with self.assertRaises(ConnectionError):
+            await self.persistence.save_game_state(["g1"])
+
+        self.assertEqual(self.character_manager._deleted_characters_ids["g1"], {"char_old"})
+        self.assertEqual(self.character_manager._dirty_characters["g1"], {"char_1"})
+        self.assertEqual(self.npc_manager._dirty_npcs["g1"], {"npc1"})
+
+        # Строка уже получила отпечаток, но он не был зафиксирован: снова полный upsert.
+        self.db_service.fail_commit = False
+        await self.persistence.save_game_state(["g1"])
+        self.assertEqual(self.db_service.adapter.bulk_upsert.await_count, 2)
+        self.db_service.adapter.execute_many.assert_not_awaited()
+
+    async def test_manager_without_pending_save_hooks_is_not_saved(self):
+        class _NoHooks:
+            save_state = AsyncMock()
+
+        no_hooks = _NoHooks()
+        self.persistence._skill_manager = no_hooks
+
+        await self.persistence.save_game_state(["g1"])
+
+        no_hooks.save_state.assert_not_awaited()
+        self.assertNotIn("g1", self.character_manager._dirty_characters)
+
+
+if __name__ == '__main__':
+    unittest.main()
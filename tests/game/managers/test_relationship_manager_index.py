@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+from bot.game.managers.relationship_manager import RelationshipManager
+
+
+class TestRelationshipManagerIndexes(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.manager = RelationshipManager(db_service=MagicMock())
+        self.guild_id = "guild1"
+
+    async def _relate(self, entity1_id, entity2_id, relationship_type, strength):
+        return await self.manager.create_or_update_relationship(
+            self.guild_id, entity1_id, "character", entity2_id, "npc", relationship_type, strength
+        )
+
+    async def test_entity_lookup_uses_both_sides_of_relationship(self):
+        friend = await self._relate("hero", "npc_a", "friend", 40.0)
+        enemy = await self._relate("npc_b", "hero", "enemy", -80.0)
+        await self._relate("npc_a", "npc_b", "neutral", 0.0)
+
+        self.assertEqual({rel.id for rel in self.manager.get_relationships_for_entity(self.guild_id, "hero")}, {friend.id, enemy.id})
+        self.assertIs(self.manager.get_relationship_between(self.guild_id, "hero", "npc_b", "ENEMY"), enemy)
+
+    async def test_create_or_update_reuses_existing_pair(self):
+        first = await self._relate("hero", "npc_a", "friend", 10.0)
+        second = await self._relate("npc_a", "hero", "friend", 30.0)
+
+        self.assertIs(first, second)
+        self.assertEqual(second.strength, 30.0)
+        self.assertEqual(len(self.manager.get_relationships_for_entity(self.guild_id, "hero")), 1)
+
+    async def test_adjust_and_delete_keep_indexes_in_sync(self):
+        rel = await self._relate("hero", "npc_a", "friend", 10.0)
+
+        adjusted = await self.manager.adjust_relationship_strength(self.guild_id, "npc_a", "hero", "friend", 15.0)
+        self.assertIs(adjusted, rel)
+        self.assertEqual(rel.strength, 25.0)
+
+        await self.manager.delete_relationship(self.guild_id, rel.id)
+        self.assertEqual(self.manager.get_relationships_for_entity(self.guild_id, "hero"), [])
+        self.assertIsNone(self.manager.get_relationship_between(self.guild_id, "hero", "npc_a", "friend"))
+
+    async def test_strongest_relationships_rank_by_absolute_strength(self):
+        await self._relate("hero", "npc_a", "friend", 20.0)
+        enemy = await self._relate("hero", "npc_b", "enemy", -90.0)
+        ally = await self._relate("hero", "npc_c", "friend", 60.0)
+
+        strongest = self.manager.get_strongest_relationships(self.guild_id, "hero", limit=2)
+        self.assertEqual([rel.id for rel in strongest], [enemy.id, ally.id])
+
+    async def test_load_state_rebuilds_indexes(self):
+        self.manager._db_service.adapter.fetchall = AsyncMock(return_value=[{
+            "id": "rel1", "guild_id": self.guild_id, "entity1_id": "hero", "entity1_type": "character",
+            "entity2_id": "npc_a", "entity2_type": "npc", "relationship_type": "friend", "strength": 50.0,
+            "details": None, "created_at": None, "updated_at": None,
+        }])
+
+        await self.manager.load_state(self.guild_id)
+
+        self.assertEqual([rel.id for rel in self.manager.get_relationships_for_entity(self.guild_id, "npc_a")], ["rel1"])
+        self.assertEqual(self.manager.get_relationship_between(self.guild_id, "npc_a", "hero", "friend").id, "rel1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -108,5 +108,86 @@ class TestStatusManager(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(removed_count, 0)
         self.status_manager.remove_status_effect.assert_not_called()
 
+
+class TestStatusManagerExpiry(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.mock_db_service = MagicMock()
+        self.mock_db_service.adapter = AsyncMock()
+        self.game_time = {"g1": 0.0}
+        self.mock_time_manager = MagicMock()
+        self.mock_time_manager.get_current_game_time.side_effect = lambda gid: self.game_time.get(gid, 0.0)
+        self.mock_rule_engine = MagicMock(spec=[])  # no periodic handler, no rules_config
+        self.status_manager = StatusManager(
+            db_service=self.mock_db_service,
+            settings={"status_templates": {
+                "stunned": {"name_i18n": {"en": "Stunned"}, "default_duration_turns": 5},
+                "bleeding": {"name_i18n": {"en": "Bleeding"}, "tick_effect": {"type": "damage"}, "tick_interval": 2},
+            }},
+            rule_engine=self.mock_rule_engine,
+            time_manager=self.mock_time_manager,
+        )
+
+    async def _advance(self, delta):
+        self.game_time["g1"] += delta
+        await self.status_manager.process_tick("g1", delta)
+
+    async def test_tick_does_not_dirty_unchanged_statuses_and_expires_on_time(self):
+        short = await self.status_manager.apply_status("c1", "Character", "stunned", "g1", duration_turns=3)
+        long = await self.status_manager.apply_status("c1", "Character", "stunned", "g1", duration_turns=10)
+        self.assertEqual(short.expires_at, 3.0)
+        self.status_manager._dirty_status_effects.clear()
+
+        await self._advance(2)
+        self.assertEqual(self.status_manager._dirty_status_effects, {})
+        self.assertIsNotNone(self.status_manager.get_status_effect("g1", short.id))
+        self.assertEqual(short.duration, 3.0)  # duration is no longer decremented
+
+        await self._advance(2)
+        self.assertIsNone(self.status_manager.get_status_effect("g1", short.id))
+        self.assertIsNotNone(self.status_manager.get_status_effect("g1", long.id))
+        self.assertIn(short.id, self.status_manager._deleted_status_effects_ids["g1"])
+        self.assertEqual(self.status_manager._dirty_status_effects.get("g1", set()), set())
+
+    async def test_periodic_effects_follow_schedule(self):
+        self.mock_rule_engine.apply_status_periodic_effects = AsyncMock()
+        character = MagicMock()
+        self.status_manager._character_manager = MagicMock()
+        self.status_manager._character_manager.get_character = AsyncMock(return_value=character)
+        self.status_manager._character_manager.trigger_stats_recalculation = AsyncMock()
+        bleeding = await self.status_manager.apply_status("c1", "Character", "bleeding", "g1", duration_turns=100)
+        await self.status_manager.apply_status("c1", "Character", "stunned", "g1", duration_turns=100)
+
+        for _ in range(4):
+            await self._advance(1)
+
+        calls = self.mock_rule_engine.apply_status_periodic_effects.call_args_list
+        self.assertEqual(len(calls), 2)  # every 2 time units, only for the periodic status
+        self.assertTrue(all(c.kwargs["status_effect"] is bleeding for c in calls))
+        self.assertEqual(calls[0].kwargs["game_time_delta"], 2.0)
+
+    async def test_display_name_without_game_time_shows_remaining(self):
+        status = await self.status_manager.apply_status("c1", "Character", "stunned", "g1", duration_turns=5)
+        await self._advance(2)
+        self.assertEqual(self.status_manager.get_status_display_name(status), "Stunned (3.0 ост.)")
+        self.assertEqual(self.status_manager.get_status_display_name(status, current_game_time=4.5), "Stunned (0.5 ост.)")
+
+    async def test_load_state_drops_expired_and_indexes_active(self):
+        self.game_time["g1"] = 50.0
+        self.mock_db_service.adapter.fetchall = AsyncMock(return_value=[
+            {"id": "s_old", "status_type": "stunned", "target_id": "c1", "target_type": "Character",
+             "duration_turns": 5, "applied_at": 10.0, "source_id": None, "state_variables": "{}", "guild_id": "g1"},
+            {"id": "s_new", "status_type": "stunned", "target_id": "c1", "target_type": "Character",
+             "duration_turns": 5, "applied_at": 48.0, "source_id": None, "state_variables": "{}", "guild_id": "g1"},
+        ])
+        await self.status_manager.load_state("g1")
+        self.assertIsNone(self.status_manager.get_status_effect("g1", "s_old"))
+        self.assertIn("s_old", self.status_manager._deleted_status_effects_ids["g1"])
+
+        await self._advance(2)
+        self.assertIsNotNone(self.status_manager.get_status_effect("g1", "s_new"))
+        await self._advance(1)
+        self.assertIsNone(self.status_manager.get_status_effect("g1", "s_new"))
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,6 +9,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from bot.services.db_service import DBService
 from bot.database.postgres_adapter import PostgresAdapter
 from bot.game.managers.time_manager import TimeManager
+from bot.services.global_state_cache import GlobalStateCache
 
 @pytest_asyncio.fixture
 async def mock_db_service():
@@ -104,3 +105,92 @@ async def test_save_state_updates_existing_game_time(time_manager, mock_db_servi
     # after the reset_mock(). The exact number of calls might depend on other operations
     # in save_state (like saving timers). We are primarily interested in the game_time call.
     assert mock_db_service.adapter.execute.call_count >= 1
+
+
+@pytest.mark.asyncio
+async def test_game_time_goes_through_global_state_cache(mock_db_service):
+    """With a GlobalStateCache the game time is written through it and loaded from memory."""
+    guild_id = "test_guild_cache"
+    mock_db_service.adapter.fetchall = AsyncMock(return_value=[])
+    mock_db_service.adapter.fetchone = AsyncMock(return_value=None)
+    cache = GlobalStateCache(db_service=mock_db_service)
+    await cache.load()
+    changes = []
+    cache.subscribe(lambda key, value: changes.append((key, value)))
+    tm = TimeManager(db_service=mock_db_service, settings={}, global_state_cache=cache)
+    tm._current_game_time[guild_id] = 42.5
+
+    await tm.save_state(guild_id=guild_id)
+
+    assert cache.get(f'game_time_{guild_id}') == json.dumps(42.5)
+    assert changes == [(f'game_time_{guild_id}', json.dumps(42.5))]
+    mock_db_service.adapter.execute.assert_any_call(
+        "INSERT INTO global_state (key, value) VALUES ($1, $2) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+        (f'game_time_{guild_id}', json.dumps(42.5))
+    )
+
+    tm._current_game_time.clear()
+    await tm.load_state(guild_id=guild_id)
+    assert tm._current_game_time[guild_id] == 42.5
+    assert all("global_state" not in c.args[0] for c in mock_db_service.adapter.fetchone.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_process_tick_triggers_only_due_timers_and_batch_deletes(time_manager, mock_db_service):
+    """Only expired timers fire; they are removed with a single DELETE."""
+    guild_id = "test_guild_789"
+    time_manager._current_game_time[guild_id] = 0.0
+    first_id = await time_manager.add_timer(guild_id, "t", 5.0, {"n": 1})
+    second_id = await time_manager.add_timer(guild_id, "t", 7.0, {"n": 2})
+    later_id = await time_manager.add_timer(guild_id, "t", 50.0, {"n": 3})
+    mock_db_service.adapter.execute.reset_mock()
+
+    with patch.object(time_manager, "_trigger_timer_callback", new_callable=AsyncMock) as trigger:
+        await time_manager.process_tick(guild_id, 10.0)
+
+    assert [c.args[1]["n"] for c in trigger.call_args_list] == [1, 2]
+    mock_db_service.adapter.execute.assert_called_once()
+    sql, params = mock_db_service.adapter.execute.call_args[0]
+    assert sql.startswith("DELETE FROM timers")
+    assert params == (guild_id, [first_id, second_id])
+    assert time_manager.get_timer(guild_id, later_id) is not None
+    assert time_manager.get_timer(guild_id, first_id) is None
+
+
+@pytest.mark.asyncio
+async def test_removed_timer_is_not_triggered(time_manager):
+    guild_id = "test_guild_rm"
+    time_manager._current_game_time[guild_id] = 0.0
+    timer_id = await time_manager.add_timer(guild_id, "t", 1.0, {})
+    await time_manager.remove_timer(guild_id, timer_id)
+
+    with patch.object(time_manager, "_trigger_timer_callback", new_callable=AsyncMock) as trigger:
+        await time_manager.process_tick(guild_id, 5.0)
+    trigger.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_save_state_writes_only_changed_timers(time_manager, mock_db_service):
+    """save_state no longer rewrites every timer; only dirty ones are upserted."""
+    guild_id = "test_guild_delta"
+    time_manager._current_game_time[guild_id] = 0.0
+    await time_manager.add_timer(guild_id, "t", 5.0, {})
+    changed_id = await time_manager.add_timer(guild_id, "t", 10.0, {})
+    mock_db_service.adapter.execute.reset_mock()
+
+    await time_manager.save_state(guild_id=guild_id)
+    mock_db_service.adapter.bulk_upsert.assert_not_called()
+    mock_db_service.adapter.bulk_delete.assert_not_called()
+
+    time_manager.get_timer(guild_id, changed_id)['ends_at'] = 2.0
+    time_manager.mark_timer_dirty(guild_id, changed_id)
+    await time_manager.save_state(guild_id=guild_id)
+    mock_db_service.adapter.bulk_upsert.assert_called_once()
+    table, columns, rows = mock_db_service.adapter.bulk_upsert.call_args[0]
+    assert table == "timers"
+    assert [r[columns.index('id')] for r in rows] == [changed_id]
+
+    # The rescheduled timer fires at its new end time.
+    with patch.object(time_manager, "_trigger_timer_callback", new_callable=AsyncMock) as trigger:
+        await time_manager.process_tick(guild_id, 3.0)
+    trigger.assert_called_once()
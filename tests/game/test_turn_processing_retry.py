@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.ai.rules_schema import CoreGameRulesConfig
+from bot.game.managers.character_manager import CharacterManager
+from bot.game.models.character import Character
+from bot.game.turn_processing_service import TurnProcessingService
+from bot.game.turn_readiness_queue import REASON_END_TURN
+from bot.services.action_buffer import ActionBuffer, CollectedAction
+
+LEGACY_ACTIONS_JSON = '[{"intent": "look", "entities": []}]'
+
+
+class TestTurnProcessingRetry(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.character_manager = CharacterManager()
+        self.char = Character.from_dict({
+            "id": "p1", "discord_user_id": 42, "name": "Hero", "guild_id": "g1",
+            "location_id": "town", "hp": 50.0, "max_health": 50.0,
+        })
+        self.char.current_game_status = 'ожидание_обработки'
+        self.char.collected_actions_json = LEGACY_ACTIONS_JSON
+        self.character_manager._characters["g1"] = {self.char.id: self.char}
+
+        self.db_service = MagicMock()
+        self.db_service.insert_collected_actions = AsyncMock()
+        self.db_service.delete_collected_actions = AsyncMock()
+        self.action_buffer = ActionBuffer(db_service=self.db_service, flush_delay=60)
+        self.action = CollectedAction(intent="move", entities=[{"type": "location_name", "name": "north"}], original_text="north")
+        self.action_buffer.append("g1", "p1", self.action)
+        await self.action_buffer.flush("g1")  # the row exists, so draining schedules its delete
+
+        self.game_manager = MagicMock()
+        self.game_manager.save_game_state_after_action = AsyncMock()
+        self.rule_engine = MagicMock()
+        self.rule_engine.rules_config_data = None
+        self.conflict_resolver = AsyncMock()
+        self.tps = TurnProcessingService(
+            character_manager=self.character_manager, conflict_resolver=self.conflict_resolver, rule_engine=self.rule_engine,
+            game_manager=self.game_manager, game_log_manager=AsyncMock(), character_action_processor=AsyncMock(),
+            combat_manager=AsyncMock(), location_manager=AsyncMock(), location_interaction_service=AsyncMock(),
+            dialogue_manager=AsyncMock(), inventory_manager=AsyncMock(), equipment_manager=AsyncMock(),
+            item_manager=AsyncMock(), settings={}, action_buffer=self.action_buffer,
+        )
+
+    async def asyncTearDown(self):
+        await self.action_buffer.shutdown()
+
+    def _assert_actions_kept(self):
+        self.assertEqual([a.id for a in self.action_buffer.get_actions("g1", "p1")], [self.action.id])
+        self.assertNotIn("g1", self.action_buffer._deleted)
+        self.assertEqual(self.char.collected_actions_json, LEGACY_ACTIONS_JSON)
+
+    async def test_abort_without_rules_config_keeps_actions_and_re_enqueues_players(self):
+        result = await self.tps.run_turn_cycle_check("g1", player_ids=["p1"])
+
+        self.assertIsNone(result)
+        self.assertEqual(self.char.current_game_status, 'ожидание_обработки')
+        self._assert_actions_kept()
+        self.game_manager.turn_readiness_queue.retry_later.assert_called_once_with("g1", ["p1"], REASON_END_TURN)
+
+        await self.action_buffer.flush("g1")
+        self.db_service.delete_collected_actions.assert_not_awaited()
+
+    async def test_failed_turn_returns_players_to_waiting_with_their_actions(self):
+        self.rule_engine.rules_config_data = MagicMock(spec=CoreGameRulesConfig)
+        self.conflict_resolver.analyze_actions_for_conflicts.side_effect = ConnectionError("db down")
+
+        with self.assertRaises(ConnectionError):
+            await self.tps.run_turn_cycle_check("g1", player_ids=["p1"])
+
+        self.assertEqual(self.char.current_game_status, 'ожидание_обработки')
+        self.assertIn("p1", self.character_manager._dirty_characters["g1"])
+        self._assert_actions_kept()
+
+    async def test_turn_cycle_without_candidates_scans_the_guild(self):
+        self.tps.process_player_turns = AsyncMock(return_value={})
+
+        await self.tps.run_turn_cycle_check("g1")
+
+        self.tps.process_player_turns.assert_awaited_once_with(["p1"], "g1")
+        self.assertEqual(self.char.current_game_status, 'обрабатывается')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+
+from bot.game.turn_readiness_queue import TurnReadinessQueue, REASON_ACTIONS, REASON_END_TURN
+
+
+class TestTurnReadinessQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.queue = TurnReadinessQueue()
+
+    async def test_take_returns_only_enqueued_guilds(self):
+        self.queue.mark_ready("g1", "char1")
+        self.queue.mark_ready("g1", "char2")
+        self.queue.mark_ready("g1", "char1")
+        self.queue.mark_ready("g2", "char3", REASON_END_TURN)
+
+        self.assertEqual(self.queue.take(REASON_ACTIONS), {"g1": ["char1", "char2"]})
+        self.assertEqual(self.queue.take(REASON_ACTIONS), {})
+        self.assertEqual(self.queue.ready_guilds(REASON_END_TURN), ["g2"])
+
+    async def test_end_turn_supersedes_actions(self):
+        self.queue.mark_ready("g1", "char1", REASON_ACTIONS)
+        self.queue.mark_ready("g1", "char1", REASON_END_TURN)
+        self.queue.mark_ready("g1", "char1", REASON_ACTIONS)
+
+        self.assertFalse(self.queue.has_ready(REASON_ACTIONS))
+        self.assertEqual(self.queue.take(REASON_END_TURN), {"g1": ["char1"]})
+
+    async def test_discard_removes_empty_guilds(self):
+        self.queue.mark_ready("g1", "char1", REASON_END_TURN)
+        self.queue.discard("g1", "char1")
+        self.assertFalse(self.queue.has_ready())
+        self.assertEqual(self.queue.ready_guilds(REASON_END_TURN), [])
+
+    async def test_wait_wakes_on_mark_ready(self):
+        waiter = asyncio.create_task(self.queue.wait(REASON_END_TURN, timeout=1.0))
+        await asyncio.sleep(0)
+        self.queue.mark_ready("g1", "char1", REASON_ACTIONS)
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        self.queue.mark_ready("g1", "char1", REASON_END_TURN)
+        self.assertTrue(await waiter)
+
+    async def test_wait_times_out_when_idle(self):
+        self.assertFalse(await self.queue.wait(REASON_END_TURN, timeout=0.01))
+        self.queue.mark_ready("g1", "char1", REASON_END_TURN)
+        self.queue.take(REASON_END_TURN)
+        self.assertFalse(await self.queue.wait(REASON_END_TURN, timeout=0.01))
+
+    async def test_retry_later_re_enqueues_after_delay(self):
+        self.queue.retry_later("g1", ["char1", "char2"], REASON_END_TURN, delay=0.01)
+        self.assertFalse(self.queue.has_ready())
+        self.assertTrue(await self.queue.wait(REASON_END_TURN, timeout=1.0))
+        self.assertEqual(self.queue.take(REASON_END_TURN), {"g1": ["char1", "char2"]})
+
+    def test_unknown_reason_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.queue.mark_ready("g1", "char1", "whenever")
+        with self.assertRaises(ValueError):
+            self.queue.retry_later("g1", ["char1"], "whenever")
+
+
+if __name__ == '__main__':
+    unittest.main()
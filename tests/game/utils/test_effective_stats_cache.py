@@ -0,0 +1,93 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bot.game.utils.stats_calculator import EffectiveStatsCache
+from bot.ai.rules_schema import CoreGameRulesConfig, BaseStatDefinition, StatModifierRule
+from bot.game.models.character import Character
+from bot.game.models.status_effect import StatusEffect
+from bot.game.managers.character_manager import CharacterManager
+from bot.game.managers.npc_manager import NpcManager
+from bot.game.managers.item_manager import ItemManager
+from bot.game.managers.status_manager import StatusManager
+
+
+class TestEffectiveStatsCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.rules_config = CoreGameRulesConfig(
+            base_stats={
+                "STRENGTH": BaseStatDefinition(name_i18n={"en": "Strength"}, description_i18n={"en": "Strength"}, default_value=10, min_value=1, max_value=30),
+            },
+            status_effects={}, equipment_slots={}, checks={}, damage_types={},
+            xp_rules=None, loot_tables={}, action_conflicts=[], location_interactions={}
+        )
+        self.player = Character.from_dict({
+            "id": "player1", "name": "Test Player", "guild_id": "guild1", "discord_user_id": 123,
+            "stats": {"strength": 12}, "skills_data_json": json.dumps({}), "inventory": [],
+        })
+        self.character_manager = CharacterManager()
+        self.character_manager._characters["guild1"] = {self.player.id: self.player}
+        self.item_manager = ItemManager()
+        self.item_manager._item_templates = {
+            "ring": {"stat_modifiers": [StatModifierRule(stat_name="strength", bonus_type="flat", value=3).model_dump()]},
+        }
+        self.status_manager = StatusManager(settings={"status_templates": {
+            "blessed": {"name": "Blessed", "stat_modifiers": [{"stat_name": "strength", "bonus_type": "flat", "value": 2}]},
+        }})
+        self.cache = EffectiveStatsCache()
+
+    def _get(self, rules_config=None):
+        return self.cache.get_effective_stats(
+            db_service=MagicMock(), guild_id="guild1", entity_id="player1", entity_type="Character",
+            rules_config_data=rules_config or self.rules_config,
+            character_manager=self.character_manager, npc_manager=NpcManager(),
+            item_manager=self.item_manager, status_manager=self.status_manager
+        )
+
+    async def test_unchanged_inputs_reuse_cached_stats(self):
+        first = await self._get()
+        second = await self._get()
+
+        self.assertIs(first, second)
+        self.assertEqual(first["strength"], 12)
+
+    async def test_equipping_item_triggers_recompute(self):
+        await self._get()
+        self.player.inventory = [{"template_id": "ring", "equipped": True}]
+
+        stats = await self._get()
+        self.assertEqual(stats["strength"], 15)
+
+    async def test_applied_status_triggers_recompute(self):
+        await self._get()
+        self.status_manager._status_effects["guild1"] = {
+            "st1": StatusEffect(id="st1", status_type="blessed", target_id="player1", target_type="Character", guild_id="guild1"),
+        }
+
+        stats = await self._get()
+        self.assertEqual(stats["strength"], 14)
+
+    async def test_new_rules_config_triggers_recompute(self):
+        first = await self._get()
+        second = await self._get(self.rules_config.model_copy(deep=True))
+        self.assertIsNot(first, second)
+
+    async def test_same_tick_requests_share_one_computation(self):
+        with patch.object(self.character_manager, "get_character", wraps=self.character_manager.get_character) as get_character:
+            results = await asyncio.gather(self._get(), self._get(), self._get())
+
+        self.assertIs(results[0], results[1])
+        self.assertIs(results[1], results[2])
+        # One stamp read plus one read inside calculate_effective_stats.
+        self.assertEqual(get_character.call_count, 2)
+
+    async def test_invalidate_forces_recompute(self):
+        first = await self._get()
+        self.cache.invalidate("guild1", "player1")
+        self.assertIsNot(first, await self._get())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import MagicMock
+
+from bot.game.utils.location_occupancy import LocationOccupancyIndex, CHARACTERS, NPCS, PARTIES
+from bot.game.models.character import Character
+from bot.game.managers.character_manager import CharacterManager
+
+
+class TestLocationOccupancyIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LocationOccupancyIndex()
+
+    def test_place_moves_entity_between_locations(self):
+        self.index.place("g1", CHARACTERS, "c1", "town")
+        self.index.place("g1", CHARACTERS, "c1", "forest")
+
+        self.assertEqual(self.index.occupants("g1", "town", CHARACTERS), set())
+        self.assertEqual(self.index.occupants("g1", "forest", CHARACTERS), {"c1"})
+        self.assertEqual(self.index.location_of("g1", CHARACTERS, "c1"), "forest")
+
+    def test_kinds_and_guilds_are_separate(self):
+        self.index.place("g1", CHARACTERS, "x", "town")
+        self.index.place("g1", NPCS, "x", "town")
+        self.index.place("g2", CHARACTERS, "y", "town")
+
+        self.index.remove("g1", NPCS, "x")
+        self.assertEqual(self.index.occupants("g1", "town", CHARACTERS), {"x"})
+        self.assertEqual(self.index.occupants("g1", "town", NPCS), set())
+        self.assertEqual(self.index.occupants("g2", "town", CHARACTERS), {"y"})
+
+    def test_clear_one_kind_keeps_the_others(self):
+        self.index.place("g1", CHARACTERS, "c1", "town")
+        self.index.place("g1", PARTIES, "p1", "town")
+
+        self.index.clear("g1", CHARACTERS)
+        self.assertEqual(self.index.occupants("g1", "town", CHARACTERS), set())
+        self.assertEqual(self.index.occupants("g1", "town", PARTIES), {"p1"})
+        self.assertIsNone(self.index.location_of("g1", CHARACTERS, "c1"))
+
+
+class TestCharacterManagerOccupancy(unittest.IsolatedAsyncioTestCase):
+
+    async def test_update_and_revert_location_keep_index_in_sync(self):
+        index = LocationOccupancyIndex()
+        manager = CharacterManager(db_service=MagicMock(), occupancy_index=index)
+        char = Character.from_dict({"id": "c1", "discord_user_id": 1, "name": "Hero", "guild_id": "g1", "location_id": "town"})
+        manager._characters["g1"] = {"c1": char}
+        index.place("g1", CHARACTERS, "c1", "town")
+
+        await manager.update_character_location("c1", "forest", "g1")
+        self.assertEqual(char.location_id, "forest")
+        self.assertEqual([c.id for c in manager.get_characters_in_location("g1", "forest")], ["c1"])
+        self.assertEqual(manager.get_characters_in_location("g1", "town"), [])
+
+        await manager.revert_location_change("g1", "c1", "town")
+        self.assertEqual([c.id for c in manager.get_characters_in_location("g1", "town")], ["c1"])
+        self.assertEqual(index.occupants("g1", "forest", CHARACTERS), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
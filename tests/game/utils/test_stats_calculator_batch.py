@@ -0,0 +1,138 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bot.game.utils import stats_calculator
+from bot.game.utils.stats_calculator import calculate_effective_stats, calculate_effective_stats_batch
+from bot.ai.rules_schema import CoreGameRulesConfig, BaseStatDefinition, StatModifierRule, GrantedAbilityOrSkill
+from bot.game.models.character import Character
+from bot.game.models.npc import NPC as NpcModel
+from bot.game.models.status_effect import StatusEffect
+from bot.game.managers.character_manager import CharacterManager
+from bot.game.managers.npc_manager import NpcManager
+from bot.game.managers.item_manager import ItemManager
+from bot.game.managers.status_manager import StatusManager
+
+
+class TestEffectiveStatsBatch(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.rules_config = CoreGameRulesConfig(
+            base_stats={
+                "STRENGTH": BaseStatDefinition(name_i18n={"en": "Strength"}, description_i18n={"en": "Strength"}, default_value=10, min_value=1, max_value=30),
+                "DEXTERITY": BaseStatDefinition(name_i18n={"en": "Dexterity"}, description_i18n={"en": "Dexterity"}, default_value=10, min_value=1, max_value=30),
+                "MAX_HP": BaseStatDefinition(name_i18n={"en": "Max HP"}, description_i18n={"en": "Max HP"}, default_value=50, min_value=1, max_value=1000),
+            },
+            status_effects={}, equipment_slots={}, checks={}, damage_types={},
+            xp_rules=None, loot_tables={}, action_conflicts=[], location_interactions={}
+        )
+        self.characters = {
+            "player1": Character.from_dict({
+                "id": "player1", "name": "Fighter", "guild_id": "guild1", "discord_user_id": 1,
+                "stats": {"strength": 12, "dexterity": 11}, "skills_data_json": json.dumps({"sword_skill": 5}),
+                "inventory": [{"template_id": "ring", "equipped": True}, {"template_id": "boots", "equipped": True}],
+            }),
+            "player2": Character.from_dict({
+                "id": "player2", "name": "Rogue", "guild_id": "guild1", "discord_user_id": 2,
+                "stats": {"strength": 9, "dexterity": 17, "luck": 3}, "skills_data_json": json.dumps({}),
+                "inventory": [{"template_id": "boots", "equipped": True}, {"template_id": "boots", "equipped": True}],
+            }),
+        }
+        self.npcs = {
+            "npc1": NpcModel.from_dict({
+                "id": "npc1", "template_id": "goblin", "name_i18n": {"en": "Goblin"}, "guild_id": "guild1",
+                "stats": {"strength": 29, "dexterity": 8}, "skills": {"axe_skill": 3},
+            }),
+        }
+        modifiers = {
+            "ring": [
+                StatModifierRule(stat_name="STRENGTH", bonus_type="flat", value=2.5),
+                StatModifierRule(stat_name="sword_skill", bonus_type="percentage_increase", value=15),
+            ],
+            "boots": [
+                StatModifierRule(stat_name="dexterity", bonus_type="multiplier", value=1.1),
+                StatModifierRule(stat_name="speed", bonus_type="flat", value=0.3),
+            ],
+            "rage": [
+                StatModifierRule(stat_name="strength", bonus_type="flat", value=4),
+                StatModifierRule(stat_name="strength", bonus_type="percentage_increase", value=10),
+                StatModifierRule(stat_name="dexterity", bonus_type="multiplier", value=0.7),
+            ],
+        }
+
+        # Real managers: sync getters, templates as dicts (what ItemManager/StatusManager hand out).
+        self.character_manager = CharacterManager()
+        self.character_manager._characters["guild1"] = dict(self.characters)
+        self.npc_manager = NpcManager()
+        self.npc_manager._npcs["guild1"] = dict(self.npcs)
+        self.item_manager = ItemManager()
+        self.item_manager._item_templates = {
+            "ring": {
+                "stat_modifiers": [m.model_dump() for m in modifiers["ring"]],
+                "grants_abilities_or_skills": [GrantedAbilityOrSkill(id="cleave", type="ability").model_dump()],
+            },
+            "boots": {"stat_modifiers": [m.model_dump() for m in modifiers["boots"]], "grants_abilities_or_skills": []},
+        }
+        self.status_manager = StatusManager(settings={"status_templates": {
+            "rage": {"name": "Rage", "stat_modifiers": [m.model_dump() for m in modifiers["rage"]]},
+        }})
+        self.status_manager._status_effects["guild1"] = {
+            "st1": StatusEffect(id="st1", status_type="rage", target_id="npc1", target_type="NPC", guild_id="guild1"),
+            "st2": StatusEffect(id="st2", status_type="rage", target_id="player2", target_type="Character", guild_id="guild1"),
+        }
+        self.entities = [("player1", "Character"), ("npc1", "NPC"), ("player2", "player"), ("ghost", "NPC")]
+
+    def _managers(self):
+        return dict(
+            db_service=MagicMock(), guild_id="guild1", rules_config_data=self.rules_config,
+            character_manager=self.character_manager, npc_manager=self.npc_manager,
+            item_manager=self.item_manager, status_manager=self.status_manager
+        )
+
+    async def _scalar_results(self):
+        return {
+            entity_id: await calculate_effective_stats(entity_id=entity_id, entity_type=entity_type, **self._managers())
+            for entity_id, entity_type in self.entities
+        }
+
+    async def test_batch_matches_scalar_results(self):
+        expected = await self._scalar_results()
+        batch = await calculate_effective_stats_batch(entities=self.entities, **self._managers())
+
+        self.assertEqual(batch, expected)
+        for entity_id, stats in expected.items():
+            self.assertEqual(list(batch[entity_id]), list(stats))
+            for key, value in stats.items():
+                self.assertIs(type(batch[entity_id][key]), type(value), f"{entity_id}.{key}")
+        self.assertEqual(batch["ghost"], {})
+        self.assertEqual(batch["npc1"]["strength"], 30)  # capped
+
+    async def test_batch_without_numpy_matches_scalar_results(self):
+        expected = await self._scalar_results()
+        with patch.object(stats_calculator, "np", None):
+            batch = await calculate_effective_stats_batch(entities=self.entities, **self._managers())
+        self.assertEqual(batch, expected)
+
+    async def test_non_numeric_stats_use_scalar_path(self):
+        self.characters["player1"].stats = {"strength": 12, "title": "Sir"}
+        expected = await self._scalar_results()
+        batch = await calculate_effective_stats_batch(entities=self.entities, **self._managers())
+        self.assertEqual(batch, expected)
+        self.assertEqual(batch["player1"]["title"], "Sir")
+
+    async def test_modifiers_from_real_templates_are_applied(self):
+        batch = await calculate_effective_stats_batch(entities=self.entities, **self._managers())
+        self.assertEqual(batch["player1"]["strength"], 14)  # round(12 + 2.5)
+        self.assertEqual(batch["player1"]["granted_abilities_skills"], [{"id": "cleave", "type": "ability"}])
+        self.assertEqual(batch["player2"]["strength"], 14)  # round((9 + 4) * 1.1)
+
+    async def test_templates_are_looked_up_once_per_batch(self):
+        with patch.object(self.item_manager, "get_item_template", wraps=self.item_manager.get_item_template) as item_lookup, \
+                patch.object(self.status_manager, "get_status_template", wraps=self.status_manager.get_status_template) as status_lookup:
+            await calculate_effective_stats_batch(entities=self.entities, **self._managers())
+        self.assertEqual(item_lookup.call_count, 2)
+        self.assertEqual(status_lookup.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
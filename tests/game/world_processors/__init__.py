@@ -0,0 +1 @@
+# This file makes Python treat the 'tests/game/world_processors' directory as a package.
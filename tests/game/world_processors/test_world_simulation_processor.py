@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.game.world_processors.world_simulation_processor import WorldSimulationProcessor
+
+
+class TestWorldSimulationProcessorTick(unittest.IsolatedAsyncioTestCase):
+
+    def _make_wsp(self, settings=None, **optional_managers):
+        return WorldSimulationProcessor(
+            event_manager=MagicMock(spec=[]),
+            character_manager=MagicMock(spec=[]),
+            location_manager=MagicMock(spec=[]),
+            rule_engine=MagicMock(),
+            openai_service=MagicMock(),
+            event_stage_processor=MagicMock(),
+            event_action_processor=MagicMock(),
+            persistence_manager=MagicMock(),
+            settings=settings or {},
+            send_callback_factory=MagicMock(),
+            character_action_processor=MagicMock(),
+            party_action_processor=MagicMock(),
+            **optional_managers
+        )
+
+    def _persistence(self, guild_ids):
+        persistence_manager = MagicMock()
+        persistence_manager.get_loaded_guild_ids.return_value = guild_ids
+        return persistence_manager
+
+    async def test_guilds_tick_concurrently_up_to_limit(self):
+        running = 0
+        max_running = 0
+
+        async def slow_tick(guild_id, game_time_delta, **kwargs):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        time_manager = MagicMock()
+        time_manager.process_tick = AsyncMock(side_effect=slow_tick)
+        wsp = self._make_wsp(settings={'world_tick_settings': {'max_concurrent_guilds': 2}}, time_manager=time_manager)
+
+        await wsp.process_world_tick(1.0, persistence_manager=self._persistence(["g1", "g2", "g3", "g4"]))
+
+        self.assertEqual(time_manager.process_tick.await_count, 4)
+        self.assertEqual(max_running, 2)
+        self.assertEqual(set(wsp.get_tick_stats()['guild_timings']), {"g1", "g2", "g3", "g4"})
+        self.assertIn('time', wsp.get_tick_stats()['guild_timings']['g1'])
+
+    async def test_failing_guild_does_not_stop_others(self):
+        wsp = self._make_wsp(time_manager=MagicMock(process_tick=AsyncMock()))
+        wsp._process_guild_tick = AsyncMock(side_effect=[RuntimeError("boom"), None])
+
+        await wsp.process_world_tick(1.0, persistence_manager=self._persistence(["bad", "good"]))
+
+        self.assertEqual(wsp._process_guild_tick.await_count, 2)
+        self.assertEqual(wsp.get_tick_stats()['failed_guild_ids'], ["bad"])
+
+    async def test_idle_subsystems_are_skipped(self):
+        status_manager = MagicMock()
+        status_manager.has_tick_work.return_value = False
+        status_manager.process_tick = AsyncMock()
+        wsp = self._make_wsp(status_manager=status_manager)
+
+        await wsp.process_world_tick(1.0, persistence_manager=self._persistence(["g1"]))
+
+        status_manager.has_tick_work.assert_called_once_with("g1")
+        status_manager.process_tick.assert_not_awaited()
+
+    async def test_missed_ticks_are_coalesced_or_dropped(self):
+        time_manager = MagicMock(process_tick=AsyncMock())
+        wsp = self._make_wsp(time_manager=time_manager)
+        wsp.note_missed_ticks(2, 5.0)
+        await wsp.process_world_tick(5.0, persistence_manager=self._persistence(["g1"]))
+        self.assertEqual(time_manager.process_tick.await_args.kwargs['game_time_delta'], 15.0)
+
+        dropping = self._make_wsp(settings={'world_tick_settings': {'overrun_policy': 'drop'}}, time_manager=time_manager)
+        dropping.note_missed_ticks(2, 5.0)
+        await dropping.process_world_tick(5.0, persistence_manager=self._persistence(["g1"]))
+        self.assertEqual(time_manager.process_tick.await_args.kwargs['game_time_delta'], 5.0)
+        self.assertEqual(dropping.get_tick_stats()['dropped_tick_count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
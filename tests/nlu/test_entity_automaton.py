@@ -0,0 +1,70 @@
+import unittest
+
+from bot.nlu.entity_automaton import EntityAutomaton, EntityAutomatonCache
+
+
+def _entity(eid, name, etype="npc", lang="en"):
+    return {"id": eid, "name": name, "type": etype, "lang": lang}
+
+
+class TestEntityAutomaton(unittest.TestCase):
+
+    def setUp(self):
+        self.automaton = EntityAutomaton({
+            "npc": [_entity("npc1", "Guard Captain"), _entity("npc2", "Guard"), _entity("npc3", "Фаэлан", lang="ru")],
+            "location": [_entity("loc1", "Old Tree", "location"), _entity("loc2", "Tree", "location")],
+            "item": [_entity("item1", "Sword", "item"), _entity("item2", "sword", "item_template")],
+        })
+
+    def _found(self, text):
+        return [(text[m.start:m.end], [e["id"] for e in m.entities]) for m in self.automaton.find(text)]
+
+    def test_case_folded_longest_match(self):
+        self.assertEqual(self._found("talk to the GUARD captain"), [("GUARD captain", ["npc1"])])
+        self.assertEqual(self._found("search the old tree"), [("old tree", ["loc1"])])
+        self.assertEqual(self._found("атакуй ФАЭЛАН"), [("ФАЭЛАН", ["npc3"])])
+
+    def test_multiple_matches_in_text_order(self):
+        self.assertEqual(
+            self._found("use sword on guard near the tree"),
+            [("sword", ["item1", "item2"]), ("guard", ["npc2"]), ("tree", ["loc2"])]
+        )
+
+    def test_whole_words_only(self):
+        self.assertEqual(self._found("the guardian swordsmith"), [])
+        self.assertEqual(self._found("guard, then guard!"), [("guard", ["npc2"]), ("guard", ["npc2"])])
+
+    def test_whitespace_runs_are_collapsed(self):
+        self.assertEqual(self._found("hail the guard   captain"), [("guard   captain", ["npc1"])])
+
+    def test_shorter_name_is_used_when_longer_fails_word_boundary(self):
+        self.assertEqual(self._found("guard captains"), [("guard", ["npc2"])])
+
+    def test_empty_automaton(self):
+        self.assertEqual(EntityAutomaton({}).find("anything"), [])
+        self.assertEqual(len(EntityAutomaton({"npc": [{"id": "x", "name": ""}]})), 0)
+
+
+class TestEntityAutomatonCache(unittest.TestCase):
+
+    def test_rebuilds_only_on_new_version(self):
+        cache = EntityAutomatonCache()
+        first = cache.get_automaton("g1", "en", {"npc": [_entity("npc1", "Guard")]}, source_version=1)
+        self.assertIs(cache.get_automaton("g1", "en", {}, source_version=1), first)
+        second = cache.get_automaton("g1", "en", {"npc": [_entity("npc2", "Merchant")]}, source_version=2)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.find("guard"), [])
+        self.assertEqual(len(second.find("merchant")), 1)
+
+    def test_invalidate(self):
+        cache = EntityAutomatonCache()
+        entities = {"npc": [_entity("npc1", "Guard")]}
+        en = cache.get_automaton("g1", "en", entities, source_version=1)
+        ru = cache.get_automaton("g1", "ru", entities, source_version=1)
+        cache.invalidate("g1", "en")
+        self.assertIsNot(cache.get_automaton("g1", "en", entities, source_version=1), en)
+        self.assertIs(cache.get_automaton("g1", "ru", entities, source_version=1), ru)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+
+import spacy
+
+from bot.nlu.entity_matcher_cache import EntityMatcherCache
+
+
+def _entities(*names_and_ids):
+    return {"npc": [{"id": eid, "name": name, "type": "npc", "lang": "en"} for name, eid in names_and_ids]}
+
+
+class TestEntityMatcherCache(unittest.TestCase):
+
+    def setUp(self):
+        self.nlp = spacy.blank("en")
+        self.cache = EntityMatcherCache()
+
+    def _match_ids(self, entry, text):
+        doc = self.nlp(text)
+        return {self.nlp.vocab.strings[m_id] for m_id, _, _ in entry.matcher(doc)}
+
+    def test_matches_entities_case_insensitively(self):
+        entry = self.cache.get_entry(self.nlp, "g1", "en", _entities(("Guard Captain", "npc1")), source_version=1)
+        self.assertEqual(self._match_ids(entry, "talk to the guard captain"), {"NPC_npc1"})
+        self.assertEqual(entry.entity_map["NPC_npc1"]["id"], "npc1")
+
+    def test_same_version_reuses_compiled_matcher(self):
+        self.cache.get_entry(self.nlp, "g1", "en", _entities(("Guard", "npc1")), source_version=1)
+        with patch.object(self.nlp, "make_doc", wraps=self.nlp.make_doc) as make_doc:
+            entry = self.cache.get_entry(self.nlp, "g1", "en", _entities(("Guard", "npc1")), source_version=1)
+            make_doc.assert_not_called()
+        self.assertEqual(self._match_ids(entry, "guard"), {"NPC_npc1"})
+
+    def test_new_version_is_applied_incrementally(self):
+        self.cache.get_entry(self.nlp, "g1", "en", _entities(("Guard", "npc1"), ("Merchant", "npc2")), source_version=1)
+        with patch.object(self.nlp, "make_doc", wraps=self.nlp.make_doc) as make_doc:
+            entry = self.cache.get_entry(
+                self.nlp, "g1", "en", _entities(("Guard", "npc1"), ("Blacksmith", "npc3")), source_version=2
+            )
+            # Only the added entity is compiled; the unchanged one is kept.
+            self.assertEqual(make_doc.call_count, 1)
+        self.assertEqual(self._match_ids(entry, "guard and merchant and blacksmith"), {"NPC_npc1", "NPC_npc3"})
+        self.assertNotIn("NPC_npc2", entry.entity_map)
+
+    def test_renamed_entity_is_recompiled(self):
+        self.cache.get_entry(self.nlp, "g1", "en", _entities(("Guard", "npc1")), source_version=1)
+        entry = self.cache.get_entry(self.nlp, "g1", "en", _entities(("Captain", "npc1")), source_version=2)
+        self.assertEqual(self._match_ids(entry, "guard"), set())
+        self.assertEqual(self._match_ids(entry, "captain"), {"NPC_npc1"})
+
+    def test_entries_are_per_guild_and_language_and_can_be_invalidated(self):
+        entry_g1 = self.cache.get_entry(self.nlp, "g1", "en", _entities(("Guard", "npc1")), source_version=1)
+        entry_g2 = self.cache.get_entry(self.nlp, "g2", "en", _entities(("Stranger", "npc2")), source_version=1)
+        self.assertIsNot(entry_g1, entry_g2)
+
+        self.cache.invalidate("g1")
+        rebuilt = self.cache.get_entry(self.nlp, "g1", "en", _entities(("Guard", "npc1")), source_version=1)
+        self.assertIsNot(rebuilt, entry_g1)
+        self.assertIs(self.cache.get_entry(self.nlp, "g2", "en", {}, source_version=1), entry_g2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from bot.nlu.lemma_table import LemmaTable
+from bot.nlu.nlu_executor import NLUToken
+
+KEYWORDS = {
+    "move": ["go", "иди", "идти"],
+    "look": ["look"],
+    "use_skill": ["use skill"],
+}
+
+
+class TestLemmaTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = LemmaTable.from_keywords(KEYWORDS, ["north", "the", "на", "север"])
+
+    def test_simple_command_resolves_without_model(self):
+        tokens = self.table.resolve(["Go", "North", "!"], [" ", "", ""])
+        self.assertEqual([t.lemma for t in tokens], ["go", "north", "!"])
+        self.assertEqual([t.text for t in tokens], ["Go", "North", "!"])
+        self.assertEqual(tokens[2].pos, "PUNCT")
+
+    def test_unknown_word_needs_model(self):
+        self.assertIsNone(self.table.resolve(["go", "to", "Forest"], [" ", " ", ""]))
+        self.assertIsNone(self.table.resolve([], []))
+
+    def test_multi_word_keywords_are_not_seeded(self):
+        self.assertIsNone(self.table.lookup("use skill"))
+        self.assertIsNone(self.table.lookup("use"))
+
+    def test_learned_lemmas_extend_the_table(self):
+        self.table.learn([NLUToken("Иду", " ", "идти", "VERB"), NLUToken("на", " ", "на", "ADP"), NLUToken(".", "", ".", "PUNCT")])
+        tokens = self.table.resolve(["иду", "на", "север"], [" ", " ", ""])
+        self.assertEqual([t.lemma for t in tokens], ["идти", "на", "север"])
+        self.assertEqual(tokens[0].pos, "VERB")
+
+    def test_learned_lemmas_are_bounded(self):
+        table = LemmaTable.from_keywords(KEYWORDS, learned_capacity=2)
+        table.learn([NLUToken("one", " ", "one", "NUM"), NLUToken("two", " ", "two", "NUM")])
+        table.lookup("one")  # refreshes "one"
+        table.learn([NLUToken("three", "", "three", "NUM")])
+        self.assertIsNotNone(table.lookup("one"))
+        self.assertIsNone(table.lookup("two"))
+        self.assertIsNotNone(table.lookup("three"))
+
+
+if __name__ == '__main__':
+    unittest.main()
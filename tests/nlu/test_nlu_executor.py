@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from bot.nlu import nlu_executor
+from bot.nlu.nlu_executor import NLUExecutor, NLUToken
+
+
+def _fake_analyze_batch(calls):
+    def analyze(language, texts):
+        calls.append((language, list(texts)))
+        if language == "xx":
+            return None
+        return [[NLUToken(word, " ", word.lower(), "X") for word in text.split()] for text in texts]
+    return analyze
+
+
+class TestNLUExecutor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.calls = []
+        patcher = patch.object(nlu_executor, "_analyze_batch", _fake_analyze_batch(self.calls))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.pool.shutdown)
+
+    async def test_concurrent_messages_are_micro_batched_per_language(self):
+        executor = NLUExecutor(batch_window=0.01, executor=self.pool)
+        results = await asyncio.gather(
+            executor.analyze("Go North", "en"),
+            executor.analyze("иди на север", "ru"),
+            executor.analyze("look", "en"),
+        )
+        self.assertEqual([t.lemma for t in results[0]], ["go", "north"])
+        self.assertEqual([t.text for t in results[1]], ["иди", "на", "север"])
+        self.assertEqual([t.text for t in results[2]], ["look"])
+        self.assertCountEqual(self.calls, [("en", ["Go North", "look"]), ("ru", ["иди на север"])])
+
+    async def test_full_batch_is_flushed_without_waiting_for_the_window(self):
+        executor = NLUExecutor(batch_window=60, max_batch_size=2, executor=self.pool)
+        results = await asyncio.wait_for(
+            asyncio.gather(executor.analyze("a", "en"), executor.analyze("b", "en")), timeout=5
+        )
+        self.assertEqual([r[0].text for r in results], ["a", "b"])
+        self.assertEqual(self.calls, [("en", ["a", "b"])])
+
+    async def test_missing_model_resolves_to_none(self):
+        executor = NLUExecutor(batch_window=0, executor=self.pool)
+        self.assertIsNone(await executor.analyze("hello", "xx"))
+
+    async def test_worker_error_is_raised_to_every_caller(self):
+        executor = NLUExecutor(batch_window=0.01, executor=self.pool)
+        with patch.object(nlu_executor, "_analyze_batch", side_effect=ValueError("boom")):
+            results = await asyncio.gather(
+                executor.analyze("a", "en"), executor.analyze("b", "en"), return_exceptions=True
+            )
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    async def test_shutdown_fails_pending_requests(self):
+        executor = NLUExecutor(batch_window=60, executor=self.pool)
+        pending = asyncio.ensure_future(executor.analyze("a", "en"))
+        await asyncio.sleep(0)
+        await executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            await pending
+
+    def test_from_settings(self):
+        executor = NLUExecutor.from_settings({"workers": 3, "batch_window_ms": 2, "max_batch_size": 8})
+        self.assertEqual(executor.max_workers, 3)
+        self.assertAlmostEqual(executor.batch_window, 0.002)
+        self.assertEqual(executor.max_batch_size, 8)
+        self.assertEqual(executor.languages, ("en", "ru"))
+        self.assertEqual(executor.entity_recognizer, "phrase_matcher")
+        self.assertEqual(NLUExecutor.from_settings({"entity_recognizer": "aho_corasick"}).entity_recognizer, "aho_corasick")
+        with self.assertRaises(ValueError):
+            NLUExecutor(entity_recognizer="regex")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from bot.game.rules import dice_roller
+from bot.game.rules.dice_roller import DiceEngine, parse_dice
+from bot.game.rules.rule_engine import RuleEngine
+
+
+class TestDiceEngine(unittest.TestCase):
+
+    def test_parse_is_cached_and_handles_all_forms(self):
+        self.assertIs(parse_dice("2d6+3-1"), parse_dice("2d6+3-1"))
+        self.assertEqual(parse_dice("2d6+3-1")[1:], (2, 6, 2))
+        self.assertEqual(parse_dice("4dF")[1:], (4, "F", 0))
+        self.assertEqual(parse_dice(" D20 ")[1:], (1, 20, 0))
+        self.assertEqual(parse_dice("5")[1:], (0, 1, 5))
+
+    def test_seeded_engines_are_reproducible(self):
+        first, second = DiceEngine(seed=42), DiceEngine(seed=42)
+        self.assertEqual([first.roll("3d6").total for _ in range(10)], [second.roll("3d6").total for _ in range(10)])
+        self.assertEqual(list(first.roll_many("2d8+1", 50)), list(second.roll_many("2d8+1", 50)))
+
+    def test_roll_many_stays_in_range(self):
+        totals = DiceEngine(seed=1).roll_many("3d4-2", 1000)
+        self.assertEqual(len(totals), 1000)
+        self.assertTrue(all(1 <= total <= 10 for total in totals))
+
+    def test_roll_many_without_numpy(self):
+        engine = DiceEngine(seed=7)
+        engine._generator = None
+        totals = engine.roll_many("1d6", 100)
+        self.assertTrue(all(1 <= total <= 6 for total in totals))
+
+    def test_exact_distribution(self):
+        distribution = DiceEngine().distribution("2d6")
+        self.assertAlmostEqual(distribution[7], 6 / 36)
+        self.assertAlmostEqual(sum(distribution.values()), 1.0)
+        self.assertEqual(min(DiceEngine().distribution("4dF")), -4)
+
+    def test_probability_at_least(self):
+        engine = DiceEngine(seed=3)
+        self.assertAlmostEqual(engine.probability_at_least("1d20+2", 15), 8 / 20)
+        self.assertEqual(engine.probability_at_least("1d20", 1), 1.0)
+        self.assertEqual(engine.probability_at_least("1d20", 21), 0.0)
+        self.assertAlmostEqual(engine.probability_at_least("1d20+2", 15, samples=20000), 8 / 20, delta=0.02)
+
+
+class TestResolveDiceRoll(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.log_manager = AsyncMock()
+        dice_roller.seed_dice(123)
+        self.addCleanup(dice_roller.seed_dice)
+
+    async def test_rolls_are_not_logged_by_default(self):
+        rule_engine = RuleEngine(game_log_manager=self.log_manager)
+        result = await rule_engine.resolve_dice_roll("2d6+3", context={'guild_id': 'g1'})
+
+        self.assertEqual(result['num_dice'], 2)
+        self.assertEqual(result['dice_sides'], 6)
+        self.assertEqual(result['total'], sum(result['rolls']) + 3)
+        self.log_manager.log_event.assert_not_awaited()
+
+    async def test_opt_in_and_sampled_logging(self):
+        await RuleEngine(game_log_manager=self.log_manager).resolve_dice_roll("d20", context={'guild_id': 'g1', 'log_dice_roll': True})
+        self.assertEqual(self.log_manager.log_event.await_count, 1)
+
+        await RuleEngine(settings={'dice_roll_log_sample_rate': 1.0}, game_log_manager=self.log_manager).resolve_dice_roll("d20")
+        self.assertEqual(self.log_manager.log_event.await_count, 2)
+
+    async def test_invalid_roll_raises(self):
+        with self.assertRaises(ValueError):
+            await RuleEngine().resolve_dice_roll("2d")
+
+
+if __name__ == '__main__':
+    unittest.main()
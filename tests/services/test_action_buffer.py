@@ -0,0 +1,171 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.game.managers.persistence_manager import PersistenceManager
+from bot.game.turn_readiness_queue import TurnReadinessQueue, REASON_ACTIONS
+from bot.services.action_buffer import ActionBuffer, CollectedAction
+
+
+class TestActionBuffer(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.db_service = MagicMock()
+        self.db_service.insert_collected_actions = AsyncMock()
+        self.db_service.delete_collected_actions = AsyncMock()
+        self.db_service.get_collected_actions = AsyncMock(return_value=[])
+        self.buffer = ActionBuffer(db_service=self.db_service, flush_delay=60)
+
+    def _action(self, text):
+        return CollectedAction(intent="move", entities=[{"type": "direction", "name": text}], original_text=text)
+
+    async def test_append_does_not_touch_the_database(self):
+        self.buffer.append("g1", "char1", self._action("north"))
+        self.buffer.append("g1", "char1", self._action("south"))
+        self.db_service.insert_collected_actions.assert_not_awaited()
+        self.assertEqual([a.original_text for a in self.buffer.get_actions("g1", "char1")], ["north", "south"])
+        self.assertEqual(self.buffer.characters_with_actions("g1"), ["char1"])
+        self.assertFalse(self.buffer.has_actions("g2", "char1"))
+
+    async def test_flush_inserts_in_one_batch_per_guild(self):
+        first, second = self._action("north"), self._action("south")
+        self.buffer.append("g1", "char1", first)
+        self.buffer.append("g1", "char2", second)
+        await self.buffer.save_state(guild_id="g1")
+
+        rows = self.db_service.insert_collected_actions.await_args.args[0]
+        self.assertEqual([(r[0], r[1], r[2]) for r in rows], [(first.id, "g1", "char1"), (second.id, "g1", "char2")])
+        self.assertEqual(rows[0][3], {"intent": "move", "entities": [{"type": "direction", "name": "north"}], "original_text": "north"})
+        await self.buffer.flush()
+        self.db_service.insert_collected_actions.assert_awaited_once()
+
+    async def test_drain_deletes_only_rows_already_written(self):
+        written = self._action("north")
+        self.buffer.append("g1", "char1", written)
+        await self.buffer.flush()
+        self.buffer.append("g1", "char1", self._action("south"))
+
+        drained = self.buffer.drain("g1", "char1")
+
+        self.assertEqual([a.to_dict()["original_text"] for a in drained], ["north", "south"])
+        self.assertEqual(self.buffer.get_actions("g1", "char1"), [])
+        await self.buffer.flush()
+        self.db_service.insert_collected_actions.assert_awaited_once()
+        self.db_service.delete_collected_actions.assert_awaited_once_with("g1", [written.id])
+
+    async def test_restore_puts_drained_actions_back_in_front(self):
+        written, unsaved = self._action("north"), self._action("south")
+        self.buffer.append("g1", "char1", written)
+        await self.buffer.flush()
+        self.buffer.append("g1", "char1", unsaved)
+        drained = self.buffer.drain("g1", "char1")
+        self.buffer.append("g1", "char1", self._action("east"))
+
+        self.buffer.restore("g1", "char1", drained)
+
+        self.assertEqual([a.original_text for a in self.buffer.get_actions("g1", "char1")], ["north", "south", "east"])
+        await self.buffer.flush()
+        self.db_service.delete_collected_actions.assert_not_awaited()
+        rows = self.db_service.insert_collected_actions.await_args.args[0]
+        self.assertEqual(sorted(r[3]["original_text"] for r in rows), ["east", "south"])
+
+    async def test_restore_rewrites_rows_deleted_meanwhile(self):
+        action = self._action("north")
+        self.buffer.append("g1", "char1", action)
+        await self.buffer.flush()
+        drained = self.buffer.drain("g1", "char1")
+        await self.buffer.flush()
+
+        self.buffer.restore("g1", "char1", drained)
+        await self.buffer.flush()
+
+        self.assertEqual(self.db_service.insert_collected_actions.await_args.args[0][0][0], action.id)
+
+    async def test_pop_last_removes_newest_action(self):
+        self.buffer.append("g1", "char1", self._action("north"))
+        self.buffer.append("g1", "char1", self._action("south"))
+        self.assertEqual(self.buffer.pop_last("g1", "char1").original_text, "south")
+        await self.buffer.flush()
+        rows = self.db_service.insert_collected_actions.await_args.args[0]
+        self.assertEqual([r[3]["original_text"] for r in rows], ["north"])
+        self.assertIsNone(self.buffer.pop_last("g1", "nobody"))
+
+    async def test_failed_flush_is_retried(self):
+        action = self._action("north")
+        self.buffer.append("g1", "char1", action)
+        self.db_service.insert_collected_actions.side_effect = [ConnectionError("db down"), None]
+        with self.assertRaises(ConnectionError):
+            await self.buffer.flush()
+        await self.buffer.flush()
+        self.assertEqual(self.db_service.insert_collected_actions.await_count, 2)
+        self.assertEqual(self.db_service.insert_collected_actions.await_args.args[0][0][0], action.id)
+
+    async def test_rolled_back_guild_save_writes_actions_again(self):
+        written, pending = self._action("north"), self._action("south")
+        self.buffer.append("g1", "char1", written)
+        await self.buffer.flush()
+        self.buffer.append("g1", "char2", pending)
+        self.buffer.drain("g1", "char1")
+        self.db_service.insert_collected_actions.reset_mock()
+
+        commit_fails = True
+
+        @asynccontextmanager
+        async def unit_of_work(transactional=False):
+            yield
+            if commit_fails:
+                raise ConnectionError("commit failed")
+
+        @asynccontextmanager
+        async def savepoint(on_rollback=None):
+            yield
+
+        self.db_service.unit_of_work = unit_of_work
+        self.db_service.savepoint = savepoint
+        persistence = PersistenceManager(event_manager=None, character_manager=None, location_manager=None,
+                                         db_service=self.db_service, action_buffer=self.buffer)
+
+        with self.assertRaises(ConnectionError):
+            await persistence.save_game_state(["g1"])
+        commit_fails = False
+        await persistence.save_game_state(["g1"])
+
+        self.assertEqual(self.db_service.insert_collected_actions.await_count, 2)
+        self.assertEqual([r[0] for r in self.db_service.insert_collected_actions.await_args.args[0]], [pending.id])
+        self.assertEqual(self.db_service.delete_collected_actions.await_count, 2)
+        self.db_service.delete_collected_actions.assert_awaited_with("g1", [written.id])
+
+    async def test_delayed_flush_batches_appends(self):
+        buffer = ActionBuffer(db_service=self.db_service, flush_delay=0.01)
+        buffer.append("g1", "char1", self._action("north"))
+        buffer.append("g1", "char2", self._action("south"))
+        await asyncio.sleep(0.05)
+        self.db_service.insert_collected_actions.assert_awaited_once()
+        self.assertEqual(len(self.db_service.insert_collected_actions.await_args.args[0]), 2)
+
+    async def test_load_state_restores_pending_actions(self):
+        self.db_service.get_collected_actions.return_value = [
+            {"id": "a1", "player_id": "char1", "action_data": {"intent": "look", "entities": [], "original_text": "look"}, "submitted_at": 1.0},
+            {"id": "a2", "player_id": "char1", "action_data": {"intent": "move", "entities": [], "original_text": "go"}, "submitted_at": 2.0},
+        ]
+        await self.buffer.load_state(guild_id="g1")
+        self.assertEqual([a.id for a in self.buffer.get_actions("g1", "char1")], ["a1", "a2"])
+        self.buffer.drain("g1", "char1")
+        await self.buffer.flush()
+        self.db_service.insert_collected_actions.assert_not_awaited()
+        self.assertCountEqual(self.db_service.delete_collected_actions.await_args.args[1], ["a1", "a2"])
+
+    async def test_characters_with_actions_are_enqueued(self):
+        queue = TurnReadinessQueue()
+        buffer = ActionBuffer(db_service=self.db_service, flush_delay=60, readiness_queue=queue)
+        buffer.append("g1", "char1", self._action("north"))
+        self.db_service.get_collected_actions.return_value = [
+            {"id": "a1", "player_id": "char2", "action_data": {"intent": "look", "entities": [], "original_text": "look"}, "submitted_at": 1.0},
+        ]
+        await buffer.load_state(guild_id="g2")
+        self.assertEqual(queue.take(REASON_ACTIONS), {"g1": ["char1"], "g2": ["char2"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
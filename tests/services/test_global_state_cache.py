@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.services.global_state_cache import GlobalStateCache
+
+
+class TestGlobalStateCache(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.db_service = MagicMock()
+        self.db_service.get_all_global_state = AsyncMock(return_value={"sky_condition": "clear", "current_era": "age_of_ash"})
+        self.db_service.set_global_state_value = AsyncMock()
+        self.db_service.delete_global_state_value = AsyncMock()
+        self.db_service.get_global_state_value = AsyncMock()
+        self.cache = GlobalStateCache(db_service=self.db_service)
+        await self.cache.load()
+
+    def test_reads_come_from_memory(self):
+        self.assertTrue(self.cache.is_loaded)
+        self.assertEqual(self.cache.get("sky_condition"), "clear")
+        self.assertEqual(self.cache.get("missing", "default"), "default")
+        self.assertEqual(self.cache.get_many(["current_era", "missing"]), {"current_era": "age_of_ash", "missing": None})
+        self.db_service.get_global_state_value.assert_not_called()
+
+    async def test_set_writes_through_and_notifies(self):
+        sync_listener = MagicMock()
+        async_listener = AsyncMock()
+        self.cache.subscribe(sync_listener)
+        unsubscribe = self.cache.subscribe(async_listener)
+
+        await self.cache.set("sky_condition", "storm")
+        self.db_service.set_global_state_value.assert_awaited_once_with("sky_condition", "storm")
+        self.assertEqual(self.cache.get("sky_condition"), "storm")
+        sync_listener.assert_called_once_with("sky_condition", "storm")
+        async_listener.assert_awaited_once_with("sky_condition", "storm")
+
+        unsubscribe()
+        await self.cache.set("sky_condition", "storm")  # unchanged value, no notification
+        await self.cache.delete("sky_condition")
+        self.assertIsNone(self.cache.get("sky_condition"))
+        sync_listener.assert_called_with("sky_condition", None)
+        self.assertEqual(async_listener.await_count, 1)
+
+    async def test_failed_write_leaves_cache_untouched(self):
+        self.db_service.set_global_state_value.side_effect = RuntimeError("db down")
+        with self.assertRaises(RuntimeError):
+            await self.cache.set("sky_condition", "storm")
+        self.assertEqual(self.cache.get("sky_condition"), "clear")
+
+
+if __name__ == '__main__':
+    unittest.main()
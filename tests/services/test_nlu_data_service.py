@@ -166,6 +166,76 @@ class TestNLUDataService(unittest.IsolatedAsyncioTestCase):
         await self.nlu_service.get_game_entities(guild_id, lang)
         self.assertGreater(self.mock_db_service.fetchall.call_count, initial_call_count) # DB called again
 
+    async def test_invalidate_cache_forces_refetch_and_bumps_version(self):
+        guild_id = "inval_guild"
+        lang = "en"
+        mock_data = {"FROM skills": [{"id": "skill1", "name_i18n": json.dumps({"en": "TestSkill"})}]}
+        self._mock_db_fetchall(mock_data)
+
+        await self.nlu_service.get_game_entities(guild_id, lang)
+        version_after_fetch = self.nlu_service.get_cache_version(guild_id, lang)
+        call_count = self.mock_db_service.fetchall.call_count
+
+        self.nlu_service.invalidate_cache(guild_id)
+        self.assertGreater(self.nlu_service.get_cache_version(guild_id, lang), version_after_fetch)
+
+        await self.nlu_service.get_game_entities(guild_id, lang)
+        self.assertGreater(self.mock_db_service.fetchall.call_count, call_count)
+
+    async def test_concurrent_misses_share_one_fetch(self):
+        guild_id = "sf_guild"
+        lang = "en"
+        mock_data = {"FROM skills": [{"id": "skill1", "name_i18n": json.dumps({"en": "TestSkill"})}]}
+        self._mock_db_fetchall(mock_data)
+
+        results = await asyncio.gather(*(self.nlu_service.get_game_entities(guild_id, lang) for _ in range(5)))
+
+        # One query per entity table, regardless of the number of concurrent callers.
+        from bot.services.nlu_data_service import ENTITY_CONFIG
+        self.assertEqual(self.mock_db_service.fetchall.call_count, len(ENTITY_CONFIG))
+        for result in results:
+            self.assertIs(result, results[0])
+        self.assertEqual(results[0]["skill"][0]["name"], "TestSkill")
+
+    async def test_refresh_ahead_serves_cached_data_and_refetches_in_background(self):
+        guild_id = "ra_guild"
+        lang = "en"
+        mock_data = {"FROM skills": [{"id": "skill1", "name_i18n": json.dumps({"en": "TestSkill"})}]}
+        self._mock_db_fetchall(mock_data)
+
+        first = await self.nlu_service.get_game_entities(guild_id, lang)
+        call_count = self.mock_db_service.fetchall.call_count
+        # Age the entry past the refresh-ahead threshold but not past the TTL.
+        self.nlu_service._cache[(guild_id, lang, False)]['timestamp'] -= NLUDataService.CACHE_TTL_SECONDS * 0.9
+
+        served = await self.nlu_service.get_game_entities(guild_id, lang)
+        self.assertIs(served, first)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.assertGreater(self.mock_db_service.fetchall.call_count, call_count)
+
+    async def test_upsert_and_remove_entity_patch_cached_entries(self):
+        guild_id = "hook_guild"
+        self._mock_db_fetchall({"FROM npcs": [{"id": "npc1", "name_i18n": json.dumps({"en": "Guard", "ru": "Стражник"}), "guild_id": guild_id}]})
+        await self.nlu_service.get_game_entities(guild_id, "en")
+        await self.nlu_service.get_game_entities(guild_id, "ru")
+        call_count = self.mock_db_service.fetchall.call_count
+        version_en = self.nlu_service.get_cache_version(guild_id, "en")
+
+        self.nlu_service.upsert_entity(guild_id, "npc", "npc1", {"en": "Captain", "ru": "Капитан"})
+        self.nlu_service.upsert_entity(guild_id, "npc", "npc2", {"en": "Merchant"})
+
+        entities_en = await self.nlu_service.get_game_entities(guild_id, "en")
+        entities_ru = await self.nlu_service.get_game_entities(guild_id, "ru")
+        self.assertEqual(self.mock_db_service.fetchall.call_count, call_count) # Served from patched cache
+        self.assertGreater(self.nlu_service.get_cache_version(guild_id, "en"), version_en)
+        self.assertEqual({e["name"] for e in entities_en["npc"]}, {"Captain", "Merchant"})
+        self.assertEqual({e["name"] for e in entities_ru["npc"]}, {"Капитан", "Merchant"}) # Falls back to 'en'
+
+        self.nlu_service.remove_entity(guild_id, "npc", "npc1")
+        entities_en = await self.nlu_service.get_game_entities(guild_id, "en")
+        self.assertEqual([e["id"] for e in entities_en["npc"]], ["npc2"])
+
     async def test_empty_db_results(self):
         guild_id = "empty_guild"
         lang = "en"
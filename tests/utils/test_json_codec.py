@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.database.postgres_adapter import PostgresAdapter
+from bot.utils.json_codec import RawJSON, dumps, encode_db_json, from_db_json, loads, raw_json
+
+
+class TestJsonCodec(unittest.TestCase):
+
+    def test_round_trip(self):
+        data = {"name_i18n": {"en": "Guard", "ru": "Стражник"}, "hp": 10.5, "tags": ["a", "b"]}
+        self.assertEqual(loads(dumps(data)), data)
+
+    def test_sets_are_stored_as_arrays(self):
+        self.assertEqual(sorted(loads(dumps({"ids": {"x", "y"}}))["ids"]), ["x", "y"])
+
+    def test_encoder_passes_raw_json_through(self):
+        self.assertEqual(encode_db_json(RawJSON('{"a": 1}')), '{"a": 1}')
+        self.assertEqual(loads(encode_db_json({"a": 1})), {"a": 1})
+
+    def test_encoder_stores_plain_strings_as_json_strings(self):
+        self.assertEqual(loads(encode_db_json('abc')), 'abc')
+        self.assertEqual(loads(encode_db_json('{"a": 1}')), '{"a": 1}')
+
+    def test_raw_json_marks_only_strings(self):
+        self.assertIsInstance(raw_json('[1]'), RawJSON)
+        self.assertIsNone(raw_json(None))
+        self.assertEqual(raw_json({"a": 1}), {"a": 1})
+
+    def test_from_db_json_accepts_decoded_and_raw_values(self):
+        self.assertEqual(from_db_json({"a": 1}), {"a": 1})
+        self.assertEqual(from_db_json(b'[1, 2]'), [1, 2])
+        self.assertEqual(from_db_json(None, {}), {})
+        self.assertEqual(from_db_json(b'', []), [])
+
+    def test_from_db_json_keeps_decoded_json_strings(self):
+        # A json/jsonb column holding a JSON string scalar comes back from the codec as a str.
+        self.assertEqual(from_db_json(loads(encode_db_json('{"a": 1}'))), '{"a": 1}')
+        self.assertEqual(from_db_json('not json'), 'not json')
+
+    def test_from_db_json_parses_text_columns(self):
+        self.assertEqual(from_db_json('{"a": 1}', text=True), {"a": 1})
+        self.assertEqual(from_db_json('', [], text=True), [])
+
+
+class TestPoolConnectionInit(unittest.IsolatedAsyncioTestCase):
+
+    async def test_json_codecs_are_registered_on_new_connections(self):
+        conn = MagicMock()
+        conn.set_type_codec = AsyncMock()
+        await PostgresAdapter._init_connection(conn)
+        registered = {c.args[0]: c.kwargs for c in conn.set_type_codec.await_args_list}
+        self.assertEqual(set(registered), {'json', 'jsonb'})
+        self.assertIs(registered['jsonb']['encoder'], encode_db_json)
+        self.assertEqual(registered['jsonb']['schema'], 'pg_catalog')
+
+
+if __name__ == '__main__':
+    unittest.main()
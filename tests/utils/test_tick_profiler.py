@@ -0,0 +1,74 @@
+import asyncio
+import json
+import unittest
+
+from bot.utils.tick_profiler import GLOBAL_SCOPE, LatencyHistogram, TickProfiler
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_percentiles_are_within_bucket_precision(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 1001):  # 1ms .. 1000ms
+            histogram.record(ms / 1000)
+
+        self.assertEqual(histogram.count, 1000)
+        for percent, expected in ((50, 0.5), (95, 0.95), (99, 0.99)):
+            self.assertAlmostEqual(histogram.percentile(percent), expected, delta=expected * 0.02)
+        self.assertAlmostEqual(histogram.percentile(100), 1.0, places=6)
+
+    def test_empty_histogram(self):
+        self.assertEqual(LatencyHistogram().percentile(99), 0.0)
+
+
+class TestTickProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = TickProfiler(recent_ticks=3)
+
+    def test_measure_records_per_guild_and_phase(self):
+        with self.profiler.measure('world_tick.statuses', 'g1'):
+            pass
+        self.profiler.record('world_tick.statuses', 0.2, 'g2')
+        self.profiler.record('persistence.save_game_state', 0.1)
+
+        self.assertEqual(self.profiler.get_histogram('world_tick.statuses', 'g1').count, 1)
+        self.assertEqual(self.profiler.get_histogram('persistence.save_game_state').count, 1)
+
+        snapshot = self.profiler.snapshot(guild_id='g1')
+        self.assertEqual({(p['guild_id'], p['phase']) for p in snapshot['phases']},
+                         {('g1', 'world_tick.statuses'), (GLOBAL_SCOPE, 'persistence.save_game_state')})
+
+    def test_slowest_ticks_come_from_recent_window(self):
+        for tick, duration in enumerate([5.0, 0.1, 0.3, 0.2], start=1):
+            self.profiler.record_tick(duration, {'tick': tick})
+
+        slowest = self.profiler.slowest_ticks(limit=2)
+        self.assertEqual([t['tick'] for t in slowest], [3, 4])  # tick 1 fell out of the window
+        json.loads(self.profiler.to_json())
+
+    def test_slowest_ticks_for_a_guild_hide_other_guilds(self):
+        self.profiler.record_tick(0.9, {'tick': 1, 'failed_guild_ids': ['g2'],
+                                        'guild_timings': {'g1': {'total': 0.1}, 'g2': {'total': 0.8}}})
+        self.profiler.record_tick(0.5, {'tick': 2, 'failed_guild_ids': [],
+                                        'guild_timings': {'g1': {'total': 0.4}}})
+        self.profiler.record_tick(0.7, {'tick': 3, 'failed_guild_ids': [], 'guild_timings': {'g2': {'total': 0.7}}})
+
+        slowest = self.profiler.snapshot(guild_id='g1')['slowest_ticks']
+
+        self.assertEqual([t['tick'] for t in slowest], [2, 1])  # ranked by g1's own time; tick 3 had no g1
+        self.assertEqual([set(t['guild_timings']) for t in slowest], [{'g1'}, {'g1'}])
+        self.assertEqual(slowest[1]['failed_guild_ids'], [])
+        self.assertNotIn('g2', self.profiler.to_json(guild_id='g1'))
+
+    def test_timed_decorator_uses_guild_keyword(self):
+        @self.profiler.timed('turns.process_player_turns')
+        async def process(player_ids, guild_id):
+            return len(player_ids)
+
+        self.assertEqual(asyncio.run(process(['p1'], guild_id='g1')), 1)
+        self.assertEqual(self.profiler.get_histogram('turns.process_player_turns', 'g1').count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()